@@ -0,0 +1,289 @@
+"""
+Générateurs de données synthétiques pour les benchmarks et tests différentiels
+- Aides : distribution proche des imports Aides-Territoires (périmètres, productions, montants)
+- Profils : espace de réponses de questionnaire_config.json
+
+Les générateurs sont déterministes pour une graine donnée.
+"""
+
+import json
+import random
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from models_v2 import (
+    AideAgricoleV2, CriteresEligibilite, MontantAide, ProfilAgriculteur,
+    TypeProduction, TypeProjet, StatutJuridique, TypeMontant
+)
+
+QUESTIONNAIRE_PATH = Path(__file__).parent / 'questionnaire_config.json'
+
+REGIONS = [
+    "Auvergne-Rhône-Alpes", "Bourgogne-Franche-Comté", "Bretagne", "Centre-Val de Loire",
+    "Corse", "Grand Est", "Hauts-de-France", "Île-de-France", "Normandie",
+    "Nouvelle-Aquitaine", "Occitanie", "Pays de la Loire", "Provence-Alpes-Côte d'Azur",
+]
+
+# Quelques départements par région (suffisant pour produire des matchs départementaux)
+DEPARTEMENTS = {
+    "Auvergne-Rhône-Alpes": ["01", "03", "07", "15", "26", "38", "42", "43", "63", "69", "73", "74"],
+    "Bourgogne-Franche-Comté": ["21", "25", "39", "58", "70", "71", "89", "90"],
+    "Bretagne": ["22", "29", "35", "56"],
+    "Centre-Val de Loire": ["18", "28", "36", "37", "41", "45"],
+    "Corse": ["2A", "2B"],
+    "Grand Est": ["08", "10", "51", "52", "54", "55", "57", "67", "68", "88"],
+    "Hauts-de-France": ["02", "59", "60", "62", "80"],
+    "Île-de-France": ["75", "77", "78", "91", "92", "93", "94", "95"],
+    "Normandie": ["14", "27", "50", "61", "76"],
+    "Nouvelle-Aquitaine": ["16", "17", "19", "23", "24", "33", "40", "47", "64", "79", "86", "87"],
+    "Occitanie": ["09", "11", "12", "30", "31", "32", "34", "46", "48", "65", "66", "81", "82"],
+    "Pays de la Loire": ["44", "49", "53", "72", "85"],
+    "Provence-Alpes-Côte d'Azur": ["04", "05", "06", "13", "83", "84"],
+}
+
+LABELS = ["Agriculture Biologique", "HVE", "Label Rouge", "AOC", "IGP", "Demeter", "Nature & Progrès"]
+
+ORGANISMES = [
+    "Ministère de l'Agriculture", "FranceAgriMer", "ADEME", "Agence de l'eau",
+    "Conseil régional", "Conseil départemental", "Chambre d'agriculture", "Bpifrance",
+]
+
+# Répartition observée des périmètres Aides-Territoires après normalize_aide :
+# national, régional, départemental (regions=["National"] + département), sans restriction
+PERIMETRES = [("national", 0.45), ("region", 0.35), ("departement", 0.15), ("aucun", 0.05)]
+
+TYPES_MONTANT = [
+    (TypeMontant.FORFAITAIRE, 0.45), (TypeMontant.POURCENTAGE, 0.30),
+    (TypeMontant.SURFACE, 0.15), (TypeMontant.TETE, 0.05), (TypeMontant.UNITE, 0.05),
+]
+
+
+def _weighted(rng: random.Random, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights=weights, k=1)[0]
+
+
+def _maybe(rng: random.Random, probability: float, value):
+    return value if rng.random() < probability else None
+
+
+def generate_aide(rng: random.Random, index: int) -> AideAgricoleV2:
+    """Une aide synthétique (critères souvent vides, comme les données importées)"""
+    perimetre = _weighted(rng, PERIMETRES)
+    regions: List[str] = []
+    departements: List[str] = []
+    if perimetre == "national":
+        regions = [rng.choice(["National", "France"])]
+    elif perimetre == "region":
+        regions = rng.sample(REGIONS, k=1 if rng.random() < 0.9 else 2)
+    elif perimetre == "departement":
+        region = rng.choice(REGIONS)
+        regions = ["National"]
+        departements = [rng.choice(DEPARTEMENTS[region])]
+
+    age_min = _maybe(rng, 0.1, 18)
+    age_max = _maybe(rng, 0.2, rng.choice([40, 50, 60]))
+    superficie_min = _maybe(rng, 0.15, float(rng.choice([1, 5, 10, 20])))
+    superficie_max = _maybe(rng, 0.05, float(rng.choice([100, 200, 500])))
+
+    criteres = CriteresEligibilite(
+        regions=regions,
+        departements=departements,
+        age_min=age_min,
+        age_max=age_max,
+        jeune_agriculteur=_maybe(rng, 0.15, True),
+        superficie_min=superficie_min,
+        superficie_max=superficie_max,
+        types_production=rng.sample(list(TypeProduction), k=rng.choice([0, 0, 0, 1, 2, 3])),
+        types_projets=rng.sample(list(TypeProjet), k=rng.choice([0, 0, 1, 1, 2, 3])),
+        statuts_juridiques=rng.sample(list(StatutJuridique), k=rng.choice([0, 0, 0, 0, 2, 4])),
+        labels_requis=rng.sample(LABELS, k=1) if rng.random() < 0.08 else [],
+        labels_bonus=rng.sample(LABELS, k=rng.choice([0, 0, 1, 2])),
+        premiere_installation=_maybe(rng, 0.1, True),
+    )
+
+    type_montant = _weighted(rng, TYPES_MONTANT)
+    montant = MontantAide(type_montant=type_montant)
+    if type_montant == TypeMontant.FORFAITAIRE:
+        if rng.random() < 0.5:
+            montant.montant_fixe = float(rng.choice([1000, 2500, 5000, 10000, 15000, 30000]))
+        else:
+            montant.montant_min = float(rng.choice([500, 1000, 2000, 5000]))
+            montant.montant_max = montant.montant_min * rng.choice([2, 5, 10])
+    elif type_montant == TypeMontant.POURCENTAGE:
+        montant.taux_min = float(rng.choice([10, 20, 30]))
+        montant.taux_max = montant.taux_min + float(rng.choice([0, 10, 20, 30]))
+        montant.plafond = _maybe(rng, 0.6, float(rng.choice([10000, 50000, 100000, 200000])))
+    else:
+        montant.montant_par_unite = round(rng.uniform(20, 400), 2)
+        montant.unite = {TypeMontant.SURFACE: "ha", TypeMontant.TETE: "tête", TypeMontant.UNITE: "unité"}[type_montant]
+        montant.plafond = _maybe(rng, 0.5, float(rng.choice([5000, 15000, 50000])))
+        montant.plancher = _maybe(rng, 0.1, float(rng.choice([500, 1000])))
+
+    return AideAgricoleV2(
+        aid_id=f"BENCH-{index}",
+        id_externe=str(100000 + index),
+        titre=f"Aide synthétique {index}",
+        description="Description " * rng.randint(5, 60),
+        organisme=rng.choice(ORGANISMES),
+        source="aides_territoires",
+        source_url=f"https://aides-territoires.beta.gouv.fr/aides/{index}/",
+        date_limite_depot=_maybe(rng, 0.4, f"2027-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"),
+        criteres=criteres,
+        montant=montant,
+        tags=rng.sample(["Agriculture", "Subvention", "Prêt", "Investissement", "Environnement"], k=2),
+        confiance=0.7,
+    )
+
+
+def generate_aides(count: int, seed: int = 42) -> List[AideAgricoleV2]:
+    """Catalogue synthétique de `count` aides"""
+    rng = random.Random(seed)
+    return [generate_aide(rng, i) for i in range(count)]
+
+
+PARAGRAPHES = [
+    "Cette aide vise à accompagner les exploitations agricoles dans leurs projets d'investissement.",
+    "Les dépenses éligibles comprennent le matériel, les bâtiments et les études préalables.",
+    "Le dossier doit être déposé avant le début des travaux auprès du service instructeur.",
+    "Une attention particulière est portée aux projets favorisant la transition agroécologique.",
+    "Le taux d'aide peut être majoré pour les jeunes agriculteurs et les exploitations en agriculture biologique.",
+]
+
+
+def _perimetre_brut(aide: AideAgricoleV2) -> Dict[str, str]:
+    criteres = aide.criteres
+    if criteres.departements:
+        return {'name': f"{criteres.departements[0]} - Département", 'scale': 'department'}
+    if not criteres.regions or criteres.regions[0] in ("National", "France"):
+        return {'name': "France", 'scale': 'country'}
+    return {'name': criteres.regions[0], 'scale': 'region'}
+
+
+def generate_raw_payload(aide: AideAgricoleV2, seed: int = 42) -> Dict[str, Any]:
+    """
+    Payload brut de l'API Aides-Territoires pour une aide synthétique (raw_data)
+
+    Graine propre : generate_aide n'est pas modifié (mêmes catalogues de benchmark).
+    """
+    rng = random.Random(f"{seed}-{aide.aid_id}")
+
+    def html(n: int) -> str:
+        return "".join(f"<p>{rng.choice(PARAGRAPHES)} {rng.choice(PARAGRAPHES)}</p>\n" for _ in range(n))
+
+    return {
+        'id': int(aide.id_externe),
+        'slug': f"aide-synthetique-{aide.id_externe}",
+        'url': aide.source_url,
+        'name': aide.titre,
+        'description': html(rng.randint(4, 40)),
+        'eligibility': html(rng.randint(1, 12)),
+        'contact': f"<p>{aide.organisme}<br>contact@example.fr</p>",
+        'financers': [aide.organisme],
+        'financers_full': [{'id': rng.randint(1, 500), 'name': aide.organisme, 'logo': None}],
+        'programs': rng.sample(["FEADER", "PCAE", "France 2030", "Plan de relance"], k=rng.randint(0, 2)),
+        'perimeter': _perimetre_brut(aide),
+        'categories': rng.sample(["Agriculture", "Environnement", "Économie", "Énergie"], k=2),
+        'aid_types': [aide.montant.type_montant.value if aide.montant else "subvention"],
+        'targeted_audiences': ["farmer"],
+        'submission_deadline': aide.date_limite_depot,
+        'recurrence': rng.choice(["oneoff", "ongoing", "recurring"]),
+        'subvention_rate_lower_bound': aide.montant.taux_min if aide.montant else None,
+        'subvention_rate_upper_bound': aide.montant.taux_max if aide.montant else None,
+        'date_created': "2025-01-15T10:00:00+01:00",
+        'date_updated': "2026-03-01T08:30:00+01:00",
+    }
+
+
+# ============ PROFILS ============
+
+def load_answer_space(path: Path = QUESTIONNAIRE_PATH) -> Dict[str, Dict[str, Any]]:
+    """Questions du questionnaire indexées par id (type, options, validation)"""
+    with open(path, encoding='utf-8') as f:
+        config = json.load(f)
+    questions = {}
+    for section in config.get('sections', []):
+        for question in section.get('questions', []):
+            questions[question['id']] = question
+    return questions
+
+
+def _option_values(question: Dict[str, Any]) -> List[Any]:
+    return [o['value'] if isinstance(o, dict) else o for o in question.get('options', [])]
+
+
+def generate_answers(rng: random.Random, space: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Réponses brutes au questionnaire (clés = ids des questions)"""
+    region = rng.choice(_option_values(space['region']))
+    sau_max = space['sau_totale'].get('validation', {}).get('max', 10000)
+    sau_totale = round(min(sau_max, rng.lognormvariate(4.0, 0.9)), 1)
+    label_bio = rng.choice(_option_values(space['label_bio']))
+    age_validation = space['age'].get('validation', {})
+    age = rng.randint(age_validation.get('min', 18), min(age_validation.get('max', 120), 67))
+
+    return {
+        'region': region,
+        'departement': rng.choice(DEPARTEMENTS.get(region, ["75"])),
+        'statut_juridique': rng.choice(_option_values(space['statut_juridique'])),
+        'sau_totale': sau_totale,
+        'productions': rng.sample(_option_values(space['productions']), k=rng.randint(1, 3)),
+        'age': age,
+        'jeune_agriculteur': age <= 40 and rng.random() < 0.6,
+        'diplome': rng.choice(_option_values(space['diplome'])),
+        'installation_recente': rng.random() < 0.2,
+        'label_bio': label_bio,
+        'sau_bio': round(sau_totale * rng.random(), 1) if label_bio != 'non' else 0,
+        'autres_labels': rng.sample(_option_values(space['autres_labels']), k=rng.choice([0, 0, 1, 2])),
+        'types_projets': rng.sample(_option_values(space['types_projets']), k=rng.randint(0, 3)),
+    }
+
+
+def answers_to_profil_v2(answers: Dict[str, Any]) -> Dict[str, Any]:
+    """Payload V2 de /api/matching correspondant aux réponses"""
+    labels = list(answers.get('autres_labels', []))
+    if answers.get('label_bio') == 'certifie':
+        labels.append("Agriculture Biologique")
+    return {
+        'region': answers['region'],
+        'departement': answers['departement'],
+        'statut_juridique': answers['statut_juridique'],
+        'sau_totale': answers['sau_totale'],
+        'sau_bio': answers.get('sau_bio', 0),
+        'productions': answers['productions'],
+        'age': answers['age'],
+        'jeune_agriculteur': answers['jeune_agriculteur'],
+        'premiere_installation': answers.get('installation_recente', False),
+        'niveau_formation': answers.get('diplome'),
+        'label_bio': answers.get('label_bio') == 'certifie',
+        'labels': labels,
+        'projets_en_cours': answers['types_projets'],
+    }
+
+
+def answers_to_profil_legacy(answers: Dict[str, Any]) -> Dict[str, Any]:
+    """Payload legacy (frontend) de /api/matching correspondant aux réponses"""
+    return {
+        'region': answers['region'],
+        'departement': answers['departement'],
+        'statut_juridique': answers['statut_juridique'],
+        'superficie_ha': answers['sau_totale'],
+        'productions': answers['productions'],
+        'labels': list(answers.get('autres_labels', [])),
+        'age_exploitant': answers['age'],
+        'jeune_agriculteur': answers['jeune_agriculteur'],
+        'projets': answers['types_projets'],
+    }
+
+
+def generate_profil_payloads(count: int, seed: int = 7, legacy: bool = False,
+                             space: Optional[Dict[str, Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+    """Payloads /api/matching (V2 ou legacy) issus de réponses aléatoires"""
+    rng = random.Random(seed)
+    space = space or load_answer_space()
+    convert = answers_to_profil_legacy if legacy else answers_to_profil_v2
+    return [convert(generate_answers(rng, space)) for _ in range(count)]
+
+
+def generate_profils(count: int, seed: int = 7) -> List[ProfilAgriculteur]:
+    """Profils V2 validés"""
+    return [ProfilAgriculteur(**payload) for payload in generate_profil_payloads(count, seed)]
@@ -0,0 +1,384 @@
+"""
+Benchmarks du matching V2
+- Micro : MatchingEngine.calculate_match (modèle validé), calculer + sérialisation (chemin du handler),
+  find_best_matches, convert_legacy_to_v2, compilateur de profils (legacy, V2, réponses brutes)
+- Encodage : réponse /api/matching de N résultats (json vs orjson, gzip / brotli)
+- Bout en bout (--e2e) : charge sur POST /api/matching via l'app ASGI, avec
+  mongomock-motor (pip install mongomock-motor) ou un mongod local (--mongo-url)
+
+Les résultats sont écrits en JSON dans benchmark_results/<commit>.json
+pour comparer deux commits (--compare).
+
+Usage:
+    python benchmark_matching.py
+    python benchmark_matching.py --aides 2000 --profils 50 --e2e
+    python benchmark_matching.py --e2e --mongo-url mongodb://localhost:27017
+    python benchmark_matching.py --compare benchmark_results/abc1234.json
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmark_data import (
+    generate_aides, generate_answers, generate_profil_payloads, generate_profils, load_answer_space
+)
+from matching_engine import MatchingEngine, horodatage_matching, serialiser_resultat
+
+BACKEND_DIR = Path(__file__).parent
+RESULTS_DIR = BACKEND_DIR / 'benchmark_results'
+BENCHMARK_DB_NAME = 'agrisubv_benchmark'
+
+
+# ============ MESURE ============
+
+def measure(func: Callable[[], Any], operations: int, repeat: int = 5, warmup: int = 1) -> Dict[str, Any]:
+    """
+    Exécute `func` `repeat` fois et retourne le temps par opération (µs)
+
+    Args:
+        func: Fonction exécutant `operations` opérations
+        operations: Nombre d'opérations par appel de func
+        repeat: Nombre de mesures
+        warmup: Appels non mesurés
+    """
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) / operations * 1e6)
+    return {
+        "operations": operations,
+        "repeat": repeat,
+        "us_per_op_min": round(min(samples), 3),
+        "us_per_op_median": round(statistics.median(samples), 3),
+        "us_per_op_max": round(max(samples), 3),
+        "ops_per_s": round(1e6 / statistics.median(samples), 1),
+    }
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+# ============ MICRO-BENCHMARKS ============
+
+def run_micro(aides_count: int, profils_count: int, repeat: int, seed: int) -> Dict[str, Any]:
+    """Micro-benchmarks du moteur et de la conversion legacy"""
+    aides = generate_aides(aides_count, seed=seed)
+    profils = generate_profils(profils_count, seed=seed + 1)
+    legacy_payloads = generate_profil_payloads(profils_count, seed=seed + 1, legacy=True)
+    engine = MatchingEngine()
+
+    def calculate_all():
+        for profil in profils:
+            for aide in aides:
+                engine.calculate_match(aide, profil)
+
+    def matching_run():
+        # Chemin du handler /api/matching : calcul + sérialisation de chaque résultat
+        for profil in profils:
+            date_matching = horodatage_matching()
+            for aide in aides:
+                serialiser_resultat(engine.calculer(aide, profil, date_matching=date_matching))
+
+    def best_matches():
+        for profil in profils:
+            engine.find_best_matches(aides, profil, top_n=10)
+
+    # Importé ici : server crée le client MongoDB (sans connexion) à l'import
+    from server import ProfilAgriculteurLegacy, convert_legacy_to_v2
+
+    def convert_all():
+        for payload in legacy_payloads:
+            convert_legacy_to_v2(ProfilAgriculteurLegacy(**payload))
+
+    from profile_compiler import get_profil_compiler
+
+    compiler = get_profil_compiler()
+    v2_payloads = generate_profil_payloads(profils_count, seed=seed + 1)
+    rng, space = random.Random(seed + 1), load_answer_space()
+    reponses = [generate_answers(rng, space) for _ in range(profils_count)]
+
+    def compile_legacy():
+        for payload in legacy_payloads:
+            compiler.compile(payload)
+
+    def compile_v2():
+        for payload in v2_payloads:
+            compiler.compile(payload)
+
+    def compile_reponses():
+        for answers in reponses:
+            compiler.compile(answers)
+
+    results = {
+        "calculate_match": measure(calculate_all, len(aides) * len(profils), repeat),
+        "matching_run": measure(matching_run, len(aides) * len(profils), repeat),
+        "find_best_matches": measure(best_matches, len(profils), repeat),
+        "convert_legacy_to_v2": measure(convert_all, len(legacy_payloads), max(repeat, 20)),
+        "compile_profil_legacy": measure(compile_legacy, len(legacy_payloads), max(repeat, 20)),
+        "compile_profil_v2": measure(compile_v2, len(v2_payloads), max(repeat, 20)),
+        "compile_profil_reponses": measure(compile_reponses, len(reponses), max(repeat, 20)),
+    }
+
+    eligible = sum(
+        engine.calculate_match(aide, profils[0]).eligible for aide in aides
+    )
+    results["catalogue"] = {"aides": len(aides), "profils": len(profils), "eligibles_profil_0": eligible}
+    return results
+
+
+# ============ ENCODAGE ============
+
+def build_matching_payload(count: int, seed: int) -> Dict[str, Any]:
+    """Réponse /api/matching de `count` résultats, construite comme par le handler"""
+    aides = generate_aides(count, seed=seed)
+    profil = generate_profils(1, seed=seed + 1)[0]
+    engine = MatchingEngine()
+    date_matching = horodatage_matching()
+    resultats = []
+    for aide in aides:
+        resultat = serialiser_resultat(engine.calculer(aide, profil, date_matching=date_matching))
+        resultat['aide'] = {
+            'aid_id': aide.aid_id,
+            'titre': aide.titre,
+            'description': aide.description,
+            'url': aide.source_url or aide.lien_officiel,
+            'type_aide': aide.tags[:3],
+            'organisme': aide.organisme,
+            'source': aide.source,
+        }
+        resultats.append(resultat)
+    resultats.sort(key=lambda x: (-x['eligible'], -x['score']))
+    return {"profil_id": profil.profil_id, "total_aides": len(resultats), "resultats": resultats}
+
+
+def run_encoding(count: int, repeat: int, seed: int) -> Dict[str, Any]:
+    """Temps d'encodage et octets transférés pour une réponse de `count` résultats"""
+    from fastapi.responses import JSONResponse
+    from compression import brotli, compress_body
+    from json_responses import FastJSONResponse
+
+    payload = build_matching_payload(count, seed)
+    results: Dict[str, Any] = {"resultats": count}
+
+    for name, response_class in (("json", JSONResponse), ("orjson", FastJSONResponse)):
+        body = response_class(payload).body
+        timing = measure(lambda: response_class(payload), 1, repeat)
+        results[name] = {"bytes": len(body), "encode_ms_median": round(timing["us_per_op_median"] / 1000, 2)}
+
+    body = FastJSONResponse(payload).body
+    encodings = ["gzip"] + (["br"] if brotli is not None else [])
+    for encoding in encodings:
+        compressed = compress_body(body, encoding)
+        timing = measure(lambda: compress_body(body, encoding), 1, repeat)
+        results[encoding] = {
+            "bytes": len(compressed),
+            "ratio": round(len(compressed) / len(body), 3),
+            "compress_ms_median": round(timing["us_per_op_median"] / 1000, 2),
+        }
+    if brotli is None:
+        results["br"] = {"skipped": "module brotli non installé"}
+    return results
+
+
+# ============ BOUT EN BOUT ============
+
+async def _load_test(app, payloads: List[Dict[str, Any]], concurrency: int) -> Dict[str, Any]:
+    import httpx
+
+    latencies: List[float] = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as http:
+        async def one(payload):
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                response = await http.post("/api/matching", json=payload)
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    errors += 1
+
+        # Première requête hors mesure : publication du snapshot du catalogue
+        await one(payloads[0])
+        latencies.clear()
+
+        start = time.perf_counter()
+        await asyncio.gather(*[one(p) for p in payloads])
+        elapsed = time.perf_counter() - start
+
+    return {
+        "requests": len(payloads),
+        "concurrency": concurrency,
+        "errors": errors,
+        "requests_per_s": round(len(payloads) / elapsed, 2),
+        "latency_ms_p50": round(_percentile(latencies, 50) * 1000, 2),
+        "latency_ms_p95": round(_percentile(latencies, 95) * 1000, 2),
+        "latency_ms_p99": round(_percentile(latencies, 99) * 1000, 2),
+        "latency_ms_max": round(max(latencies) * 1000, 2),
+    }
+
+
+async def run_e2e(aides_count: int, requests: int, concurrency: int, seed: int,
+                  mongo_url: Optional[str]) -> Dict[str, Any]:
+    """
+    Charge sur /api/matching avec un catalogue synthétique
+
+    server lit sa configuration à l'import (déjà fait par run_micro) : la base,
+    le répertoire de snapshots et l'échantillonnage des métriques sont donc
+    remplacés explicitement. Seule une base créée par le benchmark est supprimée.
+    """
+    import catalog_snapshot
+    import metrics
+    import server
+
+    client = None
+    if mongo_url:
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        backend = "mongod"
+        client = AsyncIOMotorClient(mongo_url)
+        if BENCHMARK_DB_NAME in await client.list_database_names():
+            client.close()
+            return {"skipped": f"la base {BENCHMARK_DB_NAME} existe déjà sur {mongo_url}, non modifiée"}
+        db = client[BENCHMARK_DB_NAME]
+    else:
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            return {"skipped": "mongomock-motor non installé et --mongo-url absent"}
+        backend = "mongomock"
+        db = AsyncMongoMockClient()[BENCHMARK_DB_NAME]
+
+    snapshot_dir = tempfile.mkdtemp(prefix='agrisubv-bench-')
+    previous = (server.db, server.matching_db, catalog_snapshot._store, metrics.METRICS_SAMPLE_RATE)
+    server.db = server.matching_db = db
+    catalog_snapshot._store = catalog_snapshot.CatalogSnapshotStore(Path(snapshot_dir))
+    metrics.METRICS_SAMPLE_RATE = 0
+    try:
+        aides = generate_aides(aides_count, seed=seed)
+        await db.aides_v2.insert_many([aide.model_dump() for aide in aides])
+
+        payloads = generate_profil_payloads(requests, seed=seed + 2)
+        result = await _load_test(server.app, payloads, concurrency)
+    finally:
+        server.db, server.matching_db, catalog_snapshot._store, metrics.METRICS_SAMPLE_RATE = previous
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
+        if client is not None:
+            # aides_v2, catalog_stats, catalog_stats_history... : la base entière est celle du benchmark
+            await client.drop_database(BENCHMARK_DB_NAME)
+            client.close()
+
+    result["backend"] = backend
+    result["aides"] = aides_count
+    return result
+
+
+# ============ RÉSULTATS ============
+
+def _git(*args: str) -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", *args], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment() -> Dict[str, Any]:
+    commit = _git("rev-parse", "--short", "HEAD")
+    dirty = bool(_git("status", "--porcelain", "--untracked-files=no"))
+    return {
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+    }
+
+
+def save_results(results: Dict[str, Any], output: Optional[Path] = None) -> Path:
+    if output is None:
+        env = results["environment"]
+        name = env["commit"] or "unknown"
+        if env["dirty"]:
+            name += "-dirty"
+        output = RESULTS_DIR / f"{name}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding='utf-8')
+    return output
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """Lignes de comparaison (ratio > 1 = plus lent que la référence)"""
+    lines = [f"Référence {baseline['environment'].get('commit')} → {current['environment'].get('commit')}"]
+    for name, result in current.get("micro", {}).items():
+        before = baseline.get("micro", {}).get(name, {})
+        if "us_per_op_median" in result and "us_per_op_median" in before:
+            ratio = result["us_per_op_median"] / before["us_per_op_median"]
+            lines.append(f"  {name:<22} {before['us_per_op_median']:>10.2f} µs → {result['us_per_op_median']:>10.2f} µs  (x{ratio:.2f})")
+    e2e, before = current.get("e2e", {}), baseline.get("e2e", {})
+    for key in ("latency_ms_p50", "latency_ms_p95", "requests_per_s"):
+        if key in e2e and key in before:
+            lines.append(f"  e2e {key:<18} {before[key]:>10.2f} → {e2e[key]:>10.2f}")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks du matching V2")
+    parser.add_argument("--aides", type=int, default=1000, help="Taille du catalogue synthétique")
+    parser.add_argument("--profils", type=int, default=20, help="Nombre de profils (micro)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--encoding-results", type=int, default=5000,
+                        help="Taille de la réponse pour le benchmark d'encodage (0 = ignoré)")
+    parser.add_argument("--e2e", action="store_true", help="Test de charge sur /api/matching")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--mongo-url", help=f"mongod local (base {BENCHMARK_DB_NAME} créée puis supprimée, refusée si elle existe)")
+    parser.add_argument("--output", type=Path, help="Fichier de résultats (défaut: benchmark_results/<commit>.json)")
+    parser.add_argument("--compare", type=Path, help="Résultats de référence à comparer")
+    args = parser.parse_args()
+
+    results: Dict[str, Any] = {
+        "environment": environment(),
+        "parameters": {k: v for k, v in vars(args).items() if k not in ("output", "compare", "mongo_url")},
+        "micro": run_micro(args.aides, args.profils, args.repeat, args.seed),
+    }
+    if args.encoding_results:
+        results["encoding"] = run_encoding(args.encoding_results, args.repeat, args.seed)
+    if args.e2e:
+        results["e2e"] = asyncio.run(
+            run_e2e(args.aides, args.requests, args.concurrency, args.seed, args.mongo_url)
+        )
+
+    path = save_results(results, args.output)
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+    print(f"\n💾 Résultats: {path}")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding='utf-8'))
+        print("\n".join(compare(results, baseline)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""
+Benchmark hors ligne des synchronisations Aides-Territoires (mode fixtures replay)
+Les pages de l'API sont rejouées depuis des fixtures (fixture_transport.py) avec
+une latence et un taux d'erreurs configurables : débit de récupération et de
+normalisation mesurable de façon déterministe, sans réseau.
+
+Les fixtures sont soit enregistrées une fois contre l'API réelle
+(HTTP_FIXTURES_MODE=record pendant une synchronisation), soit générées ici à
+partir du catalogue synthétique (--generer).
+
+Usage:
+    python benchmark_sync.py --generer 2000                 # fixtures synthétiques + mesure
+    python benchmark_sync.py --fixtures ./http_fixtures     # fixtures enregistrées
+    python benchmark_sync.py --generer 2000 --latence-ms 80 --gigue-ms 20 --erreurs 0.02
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import orjson
+
+from benchmark_data import generate_aides, generate_raw_payload
+
+API_URL = "https://aides-territoires.beta.gouv.fr/api/aids/"
+CONNEXION_URL = "https://aides-territoires.beta.gouv.fr/api/connexion/"
+PAGE_SIZE = 50
+
+
+def generer_fixtures(directory: Path, count: int, seed: int = 42) -> int:
+    """Pages synthétiques aux paramètres des deux synchronisations ; renvoie le nombre de pages"""
+    from fixture_transport import FixtureStore
+
+    store = FixtureStore(directory)
+    payloads = [generate_raw_payload(aide, seed) for aide in generate_aides(count, seed)]
+    pages = max(1, -(-count // PAGE_SIZE))
+    for page in range(1, pages + 1):
+        params = {'categories': 'agriculture', 'is_charged': 'false', 'page_size': PAGE_SIZE, 'page': page}
+        body = {
+            'count': count,
+            'next': f"{API_URL}?page={page + 1}" if page < pages else None,
+            'results': payloads[(page - 1) * PAGE_SIZE:page * PAGE_SIZE],
+        }
+        store.ecrire('GET', API_URL, params, 200, {'Content-Type': 'application/json'}, orjson.dumps(body))
+    store.ecrire('POST', CONNEXION_URL, None, 200, {'Content-Type': 'application/json'}, b'{"token": "bench"}')
+    return pages
+
+
+async def mesurer_v2() -> dict:
+    from sync_aides_territoires_v2 import AidesTerritoiresSync
+
+    syncer = AidesTerritoiresSync(db=None)
+    syncer.REQUESTS_PER_SECOND = float('inf')  # la latence vient du rejeu, pas du rate limiting
+    debut = time.perf_counter()
+    brutes = await syncer.fetch_aides_paginated()
+    fetch_s = time.perf_counter() - debut
+    debut = time.perf_counter()
+    normalisees = 0
+    for aide in brutes:
+        try:
+            syncer.normalize_aide(aide)
+            normalisees += 1
+        except Exception:
+            pass
+    normalize_s = time.perf_counter() - debut
+    return {
+        'aides': len(brutes),
+        'normalisees': normalisees,
+        'fetch_s': round(fetch_s, 3),
+        'normalize_s': round(normalize_s, 3),
+        'aides_par_s': round(len(brutes) / (fetch_s + normalize_s), 1) if brutes else 0,
+    }
+
+
+async def mesurer_legacy(concurrency: int) -> dict:
+    from sync_aides_territoires import AidesTerritoiresSyncer
+
+    debut = time.perf_counter()
+    async with AidesTerritoiresSyncer(concurrency=concurrency) as syncer:
+        brutes = await syncer.fetch_aides_agricoles(page_size=PAGE_SIZE)
+    fetch_s = time.perf_counter() - debut
+    debut = time.perf_counter()
+    normalisees = 0
+    for aide in brutes:
+        try:
+            syncer.normalize_aide(aide)
+            normalisees += 1
+        except Exception:
+            pass
+    normalize_s = time.perf_counter() - debut
+    return {
+        'aides': len(brutes),
+        'normalisees': normalisees,
+        'concurrency': concurrency,
+        'fetch_s': round(fetch_s, 3),
+        'normalize_s': round(normalize_s, 3),
+        'aides_par_s': round(len(brutes) / (fetch_s + normalize_s), 1) if brutes else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Débit des synchronisations en rejeu de fixtures")
+    parser.add_argument("--generer", type=int, help="Générer N aides synthétiques en fixtures")
+    parser.add_argument("--fixtures", type=Path, help="Dossier de fixtures (défaut: temporaire si --generer)")
+    parser.add_argument("--latence-ms", type=float, default=50.0)
+    parser.add_argument("--gigue-ms", type=float, default=0.0)
+    parser.add_argument("--erreurs", type=float, default=0.0, help="Taux d'erreurs HTTP injectées (0-1)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Pages parallèles (synchronisation legacy)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    directory = args.fixtures or Path(tempfile.mkdtemp(prefix='agrisubv-fixtures-'))
+    # Lus à l'import par fixture_transport / http_cache / sync_aides_territoires_v2
+    os.environ.update({
+        'HTTP_FIXTURES_MODE': 'replay',
+        'HTTP_FIXTURES_DIR': str(directory),
+        'HTTP_FIXTURES_LATENCY_MS': str(args.latence_ms),
+        'HTTP_FIXTURES_JITTER_MS': str(args.gigue_ms),
+        'HTTP_FIXTURES_ERROR_RATE': str(args.erreurs),
+        'HTTP_FIXTURES_SEED': str(args.seed),
+        'AT_HTTP_CACHE_ENABLED': 'false',
+    })
+    os.environ.setdefault('AIDES_TERRITOIRES_API_TOKEN', 'bench')
+    pages = generer_fixtures(directory, args.generer, args.seed) if args.generer else None
+
+    from fixture_transport import get_rejeu
+
+    resultats = {
+        'parameters': {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items()},
+        'pages': pages,
+        'v2': asyncio.run(mesurer_v2()),
+        'legacy': asyncio.run(mesurer_legacy(args.concurrency)),
+        'rejeu': get_rejeu().stats,
+    }
+    print(json.dumps(resultats, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
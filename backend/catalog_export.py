@@ -0,0 +1,309 @@
+"""
+Export du catalogue local (aides_v2) en NDJSON, CSV ou Parquet
+L'export ne retélécharge plus l'API Aides-Territoires : il lit la collection
+aides_v2 (aides actives, ordre aid_id) et sort une ligne plate par aide. Les
+textes (description, éligibilité, contact) sont convertis du HTML une seule
+fois à l'import (champs *_texte, voir html_text.py) ; les documents importés
+avant ce changement sont convertis à la volée.
+
+Le dernier export de chaque format est conservé sur disque sous le nom de son
+empreinte SHA-256 (index.json : format → version du catalogue, empreinte). Il
+n'est régénéré que lorsque la version du catalogue change ; sinon le fichier
+est relu par blocs. Une génération est streamée au client pendant qu'elle est
+écrite (NDJSON, CSV) ; Parquet (pyarrow, optionnel) est écrit puis relu.
+"""
+
+import csv
+import hashlib
+import io
+import logging
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+import orjson
+from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
+
+from html_text import html_vers_texte
+
+logger = logging.getLogger(__name__)
+
+EXPORT_DIR = Path(os.environ.get('CATALOG_EXPORT_DIR', Path(__file__).parent / 'catalog_exports'))
+EXPORT_BATCH_SIZE = int(os.environ.get('CATALOG_EXPORT_BATCH_SIZE', '500'))
+CHUNK_SIZE = 64 * 1024
+
+FORMATS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+COLONNES = (
+    "aid_id", "id_externe", "titre", "organisme", "programme", "source", "statut",
+    "date_debut", "date_fin", "date_limite_depot",
+    "description", "conditions_eligibilite", "contact", "demarche", "lien_officiel", "source_url",
+    "regions", "departements", "types_production", "types_projets", "statuts_juridiques", "labels_requis",
+    "type_montant", "montant_min", "montant_max", "taux_min", "taux_max", "plafond",
+    "tags", "confiance", "derniere_maj",
+)
+COLONNES_LISTES = frozenset((
+    "regions", "departements", "types_production", "types_projets", "statuts_juridiques", "labels_requis", "tags",
+))
+COLONNES_NUMERIQUES = frozenset(("montant_min", "montant_max", "taux_min", "taux_max", "plafond", "confiance"))
+
+# Séparateur des listes dans une cellule CSV
+SEPARATEUR_LISTE = " | "
+
+
+# ============ LIGNES ============
+
+def _texte(doc: Dict[str, Any], champ: str) -> str:
+    texte = doc.get(f"{champ}_texte")
+    return texte if texte is not None else html_vers_texte(doc.get(champ))
+
+
+def ligne_export(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Ligne plate d'un document aides_v2"""
+    criteres = doc.get('criteres') or {}
+    montant = doc.get('montant') or {}
+    return {
+        "aid_id": doc.get('aid_id'),
+        "id_externe": doc.get('id_externe'),
+        "titre": doc.get('titre'),
+        "organisme": doc.get('organisme'),
+        "programme": doc.get('programme'),
+        "source": doc.get('source'),
+        "statut": doc.get('statut'),
+        "date_debut": doc.get('date_debut'),
+        "date_fin": doc.get('date_fin'),
+        "date_limite_depot": doc.get('date_limite_depot'),
+        "description": _texte(doc, 'description'),
+        "conditions_eligibilite": _texte(doc, 'conditions_eligibilite'),
+        "contact": _texte(doc, 'contact'),
+        "demarche": doc.get('demarche'),
+        "lien_officiel": doc.get('lien_officiel'),
+        "source_url": doc.get('source_url'),
+        "regions": criteres.get('regions') or [],
+        "departements": criteres.get('departements') or [],
+        "types_production": criteres.get('types_production') or [],
+        "types_projets": criteres.get('types_projets') or [],
+        "statuts_juridiques": criteres.get('statuts_juridiques') or [],
+        "labels_requis": criteres.get('labels_requis') or [],
+        "type_montant": montant.get('type_montant'),
+        "montant_min": montant.get('montant_min'),
+        "montant_max": montant.get('montant_max'),
+        "taux_min": montant.get('taux_min'),
+        "taux_max": montant.get('taux_max'),
+        "plafond": montant.get('plafond'),
+        "tags": doc.get('tags') or [],
+        "confiance": doc.get('confiance'),
+        "derniere_maj": doc.get('derniere_maj'),
+    }
+
+
+def encoder_ndjson(lignes: List[Dict[str, Any]]) -> bytes:
+    return b"".join(orjson.dumps(ligne) + b"\n" for ligne in lignes)
+
+
+def encoder_csv(lignes: List[Dict[str, Any]], entete: bool = False) -> bytes:
+    tampon = io.StringIO()
+    writer = csv.writer(tampon, lineterminator="\n")
+    if entete:
+        writer.writerow(COLONNES)
+    for ligne in lignes:
+        writer.writerow([
+            SEPARATEUR_LISTE.join(ligne[c]) if c in COLONNES_LISTES else ("" if ligne[c] is None else ligne[c])
+            for c in COLONNES
+        ])
+    return tampon.getvalue().encode('utf-8')
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        return None
+    return pyarrow
+
+
+def parquet_disponible() -> bool:
+    return _pyarrow() is not None
+
+
+def _schema_parquet(pa):
+    return pa.schema([
+        (c, pa.list_(pa.string()) if c in COLONNES_LISTES else pa.float64() if c in COLONNES_NUMERIQUES else pa.string())
+        for c in COLONNES
+    ])
+
+
+# ============ CACHE ADRESSÉ PAR CONTENU ============
+
+class CatalogExportStore:
+    """Derniers exports par format, nommés par empreinte SHA-256"""
+
+    def __init__(self, directory: Path = EXPORT_DIR):
+        self.directory = Path(directory)
+
+    @property
+    def index_path(self) -> Path:
+        return self.directory / "index.json"
+
+    def _index(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            return orjson.loads(self.index_path.read_bytes())
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def existant(self, format: str, version: int) -> Optional[Dict[str, Any]]:
+        """Entrée de l'export du format pour cette version du catalogue (None si à régénérer)"""
+        entree = self._index().get(format)
+        if entree is None or entree['version'] != version or not self.path(entree).exists():
+            return None
+        return entree
+
+    def path(self, entree: Dict[str, Any]) -> Path:
+        return self.directory / f"{entree['sha256']}.{FORMATS[entree['format']][1]}"
+
+    def _enregistrer(self, format: str, version: int, tmp_path: Path, empreinte: str, taille: int) -> Dict[str, Any]:
+        entree = {
+            'format': format,
+            'version': version,
+            'sha256': empreinte,
+            'taille': taille,
+            'cree_le': datetime.now(timezone.utc).isoformat(),
+        }
+        os.replace(tmp_path, self.path(entree))
+        index = self._index()
+        index[format] = entree
+        tmp_index = self.directory / f".index.{os.getpid()}.tmp"
+        tmp_index.write_bytes(orjson.dumps(index))
+        os.replace(tmp_index, self.index_path)
+        self._nettoyer(index)
+        logger.info(f"📤 Export {format} du catalogue v{version}: {taille} octets ({empreinte[:12]})")
+        return entree
+
+    def _nettoyer(self, index: Dict[str, Dict[str, Any]]) -> None:
+        """Supprime les exports qui ne sont plus référencés"""
+        gardes = {self.path(entree).name for entree in index.values()}
+        for path in self.directory.iterdir():
+            if path.suffix.lstrip('.') in ('ndjson', 'csv', 'parquet') and path.name not in gardes:
+                try:
+                    path.unlink()
+                except OSError as e:
+                    logger.warning(f"⚠️  Suppression impossible de {path.name}: {e}")
+
+    def lire(self, entree: Dict[str, Any]) -> Iterator[bytes]:
+        """Fichier d'export par blocs (itérateur synchrone, exécuté hors boucle par Starlette)"""
+        with open(self.path(entree), 'rb') as f:
+            while True:
+                bloc = f.read(CHUNK_SIZE)
+                if not bloc:
+                    return
+                yield bloc
+
+    async def generer(self, db, format: str, version: int) -> AsyncIterator[bytes]:
+        """Génère l'export depuis aides_v2 en le streamant et l'enregistre s'il va jusqu'au bout"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.directory / f".{format}.{os.getpid()}.{id(object())}.tmp"
+        termine = False
+        try:
+            if format == 'parquet':
+                empreinte, taille = await self._ecrire_parquet(db, tmp_path)
+                entree = self._enregistrer(format, version, tmp_path, empreinte, taille)
+                termine = True
+                for bloc in self.lire(entree):
+                    yield bloc
+                return
+
+            empreinte, taille = hashlib.sha256(), 0
+            with open(tmp_path, 'wb') as f:
+                premier = True
+                async for lignes in _lots(db):
+                    bloc = encoder_ndjson(lignes) if format == 'ndjson' else encoder_csv(lignes, entete=premier)
+                    premier = False
+                    f.write(bloc)
+                    empreinte.update(bloc)
+                    taille += len(bloc)
+                    yield bloc
+                if premier and format == 'csv':
+                    bloc = encoder_csv([], entete=True)
+                    f.write(bloc)
+                    empreinte.update(bloc)
+                    taille += len(bloc)
+                    yield bloc
+            self._enregistrer(format, version, tmp_path, empreinte.hexdigest(), taille)
+            termine = True
+        finally:
+            if not termine:
+                tmp_path.unlink(missing_ok=True)
+
+    async def _ecrire_parquet(self, db, tmp_path: Path):
+        pa = _pyarrow()
+        if pa is None:
+            raise RuntimeError("Export Parquet indisponible : pyarrow n'est pas installé")
+        schema = _schema_parquet(pa)
+        with pa.parquet.ParquetWriter(str(tmp_path), schema, compression='zstd') as writer:
+            async for lignes in _lots(db):
+                writer.write_table(pa.Table.from_pylist(lignes, schema=schema))
+        empreinte, taille = hashlib.sha256(), 0
+        with open(tmp_path, 'rb') as f:
+            while bloc := f.read(CHUNK_SIZE):
+                empreinte.update(bloc)
+                taille += len(bloc)
+        return empreinte.hexdigest(), taille
+
+
+async def _lots(db, batch_size: Optional[int] = None) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Lignes d'export par lots, ordre aid_id (même catalogue, même fichier)"""
+    batch_size = batch_size or EXPORT_BATCH_SIZE
+    curseur = db.aides_v2.find(
+        {'statut': 'active'}, {'_id': 0, 'raw_data': 0}
+    ).sort('aid_id', 1).batch_size(batch_size)
+    lot = []
+    async for doc in curseur:
+        lot.append(ligne_export(doc))
+        if len(lot) >= batch_size:
+            yield lot
+            lot = []
+    if lot:
+        yield lot
+
+
+def reponse_export(request: Request, db, format: str, version: int,
+                   store: Optional[CatalogExportStore] = None) -> Response:
+    """
+    Réponse HTTP de l'export (fichier en cache ou génération streamée)
+
+    ETag = empreinte du fichier : 304 si If-None-Match correspond à l'export de
+    la version courante. Une génération n'a pas encore d'empreinte : pas d'ETag.
+    """
+    store = store or get_export_store()
+    media_type, extension = FORMATS[format]
+    headers = {
+        "Content-Disposition": f'attachment; filename="aides-v{version}.{extension}"',
+        "X-Catalog-Version": str(version),
+    }
+    entree = store.existant(format, version)
+    if entree is None:
+        return StreamingResponse(store.generer(db, format, version), media_type=media_type, headers=headers)
+
+    headers["ETag"] = f'"{entree["sha256"]}"'
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and headers["ETag"] in (e.strip() for e in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+    headers["Content-Length"] = str(entree["taille"])
+    return StreamingResponse(store.lire(entree), media_type=media_type, headers=headers)
+
+
+_store: Optional[CatalogExportStore] = None
+
+
+def get_export_store() -> CatalogExportStore:
+    global _store
+    if _store is None:
+        _store = CatalogExportStore()
+    return _store
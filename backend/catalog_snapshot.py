@@ -0,0 +1,508 @@
+"""
+Snapshot binaire du catalogue d'aides V2
+Fichier versionné, mappé en mémoire (mmap) en lecture seule et partagé entre les workers uvicorn
+
+Format (little-endian, sections alignées sur 8 octets):
+- En-tête: magic, version du format, nombre d'aides, version du catalogue, date de création
+- Table des sections: nom, typecode (module array), offset, nombre d'éléments
+- Données colonnaires: une colonne par critère (float64 avec NaN pour None, int8 pour les
+  booléens optionnels, listes CSR pour les listes d'enums et de chaînes)
+- Table des chaînes: offsets vers un blob UTF-8 unique (titres, descriptions, explications...)
+
+Le processus de synchronisation écrit un nouveau fichier puis bascule atomiquement le
+pointeur CURRENT (os.replace). Les workers détectent la bascule au prochain accès et
+remappent le nouveau fichier : la RAM est partagée via le page cache et tous les workers
+voient la même version du catalogue.
+"""
+
+import array
+import asyncio
+import fcntl
+import logging
+import math
+import mmap
+import os
+import struct
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from models_v2 import (
+    AideAgricoleV2, CriteresEligibilite, MontantAide,
+    TypeProduction, TypeProjet, StatutJuridique, TypeMontant
+)
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = Path(os.environ.get(
+    'CATALOG_SNAPSHOT_DIR',
+    Path(__file__).parent / 'catalog_snapshots'
+))
+
+MAGIC = b"AGRICAT1"
+FORMAT_VERSION = 1
+CURRENT_POINTER = "CURRENT"
+KEEP_VERSIONS = 3
+
+# magic, format, nb aides, version catalogue, date création, nb sections
+_HEADER = struct.Struct("<8sIIQdI4x")
+# nom, typecode, offset, nb éléments
+_SECTION = struct.Struct("<48sc7xQQ")
+
+_NONE_ID = 0xFFFFFFFF
+
+# ============ SCHÉMA DES COLONNES ============
+
+# Chaînes simples (Optional[str])
+_STR_FIELDS = (
+    "aid_id", "id_externe", "titre", "description", "organisme", "programme",
+    "source", "source_url", "derniere_maj", "date_debut", "date_fin",
+    "date_limite_depot", "statut", "conditions_eligibilite", "demarche",
+    "contact", "lien_officiel", "lien_dossier",
+    "montant.unite", "montant.description", "montant.conditions_particulieres",
+)
+
+# Listes de chaînes
+_STR_LIST_FIELDS = (
+    "tags",
+    "criteres.regions", "criteres.departements", "criteres.zones_specifiques",
+    "criteres.labels_requis", "criteres.labels_bonus",
+)
+
+# Numériques optionnels (stockés en float64, NaN = None)
+_NUM_FIELDS = (
+    ("confiance", float),
+    ("criteres.age_min", int),
+    ("criteres.age_max", int),
+    ("criteres.superficie_min", float),
+    ("criteres.superficie_max", float),
+    ("criteres.cheptel_min", int),
+    ("criteres.cheptel_max", int),
+    ("criteres.ca_min", float),
+    ("criteres.ca_max", float),
+    ("montant.montant_min", float),
+    ("montant.montant_max", float),
+    ("montant.montant_fixe", float),
+    ("montant.taux_min", float),
+    ("montant.taux_max", float),
+    ("montant.plafond", float),
+    ("montant.plancher", float),
+    ("montant.montant_par_unite", float),
+)
+
+# Booléens optionnels (-1 = None)
+_TRI_FIELDS = (
+    "criteres.jeune_agriculteur",
+    "criteres.premiere_installation",
+    "criteres.en_difficulte",
+    "criteres.projets_collectifs",
+)
+
+# Listes d'enums (indices des membres, ordre conservé)
+_ENUM_LIST_FIELDS = (
+    ("criteres.types_production", TypeProduction),
+    ("criteres.types_projets", TypeProjet),
+    ("criteres.statuts_juridiques", StatutJuridique),
+)
+
+# Enums simples
+_ENUM_FIELDS = (
+    ("montant.type_montant", TypeMontant),
+)
+
+
+def _get(data: Dict[str, Any], path: str) -> Any:
+    """Lit un champ pointé ('criteres.regions') dans un dict d'aide"""
+    for key in path.split('.'):
+        if data is None:
+            return None
+        data = data.get(key)
+    return data
+
+
+def _set(target: Dict[str, Dict[str, Any]], path: str, value: Any) -> None:
+    """Écrit un champ pointé dans le dict racine / criteres / montant"""
+    if '.' in path:
+        group, key = path.split('.', 1)
+        target[group][key] = value
+    else:
+        target[""][path] = value
+
+
+# ============ ÉCRITURE ============
+
+def write_snapshot(aides: List[AideAgricoleV2], path: Path, catalog_version: int) -> None:
+    """
+    Écrit un snapshot binaire du catalogue
+
+    Args:
+        aides: Aides validées à inclure (raw_data n'est pas conservé)
+        path: Chemin du fichier à écrire
+        catalog_version: Version du catalogue enregistrée dans l'en-tête
+    """
+    string_ids: Dict[str, int] = {}
+    strings: List[bytes] = []
+
+    def intern(value: Optional[str]) -> int:
+        if value is None:
+            return _NONE_ID
+        sid = string_ids.get(value)
+        if sid is None:
+            sid = len(strings)
+            string_ids[value] = sid
+            strings.append(value.encode('utf-8'))
+        return sid
+
+    sections: Dict[str, array.array] = {}
+    for field in _STR_FIELDS:
+        sections[f"s.{field}"] = array.array('I')
+    for field in _STR_LIST_FIELDS:
+        sections[f"l.{field}.off"] = array.array('I', [0])
+        sections[f"l.{field}.ids"] = array.array('I')
+    for field, _ in _NUM_FIELDS:
+        sections[f"f.{field}"] = array.array('d')
+    for field in _TRI_FIELDS:
+        sections[f"t.{field}"] = array.array('b')
+    for field, _ in _ENUM_LIST_FIELDS:
+        sections[f"e.{field}.off"] = array.array('I', [0])
+        sections[f"e.{field}.idx"] = array.array('B')
+    for field, _ in _ENUM_FIELDS:
+        sections[f"k.{field}"] = array.array('b')
+
+    enum_index = {
+        field: {member: i for i, member in enumerate(enum_cls)}
+        for field, enum_cls in _ENUM_LIST_FIELDS + _ENUM_FIELDS
+    }
+
+    for aide in aides:
+        data = aide.model_dump(exclude={'raw_data'})
+
+        for field in _STR_FIELDS:
+            sections[f"s.{field}"].append(intern(_get(data, field)))
+
+        for field in _STR_LIST_FIELDS:
+            ids = sections[f"l.{field}.ids"]
+            ids.extend(intern(v) for v in (_get(data, field) or []))
+            sections[f"l.{field}.off"].append(len(ids))
+
+        for field, _ in _NUM_FIELDS:
+            value = _get(data, field)
+            sections[f"f.{field}"].append(math.nan if value is None else float(value))
+
+        for field in _TRI_FIELDS:
+            value = _get(data, field)
+            sections[f"t.{field}"].append(-1 if value is None else int(bool(value)))
+
+        for field, _ in _ENUM_LIST_FIELDS:
+            idx = sections[f"e.{field}.idx"]
+            idx.extend(enum_index[field][v] for v in (_get(data, field) or []))
+            sections[f"e.{field}.off"].append(len(idx))
+
+        for field, _ in _ENUM_FIELDS:
+            value = _get(data, field)
+            sections[f"k.{field}"].append(-1 if value is None else enum_index[field][value])
+
+    # Table des chaînes
+    offsets = array.array('Q', [0])
+    for encoded in strings:
+        offsets.append(offsets[-1] + len(encoded))
+    sections["str.offsets"] = offsets
+    sections["str.blob"] = array.array('B', b"".join(strings))
+
+    # Disposition du fichier
+    table_size = _HEADER.size + _SECTION.size * len(sections)
+    position = _align(table_size)
+    layout = []
+    for name, values in sections.items():
+        layout.append((name, values, position))
+        position = _align(position + len(values) * values.itemsize)
+
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, len(aides), catalog_version, time.time(), len(sections)))
+        for name, values, offset in layout:
+            f.write(_SECTION.pack(name.encode('ascii'), values.typecode.encode('ascii'), offset, len(values)))
+        for name, values, offset in layout:
+            f.seek(offset)
+            f.write(values.tobytes())
+        f.truncate(position)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _align(position: int) -> int:
+    return (position + 7) & ~7
+
+
+# ============ LECTURE ============
+
+class CatalogSnapshot:
+    """Snapshot du catalogue mappé en mémoire (lecture seule)"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, fmt, count, version, created_at, n_sections = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or fmt != FORMAT_VERSION:
+            self._mmap.close()
+            raise ValueError(f"Snapshot invalide: {self.path}")
+
+        self.count = count
+        self.version = version
+        self.created_at = created_at
+
+        buffer = memoryview(self._mmap)
+        self._columns: Dict[str, memoryview] = {}
+        for i in range(n_sections):
+            raw_name, typecode, offset, length = _SECTION.unpack_from(self._mmap, _HEADER.size + i * _SECTION.size)
+            typecode = typecode.decode('ascii')
+            itemsize = array.array(typecode).itemsize
+            self._columns[raw_name.rstrip(b"\0").decode('ascii')] = \
+                buffer[offset:offset + length * itemsize].cast(typecode)
+        self._buffer = buffer
+
+        self._string_cache: Dict[int, str] = {}
+        self._aides: Optional[List[AideAgricoleV2]] = None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def column(self, name: str) -> memoryview:
+        """Accès direct à une colonne ('f.criteres.age_min', 's.titre'...)"""
+        return self._columns[name]
+
+    def string(self, sid: int) -> Optional[str]:
+        """Décode une chaîne de la table (mise en cache)"""
+        if sid == _NONE_ID:
+            return None
+        value = self._string_cache.get(sid)
+        if value is None:
+            offsets = self._columns["str.offsets"]
+            value = bytes(self._columns["str.blob"][offsets[sid]:offsets[sid + 1]]).decode('utf-8')
+            self._string_cache[sid] = value
+        return value
+
+    def aide_dict(self, i: int) -> Dict[str, Any]:
+        """Reconstruit le dict de l'aide i (même forme que model_dump, sans raw_data)"""
+        cols = self._columns
+        target: Dict[str, Dict[str, Any]] = {"": {}, "criteres": {}, "montant": {}}
+
+        for field in _STR_FIELDS:
+            _set(target, field, self.string(cols[f"s.{field}"][i]))
+
+        for field in _STR_LIST_FIELDS:
+            off = cols[f"l.{field}.off"]
+            ids = cols[f"l.{field}.ids"][off[i]:off[i + 1]]
+            _set(target, field, [self.string(sid) for sid in ids])
+
+        for field, kind in _NUM_FIELDS:
+            value = cols[f"f.{field}"][i]
+            _set(target, field, None if math.isnan(value) else kind(value))
+
+        for field in _TRI_FIELDS:
+            value = cols[f"t.{field}"][i]
+            _set(target, field, None if value < 0 else bool(value))
+
+        for field, enum_cls in _ENUM_LIST_FIELDS:
+            members = list(enum_cls)
+            off = cols[f"e.{field}.off"]
+            _set(target, field, [members[j] for j in cols[f"e.{field}.idx"][off[i]:off[i + 1]]])
+
+        for field, enum_cls in _ENUM_FIELDS:
+            j = cols[f"k.{field}"][i]
+            _set(target, field, None if j < 0 else list(enum_cls)[j])
+
+        data = target[""]
+        data["criteres"] = target["criteres"]
+        data["montant"] = target["montant"]
+        data["raw_data"] = None
+        return data
+
+    def aide(self, i: int) -> AideAgricoleV2:
+        """Reconstruit l'aide i sans revalidation Pydantic (données validées à l'écriture)"""
+        data = self.aide_dict(i)
+        data["criteres"] = CriteresEligibilite.model_construct(**data["criteres"])
+        data["montant"] = MontantAide.model_construct(**data["montant"])
+        return AideAgricoleV2.model_construct(**data)
+
+    def load_aides(self) -> List[AideAgricoleV2]:
+        """Toutes les aides du snapshot (décodées une seule fois par worker et par version)"""
+        if self._aides is None:
+            self._aides = [self.aide(i) for i in range(self.count)]
+        return self._aides
+
+    def close(self) -> None:
+        """Libère les vues et le mapping mémoire"""
+        for view in self._columns.values():
+            view.release()
+        self._columns = {}
+        self._buffer.release()
+        self._mmap.close()
+
+
+class CatalogSnapshotStore:
+    """
+    Répertoire de snapshots versionnés avec pointeur CURRENT
+
+    Chaque worker garde le snapshot courant mappé et ne le remplace que lorsque
+    le pointeur change (comparaison de l'inode, os.replace en crée un nouveau).
+    """
+
+    def __init__(self, directory: Path = SNAPSHOT_DIR):
+        self.directory = Path(directory)
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._pointer_stat = None
+        # Un seul premier snapshot construit à la fois dans le processus (load_catalog)
+        self.publication_lock = asyncio.Lock()
+
+    @property
+    def pointer_path(self) -> Path:
+        return self.directory / CURRENT_POINTER
+
+    def current(self) -> Optional[CatalogSnapshot]:
+        """
+        Retourne le snapshot courant (None si aucun n'a encore été publié)
+        """
+        try:
+            stat = os.stat(self.pointer_path)
+        except FileNotFoundError:
+            return None
+
+        pointer_stat = (stat.st_ino, stat.st_mtime_ns)
+        if self._snapshot is not None and pointer_stat == self._pointer_stat:
+            return self._snapshot
+
+        name = self.pointer_path.read_text(encoding='utf-8').strip()
+        snapshot = CatalogSnapshot(self.directory / name)
+        previous = self._snapshot
+        self._snapshot = snapshot
+        self._pointer_stat = pointer_stat
+        if previous is not None:
+            logger.info(f"🔄 Catalogue v{previous.version} → v{snapshot.version}")
+        else:
+            logger.info(f"📦 Catalogue v{snapshot.version} chargé ({snapshot.count} aides)")
+        return snapshot
+
+    def current_version(self) -> int:
+        snapshot = self.current()
+        return snapshot.version if snapshot is not None else 0
+
+    def publish(self, aides: List[AideAgricoleV2]) -> CatalogSnapshot:
+        """
+        Écrit une nouvelle version du catalogue et bascule CURRENT atomiquement
+
+        Args:
+            aides: Aides actives validées
+
+        Returns:
+            Le snapshot publié
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        with open(self.directory / ".lock", 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                version = self.current_version() + 1
+                name = f"catalog-v{version:08d}.bin"
+                write_snapshot(aides, self.directory / name, version)
+
+                tmp_pointer = self.directory / f".{CURRENT_POINTER}.{os.getpid()}.tmp"
+                tmp_pointer.write_text(name, encoding='utf-8')
+                os.replace(tmp_pointer, self.pointer_path)
+
+                self._cleanup(keep=name)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+        logger.info(f"💾 Snapshot catalogue v{version} publié ({len(aides)} aides)")
+        return self.current()
+
+    def _cleanup(self, keep: str) -> None:
+        """Supprime les anciennes versions (les workers qui les mappent encore gardent l'inode)"""
+        versions = sorted(p for p in self.directory.glob("catalog-v*.bin") if p.name != keep)
+        for old in versions[:max(0, len(versions) - (KEEP_VERSIONS - 1))]:
+            try:
+                old.unlink()
+            except OSError as e:
+                logger.warning(f"⚠️  Suppression impossible de {old.name}: {e}")
+
+
+_store: Optional[CatalogSnapshotStore] = None
+
+
+def get_snapshot_store() -> CatalogSnapshotStore:
+    """Store partagé du processus courant"""
+    global _store
+    if _store is None:
+        _store = CatalogSnapshotStore(SNAPSHOT_DIR)
+    return _store
+
+
+async def publish_catalog_snapshot(db, store: Optional[CatalogSnapshotStore] = None) -> CatalogSnapshot:
+    """
+    Construit et publie un snapshot depuis la collection aides_v2
+
+    Args:
+        db: Instance MongoDB
+        store: Store cible (store partagé par défaut)
+
+    Returns:
+        Le snapshot publié
+    """
+    # Importé ici : expiry_scheduler dépend de ce module
+    from catalog_stats import enregistrer_historique
+    from expiry_scheduler import basculer_expirees, est_expiree
+
+    store = store or get_snapshot_store()
+
+    docs = await db.aides_v2.find({"statut": "active"}, {"_id": 0, "raw_data": 0}).to_list(length=None)
+
+    # Aides dont la date limite est passée depuis la dernière synchronisation
+    maintenant = datetime.now(timezone.utc)
+    echues = [doc.get('aid_id') for doc in docs if est_expiree(doc.get('date_limite_depot'), maintenant)]
+    if echues:
+        await basculer_expirees(db, echues)
+        logger.info(f"⏰ {len(echues)} aide(s) expirée(s) exclue(s) du snapshot")
+        echues = set(echues)
+        docs = [doc for doc in docs if doc.get('aid_id') not in echues]
+
+    aides = []
+    for doc in docs:
+        try:
+            aides.append(AideAgricoleV2(**doc))
+        except Exception as e:
+            logger.error(f"   ❌ Aide {doc.get('aid_id')} ignorée du snapshot: {e}")
+
+    # Verrou inter-processus, écriture et fsync bloquants : hors de la boucle d'événements
+    snapshot = await asyncio.to_thread(store.publish, aides)
+    # Statistiques de cette version (évolution du catalogue)
+    await enregistrer_historique(db, snapshot.version)
+    return snapshot
+
+
+async def load_catalog(db, store: Optional[CatalogSnapshotStore] = None) -> CatalogSnapshot:
+    """
+    Retourne le catalogue courant, en publiant un premier snapshot si aucun n'existe
+
+    Args:
+        db: Base principale (primaire) : un premier snapshot devient la version
+            servie par tous les workers, il ne doit pas venir d'un secondaire en retard
+        store: Store cible (store partagé par défaut)
+    """
+    store = store or get_snapshot_store()
+    snapshot = store.current()
+    if snapshot is not None:
+        return snapshot
+
+    # Requêtes concurrentes au démarrage : une seule construit le snapshot,
+    # les autres relisent le pointeur une fois le verrou obtenu
+    async with store.publication_lock:
+        snapshot = store.current()
+        if snapshot is None:
+            logger.info("📦 Aucun snapshot catalogue, construction depuis MongoDB...")
+            snapshot = await publish_catalog_snapshot(db, store)
+    return snapshot
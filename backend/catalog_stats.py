@@ -0,0 +1,220 @@
+"""
+Statistiques matérialisées du catalogue aides_v2
+Un document unique (collection catalog_stats) tient les compteurs du catalogue :
+aides par statut et par source, et pour les aides actives par région, par
+production, critères d'éligibilité mentionnés, tranches de montant et de taux.
+
+Il est maintenu par incréments : chaque écriture d'une aide applique
+contribution(nouveau) - contribution(ancien) en un $inc (import par batch de la
+synchronisation, bascule en 'expiree'). S'il n'existe pas encore, il est
+recalculé depuis la collection. Chaque version publiée du catalogue en ajoute
+une copie à l'historique (catalog_stats_history) pour suivre son évolution
+sans rescanner.
+
+Un second document tient les compteurs de la collection legacy aides
+(/api/stats) : recalculé après chaque écriture de cette collection
+(synchronisations legacy et PAC, nettoyage de la migration, POST /api/aides).
+"""
+
+import logging
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from criteria_patterns import criteres_mentionnes, productions_mentionnees
+
+logger = logging.getLogger(__name__)
+
+STATS_COLLECTION = "catalog_stats"
+HISTORY_COLLECTION = "catalog_stats_history"
+STATS_ID = "aides_v2"
+LEGACY_STATS_ID = "aides"
+
+# Champs lus pour calculer la contribution d'une aide
+PROJECTION_STATS = {
+    '_id': 0, 'aid_id': 1, 'source': 1, 'statut': 1, 'tags': 1, 'signaux_criteres': 1,
+    'criteres.regions': 1, 'criteres.types_production': 1, 'montant.montant_max': 1, 'montant.taux_max': 1,
+}
+
+# Bornes supérieures (exclues) des tranches de montant maximum (€) et de taux maximum (%)
+TRANCHES_MONTANT = ((5_000, "moins_5k"), (20_000, "5k_20k"), (100_000, "20k_100k"))
+TRANCHES_TAUX = ((21, "jusqu_20"), (41, "21_40"), (61, "41_60"))
+
+SECTIONS = ("par_statut", "par_source", "par_region", "par_production", "criteres", "mots_cles_production",
+            "montants", "taux", "montant_max")
+
+
+def _cle(valeur: Any) -> str:
+    """Valeur utilisable comme nom de champ MongoDB (ni '.' ni '$' initial)"""
+    texte = str(getattr(valeur, 'value', valeur)) or "inconnu"
+    return texte.replace('.', '_').lstrip('$') or "inconnu"
+
+
+def _tranche(valeur: Optional[float], tranches, derniere: str) -> str:
+    if not valeur:
+        return "non_precise"
+    for borne, nom in tranches:
+        if valeur < borne:
+            return nom
+    return derniere
+
+
+def contribution(doc: Optional[Dict[str, Any]]) -> Counter:
+    """Compteurs (chemins pointés) d'une aide ; les détails ne portent que sur les aides actives"""
+    compteurs = Counter()
+    if not doc:
+        return compteurs
+    statut = doc.get('statut') or 'active'
+    compteurs['total'] += 1
+    compteurs[f"par_statut.{_cle(statut)}"] += 1
+    compteurs[f"par_source.{_cle(doc.get('source') or 'manual')}"] += 1
+    if statut != 'active':
+        return compteurs
+
+    criteres = doc.get('criteres') or {}
+    for region in criteres.get('regions') or []:
+        compteurs[f"par_region.{_cle(region)}"] += 1
+    for production in criteres.get('types_production') or []:
+        compteurs[f"par_production.{_cle(production)}"] += 1
+
+    # Signaux stockés à l'import uniquement : l'incrément et le recalcul comptent pareil
+    signaux = doc.get('signaux_criteres') or {}
+    for cle in criteres_mentionnes(signaux, doc.get('tags')):
+        compteurs[f"criteres.{cle}"] += 1
+    for production in productions_mentionnees(signaux):
+        compteurs[f"mots_cles_production.{production}"] += 1
+
+    montant = doc.get('montant') or {}
+    montant_max = montant.get('montant_max')
+    compteurs[f"montants.{_tranche(montant_max, TRANCHES_MONTANT, 'plus_100k')}"] += 1
+    compteurs[f"taux.{_tranche(montant.get('taux_max'), TRANCHES_TAUX, 'plus_60')}"] += 1
+    if montant_max:
+        compteurs['montant_max.somme'] += montant_max
+        compteurs['montant_max.n'] += 1
+    return compteurs
+
+
+def delta(nouveau: Optional[Dict[str, Any]], ancien: Optional[Dict[str, Any]]) -> Counter:
+    """contribution(nouveau) - contribution(ancien), valeurs négatives comprises"""
+    ecart = contribution(nouveau)
+    ecart.subtract(contribution(ancien))
+    return ecart
+
+
+def _imbriquer(compteurs: Counter) -> Dict[str, Any]:
+    doc: Dict[str, Any] = {'total': 0, **{section: {} for section in SECTIONS}}
+    for chemin, valeur in compteurs.items():
+        if '.' in chemin:
+            section, cle = chemin.split('.', 1)
+            doc[section][cle] = valeur
+        else:
+            doc[chemin] = valeur
+    return doc
+
+
+async def recalculer_stats(db) -> Dict[str, Any]:
+    """Recalcule le document depuis aides_v2 (premier usage, après une migration)"""
+    compteurs = Counter()
+    async for doc in db.aides_v2.find({}, PROJECTION_STATS):
+        compteurs.update(contribution(doc))
+    maintenant = datetime.now(timezone.utc).isoformat()
+    stats = {'_id': STATS_ID, **_imbriquer(compteurs), 'maj_le': maintenant, 'recalcule_le': maintenant}
+    await db[STATS_COLLECTION].replace_one({'_id': STATS_ID}, stats, upsert=True)
+    logger.info(f"📊 Statistiques du catalogue recalculées: {stats['total']} aides")
+    return stats
+
+
+async def appliquer_delta(db, ecart: Counter) -> None:
+    """$inc des compteurs modifiés ; recalcul complet si le document n'existe pas encore"""
+    inc = {chemin: valeur for chemin, valeur in ecart.items() if valeur}
+    if not inc:
+        return
+    result = await db[STATS_COLLECTION].update_one(
+        {'_id': STATS_ID},
+        {'$inc': inc, '$set': {'maj_le': datetime.now(timezone.utc).isoformat()}}
+    )
+    if result.matched_count == 0:
+        await recalculer_stats(db)
+
+
+async def appliquer_delta_sans_erreur(db, ecart: Counter) -> None:
+    """Les statistiques ne font jamais échouer l'écriture du catalogue (recalculables)"""
+    try:
+        await appliquer_delta(db, ecart)
+    except Exception as e:
+        logger.error(f"❌ Erreur statistiques catalogue: {e}")
+
+
+async def lire_stats(db) -> Dict[str, Any]:
+    stats = await db[STATS_COLLECTION].find_one({'_id': STATS_ID})
+    if stats is None:
+        stats = await recalculer_stats(db)
+    return stats
+
+
+def vue_stats(stats: Dict[str, Any]) -> Dict[str, Any]:
+    """Document servi : compteurs non nuls, pourcentages des critères, montant maximum moyen"""
+    actives = (stats.get('par_statut') or {}).get('active', 0)
+    vue = {'total': stats.get('total', 0), 'actives': actives}
+    for section in SECTIONS:
+        valeurs = {cle: valeur for cle, valeur in (stats.get(section) or {}).items() if valeur}
+        if section != 'montant_max':
+            valeurs = dict(sorted(valeurs.items(), key=lambda item: (-item[1], item[0])))
+        vue[section] = valeurs
+    vue['criteres_pourcentage'] = {
+        cle: round(valeur / actives * 100, 1) for cle, valeur in vue['criteres'].items()
+    } if actives else {}
+    montant_max = vue.pop('montant_max')
+    vue['montant_max_moyen'] = round(montant_max['somme'] / montant_max['n']) if montant_max.get('n') else None
+    vue['maj_le'] = stats.get('maj_le')
+    return vue
+
+
+async def enregistrer_historique(db, version: int) -> None:
+    """Copie des statistiques pour une version publiée du catalogue"""
+    try:
+        stats = await lire_stats(db)
+        entree = {k: v for k, v in stats.items() if k not in ('_id', 'maj_le', 'recalcule_le')}
+        await db[HISTORY_COLLECTION].insert_one({
+            'version': version,
+            'date': datetime.now(timezone.utc).isoformat(),
+            **entree,
+        })
+    except Exception as e:
+        logger.error(f"❌ Erreur historique statistiques v{version}: {e}")
+
+
+async def historique(db, limit: int = 100) -> List[Dict[str, Any]]:
+    """Dernières entrées de l'historique, de la plus ancienne à la plus récente"""
+    entrees = await db[HISTORY_COLLECTION].find({}, {'_id': 0}).sort('version', -1).to_list(length=limit)
+    return [{'version': e['version'], 'date': e['date'], **vue_stats(e)} for e in reversed(entrees)]
+
+
+# ============ COLLECTION LEGACY ============
+
+async def recalculer_stats_legacy(db) -> Dict[str, Any]:
+    """Compteurs de la collection legacy aides (total, non expirées)"""
+    stats = {
+        '_id': LEGACY_STATS_ID,
+        'total': await db.aides.count_documents({}),
+        'actives': await db.aides.count_documents({"expiree": False}),
+        'maj_le': datetime.now(timezone.utc).isoformat(),
+    }
+    await db[STATS_COLLECTION].replace_one({'_id': LEGACY_STATS_ID}, stats, upsert=True)
+    return stats
+
+
+async def recalculer_stats_legacy_sans_erreur(db) -> None:
+    """Après une écriture : les statistiques ne font jamais échouer la synchronisation ni la requête"""
+    try:
+        stats = await recalculer_stats_legacy(db)
+        logger.info(f"📊 Statistiques legacy: {stats['total']} aides, {stats['actives']} actives")
+    except Exception as e:
+        logger.error(f"❌ Erreur statistiques legacy: {e}")
+
+
+async def lire_stats_legacy(db) -> Dict[str, Any]:
+    stats = await db[STATS_COLLECTION].find_one({'_id': LEGACY_STATS_ID})
+    if stats is None:
+        stats = await recalculer_stats_legacy(db)
+    return stats
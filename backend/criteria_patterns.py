@@ -0,0 +1,136 @@
+"""
+Expressions régulières précompilées des critères d'éligibilité et des montants
+Partagées par les deux synchronisations (extraction des montants) et par
+l'analyse des critères. signaux_texte extrait tous les signaux d'un texte
+(SAU, âge, JA, bio, diplôme, installation, statut, taux, plafond, montant/ha,
+productions) : chaque motif parcourt le texte une fois et donne à la fois la
+présence et les valeurs.
+
+Une alternative unique de tous les motifs (un seul parcours) a été mesurée
+3 fois plus lente avec le moteur re de CPython : pas de préfiltre littéral sur
+une grande alternance, alors que chaque motif isolé en a un.
+
+Les signaux de chaque aide sont calculés à l'import (champ signaux_criteres
+d'aides_v2, depuis le texte extrait du HTML) et comptés dans les statistiques
+matérialisées du catalogue (catalog_stats.py).
+"""
+
+import re
+from itertools import islice
+from typing import Any, Dict, List, Optional, Tuple
+
+from html_text import html_vers_texte
+
+# ============ MONTANTS ============
+
+MONTANT_EUROS = re.compile(r'(\d+[\s\u202f]?\d*)\s*€')
+TAUX_POURCENT = re.compile(r'(\d+)\s*%')
+PAR_HECTARE = re.compile(r'/ha|hectare', re.IGNORECASE)
+PAR_TETE = re.compile(r'/tête|animal', re.IGNORECASE)
+NUMERO_DEPARTEMENT = re.compile(r'\b(\d{2,3})\b')
+
+
+def montants_et_taux(texte: str) -> Tuple[List[int], List[int]]:
+    """Montants en euros et taux en pourcentage mentionnés dans un texte"""
+    montants = [int(m.replace(' ', '').replace('\u202f', '')) for m in MONTANT_EUROS.findall(texte)]
+    taux = [int(t) for t in TAUX_POURCENT.findall(texte)]
+    return montants, taux
+
+
+def bornes(valeurs: List[int]) -> Tuple[Optional[int], Optional[int]]:
+    """(min, max) ; une seule valeur est un maximum"""
+    if not valeurs:
+        return None, None
+    if len(valeurs) == 1:
+        return None, valeurs[0]
+    return min(valeurs), max(valeurs)
+
+
+# ============ SIGNAUX DE CRITÈRES ============
+
+# Textes en minuscules ; \b seulement autour des mots courts (un \b initial
+# désactive la recherche par préfixe littéral du moteur)
+SIGNAUX = {
+    "sau": re.compile(r"(?:sau|surface|hectares?|ha)\s*(?:minimum|mini|min|>|≥|supérieure?|de)\s*(\d+)"),
+    "age": re.compile(r"(?:âge|age)\s*(?:maximum|maxi|max|<|≤|inférieur|moins de)\s*(\d+)"),
+    "age_ja": re.compile(r"jeunes? agriculteurs?|\bja\b|moins de 40 ans|âge.{0,40}?\b40\b"),
+    "bio": re.compile(r"agriculture biologique|conversion bio\b|label bio\b|\bbio\b|\bab\b"),
+    "diplome": re.compile(r"diplôme|bac pro\b|\bbts\b|capacité professionnelle|niveau\b"),
+    "installation": re.compile(r"installation|installé|titre principal"),
+    "statut": re.compile(r"earl|gaec|scea|individuel|société|exploitation"),
+    "montant_ha": re.compile(r"(\d+)\s*€\s*(?:/|par)\s*(?:ha|hectare)\b"),
+    "taux": re.compile(r"(\d+)\s*%"),
+    "plafond": re.compile(r"plafond\s*(?:de)?\s*(\d+(?:[\s\u202f]?\d+)*)\s*€"),
+}
+
+PRODUCTIONS_MOTS_CLES = {
+    "cereales": ["céréale", "blé", "orge", "maïs", "colza"],
+    "elevage_bovin": ["bovin", "vache", "taureau", "veau"],
+    "elevage_ovin": ["ovin", "mouton", "brebis", "agneau"],
+    "elevage_porcin": ["porcin", "porc", "cochon"],
+    "elevage_volaille": ["volaille", "poulet", "poule"],
+    "viticulture": ["viticult", "vin", "vigne", "raisin"],
+    "maraichage": ["maraîch", "légume", "légumier"],
+    "arboriculture": ["arboricult", "fruitier", "verger"],
+    "apiculture": ["apicult", "abeille", "miel"],
+    "horticulture": ["horticult", "fleur", "plante"],
+}
+PREFIXE_PRODUCTION = "prod_"
+
+# Valeurs conservées par signal et par aide (le parcours s'arrête au-delà)
+MAX_VALEURS = 5
+
+
+def signaux_texte(texte: str) -> Dict[str, List[str]]:
+    """Signaux d'un texte : {signal: valeurs capturées (ou extraits), sans doublon}"""
+    texte = texte.lower()
+    signaux: Dict[str, List[str]] = {}
+    for nom, motif in SIGNAUX.items():
+        valeurs = []
+        for m in islice(motif.finditer(texte), MAX_VALEURS):
+            valeur = m.group(1) if motif.groups else m.group(0)
+            if valeur not in valeurs:
+                valeurs.append(valeur)
+        if valeurs:
+            signaux[nom] = valeurs
+    for production, mots in PRODUCTIONS_MOTS_CLES.items():
+        trouves = [mot for mot in mots if mot in texte]
+        if trouves:
+            signaux[PREFIXE_PRODUCTION + production] = trouves
+    return signaux
+
+
+def signaux_aide(doc: Dict[str, Any]) -> Dict[str, List[str]]:
+    """Signaux d'une aide aides_v2 (texte stocké à l'import, sinon extrait du HTML)"""
+    textes = []
+    for champ in ('conditions_eligibilite', 'description'):
+        texte = doc.get(f"{champ}_texte")
+        textes.append(texte if texte is not None else html_vers_texte(doc.get(champ)))
+    return signaux_texte("\n".join(textes))
+
+
+# ============ CRITÈRES MENTIONNÉS ============
+
+# Clé de fréquence -> signaux qui la déclenchent
+CRITERES_SIGNAUX = {
+    "sau_mentioned": ("sau",),
+    "age_mentioned": ("age", "age_ja"),
+    "bio_mentioned": ("bio",),
+    "diplome_mentioned": ("diplome",),
+    "installation_mentioned": ("installation",),
+    "statut_juridique_mentioned": ("statut",),
+}
+MOTIFS_MONTANT = {"with_taux": "taux", "with_montant_fixe": "montant_ha", "with_plafond": "plafond"}
+
+
+def criteres_mentionnes(signaux: Dict[str, List[str]], tags: Optional[List[str]] = None) -> List[str]:
+    """Clés de fréquence d'une aide : critères, motifs de montant, catégorie agriculture"""
+    cles = [cle for cle, noms in CRITERES_SIGNAUX.items() if any(nom in signaux for nom in noms)]
+    cles += [cle for cle, nom in MOTIFS_MONTANT.items() if nom in signaux]
+    if any("agriculture" in str(tag).lower() for tag in tags or []):
+        cles.append("agriculture_category")
+    return cles
+
+
+def productions_mentionnees(signaux: Dict[str, List[str]]) -> List[str]:
+    return [nom[len(PREFIXE_PRODUCTION):] for nom in signaux if nom.startswith(PREFIXE_PRODUCTION)]
@@ -0,0 +1,235 @@
+"""
+Connexion MongoDB centralisée pour l'API et les scripts (sync, migration)
+Pool de connexions, timeouts, read preference et compression configurables par variables d'environnement
+"""
+
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+from pymongo.read_preferences import (
+    Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+)
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+DB_NAME = os.environ.get('DB_NAME', 'agrisubv_db')
+
+# Read preference des lectures de matching par requête (le snapshot du catalogue est publié depuis le primaire)
+MATCHING_READ_PREFERENCE = os.environ.get('MONGO_MATCHING_READ_PREFERENCE', 'secondaryPreferred')
+MATCHING_MAX_STALENESS_S = os.environ.get('MONGO_MATCHING_MAX_STALENESS_S')
+
+_READ_PREFERENCES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+# Variable d'environnement -> (option pymongo, conversion)
+_CLIENT_OPTIONS = {
+    'MONGO_MAX_POOL_SIZE': ('maxPoolSize', int),
+    'MONGO_MIN_POOL_SIZE': ('minPoolSize', int),
+    'MONGO_MAX_IDLE_TIME_MS': ('maxIdleTimeMS', int),
+    'MONGO_MAX_CONNECTING': ('maxConnecting', int),
+    'MONGO_WAIT_QUEUE_TIMEOUT_MS': ('waitQueueTimeoutMS', int),
+    'MONGO_CONNECT_TIMEOUT_MS': ('connectTimeoutMS', int),
+    'MONGO_SOCKET_TIMEOUT_MS': ('socketTimeoutMS', int),
+    'MONGO_SERVER_SELECTION_TIMEOUT_MS': ('serverSelectionTimeoutMS', int),
+    'MONGO_COMPRESSORS': ('compressors', str),
+    'MONGO_ZLIB_COMPRESSION_LEVEL': ('zlibCompressionLevel', int),
+}
+
+
+def get_client_options() -> Dict[str, Any]:
+    """
+    Options du client construites depuis l'environnement
+
+    Seules les variables définies sont transmises, les autres gardent
+    les valeurs par défaut du driver (maxPoolSize=100, minPoolSize=0...).
+    """
+    options: Dict[str, Any] = {"appname": os.environ.get('MONGO_APP_NAME', 'agrisubv')}
+    for env_name, (option, convert) in _CLIENT_OPTIONS.items():
+        value = os.environ.get(env_name)
+        if value:
+            options[option] = convert(value)
+    return options
+
+
+def get_matching_read_preference():
+    """Read preference des lectures de matching (secondaryPreferred par défaut)"""
+    mode = _READ_PREFERENCES.get(MATCHING_READ_PREFERENCE)
+    if mode is None:
+        logger.warning(f"⚠️  Read preference inconnue '{MATCHING_READ_PREFERENCE}', utilisation de primary")
+        return Primary()
+    if mode is Primary or not MATCHING_MAX_STALENESS_S:
+        return mode()
+    return mode(max_staleness=int(MATCHING_MAX_STALENESS_S))
+
+
+# ============ STATISTIQUES DU POOL ============
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """
+    Compteurs du pool de connexions (événements CMAP du driver)
+
+    Les événements arrivent depuis les threads de Motor, d'où le verrou.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pools: Dict[str, Dict[str, Any]] = {}
+
+    def _pool(self, address) -> Dict[str, Any]:
+        key = f"{address[0]}:{address[1]}"
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = self._pools[key] = {
+                "connections_open": 0,
+                "connections_created": 0,
+                "connections_closed": 0,
+                "checked_out": 0,
+                "max_checked_out": 0,
+                "wait_queue": 0,
+                "max_wait_queue": 0,
+                "checkouts": 0,
+                "checkout_failures": 0,
+                "checkout_wait_total_s": 0.0,
+                "checkout_wait_max_s": 0.0,
+                "pool_cleared": 0,
+            }
+        return pool
+
+    def pool_created(self, event):
+        with self._lock:
+            self._pool(event.address)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self._pool(event.address)["pool_cleared"] += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            pool = self._pool(event.address)
+            pool["connections_created"] += 1
+            pool["connections_open"] += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            pool = self._pool(event.address)
+            pool["connections_closed"] += 1
+            pool["connections_open"] = max(0, pool["connections_open"] - 1)
+
+    def connection_check_out_started(self, event):
+        with self._lock:
+            pool = self._pool(event.address)
+            pool["wait_queue"] += 1
+            pool["max_wait_queue"] = max(pool["max_wait_queue"], pool["wait_queue"])
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            pool = self._pool(event.address)
+            pool["wait_queue"] = max(0, pool["wait_queue"] - 1)
+            pool["checkout_failures"] += 1
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            pool = self._pool(event.address)
+            pool["wait_queue"] = max(0, pool["wait_queue"] - 1)
+            pool["checked_out"] += 1
+            pool["max_checked_out"] = max(pool["max_checked_out"], pool["checked_out"])
+            pool["checkouts"] += 1
+            duration = getattr(event, 'duration', 0.0) or 0.0
+            pool["checkout_wait_total_s"] += duration
+            pool["checkout_wait_max_s"] = max(pool["checkout_wait_max_s"], duration)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            pool = self._pool(event.address)
+            pool["checked_out"] = max(0, pool["checked_out"] - 1)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Copie des compteurs par serveur, avec le temps d'attente moyen"""
+        with self._lock:
+            result = {}
+            for address, pool in self._pools.items():
+                stats = dict(pool)
+                stats["checkout_wait_avg_ms"] = round(
+                    stats["checkout_wait_total_s"] / stats["checkouts"] * 1000, 3
+                ) if stats["checkouts"] else 0.0
+                stats["checkout_wait_max_ms"] = round(stats.pop("checkout_wait_max_s") * 1000, 3)
+                stats.pop("checkout_wait_total_s")
+                result[address] = stats
+            return result
+
+    def reset_peaks(self) -> None:
+        """Remet à zéro les maxima (pour mesurer une fenêtre de charge)"""
+        with self._lock:
+            for pool in self._pools.values():
+                pool["max_checked_out"] = pool["checked_out"]
+                pool["max_wait_queue"] = pool["wait_queue"]
+                pool["checkout_wait_max_s"] = 0.0
+
+
+pool_stats = PoolStatsListener()
+
+
+# ============ CLIENT ============
+
+_client: Optional[AsyncIOMotorClient] = None
+
+
+def get_client() -> AsyncIOMotorClient:
+    """Client Motor partagé du processus (créé à la première utilisation)"""
+    global _client
+    if _client is None:
+        options = get_client_options()
+        _client = AsyncIOMotorClient(MONGO_URL, event_listeners=[pool_stats], **options)
+        logger.info(f"📡 Client MongoDB configuré: {options}")
+    return _client
+
+
+def get_db():
+    """Base principale (lectures et écritures sur le primaire)"""
+    return get_client()[DB_NAME]
+
+
+def get_matching_db():
+    """Base pour les lectures de matching (read preference configurable)"""
+    return get_client().get_database(DB_NAME, read_preference=get_matching_read_preference())
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Statistiques du pool et configuration effective, pour l'endpoint admin"""
+    return {
+        "options": get_client_options(),
+        "matching_read_preference": MATCHING_READ_PREFERENCE,
+        "pools": pool_stats.snapshot(),
+    }
+
+
+def close_client() -> None:
+    """Ferme le client partagé"""
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
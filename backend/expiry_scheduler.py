@@ -0,0 +1,176 @@
+"""
+Expiration planifiée des aides (date limite de dépôt)
+Le statut 'expiree' n'était posé qu'à la normalisation : une aide dont la date
+limite passe entre deux synchronisations restait active et évaluée par
+/api/matching. L'échéancier garde les dates limites des aides actives dans un
+tas (min-heap) ; la tâche de fond dort jusqu'à la prochaine échéance, bascule
+les aides échues en 'expiree' dans MongoDB et publie une nouvelle version du
+catalogue.
+
+Plusieurs workers peuvent exécuter la tâche : la bascule est idempotente
+(filtre statut 'active') et seul le worker qui a modifié des aides publie.
+"""
+
+import asyncio
+import heapq
+from collections import Counter
+import logging
+import os
+from datetime import date, datetime, time as dtime, timedelta, timezone
+from typing import Any, List, Optional, Tuple
+
+from catalog_snapshot import get_snapshot_store, publish_catalog_snapshot
+from catalog_stats import PROJECTION_STATS, appliquer_delta_sans_erreur, delta
+
+logger = logging.getLogger(__name__)
+
+EXPIRY_SCHEDULER_ENABLED = os.environ.get('EXPIRY_SCHEDULER_ENABLED', 'true').lower() not in ('0', 'false', 'no')
+# Réveil au plus tard après ce délai (nouvelle version du catalogue publiée par une synchronisation)
+EXPIRY_MAX_SLEEP_S = float(os.environ.get('EXPIRY_MAX_SLEEP_S', '300'))
+
+
+def date_expiration(date_limite: Any) -> Optional[datetime]:
+    """
+    Instant (UTC) à partir duquel une aide est expirée, None si pas de date lisible
+
+    Une date sans heure vaut jusqu'à la fin de la journée ; une date-heure sans
+    fuseau est lue en UTC.
+    """
+    if not date_limite or not isinstance(date_limite, str):
+        return None
+    texte = date_limite.strip().replace('Z', '+00:00')
+    try:
+        if len(texte) == 10:
+            jour = date.fromisoformat(texte)
+            return datetime.combine(jour + timedelta(days=1), dtime.min, tzinfo=timezone.utc)
+        instant = datetime.fromisoformat(texte)
+    except ValueError:
+        return None
+    if instant.tzinfo is None:
+        instant = instant.replace(tzinfo=timezone.utc)
+    return instant
+
+
+def est_expiree(date_limite: Any, maintenant: Optional[datetime] = None) -> bool:
+    expiration = date_expiration(date_limite)
+    if expiration is None:
+        return False
+    return expiration <= (maintenant or datetime.now(timezone.utc))
+
+
+class EcheancierExpiration:
+    """Tas des (date d'expiration, aid_id) des aides actives"""
+
+    def __init__(self, aides: List[Tuple[str, Any]] = ()):
+        self._tas: List[Tuple[datetime, str]] = []
+        for aid_id, date_limite in aides:
+            expiration = date_expiration(date_limite)
+            if expiration is not None:
+                self._tas.append((expiration, aid_id))
+        heapq.heapify(self._tas)
+
+    def __len__(self) -> int:
+        return len(self._tas)
+
+    def ajouter(self, aid_id: str, date_limite: Any) -> None:
+        expiration = date_expiration(date_limite)
+        if expiration is not None:
+            heapq.heappush(self._tas, (expiration, aid_id))
+
+    def prochaine(self) -> Optional[datetime]:
+        return self._tas[0][0] if self._tas else None
+
+    def echues(self, maintenant: datetime) -> List[str]:
+        """Retire et renvoie les aides dont l'expiration est passée"""
+        ids = []
+        while self._tas and self._tas[0][0] <= maintenant:
+            ids.append(heapq.heappop(self._tas)[1])
+        return ids
+
+
+async def charger_echeancier(db) -> EcheancierExpiration:
+    """Échéancier des aides actives datées (index statut + date_limite_depot)"""
+    curseur = db.aides_v2.find(
+        {"statut": "active", "date_limite_depot": {"$nin": [None, ""]}},
+        {"_id": 0, "aid_id": 1, "date_limite_depot": 1}
+    )
+    docs = await curseur.to_list(length=None)
+    return EcheancierExpiration([(doc["aid_id"], doc["date_limite_depot"]) for doc in docs])
+
+
+async def basculer_expirees(db, aid_ids: List[str]) -> int:
+    """
+    Bascule les aides actives en 'expiree' ; renvoie le nombre d'aides modifiées
+
+    Une aide à la fois (find_one_and_update) : seul le worker qui l'a modifiée
+    reçoit l'ancien document et compte le changement dans les statistiques.
+    """
+    ecart = Counter()
+    modifiees = 0
+    for aid_id in aid_ids:
+        ancien = await db.aides_v2.find_one_and_update(
+            {"aid_id": aid_id, "statut": "active"},
+            {"$set": {"statut": "expiree"}},
+            projection=PROJECTION_STATS
+        )
+        if ancien is not None:
+            modifiees += 1
+            ecart.update(delta({**ancien, "statut": "expiree"}, ancien))
+    await appliquer_delta_sans_erreur(db, ecart)
+    return modifiees
+
+
+async def expirer_aides(db, aid_ids: List[str]) -> int:
+    """Bascule les aides en 'expiree' (idempotent) et publie le catalogue si besoin"""
+    if not aid_ids:
+        return 0
+    modifiees = await basculer_expirees(db, aid_ids)
+    if modifiees:
+        snapshot = await publish_catalog_snapshot(db)
+        logger.info(f"⏰ {modifiees} aide(s) expirée(s), catalogue v{snapshot.version}")
+    return modifiees
+
+
+class ExpiryScheduler:
+    """Tâche de fond : dort jusqu'à la prochaine échéance puis expire les aides échues"""
+
+    def __init__(self, db, max_sleep_s: float = EXPIRY_MAX_SLEEP_S):
+        self.db = db
+        self.max_sleep_s = max_sleep_s
+        self.echeancier: Optional[EcheancierExpiration] = None
+        self.version_catalogue: Optional[int] = None
+        self.expirees = 0
+
+    async def tour(self, maintenant: Optional[datetime] = None) -> float:
+        """
+        Un passage : recharge l'échéancier si le catalogue a changé, expire les aides échues
+
+        Returns:
+            Délai (s) avant le prochain passage
+        """
+        version = get_snapshot_store().current_version()
+        if self.echeancier is None or version != self.version_catalogue:
+            self.echeancier = await charger_echeancier(self.db)
+            self.version_catalogue = version
+
+        maintenant = maintenant or datetime.now(timezone.utc)
+        echues = self.echeancier.echues(maintenant)
+        if echues:
+            self.expirees += await expirer_aides(self.db, echues)
+            self.version_catalogue = get_snapshot_store().current_version()
+
+        prochaine = self.echeancier.prochaine()
+        if prochaine is None:
+            return self.max_sleep_s
+        return max(0.0, min(self.max_sleep_s, (prochaine - maintenant).total_seconds()))
+
+    async def run(self) -> None:
+        logger.info("⏰ Planificateur d'expiration démarré")
+        while True:
+            try:
+                delai = await self.tour()
+            except Exception as e:
+                logger.error(f"❌ Erreur planificateur d'expiration: {e}")
+                self.echeancier = None
+                delai = self.max_sleep_s
+            await asyncio.sleep(delai)
@@ -2,10 +2,12 @@
 Comparaison : 507 aides farmer VS 226 aides agriculture
 """
 
-import httpx
 from datetime import datetime, timezone
 import logging
 
+from fixture_transport import client_httpx
+from http_cache import ClientAidesTerritoires
+
 logger = logging.getLogger(__name__)
 
 async def explore_aides_territoires_handler():
@@ -22,37 +24,24 @@ async def explore_aides_territoires_handler():
             "comparison": {}
         }
         
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            
-            # Authentification
-            logger.info("🔐 Authentification...")
-            response = await client.post(
-                API_BASE_URL + "/connexion/",
-                headers={"X-AUTH-TOKEN": API_TOKEN, "Content-Type": "application/json"}
-            )
+        async with client_httpx(timeout=60.0) as client:
             
-            if response.status_code != 200:
+            # Authentification (Bearer Token partagé, valable 24h)
+            at = ClientAidesTerritoires(client, API_TOKEN)
+            if not await at.authentifier():
                 return {"status": "error", "message": "Échec authentification"}
             
-            bearer_token = response.json().get("token")
-            auth_headers = {
-                "Authorization": f"Bearer {bearer_token}",
-                "Content-Type": "application/json"
-            }
-            
             # TEST 1 : 507 aides (targeted_audiences=farmer uniquement)
             logger.info("🔍 Test 1: targeted_audiences=farmer...")
-            response = await client.get(
+            status, data = await at.get_json(
                 API_BASE_URL + "/aids/",
-                headers=auth_headers,
-                params={
+                {
                     "targeted_audiences": "farmer",
                     "page_size": 10
                 }
             )
             
-            if response.status_code == 200:
-                data = response.json()
+            if status == 200:
                 results["comparison"]["farmer_only"] = {
                     "total_count": data.get("count", 0),
                     "description": "Toutes les aides ciblant les agriculteurs (production + diversification + agritourisme)",
@@ -69,18 +58,16 @@ async def explore_aides_territoires_handler():
             
             # TEST 2 : 226 aides (targeted_audiences=farmer + categories=agriculture)
             logger.info("🔍 Test 2: targeted_audiences=farmer + categories=agriculture...")
-            response = await client.get(
+            status, data = await at.get_json(
                 API_BASE_URL + "/aids/",
-                headers=auth_headers,
-                params={
+                {
                     "targeted_audiences": "farmer",
                     "categories": "agriculture",
                     "page_size": 10
                 }
             )
             
-            if response.status_code == 200:
-                data = response.json()
+            if status == 200:
                 results["comparison"]["farmer_agriculture"] = {
                     "total_count": data.get("count", 0),
                     "description": "Aides strictement agricoles (production, installation, matériel)",
@@ -97,14 +84,12 @@ async def explore_aides_territoires_handler():
             
             # TEST 3 : Toutes les catégories disponibles
             logger.info("🔍 Test 3: Liste des catégories disponibles...")
-            response = await client.get(
+            status, data = await at.get_json(
                 API_BASE_URL + "/themes/",
-                headers=auth_headers,
-                params={"page_size": 50}
+                {"page_size": 50}
             )
             
-            if response.status_code == 200:
-                data = response.json()
+            if status == 200:
                 results["comparison"]["available_categories"] = {
                     "total": data.get("count", 0),
                     "list": data.get("results", [])[:20]
@@ -3,12 +3,14 @@ Endpoint pour exporter toutes les aides agricoles en JSON
 Export des 507 aides ciblant les agriculteurs pour enrichissement manuel
 """
 
-import httpx
 import json
 from datetime import datetime, timezone
-from bs4 import BeautifulSoup
 import logging
 
+from fixture_transport import client_httpx
+from html_text import html_vers_texte
+from http_cache import ClientAidesTerritoires
+
 logger = logging.getLogger(__name__)
 
 async def export_aides_handler():
@@ -20,24 +22,13 @@ async def export_aides_handler():
         API_BASE_URL = "https://aides-territoires.beta.gouv.fr/api"
         API_TOKEN = "92de4853a490b73a75567d7fb66955d62babdd0c9328f67c12a9f2f4266b8ecb"
         
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            
-            # Authentification
-            logger.info("🔐 Authentification API Aides-Territoires...")
-            response = await client.post(
-                API_BASE_URL + "/connexion/",
-                headers={"X-AUTH-TOKEN": API_TOKEN, "Content-Type": "application/json"}
-            )
+        async with client_httpx(timeout=60.0) as client:
             
-            if response.status_code != 200:
+            # Authentification (Bearer Token partagé, valable 24h)
+            at = ClientAidesTerritoires(client, API_TOKEN)
+            if not await at.authentifier():
                 return {"status": "error", "message": "Échec authentification"}
             
-            bearer_token = response.json().get("token")
-            auth_headers = {
-                "Authorization": f"Bearer {bearer_token}",
-                "Content-Type": "application/json"
-            }
-            
             # Récupération de TOUTES les aides agricoles (507 aides)
             logger.info("📥 Récupération des 507 aides agricoles...")
             all_aids = []
@@ -45,21 +36,19 @@ async def export_aides_handler():
             
             while True:
                 logger.info(f"   📄 Page {page}...")
-                response = await client.get(
+                status, data = await at.get_json(
                     API_BASE_URL + "/aids/",
-                    headers=auth_headers,
-                    params={
+                    {
                         "targeted_audiences": "farmer",
                         "page": page,
                         "page_size": 50
                     }
                 )
                 
-                if response.status_code != 200:
-                    logger.error(f"❌ Erreur page {page}: {response.status_code}")
+                if status != 200:
+                    logger.error(f"❌ Erreur page {page}: {status}")
                     break
                 
-                data = response.json()
                 results = data.get("results", [])
                 
                 if not results:
@@ -82,11 +71,6 @@ async def export_aides_handler():
             exported_aids = []
             
             for aid in all_aids:
-                # Nettoyer le HTML (gérer les None)
-                soup_desc = BeautifulSoup(aid.get("description") or "", 'html.parser')
-                soup_elig = BeautifulSoup(aid.get("eligibility") or "", 'html.parser')
-                soup_contact = BeautifulSoup(aid.get("contact") or "", 'html.parser')
-                
                 # Extraire le premier financeur
                 financeurs = aid.get("financers", [])
                 premier_financeur = financeurs[0] if financeurs else "Non spécifié"
@@ -99,8 +83,8 @@ async def export_aides_handler():
                     
                     # ========== INFORMATIONS DE BASE ========== 
                     "titre": aid.get("name", ""),
-                    "description": soup_desc.get_text(separator='\n', strip=True),
-                    "eligibilite_texte": soup_elig.get_text(separator='\n', strip=True),
+                    "description": html_vers_texte(aid.get("description")),
+                    "eligibilite_texte": html_vers_texte(aid.get("eligibility")),
                     
                     # ========== ORGANISMES ========== 
                     "financeurs": financeurs,
@@ -133,7 +117,7 @@ async def export_aides_handler():
                     # ========== URLS ET CONTACT ========== 
                     "url_origine": aid.get("origin_url", ""),
                     "url_candidature": aid.get("application_url"),
-                    "contact": soup_contact.get_text(strip=True),
+                    "contact": html_vers_texte(aid.get("contact")),
                     
                     # ========== MÉTADONNÉES ========== 
                     "date_creation": aid.get("date_created"),
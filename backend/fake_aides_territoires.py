@@ -0,0 +1,46 @@
+"""
+Faux serveur Aides-Territoires pour les tests de synchronisation
+API paginée servie par une app aiohttp locale (TestServer) et récupération
+complète via AidesTerritoiresSyncer
+"""
+
+import asyncio
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+import sync_aides_territoires
+from sync_aides_territoires import AidesTerritoiresSyncer
+
+TOTAL = 120
+
+
+def api_app(fail_page=None, with_count=True):
+    """App aiohttp servant TOTAL aides paginées et la liste des pages demandées"""
+    requested = []
+
+    async def aids(request):
+        page, page_size = int(request.query['page']), int(request.query['page_size'])
+        requested.append(page)
+        if page == fail_page:
+            raise web.HTTPInternalServerError()
+        ids = range((page - 1) * page_size, min(page * page_size, TOTAL))
+        payload = {"results": [{"id": i, "name": f"Aide {i}"} for i in ids],
+                   "next": "suite" if page * page_size < TOTAL else None}
+        if with_count:
+            payload["count"] = TOTAL
+        return web.json_response(payload)
+
+    app = web.Application()
+    app.router.add_get("/api/aids/", aids)
+    return app, requested
+
+
+def fetch(app, monkeypatch, **kwargs):
+    """Récupère toutes les aides de `app` (URL de l'API redirigée via monkeypatch)"""
+    async def run():
+        async with TestServer(app) as server:
+            monkeypatch.setattr(sync_aides_territoires, "AIDES_TERRITOIRES_API_URL", str(server.make_url("/api/aids/")))
+            async with AidesTerritoiresSyncer(concurrency=3) as syncer:
+                return await syncer.fetch_aides_agricoles(page_size=10, **kwargs)
+    return asyncio.run(run())
@@ -0,0 +1,321 @@
+"""
+Enregistrement / rejeu des appels HTTP amont (mode fixtures)
+Les synchronisations et les endpoints admin parlent à l'API Aides-Territoires
+en direct : impossible de les mesurer hors ligne. En mode 'record', les
+réponses réelles sont écrites une fois dans des fichiers compressés (une
+fixture par méthode + URL + paramètres) ; en mode 'replay', elles sont
+resservies sans réseau, avec latence et erreurs injectées (tirage déterministe
+pour une graine donnée).
+
+Un point d'accroche par client HTTP du backend :
+- aiohttp : client_session() remplace aiohttp.ClientSession(...)
+- httpx : client_httpx() passe un transport httpx au client
+- requests : monter_requests(session) monte un adaptateur
+
+HTTP_FIXTURES_MODE=off (défaut) : les clients habituels, sans surcoût.
+Le cache HTTP (http_cache.py) reste actif par-dessus : le désactiver
+(AT_HTTP_CACHE_ENABLED=false) pour mesurer le pipeline complet.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import logging
+import os
+import random
+import time
+from pathlib import Path
+from typing import Any, Dict, Mapping, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit, urlunsplit
+
+import aiohttp
+import httpx
+import orjson
+import requests
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
+
+logger = logging.getLogger(__name__)
+
+FIXTURES_MODE = os.environ.get('HTTP_FIXTURES_MODE', 'off').lower()
+FIXTURES_DIR = Path(os.environ.get('HTTP_FIXTURES_DIR', Path(__file__).parent / 'http_fixtures'))
+FIXTURES_LATENCY_MS = float(os.environ.get('HTTP_FIXTURES_LATENCY_MS', '0'))
+FIXTURES_JITTER_MS = float(os.environ.get('HTTP_FIXTURES_JITTER_MS', '0'))
+FIXTURES_ERROR_RATE = float(os.environ.get('HTTP_FIXTURES_ERROR_RATE', '0'))
+FIXTURES_ERROR_STATUS = int(os.environ.get('HTTP_FIXTURES_ERROR_STATUS', '503'))
+FIXTURES_SEED = int(os.environ.get('HTTP_FIXTURES_SEED', '42'))
+
+# En-têtes conservés dans les fixtures (le corps est stocké décodé)
+ENTETES_CONSERVES = ('content-type', 'etag', 'last-modified')
+
+Reponse = Tuple[int, Dict[str, str], bytes]
+
+
+class FixtureManquante(ConnectionError):
+    """Requête sans fixture en mode replay (traitée comme une erreur réseau par les appelants)"""
+
+
+def requete_canonique(method: str, url: str, params: Optional[Mapping[str, Any]] = None) -> Tuple[str, Dict[str, str]]:
+    """URL sans query + paramètres en chaînes : même clé quel que soit le client"""
+    parties = urlsplit(url)
+    tous = dict(parse_qsl(parties.query, keep_blank_values=True))
+    tous.update({k: str(v) for k, v in (params or {}).items()})
+    return f"{method.upper()} {urlunsplit(parties._replace(query=''))}", tous
+
+
+class FixtureStore:
+    """Fixtures sur disque : gzip(métadonnées JSON + '\\n' + corps)"""
+
+    def __init__(self, directory: Optional[Path] = None):
+        self.directory = Path(directory or FIXTURES_DIR)
+
+    def _path(self, method: str, url: str, params: Optional[Mapping[str, Any]]) -> Path:
+        cible, tous = requete_canonique(method, url, params)
+        canon = cible + '?' + '&'.join(f"{k}={v}" for k, v in sorted(tous.items()))
+        return self.directory / f"{hashlib.sha256(canon.encode()).hexdigest()}.gz"
+
+    def lire(self, method: str, url: str, params: Optional[Mapping[str, Any]] = None) -> Optional[Reponse]:
+        try:
+            meta, body = gzip.decompress(self._path(method, url, params).read_bytes()).split(b'\n', 1)
+        except FileNotFoundError:
+            return None
+        meta = orjson.loads(meta)
+        return meta['status'], meta['headers'], body
+
+    def ecrire(self, method: str, url: str, params: Optional[Mapping[str, Any]],
+               status: int, headers: Mapping[str, str], body: bytes) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        cible, tous = requete_canonique(method, url, params)
+        meta = {
+            'requete': cible,
+            'params': tous,
+            'status': status,
+            'headers': {k.lower(): v for k, v in headers.items() if k.lower() in ENTETES_CONSERVES},
+        }
+        path = self._path(method, url, params)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_bytes(gzip.compress(orjson.dumps(meta) + b'\n' + body, compresslevel=9))
+        os.replace(tmp_path, path)
+
+
+class Rejeu:
+    """Réponses rejouées avec latence (+ gigue) et erreurs injectées"""
+
+    def __init__(self, store: FixtureStore, latency_ms: float = FIXTURES_LATENCY_MS,
+                 jitter_ms: float = FIXTURES_JITTER_MS, error_rate: float = FIXTURES_ERROR_RATE,
+                 error_status: int = FIXTURES_ERROR_STATUS, seed: int = FIXTURES_SEED):
+        self.store = store
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rng = random.Random(seed)
+        self.stats = {'rejouees': 0, 'erreurs_injectees': 0}
+
+    def _tirage(self) -> Tuple[float, bool]:
+        """(délai en s, erreur injectée) : mêmes tirages dans le même ordre pour une graine"""
+        delai = max(0.0, self.latency_ms + self.rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+        return delai, self.rng.random() < self.error_rate
+
+    def _reponse(self, method: str, url: str, params: Optional[Mapping[str, Any]], erreur: bool) -> Reponse:
+        if erreur:
+            self.stats['erreurs_injectees'] += 1
+            return self.error_status, {'content-type': 'application/json'}, b'{"detail": "erreur injectee"}'
+        reponse = self.store.lire(method, url, params)
+        if reponse is None:
+            raise FixtureManquante(f"Aucune fixture pour {method.upper()} {url} {dict(params or {})}")
+        self.stats['rejouees'] += 1
+        return reponse
+
+    async def repondre(self, method: str, url: str, params: Optional[Mapping[str, Any]] = None) -> Reponse:
+        delai, erreur = self._tirage()
+        if delai:
+            await asyncio.sleep(delai)
+        return self._reponse(method, url, params, erreur)
+
+    def repondre_sync(self, method: str, url: str, params: Optional[Mapping[str, Any]] = None) -> Reponse:
+        delai, erreur = self._tirage()
+        if delai:
+            time.sleep(delai)
+        return self._reponse(method, url, params, erreur)
+
+
+# ============ aiohttp ============
+
+class ReponseFixture:
+    """Sous-ensemble de aiohttp.ClientResponse utilisé par les synchronisations"""
+
+    def __init__(self, method: str, url: str, status: int, headers: Mapping[str, str], body: bytes):
+        self.method = method
+        self.url = url
+        self.status = status
+        self.headers = CIMultiDictProxy(CIMultiDict(headers))
+        self._body = body
+
+    async def read(self) -> bytes:
+        return self._body
+
+    async def text(self, encoding: str = 'utf-8') -> str:
+        return self._body.decode(encoding, errors='replace')
+
+    async def json(self, **kwargs) -> Any:
+        return orjson.loads(self._body)
+
+    def raise_for_status(self) -> None:
+        if self.status >= 400:
+            info = aiohttp.RequestInfo(URL(self.url), self.method, CIMultiDictProxy(CIMultiDict()))
+            raise aiohttp.ClientResponseError(info, (), status=self.status, message=f"HTTP {self.status}")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return None
+
+
+class _RequeteFixture:
+    def __init__(self, session: 'SessionFixtures', method: str, url: str, params, kwargs):
+        self.session = session
+        self.args = (method, url, params, kwargs)
+
+    async def __aenter__(self) -> ReponseFixture:
+        return await self.session._executer(*self.args)
+
+    async def __aexit__(self, *exc):
+        return None
+
+
+class SessionFixtures:
+    """
+    Remplaçant de aiohttp.ClientSession (get / post en contexte asynchrone)
+
+    En record, la session réelle envoie la requête et la réponse est écrite ;
+    en replay, aucune connexion n'est ouverte.
+    """
+
+    def __init__(self, store: FixtureStore, rejeu: Optional[Rejeu] = None,
+                 session: Optional[aiohttp.ClientSession] = None):
+        self.store = store
+        self.rejeu = rejeu
+        self.session = session
+
+    async def _executer(self, method: str, url: str, params, kwargs) -> ReponseFixture:
+        if self.session is None:
+            status, headers, body = await self.rejeu.repondre(method, url, params)
+            return ReponseFixture(method, url, status, headers, body)
+        async with self.session.request(method, url, params=params, **kwargs) as response:
+            body = await response.read()
+            self.store.ecrire(method, url, params, response.status, response.headers, body)
+            return ReponseFixture(method, url, response.status, response.headers, body)
+
+    def get(self, url: str, params=None, **kwargs) -> _RequeteFixture:
+        return _RequeteFixture(self, 'GET', url, params, kwargs)
+
+    def post(self, url: str, params=None, **kwargs) -> _RequeteFixture:
+        return _RequeteFixture(self, 'POST', url, params, kwargs)
+
+    async def close(self) -> None:
+        if self.session is not None:
+            await self.session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+# ============ httpx ============
+
+class TransportHttpxFixtures(httpx.AsyncBaseTransport):
+    def __init__(self, store: FixtureStore, rejeu: Optional[Rejeu] = None,
+                 inner: Optional[httpx.AsyncBaseTransport] = None):
+        self.store = store
+        self.rejeu = rejeu
+        self.inner = inner
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        method, url = request.method, str(request.url)
+        if self.inner is None:
+            status, headers, body = await self.rejeu.repondre(method, url)
+        else:
+            response = await self.inner.handle_async_request(request)
+            body = await response.aread()
+            status, headers = response.status_code, dict(response.headers)
+            self.store.ecrire(method, url, None, status, headers, body)
+            headers = {k: v for k, v in headers.items() if k.lower() in ENTETES_CONSERVES}
+        return httpx.Response(status, headers=headers, content=body, request=request)
+
+    async def aclose(self) -> None:
+        if self.inner is not None:
+            await self.inner.aclose()
+
+
+# ============ requests ============
+
+class AdaptateurRequestsFixtures(requests.adapters.HTTPAdapter):
+    def __init__(self, store: FixtureStore, rejeu: Optional[Rejeu] = None):
+        super().__init__()
+        self.store = store
+        self.rejeu = rejeu
+
+    def send(self, request, **kwargs):
+        if self.rejeu is None:
+            response = super().send(request, **kwargs)
+            self.store.ecrire(request.method, request.url, None, response.status_code,
+                              response.headers, response.content)
+            return response
+        status, headers, body = self.rejeu.repondre_sync(request.method, request.url)
+        response = requests.Response()
+        response.status_code = status
+        response.headers = requests.structures.CaseInsensitiveDict(headers)
+        response._content = body
+        response.url = request.url
+        response.request = request
+        response.encoding = 'utf-8'
+        return response
+
+
+# ============ Points d'accroche ============
+
+_rejeu: Optional[Rejeu] = None
+
+
+def get_rejeu() -> Rejeu:
+    """Rejeu partagé du processus (un seul tirage aléatoire pour tous les clients)"""
+    global _rejeu
+    if _rejeu is None:
+        _rejeu = Rejeu(FixtureStore())
+        logger.info(f"🎞️  Mode fixtures replay ({FIXTURES_DIR}, latence {FIXTURES_LATENCY_MS}ms, "
+                    f"erreurs {FIXTURES_ERROR_RATE:.0%})")
+    return _rejeu
+
+
+def client_session(**kwargs):
+    """aiohttp.ClientSession(**kwargs), ou sa version record / replay"""
+    if FIXTURES_MODE == 'replay':
+        return SessionFixtures(get_rejeu().store, get_rejeu())
+    if FIXTURES_MODE == 'record':
+        return SessionFixtures(FixtureStore(), session=aiohttp.ClientSession(**kwargs))
+    return aiohttp.ClientSession(**kwargs)
+
+
+def client_httpx(**kwargs) -> httpx.AsyncClient:
+    """httpx.AsyncClient(**kwargs) avec le transport record / replay si activé"""
+    if FIXTURES_MODE == 'replay':
+        kwargs['transport'] = TransportHttpxFixtures(get_rejeu().store, get_rejeu())
+    elif FIXTURES_MODE == 'record':
+        kwargs['transport'] = TransportHttpxFixtures(FixtureStore(), inner=httpx.AsyncHTTPTransport())
+    return httpx.AsyncClient(**kwargs)
+
+
+def monter_requests(session: requests.Session) -> requests.Session:
+    """Monte l'adaptateur record / replay sur une session requests si activé"""
+    if FIXTURES_MODE in ('record', 'replay'):
+        adaptateur = AdaptateurRequestsFixtures(
+            get_rejeu().store if FIXTURES_MODE == 'replay' else FixtureStore(),
+            get_rejeu() if FIXTURES_MODE == 'replay' else None,
+        )
+        session.mount('https://', adaptateur)
+        session.mount('http://', adaptateur)
+    return session
@@ -0,0 +1,139 @@
+"""
+Nettoyage HTML et extraction de texte à l'import
+Les descriptions, conditions d'éligibilité et contacts Aides-Territoires sont du
+HTML. Ils sont traités une seule fois, à la normalisation, par un parseur
+événementiel (html.parser, sans arbre BeautifulSoup) qui produit en une passe :
+- un HTML affichable : balises de mise en forme autorisées, attributs retirés
+  (sauf href http(s)/mailto/tel des liens), script/style supprimés avec leur contenu ;
+- un texte brut : un bloc par ligne, espaces normalisés, entités décodées.
+
+La détection de mots-clés, la recherche et l'export lisent le texte brut.
+"""
+
+from html import escape
+from html.parser import HTMLParser
+from typing import Any, Dict, List, NamedTuple
+
+BALISES_AUTORISEES = frozenset((
+    'p', 'br', 'ul', 'ol', 'li', 'strong', 'b', 'em', 'i', 'u', 'a', 'blockquote',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'table', 'thead', 'tbody', 'tr', 'th', 'td',
+))
+# Contenu supprimé avec la balise
+BALISES_IGNOREES = frozenset((
+    'script', 'style', 'iframe', 'object', 'embed', 'noscript', 'template', 'svg', 'math', 'head', 'title',
+))
+# Balises qui coupent le texte brut en lignes
+BALISES_BLOC = frozenset((
+    'p', 'div', 'br', 'li', 'ul', 'ol', 'blockquote', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+    'table', 'tr', 'section', 'article', 'header', 'footer', 'hr', 'dl', 'dt', 'dd', 'pre',
+))
+ELEMENTS_VIDES = frozenset(('br', 'hr', 'img', 'input', 'meta', 'link', 'wbr', 'col', 'area', 'source'))
+SCHEMAS_LIENS = ('http://', 'https://', 'mailto:', 'tel:')
+
+
+class TexteHtml(NamedTuple):
+    html: str
+    texte: str
+
+
+class ExtracteurHtml(HTMLParser):
+    """Parseur en flux : feed() autant de fois que nécessaire, puis resultat()"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self._html: List[str] = []
+        self._texte: List[str] = []
+        self._ouvertes: List[str] = []
+        self._ignore = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in BALISES_IGNOREES:
+            self._ignore += 1
+            return
+        if self._ignore:
+            return
+        if tag in BALISES_BLOC:
+            self._texte.append('\n')
+        elif tag in ('td', 'th'):
+            self._texte.append(' ')
+        if tag not in BALISES_AUTORISEES:
+            return
+        if tag == 'a':
+            href = dict(attrs).get('href') or ''
+            if href.strip().lower().startswith(SCHEMAS_LIENS):
+                self._html.append(f'<a href="{escape(href.strip())}" rel="noopener noreferrer nofollow">')
+            else:
+                self._html.append('<a>')
+        else:
+            self._html.append(f'<{tag}>')
+        if tag not in ELEMENTS_VIDES:
+            self._ouvertes.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in ELEMENTS_VIDES:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in BALISES_IGNOREES:
+            self._ignore = max(0, self._ignore - 1)
+            return
+        if self._ignore:
+            return
+        if tag in BALISES_BLOC:
+            self._texte.append('\n')
+        # Ferme les balises restées ouvertes à l'intérieur (HTML mal formé)
+        if tag in self._ouvertes:
+            while self._ouvertes:
+                ouverte = self._ouvertes.pop()
+                self._html.append(f'</{ouverte}>')
+                if ouverte == tag:
+                    break
+
+    def handle_data(self, data):
+        if self._ignore:
+            return
+        self._html.append(escape(data, quote=False))
+        # Les retours à la ligne du source sont des espaces en HTML : seuls les blocs coupent
+        self._texte.append(data.replace('\n', ' '))
+
+    def resultat(self) -> TexteHtml:
+        self.close()
+        while self._ouvertes:
+            self._html.append(f'</{self._ouvertes.pop()}>')
+        return TexteHtml(''.join(self._html).strip(), normaliser_texte(''.join(self._texte)))
+
+
+def normaliser_texte(texte: str) -> str:
+    """Une ligne par bloc, espaces (dont insécables) réduits, lignes vides retirées"""
+    lignes = (' '.join(ligne.split()) for ligne in texte.split('\n'))
+    return '\n'.join(ligne for ligne in lignes if ligne)
+
+
+def extraire_html(html: Any) -> TexteHtml:
+    """HTML affichable et texte brut d'un champ Aides-Territoires (None, texte ou HTML)"""
+    if not html:
+        return TexteHtml('', '')
+    if not isinstance(html, str):
+        html = str(html)
+    if '<' not in html and '&' not in html:
+        texte = normaliser_texte(html)
+        return TexteHtml(escape(html.strip(), quote=False), texte)
+    extracteur = ExtracteurHtml()
+    extracteur.feed(html)
+    return extracteur.resultat()
+
+
+def html_vers_texte(html: Any) -> str:
+    return extraire_html(html).texte
+
+
+def textes_aide(aide_dict: Dict[str, Any]) -> Dict[str, str]:
+    """Champs texte stockés avec l'aide (quand la normalisation ne les a pas fournis)"""
+    raw = aide_dict.get('raw_data') or {}
+    return {
+        'description_texte': html_vers_texte(aide_dict.get('description')),
+        'conditions_eligibilite_texte': html_vers_texte(aide_dict.get('conditions_eligibilite')),
+        'contact_texte': html_vers_texte(aide_dict.get('contact') or raw.get('contact')),
+    }
+
@@ -0,0 +1,302 @@
+"""
+Cache HTTP partagé des appels à l'API Aides-Territoires
+La synchronisation V2 et les endpoints admin (export, analyse, exploration)
+s'authentifiaient et retéléchargeaient chacun les mêmes pages. Ils passent
+maintenant par :
+- HttpCache : réponses GET sur disque (une entrée par URL + paramètres).
+  Pendant AT_HTTP_CACHE_TTL_S une entrée est servie sans requête ; ensuite la
+  requête est conditionnelle (If-None-Match / If-Modified-Since) et un 304
+  ressert le corps stocké.
+- BearerTokenCache : Bearer Token obtenu via /api/connexion/ conservé pendant
+  sa validité (24h, marge déduite), partagé entre clients et redémarrages.
+
+Le cache ne dépend pas du client HTTP : un transport (aiohttp ou httpx) est une
+fonction async (url, params, headers) -> (status, headers, corps).
+"""
+
+import asyncio
+import gzip
+import hashlib
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Mapping, NamedTuple, Optional, Tuple
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+CONNEXION_URL = "https://aides-territoires.beta.gouv.fr/api/connexion/"
+
+HTTP_CACHE_ENABLED = os.environ.get('AT_HTTP_CACHE_ENABLED', 'true').lower() not in ('0', 'false', 'no')
+HTTP_CACHE_DIR = Path(os.environ.get('AT_HTTP_CACHE_DIR', Path(__file__).parent / 'http_cache'))
+HTTP_CACHE_TTL_S = float(os.environ.get('AT_HTTP_CACHE_TTL_S', '300'))
+# Validité annoncée du Bearer Token, renouvelé TOKEN_MARGIN_S avant l'échéance
+TOKEN_VALIDITY_S = float(os.environ.get('AT_TOKEN_VALIDITY_S', str(24 * 3600)))
+TOKEN_MARGIN_S = 600
+
+Transport = Callable[[str, Mapping[str, Any], Mapping[str, str]], Awaitable[Tuple[int, Mapping[str, str], bytes]]]
+
+
+class ReponseHttp(NamedTuple):
+    status: int
+    body: bytes
+    # 'reseau' (téléchargée), 'revalidee' (304) ou 'cache' (fraîche, sans requête)
+    source: str
+
+    def json(self) -> Any:
+        return orjson.loads(self.body)
+
+
+def cle_requete(url: str, params: Optional[Mapping[str, Any]] = None) -> str:
+    """Clé d'une requête GET (paramètres triés, en-têtes d'authentification exclus)"""
+    canon = url + '?' + '&'.join(f"{k}={v}" for k, v in sorted((params or {}).items()))
+    return hashlib.sha256(canon.encode()).hexdigest()
+
+
+def _entete(headers: Mapping[str, str], nom: str) -> Optional[str]:
+    """En-tête insensible à la casse (les adaptateurs passent parfois un dict simple)"""
+    valeur = headers.get(nom)
+    if valeur is None:
+        valeur = next((v for k, v in headers.items() if k.lower() == nom.lower()), None)
+    return valeur
+
+
+class HttpCache:
+    """Réponses GET sur disque, revalidées par ETag / Last-Modified"""
+
+    def __init__(self, directory: Path = HTTP_CACHE_DIR, ttl_s: float = HTTP_CACHE_TTL_S):
+        self.directory = Path(directory)
+        self.ttl_s = ttl_s
+        self.stats = {'cache': 0, 'revalidee': 0, 'reseau': 0}
+
+    def _path(self, cle: str) -> Path:
+        return self.directory / f"{cle}.gz"
+
+    def lire(self, cle: str) -> Optional[Tuple[Dict[str, Any], bytes]]:
+        """(métadonnées, corps) d'une entrée, None si absente ou illisible"""
+        try:
+            contenu = gzip.decompress(self._path(cle).read_bytes())
+            meta, body = contenu.split(b'\n', 1)
+            return orjson.loads(meta), body
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️  Entrée de cache HTTP illisible {cle[:12]}: {e}")
+            return None
+
+    def ecrire(self, cle: str, meta: Dict[str, Any], body: bytes) -> None:
+        """Écriture atomique (fichier temporaire + os.replace)"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(cle)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_bytes(gzip.compress(orjson.dumps(meta) + b'\n' + body, compresslevel=6))
+        os.replace(tmp_path, path)
+
+    def est_fraiche(self, meta: Dict[str, Any], maintenant: Optional[float] = None) -> bool:
+        return (maintenant or time.time()) - meta['valide_le'] < self.ttl_s
+
+    @staticmethod
+    def entetes_conditionnels(meta: Dict[str, Any]) -> Dict[str, str]:
+        headers = {}
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+        return headers
+
+    async def get(self, transport: Transport, url: str, params: Optional[Mapping[str, Any]] = None,
+                  headers: Optional[Mapping[str, str]] = None) -> ReponseHttp:
+        """GET via le cache ; seules les réponses 200 sont stockées"""
+        cle = cle_requete(url, params)
+        entree = self.lire(cle)
+        if entree is not None and self.est_fraiche(entree[0]):
+            self.stats['cache'] += 1
+            return ReponseHttp(200, entree[1], 'cache')
+
+        envoyes = dict(headers or {})
+        if entree is not None:
+            envoyes.update(self.entetes_conditionnels(entree[0]))
+        status, entetes, body = await transport(url, params or {}, envoyes)
+
+        if status == 304 and entree is not None:
+            meta, body = entree
+            meta['valide_le'] = time.time()
+            self.ecrire(cle, meta, body)
+            self.stats['revalidee'] += 1
+            return ReponseHttp(200, body, 'revalidee')
+
+        self.stats['reseau'] += 1
+        if status == 200:
+            self.ecrire(cle, {
+                'url': url,
+                'etag': _entete(entetes, 'ETag'),
+                'last_modified': _entete(entetes, 'Last-Modified'),
+                'valide_le': time.time(),
+            }, body)
+        return ReponseHttp(status, body, 'reseau')
+
+
+class BearerTokenCache:
+    """
+    Bearer Tokens Aides-Territoires par X-AUTH-TOKEN (clé = empreinte, jamais le token API)
+
+    Persisté dans le dossier du cache HTTP (fichier lisible par le seul
+    utilisateur) pour survivre aux redémarrages et être partagé entre workers.
+    """
+
+    def __init__(self, path: Optional[Path] = None, validity_s: float = TOKEN_VALIDITY_S):
+        self.path = path
+        self.validity_s = validity_s
+        self._tokens: Dict[str, Tuple[str, float]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._charger()
+
+    @staticmethod
+    def _cle(api_token: str) -> str:
+        return hashlib.sha256(api_token.encode()).hexdigest()[:16]
+
+    def _charger(self) -> None:
+        """Relit le fichier (tokens obtenus par un autre worker depuis le démarrage)"""
+        if self.path is None:
+            return
+        try:
+            self._tokens = {k: tuple(v) for k, v in orjson.loads(self.path.read_bytes()).items()}
+        except (OSError, ValueError):
+            pass
+
+    def _sauvegarder(self) -> None:
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+        # Créé directement en 0600 : le token n'est jamais lisible par les autres utilisateurs
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(orjson.dumps(self._tokens))
+        os.replace(tmp_path, self.path)
+
+    def valide(self, api_token: str, maintenant: Optional[float] = None) -> Optional[str]:
+        entree = self._tokens.get(self._cle(api_token))
+        if entree is None:
+            return None
+        token, obtenu_le = entree
+        if (maintenant or time.time()) - obtenu_le >= self.validity_s - TOKEN_MARGIN_S:
+            return None
+        return token
+
+    async def token(self, api_token: str, obtenir: Callable[[], Awaitable[Optional[str]]]) -> Optional[str]:
+        """Token en cache, sinon obtenu une seule fois même pour des appels concurrents"""
+        cle = self._cle(api_token)
+        token = self.valide(api_token)
+        if token is not None:
+            return token
+        async with self._locks.setdefault(cle, asyncio.Lock()):
+            self._charger()
+            token = self.valide(api_token)
+            if token is None:
+                token = await obtenir()
+                if token:
+                    self._charger()
+                    self._tokens[cle] = (token, time.time())
+                    self._sauvegarder()
+        return token
+
+    def invalider(self, api_token: str) -> None:
+        """Token refusé (401) : le prochain appel se réauthentifie"""
+        if self._tokens.pop(self._cle(api_token), None) is not None:
+            self._sauvegarder()
+
+
+def transport_aiohttp(session) -> Transport:
+    async def envoyer(url, params, headers):
+        async with session.get(url, params=params, headers=headers) as response:
+            return response.status, response.headers, await response.read()
+    return envoyer
+
+
+def transport_httpx(client) -> Transport:
+    async def envoyer(url, params, headers):
+        response = await client.get(url, params=params, headers=headers)
+        return response.status_code, response.headers, response.content
+    return envoyer
+
+
+async def get_cached(transport: Transport, url: str, params: Optional[Mapping[str, Any]] = None,
+                     headers: Optional[Mapping[str, str]] = None,
+                     cache: Optional[HttpCache] = None) -> ReponseHttp:
+    """GET via le cache partagé (requête directe si le cache est désactivé)"""
+    cache = cache if cache is not None else get_http_cache()
+    if cache is None:
+        status, _, body = await transport(url, params or {}, headers or {})
+        return ReponseHttp(status, body, 'reseau')
+    return await cache.get(transport, url, params, headers)
+
+
+class ClientAidesTerritoires:
+    """
+    Client httpx authentifié des endpoints admin (token et pages en cache)
+
+        async with client_httpx(timeout=60.0) as client:
+            at = ClientAidesTerritoires(client, API_TOKEN)
+            if not await at.authentifier(): ...
+            status, data = await at.get_json(API_BASE_URL + "/aids/", params)
+    """
+
+    def __init__(self, client, api_token: str, cache: Optional[HttpCache] = None,
+                 tokens: Optional[BearerTokenCache] = None):
+        self.client = client
+        self.api_token = api_token
+        self.cache = cache
+        self.tokens = tokens or get_token_cache()
+        self.bearer_token: Optional[str] = None
+
+    async def _connexion(self) -> Optional[str]:
+        logger.info("🔐 Authentification API Aides-Territoires...")
+        response = await self.client.post(
+            CONNEXION_URL,
+            headers={"X-AUTH-TOKEN": self.api_token, "Content-Type": "application/json"}
+        )
+        if response.status_code != 200:
+            logger.error(f"❌ Erreur authentification: HTTP {response.status_code}")
+            return None
+        return response.json().get("token")
+
+    async def authentifier(self) -> bool:
+        self.bearer_token = await self.tokens.token(self.api_token, self._connexion)
+        return self.bearer_token is not None
+
+    async def get_json(self, url: str, params: Optional[Mapping[str, Any]] = None) -> Tuple[int, Any]:
+        """(status, données JSON ou None) ; un 401 renouvelle le token une fois"""
+        for tentative in range(2):
+            headers = {"Authorization": f"Bearer {self.bearer_token}", "Content-Type": "application/json"}
+            response = await get_cached(transport_httpx(self.client), url, params, headers, self.cache)
+            if response.status == 401 and tentative == 0:
+                self.tokens.invalider(self.api_token)
+                if not await self.authentifier():
+                    break
+                continue
+            return response.status, response.json() if response.status == 200 else None
+        return 401, None
+
+
+_http_cache: Optional[HttpCache] = None
+_token_cache: Optional[BearerTokenCache] = None
+
+
+def get_http_cache() -> Optional[HttpCache]:
+    """Cache HTTP partagé du processus (None si AT_HTTP_CACHE_ENABLED=false)"""
+    global _http_cache
+    if not HTTP_CACHE_ENABLED:
+        return None
+    if _http_cache is None:
+        _http_cache = HttpCache()
+    return _http_cache
+
+
+def get_token_cache() -> BearerTokenCache:
+    global _token_cache
+    if _token_cache is None:
+        _token_cache = BearerTokenCache(HTTP_CACHE_DIR / 'bearer_tokens.json' if HTTP_CACHE_ENABLED else None)
+    return _token_cache
@@ -0,0 +1,55 @@
+"""
+Réponses JSON rapides pour les gros payloads (matching, éligibilité, listes d'aides)
+Encodage orjson (repli sur json si orjson n'est pas installé) et modèles
+Pydantic sérialisés sans revalidation par le response_model de FastAPI
+"""
+
+import json
+import logging
+import os
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dépend de l'environnement
+    orjson = None
+    logger.warning("⚠️  orjson non installé, encodage JSON standard")
+
+# Les handlers retournent directement la réponse encodée : FastAPI ne revalide pas
+# le contenu contre response_model (données déjà validées). false = revalidation.
+SKIP_RESPONSE_VALIDATION = os.environ.get('SKIP_RESPONSE_VALIDATION', 'true').lower() not in ('0', 'false', 'no')
+
+
+def _default(obj: Any) -> Any:
+    """Types non natifs : modèles Pydantic (imbriqués dans des dicts/listes)"""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    raise TypeError(f"Type non sérialisable en JSON: {type(obj).__name__}")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse encodée avec orjson, acceptant des modèles Pydantic dans le contenu"""
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(
+            content, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+        ).encode("utf-8")
+
+
+def respond(content: Any):
+    """
+    Réponse d'un handler dont les données sont déjà validées
+
+    Retourne une FastJSONResponse (pas de revalidation), ou le contenu tel quel
+    si SKIP_RESPONSE_VALIDATION=false pour laisser FastAPI appliquer response_model.
+    """
+    if SKIP_RESPONSE_VALIDATION:
+        return FastJSONResponse(content=content)
+    return content
@@ -0,0 +1,282 @@
+"""
+Aperçu en direct du questionnaire : nombre d'aides par option de la prochaine question
+Index en bitmaps (entiers Python, un bit par aide) des critères bloquants du
+moteur de matching : localisation, production, statut juridique, âge, surface.
+Le nombre d'aides d'une option est le popcount de l'intersection des bitmaps
+des réponses déjà données et de celui de l'option, sans exécuter le moteur.
+
+Le compte est celui des aides qu'aucun critère bloquant n'exclut : les
+questions sans réponse n'excluent rien et les critères non bloquants (projets,
+labels) n'interviennent pas. C'est une borne haute des aides éligibles.
+"""
+
+import logging
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from models_v2 import AideAgricoleV2
+
+logger = logging.getLogger(__name__)
+
+# Régions valant pour tout le territoire (comme MatchingEngine._evaluer_localisation)
+REGIONS_NATIONALES = ("National", "France")
+
+
+class _Seuils:
+    """
+    Bitmaps des aides respectant une borne numérique (minimum ou maximum)
+
+    Un bitmap cumulé par valeur de borne distincte : le masque d'une valeur
+    s'obtient par bisection, sans parcourir les aides.
+    """
+
+    def __init__(self, bornes: List[Tuple[float, int]], libres: int, minimum: bool):
+        self.libres = libres
+        self.minimum = minimum
+        par_valeur: Dict[float, int] = defaultdict(int)
+        for valeur, bit in bornes:
+            par_valeur[valeur] |= bit
+        self.valeurs = sorted(par_valeur)
+        # minimum : aides dont la borne est <= valeur (cumul croissant)
+        # maximum : aides dont la borne est >= valeur (cumul décroissant)
+        ordre = self.valeurs if minimum else list(reversed(self.valeurs))
+        cumul, cumuls = 0, []
+        for valeur in ordre:
+            cumul |= par_valeur[valeur]
+            cumuls.append(cumul)
+        self.cumuls = cumuls if minimum else list(reversed(cumuls))
+
+    def masque(self, valeur: float) -> int:
+        if self.minimum:
+            j = bisect_right(self.valeurs, valeur) - 1
+            return self.libres | self.cumuls[j] if j >= 0 else self.libres
+        j = bisect_left(self.valeurs, valeur)
+        return self.libres | self.cumuls[j] if j < len(self.valeurs) else self.libres
+
+
+class IndexBloquants:
+    """Bitmaps des aides compatibles par valeur de chaque critère bloquant"""
+
+    def __init__(self, aides: Sequence[AideAgricoleV2]):
+        self.taille = len(aides)
+        self.toutes = (1 << self.taille) - 1
+        self.regions: Dict[str, int] = defaultdict(int)
+        self.departements: Dict[str, int] = defaultdict(int)
+        self.statuts: Dict[str, int] = defaultdict(int)
+        self.productions: Dict[str, int] = defaultdict(int)
+        self.region_libre = self.departement_libre = self.statut_libre = self.production_libre = 0
+        self.jeune_requis = 0
+        surface_min, surface_max, age_min, age_max = [], [], [], []
+        surface_libre_min = surface_libre_max = age_libre_min = age_libre_max = 0
+
+        for i, aide in enumerate(aides):
+            bit = 1 << i
+            criteres = aide.criteres
+
+            if not criteres.regions or any(r in criteres.regions for r in REGIONS_NATIONALES):
+                self.region_libre |= bit
+            else:
+                for region in criteres.regions:
+                    self.regions[region] |= bit
+            if not criteres.departements:
+                self.departement_libre |= bit
+            else:
+                for departement in criteres.departements:
+                    self.departements[departement] |= bit
+
+            if not criteres.statuts_juridiques:
+                self.statut_libre |= bit
+            else:
+                for statut in criteres.statuts_juridiques:
+                    self.statuts[statut.value] |= bit
+            if not criteres.types_production:
+                self.production_libre |= bit
+            else:
+                for production in criteres.types_production:
+                    self.productions[production.value] |= bit
+
+            if criteres.superficie_min is None:
+                surface_libre_min |= bit
+            else:
+                surface_min.append((criteres.superficie_min, bit))
+            if criteres.superficie_max is None:
+                surface_libre_max |= bit
+            else:
+                surface_max.append((criteres.superficie_max, bit))
+
+            # Aide jeune agriculteur : seul le statut JA compte (bornes d'âge ignorées)
+            if criteres.jeune_agriculteur is True:
+                self.jeune_requis |= bit
+                age_libre_min |= bit
+                age_libre_max |= bit
+                continue
+            if criteres.age_min is None:
+                age_libre_min |= bit
+            else:
+                age_min.append((criteres.age_min, bit))
+            if criteres.age_max is None:
+                age_libre_max |= bit
+            else:
+                age_max.append((criteres.age_max, bit))
+
+        self.surface_min = _Seuils(surface_min, surface_libre_min, minimum=True)
+        self.surface_max = _Seuils(surface_max, surface_libre_max, minimum=False)
+        self.age_min = _Seuils(age_min, age_libre_min, minimum=True)
+        self.age_max = _Seuils(age_max, age_libre_max, minimum=False)
+
+    def masque(self, champ: str, valeur: Any, champs: Dict[str, Any]) -> int:
+        """Aides qu'une valeur du champ de profil n'exclut pas (toutes si le champ n'est pas bloquant)"""
+        if champ == "region":
+            return self.region_libre | self.regions.get(valeur, 0)
+        if champ == "departement":
+            return self.departement_libre | self.departements.get(valeur, 0)
+        if champ == "statut_juridique":
+            return self.statut_libre | self.statuts.get(valeur, 0)
+        if champ == "productions":
+            masque = self.production_libre
+            for production in valeur:
+                masque |= self.productions.get(production, 0)
+            return masque
+        if champ == "sau_totale":
+            return self.surface_min.masque(valeur) & self.surface_max.masque(valeur)
+        if champ == "age":
+            return self.age_min.masque(valeur) & self.age_max.masque(valeur)
+        if champ == "jeune_agriculteur":
+            # Sans âge renseigné le moteur n'applique pas les critères d'âge
+            if valeur is False and champs.get("age") is not None:
+                return self.toutes & ~self.jeune_requis
+            return self.toutes
+        return self.toutes
+
+    def filtre(self, champs: Dict[str, Any]) -> int:
+        """Intersection des masques des champs renseignés"""
+        masque = self.toutes
+        for champ, valeur in champs.items():
+            masque &= self.masque(champ, valeur, champs)
+        return masque
+
+
+# Index du catalogue courant, reconstruit à chaque nouvelle version
+_index: Optional[Tuple[int, List[AideAgricoleV2], IndexBloquants]] = None
+
+
+def index_catalogue(version: int, aides: List[AideAgricoleV2]) -> IndexBloquants:
+    """Index des critères bloquants d'une version du catalogue (mis en cache)"""
+    global _index
+    if _index is None or _index[0] != version or _index[1] is not aides:
+        _index = (version, aides, IndexBloquants(aides))
+        logger.info(f"🧮 Index des critères bloquants construit ({len(aides)} aides, catalogue v{version})")
+    return _index[2]
+
+
+# ============ RÉPONSES DU QUESTIONNAIRE ============
+
+def _champ(question: Dict[str, Any]) -> str:
+    return question.get("field_mapping") or question["id"]
+
+
+def _normaliser(question: Dict[str, Any], valeur: Any) -> Any:
+    """Valeur de réponse typée, None si absente ou illisible"""
+    if valeur is None or valeur == "" or valeur == []:
+        return None
+    type_question = question.get("type")
+    try:
+        if type_question == "number":
+            return float(valeur)
+        if type_question == "multiselect":
+            return list(valeur) if isinstance(valeur, (list, tuple)) else [valeur]
+        if type_question == "radio" and isinstance(valeur, str) and valeur.lower() in ("true", "false"):
+            return valeur.lower() == "true"
+    except (TypeError, ValueError):
+        return None
+    return valeur
+
+
+def champs_depuis_reponses(questions: Sequence[Dict[str, Any]], reponses: Dict[str, Any]) -> Dict[str, Any]:
+    """Champs du profil renseignés par les réponses (clés = ids des questions)"""
+    champs = {}
+    for question in questions:
+        valeur = _normaliser(question, reponses.get(question["id"]))
+        if valeur is not None:
+            champs[_champ(question)] = valeur
+    return champs
+
+
+def _visible(question: Dict[str, Any], reponses: Dict[str, Any]) -> bool:
+    condition = question.get("visible_if")
+    if not condition:
+        return True
+    valeur = reponses.get(condition.get("question_id"))
+    if valeur is None or valeur == "":
+        return False
+    operateur, attendu = condition.get("operator"), condition.get("value")
+    try:
+        if operateur == "in":
+            return valeur in condition.get("values", [])
+        if operateur == "==":
+            return valeur == attendu
+        if operateur == "!=":
+            return valeur != attendu
+        valeur, attendu = float(valeur), float(attendu)
+        return {
+            "<": valeur < attendu, "<=": valeur <= attendu,
+            ">": valeur > attendu, ">=": valeur >= attendu,
+        }.get(operateur, True)
+    except (TypeError, ValueError):
+        return False
+
+
+def prochaine_question(questions: Sequence[Dict[str, Any]], reponses: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Première question visible sans réponse"""
+    for question in questions:
+        if _visible(question, reponses) and _normaliser(question, reponses.get(question["id"])) is None:
+            return question
+    return None
+
+
+def apercu_options(index: IndexBloquants, questions: Sequence[Dict[str, Any]],
+                   reponses: Dict[str, Any], question_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Nombre d'aides restantes pour chaque option d'une question
+
+    Args:
+        index: Index des critères bloquants du catalogue
+        questions: Questions du questionnaire dans l'ordre d'affichage
+        reponses: Réponses déjà données (clés = ids des questions)
+        question_id: Question à détailler (par défaut la prochaine question)
+    """
+    champs = champs_depuis_reponses(questions, reponses)
+    if question_id is not None:
+        question = next((q for q in questions if q["id"] == question_id), None)
+        if question is None:
+            raise ValueError(f"Question inconnue: {question_id}")
+    else:
+        question = prochaine_question(questions, reponses)
+
+    resultat = {
+        "question_id": question["id"] if question else None,
+        "aides_possibles": index.filtre(champs).bit_count(),
+        "total_aides": index.taille,
+        "options": [],
+    }
+    if question is None:
+        return resultat
+
+    champ = _champ(question)
+    autres = {k: v for k, v in champs.items() if k != champ}
+    base = index.filtre(autres)
+    selection = (champs.get(champ) or []) if question.get("type") == "multiselect" else None
+    for option in question.get("options", []):
+        valeur = option["value"] if isinstance(option, dict) else option
+        if selection is not None:
+            valeur_champ = selection + [valeur] if valeur not in selection else selection
+        else:
+            valeur_champ = valeur
+        contexte = dict(autres, **{champ: valeur_champ})
+        resultat["options"].append({
+            "value": valeur,
+            "label": option.get("label", valeur) if isinstance(option, dict) else valeur,
+            "aides_possibles": (base & index.masque(champ, valeur_champ, contexte)).bit_count(),
+        })
+    return resultat
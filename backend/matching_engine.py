@@ -3,16 +3,71 @@ Moteur de matching V2 pour AgriSubv
 Calcule le score de compatibilité entre un profil agriculteur et une aide
 """
 
-from typing import List, Optional, Tuple
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple, Union
 from models_v2 import (
-    AideAgricoleV2, ProfilAgriculteur, ResultatMatching, 
-    DetailCritere, TypeProduction, TypeProjet
+    AideAgricoleV2, ProfilAgriculteur, ResultatMatching,
+    TypeProduction, TypeProjet
 )
+from montant_estimators import ContexteProfil, compiler as compiler_estimateur
 import logging
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Détail d'un critère : dictionnaire aux champs de DetailCritere
+Detail = Dict[str, Any]
+
+# Évaluation d'un groupe de critères : (score, détails, critère bloquant non respecté)
+EvaluationGroupe = Tuple[float, List[Detail], bool]
+
+
+# ============ RÉSULTATS ============
+# Le moteur produit des dictionnaires aux champs de ResultatMatching, avec les
+# types que produirait la validation (points et montants en float, score arrondi
+# comme ResultatMatching.score_valide). Les handlers les sérialisent tels quels ;
+# calculate_match les valide une seule fois en ResultatMatching.
+
+
+def _detail(
+    nom: str,
+    valide: bool,
+    bloquant: bool = False,
+    points: float = 0.0,
+    points_max: float = 0.0,
+    explication: str = ""
+) -> Detail:
+    """Détail d'un critère (points convertis en float comme le ferait Pydantic)"""
+    return {
+        'nom': nom,
+        'valide': valide,
+        'bloquant': bloquant,
+        'points': float(points),
+        'points_max': float(points_max),
+        'explication': explication,
+    }
+
+
+def serialiser_resultat(resultat: Union[ResultatMatching, Dict[str, Any]]) -> dict:
+    """
+    Résultat sous forme de dictionnaire JSON (équivalent de model_dump())
+
+    Les résultats bruts du moteur (calculer, assembler) en sont déjà un : copie
+    de premier niveau, que l'appelant peut enrichir.
+    """
+    if isinstance(resultat, ResultatMatching):
+        return resultat.model_dump()
+    return dict(resultat)
+
+
+def _float_or_none(value) -> Optional[float]:
+    return None if value is None else float(value)
+
+
+def horodatage_matching() -> str:
+    """Horodatage commun à tous les résultats d'un même matching"""
+    return datetime.now(timezone.utc).isoformat()
+
 
 class MatchingEngine:
     """
@@ -31,78 +86,136 @@ class MatchingEngine:
     # Seuil d'éligibilité (score minimum)
     SEUIL_ELIGIBILITE = 60.0
     
+    # Groupes de critères dans l'ordre d'évaluation (nom, méthode d'évaluation)
+    GROUPES: Tuple[Tuple[str, str], ...] = (
+        ("localisation", "_evaluer_localisation"),
+        ("production", "_evaluer_production"),
+        ("projet", "_evaluer_projet"),
+        ("statut", "_evaluer_statut"),
+        ("age", "_evaluer_age"),
+        ("surface", "_evaluer_surface"),
+        ("labels", "_evaluer_labels"),
+    )
+    
+    # Libellé du critère bloquant non respecté, par groupe
+    LIBELLES_BLOQUANTS = {
+        "localisation": "Localisation",
+        "production": "Production",
+        "statut": "Statut juridique",
+        "age": "Âge",
+        "surface": "Surface",
+    }
+    
+    # Champs du profil lus par chaque groupe : un changement de profil ne
+    # nécessite de réévaluer que les groupes dont un champ a changé
+    CHAMPS_GROUPES: Dict[str, FrozenSet[str]] = {
+        "localisation": frozenset({"region", "departement"}),
+        "production": frozenset({"productions"}),
+        "projet": frozenset({"projets_en_cours"}),
+        "statut": frozenset({"statut_juridique"}),
+        "age": frozenset({"age", "jeune_agriculteur"}),
+        "surface": frozenset({"sau_totale"}),
+        "labels": frozenset({"labels"}),
+    }
+    
+    # Champs du profil lus par l'estimation des montants (ContexteProfil)
+    CHAMPS_MONTANT = frozenset({
+        "sau_totale", "budget_projet", "nb_bovins", "nb_ovins", "nb_caprins", "nb_porcins", "nb_volailles"
+    })
+    
     def __init__(self):
         """Initialise le moteur de matching"""
-        pass
+        # Contexte d'estimation des montants du dernier profil évalué
+        self._profil_montant: Optional[ProfilAgriculteur] = None
+        self._contexte_montant: Optional[ContexteProfil] = None
     
     def calculate_match(
         self, 
         aide: AideAgricoleV2, 
-        profil: ProfilAgriculteur
+        profil: ProfilAgriculteur,
+        timings: Optional[Dict[str, float]] = None,
+        date_matching: Optional[str] = None
     ) -> ResultatMatching:
         """
         Calcule le score de matching entre une aide et un profil
         
+        Résultat validé une fois en ResultatMatching ; les handlers qui
+        sérialisent directement le résultat utilisent calculer.
+        
         Args:
             aide: L'aide agricole à évaluer
             profil: Le profil de l'agriculteur
+            timings: Si fourni, durée de chaque étape ajoutée (en secondes) par nom d'étape
+            date_matching: Horodatage partagé par les résultats d'un même matching
+                (horodatage_matching()), calculé à chaque appel sinon
             
         Returns:
             ResultatMatching avec score, détails et recommandations
         """
-        details_criteres: List[DetailCritere] = []
-        score_total = 0.0
-        criteres_bloquants_ko: List[str] = []
-        
-        # 1. Critères géographiques (25 points)
-        score_geo, detail_geo, bloquant_geo = self._evaluer_localisation(aide, profil)
-        details_criteres.extend(detail_geo)
-        if bloquant_geo:
-            criteres_bloquants_ko.append("Localisation")
-        else:
-            score_total += score_geo
-        
-        # 2. Critères de production (20 points)
-        score_prod, detail_prod, bloquant_prod = self._evaluer_production(aide, profil)
-        details_criteres.extend(detail_prod)
-        if bloquant_prod:
-            criteres_bloquants_ko.append("Production")
-        else:
-            score_total += score_prod
-        
-        # 3. Critères de projet (15 points)
-        score_projet, detail_projet = self._evaluer_projet(aide, profil)
-        details_criteres.extend(detail_projet)
-        score_total += score_projet
-        
-        # 4. Critères de statut juridique (10 points)
-        score_statut, detail_statut, bloquant_statut = self._evaluer_statut(aide, profil)
-        details_criteres.extend(detail_statut)
-        if bloquant_statut:
-            criteres_bloquants_ko.append("Statut juridique")
-        else:
-            score_total += score_statut
-        
-        # 5. Critères d'âge (10 points)
-        score_age, detail_age, bloquant_age = self._evaluer_age(aide, profil)
-        details_criteres.extend(detail_age)
-        if bloquant_age:
-            criteres_bloquants_ko.append("Âge")
-        else:
-            score_total += score_age
+        return ResultatMatching.model_validate(
+            self.calculer(aide, profil, timings=timings, date_matching=date_matching)
+        )
+    
+    def calculer(
+        self,
+        aide: AideAgricoleV2,
+        profil: ProfilAgriculteur,
+        timings: Optional[Dict[str, float]] = None,
+        date_matching: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Résultat brut (dictionnaire aux champs de ResultatMatching), sans validation"""
+        evaluations = self.evaluer_groupes(aide, profil, timings=timings)
+        return self.assembler(aide, profil, evaluations, timings=timings, date_matching=date_matching)
+    
+    def evaluer_groupes(
+        self,
+        aide: AideAgricoleV2,
+        profil: ProfilAgriculteur,
+        groupes: Optional[Iterable[str]] = None,
+        timings: Optional[Dict[str, float]] = None
+    ) -> Dict[str, EvaluationGroupe]:
+        """
+        Évalue les groupes de critères (tous par défaut) d'une aide pour un profil
         
-        # 6. Critères de surface (10 points)
-        score_surface, detail_surface, bloquant_surface = self._evaluer_surface(aide, profil)
-        details_criteres.extend(detail_surface)
-        if bloquant_surface:
-            criteres_bloquants_ko.append("Surface")
-        else:
-            score_total += score_surface
+        Returns:
+            {groupe: (score, détails, bloquant)} dans l'ordre de GROUPES
+        """
+        t = time.perf_counter() if timings is not None else 0.0
+        evaluations = {}
+        for nom, methode in self.GROUPES:
+            if groupes is not None and nom not in groupes:
+                continue
+            evaluations[nom] = getattr(self, methode)(aide, profil)
+            if timings is not None:
+                t = self._chrono(timings, nom, t)
+        return evaluations
+    
+    def assembler(
+        self,
+        aide: AideAgricoleV2,
+        profil: ProfilAgriculteur,
+        evaluations: Dict[str, EvaluationGroupe],
+        timings: Optional[Dict[str, float]] = None,
+        date_matching: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Construit le résultat brut à partir des évaluations de tous les groupes
         
-        # 7. Critères de labels (10 points)
-        score_labels, detail_labels = self._evaluer_labels(aide, profil)
-        details_criteres.extend(detail_labels)
-        score_total += score_labels
+        Les évaluations peuvent provenir de profils différents tant que chaque
+        groupe a été évalué avec des valeurs identiques à celles de `profil`
+        pour ses champs (CHAMPS_GROUPES) : c'est ce qui permet le recalcul partiel.
+        """
+        t = time.perf_counter() if timings is not None else 0.0
+        details_criteres: List[Detail] = []
+        criteres_bloquants_ko: List[str] = []
+        score_total = 0.0
+        for nom, _ in self.GROUPES:
+            score, details, bloquant = evaluations[nom]
+            details_criteres.extend(details)
+            if bloquant:
+                criteres_bloquants_ko.append(self.LIBELLES_BLOQUANTS[nom])
+            else:
+                score_total += score
         
         # Calcul du score final
         score_final = min(100.0, max(0.0, score_total))
@@ -115,36 +228,67 @@ class MatchingEngine:
         eligible = score_final >= self.SEUIL_ELIGIBILITE and not criteres_bloquants_ko
         
         # Comptage des critères
-        criteres_valides = sum(1 for d in details_criteres if d.valide)
+        criteres_valides = sum(1 for d in details_criteres if d['valide'])
         criteres_total = len(details_criteres)
         
         # Estimation du montant
         montant_min, montant_max = self._estimer_montant(aide, profil)
+        if timings is not None:
+            t = self._chrono(timings, "montant", t)
         
         # Génération du résumé et recommandations
         resume = self._generer_resume(eligible, score_final, criteres_bloquants_ko)
         recommandations = self._generer_recommandations(aide, profil, details_criteres, criteres_bloquants_ko)
-        
-        return ResultatMatching(
-            aide_id=aide.aid_id,
-            profil_id=profil.profil_id,
-            score=score_final,
-            eligible=eligible,
-            details_criteres=details_criteres,
-            criteres_valides=criteres_valides,
-            criteres_total=criteres_total,
-            criteres_bloquants_ko=criteres_bloquants_ko,
-            montant_estime_min=montant_min,
-            montant_estime_max=montant_max,
-            resume=resume,
-            recommandations=recommandations
-        )
+        if timings is not None:
+            t = self._chrono(timings, "recommandations", t)
+        
+        resultat = {
+            'aide_id': aide.aid_id,
+            'profil_id': profil.profil_id,
+            'score': round(float(score_final), 2),
+            'eligible': eligible,
+            'details_criteres': details_criteres,
+            'criteres_valides': criteres_valides,
+            'criteres_total': criteres_total,
+            'criteres_bloquants_ko': criteres_bloquants_ko,
+            'montant_estime_min': _float_or_none(montant_min),
+            'montant_estime_max': _float_or_none(montant_max),
+            'resume': resume,
+            'recommandations': recommandations,
+            'date_matching': date_matching or horodatage_matching(),
+        }
+        if timings is not None:
+            self._chrono(timings, "resultat", t)
+        return resultat
+    
+    def score_evaluations(self, evaluations: Dict[str, EvaluationGroupe]) -> Tuple[float, bool]:
+        """Score final et éligibilité des évaluations, sans construire de résultat"""
+        score_total = 0.0
+        for score, _, bloquant in evaluations.values():
+            if bloquant:
+                return 0.0, False
+            score_total += score
+        score_final = min(100.0, max(0.0, score_total))
+        return score_final, score_final >= self.SEUIL_ELIGIBILITE
+    
+    @classmethod
+    def groupes_concernes(cls, champs: Iterable[str]) -> List[str]:
+        """Groupes de critères qui lisent au moins un des champs du profil"""
+        champs = set(champs)
+        return [nom for nom, _ in cls.GROUPES if champs & cls.CHAMPS_GROUPES[nom]]
+    
+    @staticmethod
+    def _chrono(timings: Dict[str, float], etape: str, debut: float) -> float:
+        """Ajoute la durée écoulée depuis `debut` à l'étape et retourne l'instant courant"""
+        maintenant = time.perf_counter()
+        timings[etape] = timings.get(etape, 0.0) + (maintenant - debut)
+        return maintenant
     
     def _evaluer_localisation(
         self, 
         aide: AideAgricoleV2, 
         profil: ProfilAgriculteur
-    ) -> Tuple[float, List[DetailCritere], bool]:
+    ) -> EvaluationGroupe:
         """Évalue les critères géographiques"""
         details = []
         score = 0.0
@@ -155,7 +299,7 @@ class MatchingEngine:
         
         # Si pas de restriction géographique, points automatiques
         if not regions and not departements:
-            details.append(DetailCritere(
+            details.append(_detail(
                 nom="Localisation",
                 valide=True,
                 bloquant=False,
@@ -174,7 +318,7 @@ class MatchingEngine:
                 region_ok = True
             
             if region_ok:
-                details.append(DetailCritere(
+                details.append(_detail(
                     nom="Région",
                     valide=True,
                     bloquant=True,
@@ -184,7 +328,7 @@ class MatchingEngine:
                 ))
                 score += self.POIDS_LOCALISATION * 0.7
             else:
-                details.append(DetailCritere(
+                details.append(_detail(
                     nom="Région",
                     valide=False,
                     bloquant=True,
@@ -198,7 +342,7 @@ class MatchingEngine:
         if departements and profil.departement:
             dept_ok = profil.departement in departements
             if dept_ok:
-                details.append(DetailCritere(
+                details.append(_detail(
                     nom="Département",
                     valide=True,
                     bloquant=True,
@@ -208,7 +352,7 @@ class MatchingEngine:
                 ))
                 score += self.POIDS_LOCALISATION * 0.3
             else:
-                details.append(DetailCritere(
+                details.append(_detail(
                     nom="Département",
                     valide=False,
                     bloquant=True,
@@ -220,7 +364,7 @@ class MatchingEngine:
         elif not departements and regions:
             # Pas de restriction de département, bonus si région OK
             if region_ok:
-                details.append(DetailCritere(
+                details.append(_detail(
                     nom="Département",
                     valide=True,
                     bloquant=False,
@@ -236,7 +380,7 @@ class MatchingEngine:
         self, 
         aide: AideAgricoleV2, 
         profil: ProfilAgriculteur
-    ) -> Tuple[float, List[DetailCritere], bool]:
+    ) -> EvaluationGroupe:
         """Évalue les critères de production"""
         details = []
         score = 0.0
@@ -246,7 +390,7 @@ class MatchingEngine:
         
         # Si pas de restriction de production
         if not types_prod:
-            details.append(DetailCritere(
+            details.append(_detail(
                 nom="Type de production",
                 valide=True,
                 bloquant=False,
@@ -260,7 +404,7 @@ class MatchingEngine:
         correspondances = [p for p in profil.productions if p in types_prod]
         
         if correspondances:
-            details.append(DetailCritere(
+            details.append(_detail(
                 nom="Type de production",
                 valide=True,
                 bloquant=True,
@@ -272,7 +416,7 @@ class MatchingEngine:
         else:
             prod_requises = ', '.join([p.value for p in types_prod])
             prod_profil = ', '.join([p.value for p in profil.productions]) if profil.productions else "Aucune"
-            details.append(DetailCritere(
+            details.append(_detail(
                 nom="Type de production",
                 valide=False,
                 bloquant=True,
@@ -288,7 +432,7 @@ class MatchingEngine:
         self, 
         aide: AideAgricoleV2, 
         profil: ProfilAgriculteur
-    ) -> Tuple[float, List[DetailCritere]]:
+    ) -> EvaluationGroupe:
         """Évalue les critères de projet (non bloquant)"""
         details = []
         score = 0.0
@@ -297,7 +441,7 @@ class MatchingEngine:
         
         # Si pas de restriction de projet
         if not types_projet:
-            details.append(DetailCritere(
+            details.append(_detail(
                 nom="Type de projet",
                 valide=True,
                 bloquant=False,
@@ -305,13 +449,13 @@ class MatchingEngine:
                 points_max=self.POIDS_PROJET,
                 explication="✅ Tous types de projets acceptés"
             ))
-            return self.POIDS_PROJET, details
+            return self.POIDS_PROJET, details, False
         
         # Vérification correspondance
         correspondances = [p for p in profil.projets_en_cours if p in types_projet]
         
         if correspondances:
-            details.append(DetailCritere(
+            details.append(_detail(
                 nom="Type de projet",
                 valide=True,
                 bloquant=False,
@@ -322,7 +466,7 @@ class MatchingEngine:
             score = self.POIDS_PROJET
         else:
             projets_requis = ', '.join([p.value for p in types_projet])
-            details.append(DetailCritere(
+            details.append(_detail(
                 nom="Type de projet",
                 valide=False,
                 bloquant=False,
@@ -331,13 +475,13 @@ class MatchingEngine:
                 explication=f"⚠️ Projets suggérés: {projets_requis}"
             ))
         
-        return score, details
+        return score, details, False
     
     def _evaluer_statut(
         self, 
         aide: AideAgricoleV2, 
         profil: ProfilAgriculteur
-    ) -> Tuple[float, List[DetailCritere], bool]:
+    ) -> EvaluationGroupe:
         """Évalue le statut juridique"""
         details = []
         score = 0.0
@@ -347,7 +491,7 @@ class MatchingEngine:
         
         # Si pas de restriction
         if not statuts_acceptes:
-            details.append(DetailCritere(
+            details.append(_detail(
                 nom="Statut juridique",
                 valide=True,
                 bloquant=False,
@@ -359,7 +503,7 @@ class MatchingEngine:
         
         # Vérification
         if profil.statut_juridique in statuts_acceptes:
-            details.append(DetailCritere(
+            details.append(_detail(
                 nom="Statut juridique",
                 valide=True,
                 bloquant=True,
@@ -370,7 +514,7 @@ class MatchingEngine:
             score = self.POIDS_STATUT
         else:
             statuts_str = ', '.join([s.value for s in statuts_acceptes])
-            details.append(DetailCritere(
+            details.append(_detail(
                 nom="Statut juridique",
                 valide=False,
                 bloquant=True,
@@ -386,7 +530,7 @@ class MatchingEngine:
         self, 
         aide: AideAgricoleV2, 
         profil: ProfilAgriculteur
-    ) -> Tuple[float, List[DetailCritere], bool]:
+    ) -> EvaluationGroupe:
         """Évalue les critères d'âge"""
         details = []
         score = 0.0
@@ -398,7 +542,7 @@ class MatchingEngine:
         
         # Si pas de restriction d'âge
         if age_min is None and age_max is None and jeune_requis is None:
-            details.append(DetailCritere(
+            details.append(_detail(
                 nom="Âge",
                 valide=True,
                 bloquant=False,
@@ -410,7 +554,7 @@ class MatchingEngine:
         
         # Si l'âge n'est pas renseigné dans le profil
         if profil.age is None and (age_min or age_max or jeune_requis):
-            details.append(DetailCritere(
+            details.append(_detail(
                 nom="Âge",
                 valide=False,
                 bloquant=False,
@@ -423,7 +567,7 @@ class MatchingEngine:
         # Vérification jeune agriculteur
         if jeune_requis is True:
             if profil.jeune_agriculteur:
-                details.append(DetailCritere(
+                details.append(_detail(
                     nom="Jeune agriculteur",
                     valide=True,
                     bloquant=True,
@@ -433,7 +577,7 @@ class MatchingEngine:
                 ))
                 score = self.POIDS_AGE
             else:
-                details.append(DetailCritere(
+                details.append(_detail(
                     nom="Jeune agriculteur",
                     valide=False,
                     bloquant=True,
@@ -463,7 +607,7 @@ class MatchingEngine:
                 explication_parts.append(f"âge > {age_max} ans maximum ❌")
         
         if age_ok:
-            details.append(DetailCritere(
+            details.append(_detail(
                 nom="Âge",
                 valide=True,
                 bloquant=True,
@@ -473,7 +617,7 @@ class MatchingEngine:
             ))
             score = self.POIDS_AGE
         else:
-            details.append(DetailCritere(
+            details.append(_detail(
                 nom="Âge",
                 valide=False,
                 bloquant=True,
@@ -489,7 +633,7 @@ class MatchingEngine:
         self, 
         aide: AideAgricoleV2, 
         profil: ProfilAgriculteur
-    ) -> Tuple[float, List[DetailCritere], bool]:
+    ) -> EvaluationGroupe:
         """Évalue les critères de surface"""
         details = []
         score = 0.0
@@ -500,7 +644,7 @@ class MatchingEngine:
         
         # Si pas de restriction
         if surf_min is None and surf_max is None:
-            details.append(DetailCritere(
+            details.append(_detail(
                 nom="Surface",
                 valide=True,
                 bloquant=False,
@@ -528,7 +672,7 @@ class MatchingEngine:
                 explication_parts.append(f"SAU > {surf_max} ha maximum ❌")
         
         if surface_ok:
-            details.append(DetailCritere(
+            details.append(_detail(
                 nom="Surface",
                 valide=True,
                 bloquant=True,
@@ -538,7 +682,7 @@ class MatchingEngine:
             ))
             score = self.POIDS_SURFACE
         else:
-            details.append(DetailCritere(
+            details.append(_detail(
                 nom="Surface",
                 valide=False,
                 bloquant=True,
@@ -554,7 +698,7 @@ class MatchingEngine:
         self, 
         aide: AideAgricoleV2, 
         profil: ProfilAgriculteur
-    ) -> Tuple[float, List[DetailCritere]]:
+    ) -> EvaluationGroupe:
         """Évalue les labels (non bloquant, bonus)"""
         details = []
         score = 0.0
@@ -566,7 +710,7 @@ class MatchingEngine:
         if labels_requis:
             labels_ok = all(label in profil.labels for label in labels_requis)
             if labels_ok:
-                details.append(DetailCritere(
+                details.append(_detail(
                     nom="Labels requis",
                     valide=True,
                     bloquant=False,
@@ -577,7 +721,7 @@ class MatchingEngine:
                 score += self.POIDS_LABELS * 0.6
             else:
                 labels_manquants = [l for l in labels_requis if l not in profil.labels]
-                details.append(DetailCritere(
+                details.append(_detail(
                     nom="Labels requis",
                     valide=False,
                     bloquant=False,
@@ -595,7 +739,7 @@ class MatchingEngine:
             if labels_bonus_profil:
                 ratio = len(labels_bonus_profil) / len(labels_bonus)
                 points = self.POIDS_LABELS * 0.4 * ratio
-                details.append(DetailCritere(
+                details.append(_detail(
                     nom="Labels bonus",
                     valide=True,
                     bloquant=False,
@@ -608,28 +752,23 @@ class MatchingEngine:
             # Pas de labels bonus, points automatiques
             score += self.POIDS_LABELS * 0.4
         
-        return score, details
+        return score, details, False
     
     def _estimer_montant(
         self, 
         aide: AideAgricoleV2, 
         profil: ProfilAgriculteur
     ) -> Tuple[Optional[float], Optional[float]]:
-        """Estime le montant de l'aide pour le profil"""
-        montant = aide.montant
-        
-        montant_min = montant.montant_min
-        montant_max = montant.montant_max
-        
-        # Calcul selon le type de montant
-        if montant.type_montant == "Surface" and montant.montant_par_unite:
-            # Calcul basé sur la surface
-            montant_estime = montant.montant_par_unite * profil.sau_totale
-            if montant.plafond:
-                montant_estime = min(montant_estime, montant.plafond)
-            return montant_estime, montant_estime
+        """
+        Estime le montant de l'aide pour le profil
         
-        return montant_min, montant_max
+        Estimateur compilé selon le type de montant (voir montant_estimators),
+        contexte profil réutilisé tant que le même profil est évalué
+        """
+        if profil is not self._profil_montant:
+            self._profil_montant = profil
+            self._contexte_montant = ContexteProfil(profil)
+        return compiler_estimateur(aide)(self._contexte_montant)
     
     def _generer_resume(
         self, 
@@ -650,7 +789,7 @@ class MatchingEngine:
         self, 
         aide: AideAgricoleV2, 
         profil: ProfilAgriculteur,
-        details_criteres: List[DetailCritere],
+        details_criteres: List[Detail],
         criteres_bloquants_ko: List[str]
     ) -> List[str]:
         """Génère des recommandations pour améliorer l'éligibilité"""
@@ -658,25 +797,25 @@ class MatchingEngine:
         
         # Recommandations basées sur les critères non validés
         for detail in details_criteres:
-            if not detail.valide and detail.bloquant:
-                if "Région" in detail.nom or "Département" in detail.nom:
+            if not detail['valide'] and detail['bloquant']:
+                if "Région" in detail['nom'] or "Département" in detail['nom']:
                     recommandations.append("Cette aide n'est pas disponible dans votre zone géographique")
-                elif "production" in detail.nom.lower():
+                elif "production" in detail['nom'].lower():
                     recommandations.append("Votre type de production n'est pas éligible pour cette aide")
-                elif "Statut" in detail.nom:
+                elif "Statut" in detail['nom']:
                     recommandations.append("Votre statut juridique ne correspond pas aux critères requis")
-                elif "Âge" in detail.nom or "Jeune" in detail.nom:
+                elif "Âge" in detail['nom'] or "Jeune" in detail['nom']:
                     recommandations.append("Vérifiez les critères d'âge pour cette aide")
-                elif "Surface" in detail.nom:
+                elif "Surface" in detail['nom']:
                     recommandations.append("Votre surface agricole ne correspond pas aux critères requis")
         
         # Recommandations pour améliorer le score
         if not criteres_bloquants_ko:
             for detail in details_criteres:
-                if not detail.valide and not detail.bloquant:
-                    if "projet" in detail.nom.lower():
+                if not detail['valide'] and not detail['bloquant']:
+                    if "projet" in detail['nom'].lower():
                         recommandations.append("Envisagez un projet correspondant aux types soutenus par cette aide")
-                    elif "label" in detail.nom.lower():
+                    elif "label" in detail['nom'].lower():
                         recommandations.append("Obtenez les labels requis pour maximiser vos chances")
         
         # Si aucune recommandation spécifique
@@ -703,15 +842,15 @@ class MatchingEngine:
             Liste des meilleurs résultats de matching, triés par score
         """
         resultats = []
+        date_matching = horodatage_matching()
         
         for aide in aides:
             try:
-                resultat = self.calculate_match(aide, profil)
-                resultats.append(resultat)
+                resultats.append(self.calculer(aide, profil, date_matching=date_matching))
             except Exception as e:
                 logger.error(f"Erreur lors du matching pour aide {aide.aid_id}: {e}")
         
-        # Tri par score décroissant, puis par éligibilité
-        resultats.sort(key=lambda r: (r.eligible, r.score), reverse=True)
+        # Tri par score décroissant, puis par éligibilité ; seuls les retenus sont validés
+        resultats.sort(key=lambda r: (r['eligible'], r['score']), reverse=True)
         
-        return resultats[:top_n]
+        return [ResultatMatching.model_validate(r) for r in resultats[:top_n]]
@@ -0,0 +1,423 @@
+"""
+Harnais de test différentiel du matching
+Compare MatchingEngine.calculate_match (référence) à un moteur alternatif
+(index, cache, vectorisation...) sur de grands ensembles aléatoires aides × profils
+
+Une optimisation n'est acceptable que si score, éligibilité, critères bloquants
+et montants estimés sont identiques. La première divergence est réduite à un
+reproducteur minimal (critères et champs du profil ramenés à leurs valeurs par défaut).
+
+Référence figée : matching_golden.json.gz contient un corpus aides × profils et les
+résultats du moteur d'origine (avant optimisations). Un moteur est comparé à ces
+résultats, et non à lui-même ; le mode --live compare au moteur courant sur un
+corpus aléatoire plus grand.
+
+Usage:
+    python matching_equivalence.py --candidate module:fabrique --strict
+    python matching_equivalence.py --candidate module:fabrique --live --aides 2000 --profils 200
+    python matching_equivalence.py --write-golden   # depuis l'arbre du moteur de référence
+"""
+
+import argparse
+import gzip
+import importlib
+import json
+import logging
+import random
+import sys
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from benchmark_data import generate_aides, generate_profils
+from matching_engine import MatchingEngine
+from models_v2 import AideAgricoleV2, CriteresEligibilite, MontantAide, ProfilAgriculteur, ResultatMatching
+
+logger = logging.getLogger(__name__)
+
+# Champs qui doivent être strictement identiques
+COMPARED_FIELDS = ("score", "eligible", "criteres_bloquants_ko", "montant_estime_min", "montant_estime_max")
+
+# Champs comparés en plus en mode strict (explications)
+STRICT_FIELDS = ("criteres_valides", "criteres_total", "details_criteres", "resume", "recommandations")
+
+# Champs du profil qui ne sont jamais réduits (requis ou sans effet sur le matching)
+_PROFIL_FIXED = {"profil_id", "region", "departement", "statut_juridique", "sau_totale", "created_at", "updated_at"}
+
+# Corpus et résultats de référence (moteur d'origine)
+GOLDEN_PATH = Path(__file__).parent / 'matching_golden.json.gz'
+GOLDEN_AIDES = 150
+GOLDEN_PROFILS = 5
+GOLDEN_SEED = 5
+
+MatchFunction = Callable[[AideAgricoleV2, ProfilAgriculteur], Union[ResultatMatching, Dict[str, Any]]]
+
+
+def _as_dict(result: Union[ResultatMatching, Dict[str, Any]]) -> Dict[str, Any]:
+    return result.model_dump() if isinstance(result, ResultatMatching) else dict(result)
+
+
+def diff_results(
+    reference: Union[ResultatMatching, Dict[str, Any]],
+    candidate: Union[ResultatMatching, Dict[str, Any]],
+    strict: bool = False
+) -> Dict[str, Tuple[Any, Any]]:
+    """
+    Différences entre deux résultats (champ -> (référence, candidat))
+
+    Vérifie aussi les invariants du candidat : score arrondi comme
+    ResultatMatching.score_valide (2 décimales) et éligibilité cohérente.
+    """
+    ref = _as_dict(reference)
+    cand = _as_dict(candidate)
+    fields = COMPARED_FIELDS + (STRICT_FIELDS if strict else ())
+
+    differences = {}
+    for field in fields:
+        if ref.get(field) != cand.get(field):
+            differences[field] = (ref.get(field), cand.get(field))
+
+    score = cand.get("score")
+    if not isinstance(score, float):
+        differences["score_type"] = ("float", type(score).__name__)
+    elif round(score, 2) != score:
+        differences["score_arrondi"] = (round(score, 2), score)
+
+    attendu = (
+        isinstance(score, (int, float))
+        and score >= MatchingEngine.SEUIL_ELIGIBILITE
+        and not cand.get("criteres_bloquants_ko")
+    )
+    if cand.get("eligible") != attendu:
+        differences["eligible_coherence"] = (attendu, cand.get("eligible"))
+
+    return differences
+
+
+class Divergence:
+    """Une paire aide × profil sur laquelle les moteurs divergent"""
+
+    def __init__(self, aide: AideAgricoleV2, profil: ProfilAgriculteur, differences: Dict[str, Tuple[Any, Any]]):
+        self.aide = aide
+        self.profil = profil
+        self.differences = differences
+
+    def reproducer(self) -> Dict[str, Any]:
+        """Entrées minimales (critères et montant de l'aide, valeurs non par défaut) et différences"""
+        return {
+            "aide": {
+                "aid_id": self.aide.aid_id,
+                **self.aide.model_dump(mode="json", exclude_defaults=True, include={"criteres", "montant"}),
+            },
+            "profil": self.profil.model_dump(
+                mode="json", exclude_defaults=True, exclude={"profil_id", "created_at", "updated_at"}
+            ),
+            "differences": {
+                field: {"reference": ref, "candidat": cand}
+                for field, (ref, cand) in self.differences.items()
+            },
+        }
+
+    def __str__(self) -> str:
+        return json.dumps(self.reproducer(), indent=2, ensure_ascii=False, default=str)
+
+
+class EquivalenceReport:
+    """Résultat d'une campagne de comparaison"""
+
+    def __init__(self):
+        self.comparisons = 0
+        self.divergences: List[Divergence] = []
+        self.errors: List[str] = []
+
+    @property
+    def ok(self) -> bool:
+        return not self.divergences and not self.errors
+
+    def summary(self) -> str:
+        if self.ok:
+            return f"✅ {self.comparisons} comparaisons, aucune divergence"
+        lines = [f"❌ {len(self.divergences)} divergence(s), {len(self.errors)} erreur(s) sur {self.comparisons} comparaisons"]
+        if self.divergences:
+            lines.append("Première divergence (réduite) :")
+            lines.append(str(self.divergences[0]))
+        lines.extend(self.errors[:5])
+        return "\n".join(lines)
+
+
+# ============ RÉDUCTION ============
+
+def _default(model_cls, field: str) -> Any:
+    return model_cls.model_fields[field].get_default(call_default_factory=True)
+
+
+def _candidates_aide(aide: AideAgricoleV2):
+    """Variantes plus simples de l'aide (un champ ramené au défaut ou une liste raccourcie)"""
+    for sub, model_cls in (("criteres", CriteresEligibilite), ("montant", MontantAide)):
+        current = getattr(aide, sub)
+        for field in model_cls.model_fields:
+            value = getattr(current, field)
+            default = _default(model_cls, field)
+            if value == default:
+                continue
+            yield aide.model_copy(update={sub: current.model_copy(update={field: default})})
+            if isinstance(value, list) and len(value) > 1:
+                for i in range(len(value)):
+                    shorter = value[:i] + value[i + 1:]
+                    yield aide.model_copy(update={sub: current.model_copy(update={field: shorter})})
+
+
+def _candidates_profil(profil: ProfilAgriculteur):
+    """Variantes plus simples du profil"""
+    for field in ProfilAgriculteur.model_fields:
+        if field in _PROFIL_FIXED:
+            continue
+        value = getattr(profil, field)
+        default = _default(ProfilAgriculteur, field)
+        if value == default:
+            continue
+        yield profil.model_copy(update={field: default})
+        if isinstance(value, list) and len(value) > 1:
+            for i in range(len(value)):
+                yield profil.model_copy(update={field: value[:i] + value[i + 1:]})
+
+
+def minimize(
+    aide: AideAgricoleV2,
+    profil: ProfilAgriculteur,
+    still_diverges: Callable[[AideAgricoleV2, ProfilAgriculteur], bool],
+    max_steps: int = 500
+) -> Tuple[AideAgricoleV2, ProfilAgriculteur]:
+    """
+    Réduction gloutonne : applique toute simplification qui conserve la divergence,
+    jusqu'à ce qu'aucune ne s'applique
+    """
+    steps = 0
+    changed = True
+    while changed and steps < max_steps:
+        changed = False
+        for simpler in _candidates_aide(aide):
+            steps += 1
+            if still_diverges(simpler, profil):
+                aide, changed = simpler, True
+                break
+        if changed:
+            continue
+        for simpler in _candidates_profil(profil):
+            steps += 1
+            if still_diverges(aide, simpler):
+                profil, changed = simpler, True
+                break
+    return aide, profil
+
+
+# ============ CAMPAGNE ============
+
+def edge_profils(profils: List[ProfilAgriculteur], seed: int = 0) -> List[ProfilAgriculteur]:
+    """Variantes aux limites (âge inconnu, SAU nulle, listes vides, département absent)"""
+    rng = random.Random(seed)
+    variants = []
+    for profil in profils:
+        variants.append(profil.model_copy(update=rng.choice([
+            {"age": None},
+            {"sau_totale": 0.0, "sau_bio": 0.0},
+            {"productions": [], "projets_en_cours": []},
+            {"departement": ""},
+            {"labels": [], "label_bio": False},
+            {"age": 40, "jeune_agriculteur": True},
+        ])))
+    return variants
+
+
+def run_equivalence(
+    candidate: MatchFunction,
+    aides: List[AideAgricoleV2],
+    profils: List[ProfilAgriculteur],
+    reference: Optional[MatchFunction] = None,
+    strict: bool = False,
+    max_divergences: int = 1,
+    reduce: bool = True
+) -> EquivalenceReport:
+    """
+    Compare `candidate` à la référence sur toutes les paires aides × profils
+
+    Args:
+        candidate: Fonction (aide, profil) -> ResultatMatching ou dict
+        aides, profils: Jeux de données
+        reference: Par défaut MatchingEngine().calculate_match (moteur courant ;
+            run_golden compare au moteur d'origine)
+        strict: Compare aussi détails, résumé et recommandations
+        max_divergences: Arrêt après ce nombre de divergences
+        reduce: Réduit la première divergence à un reproducteur minimal
+    """
+    reference = reference or MatchingEngine().calculate_match
+    report = EquivalenceReport()
+
+    def differences(aide, profil) -> Dict[str, Tuple[Any, Any]]:
+        return diff_results(reference(aide, profil), candidate(aide, profil), strict=strict)
+
+    for profil in profils:
+        for aide in aides:
+            report.comparisons += 1
+            try:
+                diff = differences(aide, profil)
+            except Exception as e:
+                report.errors.append(f"{aide.aid_id} × {profil.profil_id}: {type(e).__name__}: {e}")
+                if len(report.errors) >= max_divergences:
+                    return report
+                continue
+            if not diff:
+                continue
+
+            if reduce and not report.divergences:
+                def still_diverges(a, p):
+                    try:
+                        return bool(differences(a, p))
+                    except Exception:
+                        return False
+                aide, profil_min = minimize(aide, profil, still_diverges)
+                diff = differences(aide, profil_min)
+                report.divergences.append(Divergence(aide, profil_min, diff))
+            else:
+                report.divergences.append(Divergence(aide, profil, diff))
+
+            if len(report.divergences) >= max_divergences:
+                return report
+    return report
+
+
+# ============ RÉFÉRENCE FIGÉE ============
+
+def _json(result: Union[ResultatMatching, Dict[str, Any]]) -> Dict[str, Any]:
+    """Champs comparés, sous leur forme JSON (enums en valeurs, tuples en listes)"""
+    result = _as_dict(result)
+    return json.loads(json.dumps(
+        {field: result.get(field) for field in COMPARED_FIELDS + STRICT_FIELDS}, ensure_ascii=False, default=str
+    ))
+
+
+def golden_corpus(
+    aides: int = GOLDEN_AIDES,
+    profils: int = GOLDEN_PROFILS,
+    seed: int = GOLDEN_SEED
+) -> Tuple[List[AideAgricoleV2], List[ProfilAgriculteur]]:
+    """Corpus de référence : aides et profils générés, variantes aux limites comprises"""
+    corpus_profils = generate_profils(profils, seed=seed + 1)
+    corpus_profils += edge_profils(corpus_profils, seed=seed + 2)
+    # Les variantes gardent le profil_id de leur profil : identifiants propres au corpus
+    corpus_profils = [p.model_copy(update={"profil_id": f"GOLDEN-{i}"}) for i, p in enumerate(corpus_profils)]
+    return generate_aides(aides, seed=seed), corpus_profils
+
+
+def write_golden(
+    path: Path = GOLDEN_PATH,
+    reference: Optional[MatchFunction] = None,
+    aides: Optional[List[AideAgricoleV2]] = None,
+    profils: Optional[List[ProfilAgriculteur]] = None
+) -> int:
+    """
+    Enregistre le corpus et les résultats de `reference` (à lancer avec le moteur d'origine)
+
+    Returns:
+        Nombre de résultats enregistrés
+    """
+    reference = reference or MatchingEngine().calculate_match
+    if aides is None or profils is None:
+        aides, profils = golden_corpus()
+    golden = {
+        "aides": [a.model_dump(mode="json", exclude={"raw_data"}) for a in aides],
+        "profils": [p.model_dump(mode="json") for p in profils],
+        "resultats": [[_json(reference(a, p)) for a in aides] for p in profils],
+    }
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        json.dump(golden, f, ensure_ascii=False, separators=(",", ":"))
+    return len(aides) * len(profils)
+
+
+def load_golden(path: Path = GOLDEN_PATH) -> Tuple[List[AideAgricoleV2], List[ProfilAgriculteur], MatchFunction]:
+    """Corpus enregistré et fonction de référence qui relit les résultats enregistrés"""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        golden = json.load(f)
+    aides = [AideAgricoleV2(**a) for a in golden["aides"]]
+    profils = [ProfilAgriculteur(**p) for p in golden["profils"]]
+    resultats = {
+        (aide.aid_id, profil.profil_id): resultat
+        for profil, ligne in zip(profils, golden["resultats"])
+        for aide, resultat in zip(aides, ligne)
+    }
+
+    def reference(aide: AideAgricoleV2, profil: ProfilAgriculteur) -> Dict[str, Any]:
+        return resultats[(aide.aid_id, profil.profil_id)]
+
+    return aides, profils, reference
+
+
+def run_golden(
+    candidate: MatchFunction,
+    path: Path = GOLDEN_PATH,
+    strict: bool = False,
+    max_divergences: int = 1
+) -> EquivalenceReport:
+    """
+    Compare `candidate` aux résultats enregistrés du moteur d'origine
+
+    Sans réduction : la référence ne connaît que les paires enregistrées.
+    """
+    aides, profils, reference = load_golden(path)
+    return run_equivalence(
+        lambda aide, profil: _json(candidate(aide, profil)), aides, profils,
+        reference=reference, strict=strict, max_divergences=max_divergences, reduce=False
+    )
+
+
+def load_candidate(spec: str) -> MatchFunction:
+    """
+    Charge un moteur candidat depuis 'module:attribut'
+
+    L'attribut peut être une classe de moteur (instanciée sans argument), un objet
+    avec calculate_match ou une fonction (aide, profil).
+    """
+    module_name, _, attr = spec.partition(":")
+    target = getattr(importlib.import_module(module_name), attr or "MatchingEngine")
+    if isinstance(target, type):
+        target = target()
+    return target.calculate_match if hasattr(target, "calculate_match") else target
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test différentiel du matching")
+    parser.add_argument("--candidate", default="matching_engine:MatchingEngine", help="module:attribut")
+    parser.add_argument("--aides", type=int, default=1000)
+    parser.add_argument("--profils", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--strict", action="store_true", help="Compare aussi les explications")
+    parser.add_argument("--max-divergences", type=int, default=1)
+    parser.add_argument("--golden", type=Path, default=GOLDEN_PATH, help="Résultats de référence")
+    parser.add_argument("--live", action="store_true", help="Référence = moteur courant, corpus aléatoire")
+    parser.add_argument("--write-golden", action="store_true", help="Enregistre la référence avec --candidate")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    if args.write_golden:
+        count = write_golden(args.golden, load_candidate(args.candidate))
+        print(f"💾 {count} résultats de référence enregistrés dans {args.golden}")
+        return 0
+
+    if args.live:
+        aides = generate_aides(args.aides, seed=args.seed)
+        profils = generate_profils(args.profils, seed=args.seed + 1)
+        profils += edge_profils(profils, seed=args.seed + 2)
+        report = run_equivalence(
+            load_candidate(args.candidate), aides, profils,
+            strict=args.strict, max_divergences=args.max_divergences
+        )
+    else:
+        report = run_golden(
+            load_candidate(args.candidate), args.golden,
+            strict=args.strict, max_divergences=args.max_divergences
+        )
+    print(report.summary())
+    return 0 if report.ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
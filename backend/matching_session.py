@@ -0,0 +1,196 @@
+"""
+Sessions de matching : re-scoring incrémental quand le profil change
+Le questionnaire modifie une réponse à la fois : la session garde, pour chaque
+aide, l'évaluation de chaque groupe de critères (MatchingEngine.evaluer_groupes).
+Une modification du profil ne réévalue que les groupes qui lisent les champs
+modifiés (MatchingEngine.CHAMPS_GROUPES) et ne réassemble que les résultats
+dont une évaluation (ou le montant estimé) a changé.
+
+Les sessions sont en mémoire, par worker, indexées par profil_id et expirent
+après MATCHING_SESSION_TTL_S secondes d'inactivité. Une session inconnue du
+worker (expirée, autre worker) est simplement recréée par le client.
+"""
+
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from matching_engine import EvaluationGroupe, MatchingEngine, horodatage_matching, serialiser_resultat
+from models_v2 import AideAgricoleV2, ProfilAgriculteur, ResultatMatching
+from montant_estimators import sommer_estimations
+from what_if import CHAMPS_NON_MODIFIABLES, champs_modifies
+
+logger = logging.getLogger(__name__)
+
+MATCHING_SESSION_TTL_S = float(os.environ.get('MATCHING_SESSION_TTL_S', '1800'))
+MATCHING_SESSION_MAX = int(os.environ.get('MATCHING_SESSION_MAX', '1000'))
+
+
+def resultat_enrichi(resultat: Union[ResultatMatching, Dict[str, Any]], aide: AideAgricoleV2) -> Dict[str, Any]:
+    """Résultat sérialisé enrichi des informations de l'aide (format de /matching)"""
+    resultat_dict = serialiser_resultat(resultat)
+    resultat_dict['aide'] = {
+        'aid_id': aide.aid_id,
+        'titre': aide.titre,
+        'description': aide.description,
+        'url': aide.source_url or aide.lien_officiel,
+        'type_aide': aide.tags[:3] if aide.tags else [],
+        'organisme': aide.organisme,
+        'source': aide.source
+    }
+    return resultat_dict
+
+
+def statistiques_matching(resultats: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """Comptages par catégorie et montant total estimé des aides éligibles"""
+    eligibles = [r for r in resultats if r['eligible']]
+    montant_total_min, montant_total_max = sommer_estimations(
+        (r['montant_estime_min'], r['montant_estime_max']) for r in eligibles
+    )
+    return {
+        "total_aides": len(resultats),
+        "aides_eligibles": len(eligibles),
+        "aides_quasi_eligibles": sum(1 for r in resultats if not r['eligible'] and r['score'] >= 40),
+        "aides_non_eligibles": sum(1 for r in resultats if r['score'] < 40),
+        "montant_total_estime_min": round(montant_total_min, 2),
+        "montant_total_estime_max": round(montant_total_max, 2),
+    }
+
+
+def _meme_evaluation(ancienne: EvaluationGroupe, nouvelle: EvaluationGroupe) -> bool:
+    """Évaluations identiques (score, bloquant, détails et explications)"""
+    return ancienne == nouvelle
+
+
+class SessionMatching:
+    """État du matching d'un profil : évaluations par aide et par groupe, résultats"""
+
+    def __init__(self, profil: ProfilAgriculteur, aides: Sequence[AideAgricoleV2],
+                 version_catalogue: int = 0, engine: Optional[MatchingEngine] = None):
+        self.engine = engine or MatchingEngine()
+        self.profil = profil
+        self.dernier_acces = time.monotonic()
+        self.recharger(aides, version_catalogue)
+
+    @property
+    def profil_id(self) -> str:
+        return self.profil.profil_id
+
+    def recharger(self, aides: Sequence[AideAgricoleV2], version_catalogue: int) -> None:
+        """Évaluation complète du catalogue (création, nouvelle version du catalogue)"""
+        self.aides = list(aides)
+        self.version_catalogue = version_catalogue
+        self.evaluations = [self.engine.evaluer_groupes(aide, self.profil) for aide in self.aides]
+        self._assembler()
+
+    def appliquer(self, modifications: Dict[str, Any]) -> List[str]:
+        """
+        Applique des modifications (champ V2 → nouvelle valeur) au profil
+
+        Returns:
+            Groupes de critères réévalués
+
+        Raises:
+            ValueError: champ inconnu ou non modifiable, profil modifié invalide
+        """
+        for champ in modifications:
+            if champ not in ProfilAgriculteur.model_fields or champ in CHAMPS_NON_MODIFIABLES:
+                raise ValueError(f"Champ de profil non modifiable: {champ}")
+        data = self.profil.model_dump()
+        data.update(modifications)
+        data['updated_at'] = horodatage_matching()
+        nouveau = ProfilAgriculteur.model_validate(data)
+
+        champs = champs_modifies(self.profil, nouveau)
+        self.profil = nouveau
+        if not champs:
+            return []
+
+        groupes = self.engine.groupes_concernes(champs)
+        if self.engine.CHAMPS_MONTANT.intersection(champs):
+            # Montants estimés modifiés : tous les résultats sont réassemblés
+            a_assembler = range(len(self.aides))
+        else:
+            a_assembler = []
+        if groupes:
+            a_recalculer = frozenset(groupes)
+            modifiees = []
+            for i, (aide, evaluation) in enumerate(zip(self.aides, self.evaluations)):
+                nouvelles = self.engine.evaluer_groupes(aide, nouveau, groupes=a_recalculer)
+                if any(not _meme_evaluation(evaluation[nom], nouvelles[nom]) for nom in nouvelles):
+                    modifiees.append(i)
+                evaluation.update(nouvelles)
+            if not a_assembler:
+                a_assembler = modifiees
+        # Seuls les résultats dont une évaluation ou le montant a changé sont réassemblés
+        self._assembler(a_assembler)
+        logger.debug(
+            f"🔁 Session {self.profil_id}: {', '.join(champs)} → groupes {groupes}, "
+            f"{len(a_assembler)} résultat(s) mis à jour"
+        )
+        return groupes
+
+    def _assembler(self, indices: Optional[Sequence[int]] = None) -> None:
+        """(Ré)assemble les résultats des aides indiquées (toutes par défaut)"""
+        date_matching = horodatage_matching()
+        if indices is None:
+            self.resultats = [None] * len(self.aides)
+            indices = range(len(self.aides))
+        for i in indices:
+            aide = self.aides[i]
+            resultat = self.engine.assembler(aide, self.profil, self.evaluations[i], date_matching=date_matching)
+            self.resultats[i] = resultat_enrichi(resultat, aide)
+
+    def reponse(self) -> Dict[str, Any]:
+        """Réponse au format de /matching (résultats triés, statistiques)"""
+        resultats = sorted(self.resultats, key=lambda x: (-x['eligible'], -x['score']))
+        return {
+            "profil_id": self.profil_id,
+            **statistiques_matching(resultats),
+            "version_catalogue": self.version_catalogue,
+            "resultats": resultats,
+        }
+
+
+class SessionStore:
+    """Sessions en mémoire (LRU borné, expiration à l'inactivité)"""
+
+    def __init__(self, ttl: float = MATCHING_SESSION_TTL_S, max_sessions: int = MATCHING_SESSION_MAX):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, SessionMatching]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def get(self, profil_id: str) -> Optional[SessionMatching]:
+        session = self._sessions.get(profil_id)
+        if session is None:
+            return None
+        maintenant = time.monotonic()
+        if maintenant - session.dernier_acces > self.ttl:
+            del self._sessions[profil_id]
+            return None
+        session.dernier_acces = maintenant
+        self._sessions.move_to_end(profil_id)
+        return session
+
+    def put(self, session: SessionMatching) -> None:
+        self._sessions[session.profil_id] = session
+        self._sessions.move_to_end(session.profil_id)
+        self._purger()
+
+    def delete(self, profil_id: str) -> bool:
+        return self._sessions.pop(profil_id, None) is not None
+
+    def _purger(self) -> None:
+        limite = time.monotonic() - self.ttl
+        for profil_id in [p for p, s in self._sessions.items() if s.dernier_acces < limite]:
+            del self._sessions[profil_id]
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+
+sessions = SessionStore()
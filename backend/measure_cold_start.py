@@ -0,0 +1,92 @@
+"""
+Mesure du cold-start de `uvicorn server:app`
+Temps entre le lancement du process et la première réponse de /api/health/live
+(et de /api/health prêt si --ready)
+
+Usage:
+    python measure_cold_start.py              # 5 lancements, liveness
+    python measure_cold_start.py --runs 10 --ready
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_for(url: str, deadline: float) -> bool:
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=0.5) as response:
+                if response.status == 200:
+                    return True
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.01)
+    return False
+
+
+def measure_once(ready: bool, timeout: float) -> dict:
+    """Lance uvicorn une fois et mesure les temps de réponse"""
+    port = _free_port()
+    env = {**os.environ}
+    if not ready:
+        env["WARMUP_ENABLED"] = "false"
+
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        base = f"http://127.0.0.1:{port}/api"
+        deadline = start + timeout
+        result = {}
+        if _wait_for(f"{base}/health/live", deadline):
+            result["live_s"] = time.perf_counter() - start
+        if ready and _wait_for(f"{base}/health", deadline):
+            result["ready_s"] = time.perf_counter() - start
+        return result
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mesure du cold-start de l'API")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--ready", action="store_true", help="Attendre aussi la fin du warm-up (MongoDB requis)")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    runs = [measure_once(args.ready, args.timeout) for _ in range(args.runs)]
+
+    summary = {"runs": runs}
+    for key in ("live_s", "ready_s"):
+        values = [r[key] for r in runs if key in r]
+        if values:
+            summary[key] = {
+                "min": round(min(values), 3),
+                "median": round(statistics.median(values), 3),
+                "max": round(max(values), 3),
+            }
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Mesure de l'effet de l'archive raw_data sur la taille des documents aides_v2
+Compare, pour un catalogue synthétique, les documents avec raw_data embarqué
+et les documents allégés (raw_hash) : taille BSON, temps de décodage de la
+collection entière, et taille de l'archive compressée.
+
+Usage:
+    python measure_raw_archive.py                     # en mémoire (bson.encode / decode_all)
+    python measure_raw_archive.py --aides 5000
+    python measure_raw_archive.py --mongo-url mongodb://localhost:27017   # find() réel
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from datetime import datetime, timezone
+
+import bson
+
+from benchmark_data import generate_aides, generate_raw_payload
+from raw_archive import RAW_ARCHIVE_CODEC, document_archive, separer_raw_data
+
+
+def construire_documents(count: int):
+    """(documents avec raw_data, documents allégés, documents d'archive)"""
+    date = datetime.now(timezone.utc).isoformat()
+    avec, sans, archives = [], [], []
+    for aide in generate_aides(count):
+        aide.raw_data = generate_raw_payload(aide)
+        doc = aide.model_dump(mode='json')
+        avec.append(dict(doc))
+        archives.append(document_archive(aide.aid_id, doc['raw_data'], date)[1])
+        separer_raw_data(doc, date)
+        sans.append(doc)
+    return avec, sans, archives
+
+
+def _chrono(fonction, repetitions: int) -> float:
+    durees = []
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        fonction()
+        durees.append(time.perf_counter() - debut)
+    return statistics.median(durees)
+
+
+def mesurer_memoire(avec, sans, archives, repetitions: int) -> dict:
+    blob_avec = b"".join(bson.encode(d) for d in avec)
+    blob_sans = b"".join(bson.encode(d) for d in sans)
+    return {
+        'bson_avec_raw_octets': len(blob_avec) // len(avec),
+        'bson_sans_raw_octets': len(blob_sans) // len(sans),
+        'archive_compressee_octets': sum(a['taille_compressee'] for a in archives) // len(archives),
+        'archive_brute_octets': sum(a['taille'] for a in archives) // len(archives),
+        'decode_avec_raw_ms': _chrono(lambda: bson.decode_all(blob_avec), repetitions) * 1000,
+        'decode_sans_raw_ms': _chrono(lambda: bson.decode_all(blob_sans), repetitions) * 1000,
+    }
+
+
+async def mesurer_mongo(url: str, avec, sans, repetitions: int) -> dict:
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    client = AsyncIOMotorClient(url)
+    db = client["measure_raw_archive"]
+    resultats = {}
+    try:
+        for nom, docs in (('avec_raw', avec), ('sans_raw', sans)):
+            collection = db[nom]
+            await collection.drop()
+            await collection.insert_many([dict(d) for d in docs])
+            durees = []
+            for _ in range(repetitions):
+                debut = time.perf_counter()
+                await collection.find({}, {'_id': 0}).to_list(length=None)
+                durees.append(time.perf_counter() - debut)
+            stats = await db.command('collStats', nom)
+            resultats[f'find_{nom}_ms'] = statistics.median(durees) * 1000
+            resultats[f'taille_{nom}_octets'] = stats['size']
+    finally:
+        await client.drop_database("measure_raw_archive")
+        client.close()
+    return resultats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Taille et temps de lecture des aides avec / sans raw_data")
+    parser.add_argument("--aides", type=int, default=2000)
+    parser.add_argument("--repetitions", type=int, default=5)
+    parser.add_argument("--mongo-url", help="Mesurer aussi un find() complet sur un MongoDB réel")
+    args = parser.parse_args()
+
+    avec, sans, archives = construire_documents(args.aides)
+    resultats = {'aides': args.aides, 'codec': RAW_ARCHIVE_CODEC}
+    resultats.update(mesurer_memoire(avec, sans, archives, args.repetitions))
+    if args.mongo_url:
+        resultats.update(asyncio.run(mesurer_mongo(args.mongo_url, avec, sans, args.repetitions)))
+
+    print(json.dumps({k: round(v, 2) if isinstance(v, float) else v for k, v in resultats.items()}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
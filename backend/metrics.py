@@ -0,0 +1,193 @@
+"""
+Instrumentation de la latence du matching
+Histogrammes par phase (handler /api/matching et étapes du MatchingEngine),
+exposés au format Prometheus sur /api/metrics et en en-tête Server-Timing
+
+Seule une fraction des requêtes est chronométrée phase par phase
+(METRICS_SAMPLE_RATE) : hors échantillon, seule la durée totale est mesurée.
+"""
+
+import bisect
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() not in ('0', 'false', 'no')
+METRICS_SAMPLE_RATE = float(os.environ.get('METRICS_SAMPLE_RATE', '0.05'))
+
+# Bornes des buckets en secondes (de 100 µs à 10 s)
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+LabelSet = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Histogramme cumulatif à buckets fixes (sémantique Prometheus)"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # dernier = +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[int]:
+        total = 0
+        result = []
+        for count in self.counts:
+            total += count
+            result.append(total)
+        return result
+
+
+class MetricsRegistry:
+    """Registre des histogrammes et compteurs du processus"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[LabelSet, Histogram]] = {}
+        self._counters: Dict[str, Dict[LabelSet, float]] = {}
+        self._help: Dict[str, str] = {}
+
+    def describe(self, name: str, help_text: str) -> None:
+        self._help[name] = help_text
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(value)
+
+    def inc(self, name: str, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + amount
+
+    def histogram(self, name: str, **labels: str) -> Optional[Histogram]:
+        return self._histograms.get(name, {}).get(tuple(sorted(labels.items())))
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def render(self) -> str:
+        """Format d'exposition texte Prometheus (version 0.0.4)"""
+        lines: List[str] = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+            for name, series in sorted(self._histograms.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for labels, histogram in sorted(series.items()):
+                    cumulative = histogram.cumulative()
+                    bounds = [_format_value(b) for b in histogram.buckets] + ["+Inf"]
+                    for bound, count in zip(bounds, cumulative):
+                        lines.append(f"{name}_bucket{_format_labels(labels + (('le', bound),))} {count}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(histogram.sum)}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: LabelSet) -> str:
+    if not labels:
+        return ""
+    inner = ",".join(f'{key}="{_escape(value)}"' for key, value in labels)
+    return "{" + inner + "}"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else f"{int(value)}"
+
+
+registry = MetricsRegistry()
+registry.describe("agrisubv_matching_requests_total", "Requêtes /api/matching par statut")
+registry.describe("agrisubv_matching_request_seconds", "Durée totale des requêtes /api/matching")
+registry.describe("agrisubv_matching_phase_seconds", "Durée des phases du handler /api/matching (échantillonné)")
+registry.describe("agrisubv_matching_engine_step_seconds", "Durée cumulée par requête des étapes du MatchingEngine (échantillonné)")
+
+
+class PhaseTimer:
+    """
+    Chronométrage d'une requête
+
+    Hors échantillon, `phase()` et `add()` ne font rien et `engine_steps`
+    vaut None : le MatchingEngine ne mesure alors pas ses étapes.
+    """
+
+    def __init__(self, sampled: bool):
+        self.sampled = sampled
+        self.start = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.engine_steps: Optional[Dict[str, float]] = {} if sampled else None
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        if not self.sampled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name: str, seconds: float) -> None:
+        if self.sampled:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def finish(self, status: str = "ok") -> float:
+        """Enregistre les mesures dans le registre et retourne la durée totale"""
+        total = time.perf_counter() - self.start
+        if not METRICS_ENABLED:
+            return total
+        registry.inc("agrisubv_matching_requests_total", status=status)
+        registry.observe("agrisubv_matching_request_seconds", total)
+        if self.sampled:
+            for name, seconds in self.phases.items():
+                registry.observe("agrisubv_matching_phase_seconds", seconds, phase=name)
+            for name, seconds in (self.engine_steps or {}).items():
+                registry.observe("agrisubv_matching_engine_step_seconds", seconds, step=name)
+        return total
+
+    def server_timing(self, total: Optional[float] = None) -> str:
+        """Valeur de l'en-tête Server-Timing (durées en ms)"""
+        entries = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.phases.items()]
+        entries += [f"engine-{name};dur={seconds * 1000:.2f}" for name, seconds in (self.engine_steps or {}).items()]
+        if total is not None:
+            entries.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(entries)
+
+
+def start_timer(force: bool = False) -> PhaseTimer:
+    """Démarre le chronométrage d'une requête (échantillonnée selon METRICS_SAMPLE_RATE)"""
+    sampled = METRICS_ENABLED and (force or random.random() < METRICS_SAMPLE_RATE)
+    return PhaseTimer(sampled)
@@ -13,9 +13,7 @@ Usage:
 
 import asyncio
 import sys
-from motor.motor_asyncio import AsyncIOMotorClient
 from typing import Dict, Any, List
-import os
 from dotenv import load_dotenv
 from pathlib import Path
 import logging
@@ -26,8 +24,8 @@ from models_v2 import (
     AideAgricoleV2, CriteresEligibilite, MontantAide,
     TypeProduction, TypeProjet, StatutJuridique, TypeMontant
 )
+from catalog_stats import recalculer_stats_legacy_sans_erreur
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 ROOT_DIR = Path(__file__).parent
@@ -303,6 +301,7 @@ class MigrationV2:
                 ]
             })
             fake_deleted_count = result.deleted_count
+            await recalculer_stats_legacy_sans_erreur(self.db)
             logger.info(f"   ✅ {fake_deleted_count} aides factices supprimées de la collection 'aides'")
         
         # Migrer seulement les aides réelles
@@ -433,6 +432,8 @@ class MigrationV2:
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    
     import argparse
     
     parser = argparse.ArgumentParser(description='Migration des aides vers le modèle V2')
@@ -449,14 +450,13 @@ if __name__ == "__main__":
             sys.exit(0)
     
     async def run_migration():
-        mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
-        client = AsyncIOMotorClient(mongo_url)
-        db = client[os.environ.get('DB_NAME', 'agrisubv_db')]
+        from database import get_db, close_client
+        db = get_db()
         
         migration = MigrationV2(db)
         result = await migration.migrate_all(clean_fake_aids=args.clean_fake_aids)
         
-        client.close()
+        close_client()
         return result
     
     result = asyncio.run(run_migration())
@@ -4,7 +4,7 @@ Version optimisée pour gérer 1000+ aides avec critères enrichis
 """
 
 from typing import List, Optional, Dict, Any
-from pydantic import BaseModel, Field, field_validator, ConfigDict
+from pydantic import BaseModel, Field, PrivateAttr, field_validator, ConfigDict
 from datetime import datetime, timezone
 from enum import Enum
 import uuid
@@ -69,6 +69,12 @@ class TypeMontant(str, Enum):
     UNITE = "Unité"
 
 
+# Tables valeur → enum (conversion en O(1) dans les validateurs et le compilateur de profils)
+PRODUCTIONS_PAR_VALEUR: Dict[str, TypeProduction] = {p.value: p for p in TypeProduction}
+PROJETS_PAR_VALEUR: Dict[str, TypeProjet] = {p.value: p for p in TypeProjet}
+STATUTS_PAR_VALEUR: Dict[str, StatutJuridique] = {s.value: s for s in StatutJuridique}
+
+
 # ============ SOUS-MODÈLES ============
 
 class CriteresEligibilite(BaseModel):
@@ -160,6 +166,10 @@ class AideAgricoleV2(BaseModel):
     
     raw_data: Optional[Dict[str, Any]] = None
 
+    # Estimateur de montant compilé (montant_estimators.compiler) : libéré avec
+    # l'aide, donc avec la version du catalogue qui la porte
+    _estimateur: Any = PrivateAttr(default=None)
+
 
 # ============ MODÈLE PROFIL AGRICULTEUR AVEC VALIDATEURS ============
 
@@ -234,10 +244,9 @@ class ProfilAgriculteur(BaseModel):
                 result.append(item)
             elif isinstance(item, str):
                 # String, on cherche l'Enum correspondant
-                for prod_enum in TypeProduction:
-                    if prod_enum.value == item:
-                        result.append(prod_enum)
-                        break
+                prod_enum = PRODUCTIONS_PAR_VALEUR.get(item)
+                if prod_enum is not None:
+                    result.append(prod_enum)
         
         return result
     
@@ -256,14 +265,28 @@ class ProfilAgriculteur(BaseModel):
                 result.append(item)
             elif isinstance(item, str):
                 # String, on cherche l'Enum correspondant
-                for proj_enum in TypeProjet:
-                    if proj_enum.value == item:
-                        result.append(proj_enum)
-                        break
+                proj_enum = PROJETS_PAR_VALEUR.get(item)
+                if proj_enum is not None:
+                    result.append(proj_enum)
         
         return result
 
 
+class ProfilAgriculteurLegacy(BaseModel):
+    """Ancien format de profil (frontend), validé avant conversion en ProfilAgriculteur"""
+    profil_id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    region: str
+    departement: Optional[str] = None
+    statut_juridique: str
+    superficie_ha: float
+    productions: List[str] = Field(default_factory=list)
+    labels: List[str] = Field(default_factory=list)
+    age_exploitant: Optional[int] = None
+    jeune_agriculteur: bool = False
+    projets: List[str] = Field(default_factory=list)
+    created_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+
+
 class DetailCritere(BaseModel):
     """Détail d'un critère de matching"""
     nom: str
@@ -0,0 +1,220 @@
+"""
+Estimation des montants d'aide pour un profil
+Un estimateur par TypeMontant, compilé une fois par aide (constantes extraites
+de MontantAide) et appliqué à un contexte profil calculé une fois par matching
+
+- Forfaitaire : montant fixe, sinon fourchette min/max
+- Pourcentage : taux_min/taux_max × budget_projet
+- Surface : montant par unité × SAU
+- Tête : montant par unité × cheptel des espèces concernées
+- Unité : fourchette min/max (pas de quantité dans le profil)
+
+Toutes les estimations sont bornées par plancher/plafond. Sans donnée
+suffisante dans le profil, la fourchette min/max de l'aide est retournée.
+"""
+
+import logging
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from models_v2 import AideAgricoleV2, MontantAide, ProfilAgriculteur, TypeMontant, TypeProduction
+
+logger = logging.getLogger(__name__)
+
+Estimation = Tuple[Optional[float], Optional[float]]
+
+# Effectifs du profil par production d'élevage (aides à la tête)
+CHEPTEL_PAR_PRODUCTION = {
+    TypeProduction.ELEVAGE_BOVIN: "nb_bovins",
+    TypeProduction.ELEVAGE_LAITIER: "nb_bovins",
+    TypeProduction.ELEVAGE_OVIN: "nb_ovins",
+    TypeProduction.ELEVAGE_CAPRIN: "nb_caprins",
+    TypeProduction.ELEVAGE_PORCIN: "nb_porcins",
+    TypeProduction.ELEVAGE_AVICOLE: "nb_volailles",
+}
+
+# Sans production d'élevage précisée : herbivores et porcins (les volailles se
+# comptent par milliers et fausseraient une aide « à la tête »)
+CHEPTEL_PAR_DEFAUT = ("nb_bovins", "nb_ovins", "nb_caprins", "nb_porcins")
+
+
+class ContexteProfil:
+    """Valeurs du profil utilisées par les estimateurs, extraites une fois par matching"""
+
+    __slots__ = ("profil_id", "sau_totale", "budget_projet", "cheptel")
+
+    def __init__(self, profil: ProfilAgriculteur):
+        self.profil_id = profil.profil_id
+        self.sau_totale = profil.sau_totale or 0.0
+        self.budget_projet = profil.budget_projet
+        self.cheptel = {
+            "nb_bovins": profil.nb_bovins,
+            "nb_ovins": profil.nb_ovins,
+            "nb_caprins": profil.nb_caprins,
+            "nb_porcins": profil.nb_porcins,
+            "nb_volailles": profil.nb_volailles,
+        }
+
+
+Estimateur = Callable[[ContexteProfil], Estimation]
+FabriqueEstimateur = Callable[[AideAgricoleV2], Estimateur]
+
+
+def _borner(montant: MontantAide) -> Callable[[Optional[float]], Optional[float]]:
+    """Bornage plancher/plafond (les bornes absentes ou nulles sont ignorées)"""
+    plancher, plafond = montant.plancher, montant.plafond
+    if not plancher and not plafond:
+        return lambda valeur: valeur
+
+    def borner(valeur: Optional[float]) -> Optional[float]:
+        if valeur is None:
+            return None
+        if plafond:
+            valeur = min(valeur, plafond)
+        if plancher:
+            valeur = max(valeur, plancher)
+        return valeur
+
+    return borner
+
+
+def _fourchette(montant: MontantAide) -> Estimation:
+    borner = _borner(montant)
+    return borner(montant.montant_min), borner(montant.montant_max)
+
+
+# ============ ESTIMATEURS PAR TYPE ============
+
+def estimateur_forfaitaire(aide: AideAgricoleV2) -> Estimateur:
+    montant = aide.montant
+    if montant.montant_fixe:
+        fixe = _borner(montant)(montant.montant_fixe)
+        estimation = (fixe, fixe)
+    else:
+        estimation = _fourchette(montant)
+    return lambda contexte: estimation
+
+
+def estimateur_pourcentage(aide: AideAgricoleV2) -> Estimateur:
+    montant = aide.montant
+    taux_min = montant.taux_min if montant.taux_min is not None else montant.taux_max
+    taux_max = montant.taux_max if montant.taux_max is not None else montant.taux_min
+    repli = _fourchette(montant)
+    if taux_min is None:
+        return lambda contexte: repli
+    borner = _borner(montant)
+    taux_min, taux_max = taux_min / 100.0, taux_max / 100.0
+
+    def estimer(contexte: ContexteProfil) -> Estimation:
+        budget = contexte.budget_projet
+        if not budget:
+            return repli
+        return borner(budget * taux_min), borner(budget * taux_max)
+
+    return estimer
+
+
+def estimateur_surface(aide: AideAgricoleV2) -> Estimateur:
+    montant = aide.montant
+    par_unite = montant.montant_par_unite
+    repli = _fourchette(montant)
+    if not par_unite:
+        return lambda contexte: repli
+    borner = _borner(montant)
+
+    def estimer(contexte: ContexteProfil) -> Estimation:
+        valeur = borner(par_unite * contexte.sau_totale)
+        return valeur, valeur
+
+    return estimer
+
+
+def estimateur_tete(aide: AideAgricoleV2) -> Estimateur:
+    montant = aide.montant
+    par_unite = montant.montant_par_unite
+    repli = _fourchette(montant)
+    if not par_unite:
+        return lambda contexte: repli
+    especes = tuple(dict.fromkeys(
+        CHEPTEL_PAR_PRODUCTION[production]
+        for production in aide.criteres.types_production
+        if production in CHEPTEL_PAR_PRODUCTION
+    )) or CHEPTEL_PAR_DEFAUT
+    borner = _borner(montant)
+
+    def estimer(contexte: ContexteProfil) -> Estimation:
+        tetes = sum(contexte.cheptel[espece] for espece in especes)
+        if not tetes:
+            return repli
+        valeur = borner(par_unite * tetes)
+        return valeur, valeur
+
+    return estimer
+
+
+def estimateur_fourchette(aide: AideAgricoleV2) -> Estimateur:
+    estimation = _fourchette(aide.montant)
+    return lambda contexte: estimation
+
+
+ESTIMATEURS: Dict[TypeMontant, FabriqueEstimateur] = {
+    TypeMontant.FORFAITAIRE: estimateur_forfaitaire,
+    TypeMontant.POURCENTAGE: estimateur_pourcentage,
+    TypeMontant.SURFACE: estimateur_surface,
+    TypeMontant.TETE: estimateur_tete,
+    TypeMontant.UNITE: estimateur_fourchette,
+}
+
+
+def enregistrer_estimateur(type_montant: TypeMontant, fabrique: FabriqueEstimateur) -> None:
+    """Remplace l'estimateur d'un type de montant (invalide les estimateurs déjà compilés)"""
+    global _generation
+    ESTIMATEURS[type_montant] = fabrique
+    _generation += 1
+
+
+# ============ COMPILATION ET ÉVALUATION ============
+
+# L'estimateur compilé est conservé sur l'aide (AideAgricoleV2._estimateur) : les aides
+# du catalogue sont des objets partagés (snapshot mémoïsé) et l'estimateur disparaît
+# avec la version qui les porte. Il est recompilé si les fabriques ont changé
+# (_generation) ou si montant/critères ont été remplacés (model_copy).
+_generation = 0
+
+
+def compiler(aide: AideAgricoleV2) -> Estimateur:
+    """Estimateur compilé de l'aide (réutilisé tant que l'objet aide vit)"""
+    entree = aide._estimateur
+    if entree is not None and entree[0] == _generation and entree[1] is aide.montant and entree[2] is aide.criteres:
+        return entree[3]
+    fabrique = ESTIMATEURS.get(aide.montant.type_montant, estimateur_fourchette)
+    estimateur = fabrique(aide)
+    aide._estimateur = (_generation, aide.montant, aide.criteres, estimateur)
+    return estimateur
+
+
+def estimer_montant(aide: AideAgricoleV2, profil: ProfilAgriculteur,
+                    contexte: Optional[ContexteProfil] = None) -> Estimation:
+    """Estimation (min, max) d'une aide pour un profil"""
+    return compiler(aide)(contexte or ContexteProfil(profil))
+
+
+def estimer_lot(aides: Iterable[AideAgricoleV2], profil: ProfilAgriculteur) -> List[Estimation]:
+    """Estimations d'un ensemble d'aides (contexte profil calculé une seule fois)"""
+    contexte = ContexteProfil(profil)
+    return [compiler(aide)(contexte) for aide in aides]
+
+
+def sommer_estimations(estimations: Iterable[Estimation]) -> Tuple[float, float]:
+    """Total (min, max) ; une borne absente compte pour 0"""
+    total_min = total_max = 0.0
+    for montant_min, montant_max in estimations:
+        if montant_min:
+            total_min += montant_min
+        if montant_max:
+            total_max += montant_max
+    return total_min, total_max
+
+
+def estimer_total(aides: Iterable[AideAgricoleV2], profil: ProfilAgriculteur) -> Tuple[float, float]:
+    """Montant total estimé d'un ensemble d'aides (ex. les aides éligibles)"""
+    return sommer_estimations(estimer_lot(aides, profil))
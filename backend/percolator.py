@@ -0,0 +1,270 @@
+"""
+Matching inverse (« percolateur ») : profils sauvegardés × aides nouvelles ou modifiées
+Les profils sauvegardés sont indexés en bitmaps (entiers Python, un bit par
+profil) sur les critères bloquants catégoriels du moteur : région,
+département, statut juridique et productions. Pour une aide, l'intersection
+des bitmaps donne les profils candidats ; seuls ceux-ci passent par
+MatchingEngine. Les aides éligibles vont dans la collection
+notifications_outbox (une notification par couple profil / aide).
+
+Une aide n'est percolée que si elle est nouvelle ou si ses critères ont
+changé (empreinte des critères stockée avec l'aide, voir import_batch). Les
+aides déjà stockées sans empreinte servent de référence : la première
+synchronisation ne notifie pas tout le catalogue.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from pymongo import UpdateOne
+
+from expiry_scheduler import est_expiree
+from live_preview import REGIONS_NATIONALES
+from matching_engine import MatchingEngine
+from models_v2 import AideAgricoleV2, ProfilAgriculteur
+
+logger = logging.getLogger(__name__)
+
+PROFILS_COLLECTION = "profils_sauvegardes"
+OUTBOX_COLLECTION = "notifications_outbox"
+
+# Champs de stockage ajoutés au profil (ignorés par ProfilAgriculteur)
+CHAMPS_STOCKAGE = ("contact", "sauvegarde_le")
+
+
+def empreinte_criteres(aide: AideAgricoleV2) -> str:
+    """Empreinte des critères d'éligibilité (change seulement si l'éligibilité peut changer)"""
+    criteres = aide.criteres.model_dump(mode='json')
+    return hashlib.sha1(json.dumps(criteres, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+
+def _indices(masque: int) -> Iterator[int]:
+    """Positions des bits à 1 (par octets : rapide sur les masques creux de 100k bits)"""
+    octets = masque.to_bytes((masque.bit_length() + 7) // 8, 'little')
+    for position, octet in enumerate(octets):
+        while octet:
+            bas = octet & -octet
+            yield position * 8 + bas.bit_length() - 1
+            octet ^= bas
+
+
+class Percolator:
+    """
+    Index des profils sauvegardés par critère bloquant
+
+    Les emplacements des profils retirés sont réutilisés : les bitmaps restent
+    de la taille du nombre de profils actifs.
+    """
+
+    def __init__(self, engine: Optional[MatchingEngine] = None):
+        self.engine = engine or MatchingEngine()
+        self.profils: List[Optional[ProfilAgriculteur]] = []
+        self.emplacements: Dict[str, int] = {}
+        self._libres: List[int] = []
+        self.tous = 0
+        self.regions: Dict[str, int] = defaultdict(int)
+        self.departements: Dict[str, int] = defaultdict(int)
+        self.departement_vide = 0
+        self.statuts: Dict[str, int] = defaultdict(int)
+        self.productions: Dict[str, int] = defaultdict(int)
+
+    def __len__(self) -> int:
+        return len(self.emplacements)
+
+    def ajouter(self, profil: ProfilAgriculteur) -> None:
+        """Indexe un profil (remplace la version précédente du même profil_id)"""
+        self.retirer(profil.profil_id)
+        i = self._libres.pop() if self._libres else len(self.profils)
+        if i == len(self.profils):
+            self.profils.append(profil)
+        else:
+            self.profils[i] = profil
+        self.emplacements[profil.profil_id] = i
+        self._basculer(profil, 1 << i)
+
+    def retirer(self, profil_id: str) -> bool:
+        i = self.emplacements.pop(profil_id, None)
+        if i is None:
+            return False
+        self._basculer(self.profils[i], 1 << i)
+        self.profils[i] = None
+        self._libres.append(i)
+        return True
+
+    def _basculer(self, profil: ProfilAgriculteur, bit: int) -> None:
+        """Ajoute ou retire (XOR) le bit du profil dans ses bitmaps"""
+        self.tous ^= bit
+        self.regions[profil.region] ^= bit
+        if profil.departement:
+            self.departements[profil.departement] ^= bit
+        else:
+            self.departement_vide ^= bit
+        self.statuts[profil.statut_juridique.value] ^= bit
+        for production in set(profil.productions):
+            self.productions[production.value] ^= bit
+
+    def candidats(self, aide: AideAgricoleV2) -> int:
+        """Profils qu'aucun critère bloquant catégoriel de l'aide n'exclut"""
+        criteres = aide.criteres
+        masque = self.tous
+
+        # Mêmes règles que MatchingEngine._evaluer_localisation
+        if criteres.regions and not any(r in criteres.regions for r in REGIONS_NATIONALES):
+            regions = 0
+            for region in criteres.regions:
+                regions |= self.regions.get(region, 0)
+            masque &= regions
+        if criteres.departements:
+            departements = self.departement_vide
+            for departement in criteres.departements:
+                departements |= self.departements.get(departement, 0)
+            masque &= departements
+
+        if criteres.statuts_juridiques:
+            statuts = 0
+            for statut in criteres.statuts_juridiques:
+                statuts |= self.statuts.get(statut.value, 0)
+            masque &= statuts
+        if criteres.types_production:
+            productions = 0
+            for production in criteres.types_production:
+                productions |= self.productions.get(production.value, 0)
+            masque &= productions
+        return masque
+
+    def percoler(self, aide: AideAgricoleV2) -> Tuple[int, List[Tuple[ProfilAgriculteur, float]]]:
+        """
+        Profils éligibles à une aide
+
+        Returns:
+            (nombre de candidats évalués, [(profil, score)])
+        """
+        engine = self.engine
+        profils = self.profils
+        candidats = 0
+        eligibles = []
+        for i in _indices(self.candidats(aide)):
+            candidats += 1
+            profil = profils[i]
+            score, eligible = engine.score_evaluations(engine.evaluer_groupes(aide, profil))
+            if eligible:
+                eligibles.append((profil, score))
+        return candidats, eligibles
+
+
+def profil_depuis_document(doc: Dict[str, Any]) -> ProfilAgriculteur:
+    return ProfilAgriculteur(**{k: v for k, v in doc.items() if k != '_id' and k not in CHAMPS_STOCKAGE})
+
+
+async def charger_percolator(db, engine: Optional[MatchingEngine] = None) -> Percolator:
+    """Percolateur de tous les profils sauvegardés"""
+    debut = time.perf_counter()
+    percolator = Percolator(engine)
+    invalides = 0
+    async for doc in db[PROFILS_COLLECTION].find({}, {'_id': 0}):
+        try:
+            percolator.ajouter(profil_depuis_document(doc))
+        except ValueError as e:
+            invalides += 1
+            logger.warning(f"⚠️  Profil sauvegardé invalide {doc.get('profil_id')}: {e}")
+    logger.info(
+        f"🔎 Percolateur chargé: {len(percolator)} profils ({invalides} invalides) "
+        f"en {time.perf_counter() - debut:.2f}s"
+    )
+    return percolator
+
+
+async def sauvegarder_profil(db, profil: ProfilAgriculteur, contact: Optional[str] = None) -> None:
+    """Enregistre (ou remplace) un profil à surveiller"""
+    doc = profil.model_dump(mode='json')
+    doc['contact'] = contact
+    doc['sauvegarde_le'] = datetime.now(timezone.utc).isoformat()
+    await db[PROFILS_COLLECTION].replace_one({'profil_id': profil.profil_id}, doc, upsert=True)
+
+
+async def supprimer_profil(db, profil_id: str) -> bool:
+    result = await db[PROFILS_COLLECTION].delete_one({'profil_id': profil_id})
+    return result.deleted_count > 0
+
+
+def notification(profil: ProfilAgriculteur, aide: AideAgricoleV2, score: float, date: str) -> UpdateOne:
+    """Notification idempotente : une seule par couple profil / aide"""
+    return UpdateOne(
+        {'profil_id': profil.profil_id, 'aid_id': aide.aid_id},
+        {'$setOnInsert': {
+            'profil_id': profil.profil_id,
+            'aid_id': aide.aid_id,
+            'titre': aide.titre,
+            'score': round(score, 2),
+            'statut': 'pending',
+            'created_at': date,
+        }},
+        upsert=True
+    )
+
+
+def notifiable(aide: AideAgricoleV2, maintenant: Optional[datetime] = None) -> bool:
+    """Aide encore ouverte aux candidatures (active, date limite non passée)"""
+    return aide.statut == 'active' and not est_expiree(aide.date_limite_depot, maintenant)
+
+
+async def percoler_aides(db, aides: Sequence[AideAgricoleV2],
+                         percolator: Optional[Percolator] = None,
+                         maintenant: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Percole des aides nouvelles ou modifiées et écrit les notifications
+
+    Chaque aide est évaluée dans un thread : la synchronisation s'exécute dans
+    le processus de l'API, dont la boucle d'événements reste disponible.
+    Les aides expirées (statut ou date limite) ne notifient personne.
+    """
+    debut = time.perf_counter()
+    maintenant = maintenant or datetime.now(timezone.utc)
+    ouvertes = [aide for aide in aides if notifiable(aide, maintenant)]
+    if percolator is None:
+        percolator = await charger_percolator(db)
+    date = maintenant.isoformat()
+    candidats = notifications = nouvelles = 0
+
+    for aide in ouvertes:
+        evalues, eligibles = await asyncio.to_thread(percolator.percoler, aide)
+        candidats += evalues
+        if eligibles:
+            operations = [notification(profil, aide, score, date) for profil, score in eligibles]
+            result = await db[OUTBOX_COLLECTION].bulk_write(operations, ordered=False)
+            notifications += len(operations)
+            nouvelles += result.upserted_count
+
+    stats = {
+        'aides': len(ouvertes),
+        'expirees': len(aides) - len(ouvertes),
+        'profils': len(percolator),
+        'candidats': candidats,
+        'eligibles': notifications,
+        'notifications': nouvelles,
+        'duration_seconds': round(time.perf_counter() - debut, 3),
+    }
+    logger.info(
+        f"🔔 Percolation: {stats['aides']} aides × {stats['profils']} profils, "
+        f"{candidats} candidats évalués, {nouvelles} nouvelles notifications"
+    )
+    return stats
+
+
+def a_percoler(aide_id: str, empreinte: str, empreintes: Dict[str, Optional[str]]) -> bool:
+    """
+    Aide nouvelle ou dont les critères ont changé
+
+    Args:
+        empreintes: aid_id → empreinte stockée (None pour une aide stockée sans empreinte)
+    """
+    if aide_id not in empreintes:
+        return True
+    stockee = empreintes[aide_id]
+    return stockee is not None and stockee != empreinte
@@ -0,0 +1,216 @@
+"""
+Compilateur de profils : réponses / payloads → ProfilAgriculteur
+Traducteur construit une fois depuis questionnaire_config.json (mapping_to_profil_v2,
+field_mapping et options des questions) : une table clé d'entrée → (champ V2,
+conversion) et des tables valeur → enum en O(1). Un seul chemin pour les trois
+formats d'entrée :
+- V2 : champs de ProfilAgriculteur
+- Legacy (frontend) : superficie_ha, age_exploitant, projets
+- Réponses brutes du questionnaire : ids des questions (types_projets, autres_labels...)
+
+Le format legacy est détecté par "superficie_ha" : il est d'abord validé par
+ProfilAgriculteurLegacy (mêmes erreurs qu'avant la compilation), puis seules ses
+clés sont lues et ses règles historiques s'appliquent (statut inconnu → Autre,
+bio déduit des labels, département "00").
+"""
+
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from models_v2 import (
+    PRODUCTIONS_PAR_VALEUR, PROJETS_PAR_VALEUR, STATUTS_PAR_VALEUR,
+    ProfilAgriculteur, ProfilAgriculteurLegacy, StatutJuridique
+)
+from questionnaire_endpoint import QuestionnaireConfigError, questionnaire_cache
+
+logger = logging.getLogger(__name__)
+
+# Clés du format legacy (ProfilAgriculteurLegacy) → champs V2
+CHAMPS_LEGACY = {
+    "profil_id": "profil_id",
+    "region": "region",
+    "departement": "departement",
+    "statut_juridique": "statut_juridique",
+    "superficie_ha": "sau_totale",
+    "productions": "productions",
+    "labels": "labels",
+    "age_exploitant": "age",
+    "jeune_agriculteur": "jeune_agriculteur",
+    "projets": "projets_en_cours",
+    "created_at": "created_at",
+}
+
+# Cibles du questionnaire qui ne sont pas des champs de ProfilAgriculteur
+ALIAS_CHAMPS = {
+    "diplome": "niveau_formation",
+    "installation_recente": "premiere_installation",
+}
+
+# Labels valant certification bio (format legacy)
+LABELS_BIO = frozenset({"agriculture biologique", "bio", "ab"})
+LABEL_BIO = "Agriculture Biologique"
+
+# Valeurs de la question label_bio
+LABEL_BIO_REPONSES = {"certifie": True, "conversion": False, "non": False}
+
+# Tables des champs à valeurs énumérées
+TABLES_ENUMS = {
+    "statut_juridique": STATUTS_PAR_VALEUR,
+    "productions": PRODUCTIONS_PAR_VALEUR,
+    "projets_en_cours": PROJETS_PAR_VALEUR,
+}
+
+Conversion = Callable[[Any], Any]
+
+
+def _convertir_liste(table: Dict[str, Any], message: str) -> Conversion:
+    def convertir(valeurs):
+        if not valeurs:
+            return []
+        if isinstance(valeurs, str):
+            valeurs = [valeurs]
+        resultat = [table[v] for v in valeurs if v in table]
+        if len(resultat) != len(valeurs):
+            logger.warning(f"⚠️  {message}: {[v for v in valeurs if v not in table]}")
+        return resultat
+    return convertir
+
+
+def _convertir_statut(valeur):
+    # Inconnu : laissé tel quel, rejeté par la validation (sauf format legacy)
+    return STATUTS_PAR_VALEUR.get(valeur, valeur)
+
+
+def _convertir_label_bio(valeur):
+    # Réponse du questionnaire (certifie / conversion / non), sinon validée par Pydantic
+    if isinstance(valeur, str) and valeur in LABEL_BIO_REPONSES:
+        return LABEL_BIO_REPONSES[valeur]
+    return valeur
+
+
+CONVERSIONS: Dict[str, Conversion] = {
+    "statut_juridique": _convertir_statut,
+    "productions": _convertir_liste(PRODUCTIONS_PAR_VALEUR, "Productions ignorées"),
+    "projets_en_cours": _convertir_liste(PROJETS_PAR_VALEUR, "Projets ignorés"),
+    "label_bio": _convertir_label_bio,
+}
+
+
+class ProfilCompiler:
+    """
+    Traducteur compilé des entrées (V2, legacy, réponses) vers ProfilAgriculteur
+
+    Attributes:
+        cles: clé d'entrée (V2 ou question) → (champ V2, conversion ou None)
+        cles_legacy: clé du format legacy → (champ V2, conversion ou None)
+        avertissements: incohérences relevées entre le questionnaire et les enums
+    """
+
+    def __init__(self, questionnaire: Optional[Dict[str, Any]] = None):
+        self.cles: Dict[str, Tuple[str, Optional[Conversion]]] = {}
+        self.cles_legacy = {cle: (champ, CONVERSIONS.get(champ)) for cle, champ in CHAMPS_LEGACY.items()}
+        self.avertissements: List[str] = []
+        champs_v2 = ProfilAgriculteur.model_fields
+
+        for champ in champs_v2:
+            self._ajouter(champ, champ)
+
+        questionnaire = questionnaire or {}
+        mapping = questionnaire.get("mapping_to_profil_v2", {})
+        for section in questionnaire.get("sections", []):
+            for question in section.get("questions", []):
+                cible = mapping.get(question["id"]) or question.get("field_mapping") or question["id"]
+                cible = ALIAS_CHAMPS.get(cible, cible)
+                if cible not in champs_v2:
+                    continue  # réponse sans champ V2 (date_conversion...)
+                self._ajouter(question["id"], cible)
+                self._verifier_options(question, cible)
+
+    def _ajouter(self, cle: str, champ: str) -> None:
+        self.cles[cle] = (champ, CONVERSIONS.get(champ))
+
+    def _verifier_options(self, question: Dict[str, Any], champ: str) -> None:
+        table = TABLES_ENUMS.get(champ)
+        if table is None:
+            return
+        for option in question.get("options", []):
+            valeur = option["value"] if isinstance(option, dict) else option
+            if valeur not in table:
+                message = f"Option '{valeur}' de la question {question['id']} sans équivalent pour {champ}"
+                self.avertissements.append(message)
+                logger.warning(f"⚠️  {message}")
+
+    def traduire(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Champs V2 convertis (enums) depuis une entrée V2, legacy ou réponses
+
+        Raises:
+            ValueError (pydantic.ValidationError): payload legacy invalide
+        """
+        legacy = "superficie_ha" in data
+        if legacy:
+            data = dict(ProfilAgriculteurLegacy.model_validate(data))
+        champs: Dict[str, Any] = {}
+        cles = self.cles_legacy if legacy else self.cles
+        for cle, valeur in data.items():
+            entree = cles.get(cle)
+            if entree is None:
+                continue
+            champ, conversion = entree
+            champs[champ] = conversion(valeur) if conversion is not None and valeur is not None else valeur
+
+        if data.get("label_bio") == "certifie":
+            # Réponse du questionnaire : la certification vaut label AB
+            labels = list(champs.get("labels") or [])
+            if LABEL_BIO not in labels:
+                labels.append(LABEL_BIO)
+            champs["labels"] = labels
+        if legacy:
+            self._regles_legacy(champs)
+        return champs
+
+    @staticmethod
+    def _regles_legacy(champs: Dict[str, Any]) -> None:
+        """Règles historiques de conversion du format frontend"""
+        statut = champs.get("statut_juridique")
+        if isinstance(statut, str) and not isinstance(statut, StatutJuridique):
+            logger.warning(f"⚠️  Statut inconnu '{statut}', utilisation de AUTRE")
+            champs["statut_juridique"] = StatutJuridique.AUTRE
+        champs["departement"] = champs.get("departement") or "00"
+        is_bio = any(
+            isinstance(label, str) and label.lower() in LABELS_BIO
+            for label in champs.get("labels") or []
+        )
+        champs["label_bio"] = is_bio
+        champs["sau_bio"] = champs.get("sau_totale") if is_bio else 0.0
+        productions = champs.get("productions") or []
+        champs["production_principale"] = productions[0] if productions else None
+        logger.info(
+            f"✅ Conversion réussie: {len(productions)} productions, "
+            f"{len(champs.get('projets_en_cours') or [])} projets"
+        )
+
+    def compile(self, data: Dict[str, Any]) -> ProfilAgriculteur:
+        """
+        ProfilAgriculteur validé depuis une entrée V2, legacy ou réponses
+
+        Raises:
+            ValueError (pydantic.ValidationError): payload legacy ou profil invalide
+        """
+        return ProfilAgriculteur(**self.traduire(data))
+
+
+# Compilateur de la configuration courante du questionnaire (config, compilateur)
+_compiler: Optional[Tuple[Optional[Dict[str, Any]], ProfilCompiler]] = None
+
+
+def get_profil_compiler() -> ProfilCompiler:
+    """Compilateur de la configuration courante (recompilé quand elle est rechargée)"""
+    global _compiler
+    try:
+        config = questionnaire_cache.current().config
+    except QuestionnaireConfigError:
+        config = None
+    if _compiler is None or _compiler[0] is not config:
+        _compiler = (config, ProfilCompiler(config))
+    return _compiler[1]
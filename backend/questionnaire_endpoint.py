@@ -1,52 +1,264 @@
 """
 Endpoint pour servir la configuration du questionnaire dynamique
 Génère le questionnaire optimal basé sur l'analyse des 507 aides
+
+La configuration est lue et validée (schéma Pydantic) une seule fois, puis
+rechargée quand le fichier change (mtime, taille). La réponse est encodée une
+fois par version et compressée une fois par encodage, servie avec un ETag fort
+et Cache-Control : les navigateurs et CDN revalident et reçoivent un 304 sans corps.
 """
 
+import hashlib
 import json
 import logging
+import os
 from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from fastapi import Request, Response
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, field_validator, model_validator
+
+from compression import COMPRESSION_MIN_SIZE, choose_encoding, compress_body
+from json_responses import FastJSONResponse
 
 logger = logging.getLogger(__name__)
 
-async def get_questionnaire_config():
-    """
-    Retourne la configuration complète du questionnaire dynamique
-    """
+CONFIG_PATH = Path(__file__).parent / "questionnaire_config.json"
+
+# Durée de fraîcheur côté client / CDN (revalidation par ETag ensuite)
+QUESTIONNAIRE_CACHE_MAX_AGE = int(os.environ.get('QUESTIONNAIRE_CACHE_MAX_AGE', '300'))
+
+TYPES_QUESTIONS = ("text", "number", "date", "select", "multiselect", "radio")
+TYPES_A_OPTIONS = ("select", "multiselect", "radio")
+
+
+# ============ SCHÉMA ============
+
+class OptionSchema(BaseModel):
+    model_config = ConfigDict(extra='allow')
+
+    value: Union[bool, int, float, str]
+    label: Optional[str] = None
+
+
+class QuestionSchema(BaseModel):
+    model_config = ConfigDict(extra='allow')
+
+    id: str
+    type: str
+    ordre: int = 0
+    required: bool = False
+    options: List[Union[OptionSchema, str]] = Field(default_factory=list)
+    field_mapping: Optional[str] = None
+    visible_if: Optional[Dict[str, Any]] = None
+
+    @field_validator('type')
+    @classmethod
+    def type_connu(cls, v):
+        if v not in TYPES_QUESTIONS:
+            raise ValueError(f"type de question inconnu: {v}")
+        return v
+
+    @model_validator(mode='after')
+    def options_presentes(self):
+        if self.type in TYPES_A_OPTIONS and not self.options:
+            raise ValueError(f"la question {self.id} ({self.type}) n'a pas d'options")
+        return self
+
+
+class SectionSchema(BaseModel):
+    model_config = ConfigDict(extra='allow')
+
+    id: str
+    titre: str
+    ordre: int = 0
+    questions: List[QuestionSchema] = Field(min_length=1)
+
+
+class QuestionnaireSchema(BaseModel):
+    """Structure attendue de questionnaire_config.json (champs supplémentaires autorisés)"""
+    model_config = ConfigDict(extra='allow')
+
+    version: str
+    sections: List[SectionSchema] = Field(min_length=1)
+    mapping_to_profil_v2: Dict[str, str] = Field(default_factory=dict)
+
+    @model_validator(mode='after')
+    def references_valides(self):
+        ids = [q.id for section in self.sections for q in section.questions]
+        doublons = sorted({i for i in ids if ids.count(i) > 1})
+        if doublons:
+            raise ValueError(f"ids de questions en double: {', '.join(doublons)}")
+        for section in self.sections:
+            for question in section.questions:
+                cible = (question.visible_if or {}).get("question_id")
+                if cible is not None and cible not in ids:
+                    raise ValueError(f"visible_if de {question.id} vers une question inconnue: {cible}")
+        return self
+
+
+class QuestionnaireConfigError(ValueError):
+    """Configuration du questionnaire illisible ou non conforme au schéma"""
+
+
+def validate_questionnaire_config(config: Dict[str, Any]) -> None:
+    """Vérifie la configuration contre QuestionnaireSchema"""
     try:
-        # Charger le fichier JSON
-        config_path = Path(__file__).parent / "questionnaire_config.json"
-        
-        if not config_path.exists():
-            logger.error("❌ Fichier questionnaire_config.json introuvable")
-            return {
-                "status": "error",
-                "message": "Configuration du questionnaire introuvable"
-            }
-        
-        with open(config_path, 'r', encoding='utf-8') as f:
-            config = json.load(f)
-        
-        logger.info("✅ Configuration du questionnaire chargée avec succès")
-        
-        return {
+        QuestionnaireSchema.model_validate(config)
+    except ValidationError as e:
+        raise QuestionnaireConfigError(f"Configuration du questionnaire invalide: {e}") from e
+
+
+def load_questionnaire_config(config_path: Path = CONFIG_PATH) -> Dict[str, Any]:
+    """Configuration du questionnaire (questionnaire_config.json)"""
+    with open(config_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def iter_questions(config: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Questions dans l'ordre d'affichage (ordre des sections puis des questions)"""
+    questions = []
+    for section in sorted(config.get("sections", []), key=lambda s: s.get("ordre", 0)):
+        for question in sorted(section.get("questions", []), key=lambda q: q.get("ordre", 0)):
+            questions.append(question)
+    return questions
+
+
+# ============ CACHE ============
+
+class QuestionnaireVersion:
+    """Une version chargée de la configuration : payload, corps encodé et ETag"""
+
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        self.questions = iter_questions(config)
+        self.payload = {
             "status": "success",
             "config": config,
             "stats": {
                 "total_sections": len(config.get("sections", [])),
-                "total_questions": sum(
-                    len(section.get("questions", []))
-                    for section in config.get("sections", [])
-                ),
+                "total_questions": len(self.questions),
                 "estimated_time_minutes": config.get("metadata", {}).get("estimated_time_minutes", 5)
             }
         }
-        
-    except Exception as e:
-        logger.error(f"❌ Erreur chargement questionnaire: {e}")
-        import traceback
+        self.body = FastJSONResponse(content=self.payload).body
+        self.etag = f'"{hashlib.sha256(self.body).hexdigest()[:32]}"'
+        self._compresses: Dict[str, bytes] = {}
+
+    def etag_for(self, encoding: Optional[str]) -> str:
+        """ETag fort propre à chaque représentation (identité, gzip, br)"""
+        return self.etag if encoding is None else f'{self.etag[:-1]}-{encoding}"'
+
+    def body_for(self, encoding: Optional[str]) -> bytes:
+        if encoding is None:
+            return self.body
+        if encoding not in self._compresses:
+            self._compresses[encoding] = compress_body(self.body, encoding)
+        return self._compresses[encoding]
+
+    def matches(self, if_none_match: str) -> bool:
+        """If-None-Match (comparaison faible) contre toutes les représentations de la version"""
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if "*" in tags:
+            return True
+        return any(tag.startswith(self.etag[:-1]) and tag.endswith('"') for tag in tags)
+
+
+class QuestionnaireCache:
+    """
+    Configuration chargée une fois, rechargée quand le fichier change
+
+    Un fichier modifié mais invalide est signalé et la version précédente
+    reste servie.
+    """
+
+    def __init__(self, path: Path = CONFIG_PATH):
+        self.path = Path(path)
+        self._version: Optional[QuestionnaireVersion] = None
+        self._signature: Optional[Tuple[int, int]] = None
+        self.error: Optional[str] = None
+
+    def current(self) -> QuestionnaireVersion:
+        try:
+            stat = os.stat(self.path)
+        except OSError as e:
+            if self._version is not None:
+                return self._version
+            raise QuestionnaireConfigError("Configuration du questionnaire introuvable") from e
+
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature != self._signature:
+            self._signature = signature
+            self._reload()
+        if self._version is None:
+            raise QuestionnaireConfigError(self.error)
+        return self._version
+
+    def _reload(self) -> None:
+        try:
+            config = load_questionnaire_config(self.path)
+            validate_questionnaire_config(config)
+        except (OSError, ValueError) as e:
+            self.error = str(e)
+            if self._version is not None:
+                logger.error(f"❌ Questionnaire modifié mais invalide, version précédente conservée: {e}")
+            else:
+                logger.error(f"❌ Erreur chargement questionnaire: {e}")
+            return
+        self._version = QuestionnaireVersion(config)
+        self.error = None
+        logger.info(
+            f"✅ Configuration du questionnaire chargée (v{config.get('version')}, "
+            f"{len(self._version.questions)} questions, ETag {self._version.etag})"
+        )
+
+
+questionnaire_cache = QuestionnaireCache()
+
+
+# ============ ENDPOINT ============
+
+def questionnaire_response(request: Request) -> Response:
+    """
+    Réponse HTTP de la configuration (GET / HEAD)
+
+    304 sans corps si If-None-Match correspond à la version courante, sinon le
+    corps pré-encodé (pré-compressé si le client l'accepte).
+    """
+    try:
+        version = questionnaire_cache.current()
+    except QuestionnaireConfigError as e:
+        return FastJSONResponse(
+            content={"status": "error", "message": str(e)},
+            headers={"Cache-Control": "no-store"}
+        )
+
+    encoding = None
+    if len(version.body) >= COMPRESSION_MIN_SIZE:
+        encoding = choose_encoding(request.headers.get("accept-encoding", ""))
+    headers = {
+        "ETag": version.etag_for(encoding),
+        "Cache-Control": f"public, max-age={QUESTIONNAIRE_CACHE_MAX_AGE}, must-revalidate",
+        "Vary": "Accept-Encoding",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and version.matches(if_none_match):
+        return Response(status_code=304, headers=headers)
+
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(content=version.body_for(encoding), media_type="application/json", headers=headers)
+
+
+async def get_questionnaire_config():
+    """
+    Retourne la configuration complète du questionnaire dynamique
+    """
+    try:
+        return questionnaire_cache.current().payload
+    except QuestionnaireConfigError as e:
         return {
             "status": "error",
-            "message": str(e),
-            "traceback": traceback.format_exc()
+            "message": str(e)
         }
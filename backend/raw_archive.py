@@ -0,0 +1,157 @@
+"""
+Archive des payloads bruts (raw_data) des aides, hors de la collection aides_v2
+Le JSON amont complet (descriptions HTML longues) n'est plus embarqué dans les
+documents chauds : il est stocké compressé (zstd si le module zstandard est
+installé, sinon zlib) dans la collection aides_raw, une version par couple
+(aid_id, empreinte du contenu). Les versions successives sont conservées pour
+l'audit ; le document aides_v2 ne garde que l'empreinte de la dernière (raw_hash).
+"""
+
+import hashlib
+import logging
+import os
+import zlib
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson
+from bson import Binary
+from pymongo import DESCENDING, UpdateMany, UpdateOne
+
+logger = logging.getLogger(__name__)
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+RAW_COLLECTION = "aides_raw"
+
+RAW_ARCHIVE_CODEC = os.environ.get('RAW_ARCHIVE_CODEC', 'zstd' if zstandard is not None else 'zlib')
+RAW_ARCHIVE_LEVEL = int(os.environ.get('RAW_ARCHIVE_LEVEL', '9'))
+
+if RAW_ARCHIVE_CODEC == 'zstd' and zstandard is None:
+    logger.warning("⚠️  zstandard non installé, archive raw_data en zlib")
+    RAW_ARCHIVE_CODEC = 'zlib'
+
+
+def contenu_canonique(raw: Dict[str, Any]) -> bytes:
+    """JSON canonique (clés triées) : même contenu, même empreinte"""
+    return orjson.dumps(raw, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+
+
+def empreinte_raw(raw: Dict[str, Any]) -> str:
+    return hashlib.sha256(contenu_canonique(raw)).hexdigest()
+
+
+def compresser(data: bytes, codec: str = RAW_ARCHIVE_CODEC, level: int = RAW_ARCHIVE_LEVEL) -> bytes:
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    if codec == 'zlib':
+        return zlib.compress(data, level)
+    raise ValueError(f"Codec inconnu: {codec}")
+
+
+def decompresser(data: bytes, codec: str) -> bytes:
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("Archive zstd illisible sans le module zstandard")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == 'zlib':
+        return zlib.decompress(data)
+    raise ValueError(f"Codec inconnu: {codec}")
+
+
+def document_archive(aid_id: str, raw: Dict[str, Any], date: str) -> Tuple[str, Dict[str, Any]]:
+    """(empreinte, document aides_raw) d'un payload brut"""
+    contenu = contenu_canonique(raw)
+    empreinte = hashlib.sha256(contenu).hexdigest()
+    compresse = compresser(contenu)
+    return empreinte, {
+        'aid_id': aid_id,
+        'raw_hash': empreinte,
+        'codec': RAW_ARCHIVE_CODEC,
+        'taille': len(contenu),
+        'taille_compressee': len(compresse),
+        'data': Binary(compresse),
+        'archive_le': date,
+    }
+
+
+def separer_raw_data(aide_dict: Dict[str, Any], date: str) -> Optional[UpdateOne]:
+    """
+    Retire raw_data du document chaud (remplacé par raw_hash)
+
+    Returns:
+        L'upsert de la version dans aides_raw (sans effet si elle existe déjà), None sans raw_data
+    """
+    raw = aide_dict.pop('raw_data', None)
+    if not raw:
+        aide_dict['raw_hash'] = None
+        return None
+    empreinte, doc = document_archive(aide_dict['aid_id'], raw, date)
+    aide_dict['raw_hash'] = empreinte
+    return UpdateOne(
+        {'aid_id': doc['aid_id'], 'raw_hash': empreinte},
+        {'$setOnInsert': doc, '$set': {'vu_le': date}},
+        upsert=True
+    )
+
+
+async def archiver(db, operations: List[UpdateOne]) -> int:
+    """Écrit les versions brutes ; renvoie le nombre de nouvelles versions"""
+    if not operations:
+        return 0
+    result = await db[RAW_COLLECTION].bulk_write(operations, ordered=False)
+    return result.upserted_count
+
+
+def lire_document(doc: Dict[str, Any]) -> Dict[str, Any]:
+    return orjson.loads(decompresser(bytes(doc['data']), doc['codec']))
+
+
+async def raw_data_aide(db, aid_id: str, raw_hash: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Payload brut d'une aide (dernière version archivée par défaut)"""
+    filtre = {'aid_id': aid_id}
+    if raw_hash is not None:
+        filtre['raw_hash'] = raw_hash
+    doc = await db[RAW_COLLECTION].find_one(filtre, sort=[('archive_le', DESCENDING)])
+    return lire_document(doc) if doc is not None else None
+
+
+async def versions_aide(db, aid_id: str) -> List[Dict[str, Any]]:
+    """Historique des versions brutes d'une aide (sans les données), la plus récente d'abord"""
+    curseur = db[RAW_COLLECTION].find(
+        {'aid_id': aid_id}, {'_id': 0, 'data': 0}
+    ).sort('archive_le', DESCENDING)
+    return await curseur.to_list(length=None)
+
+
+async def migrer_raw_data(db, batch_size: int = 200) -> Dict[str, int]:
+    """
+    Déplace les raw_data encore embarqués dans aides_v2 vers aides_raw
+
+    Idempotent : les documents déjà migrés n'ont plus de champ raw_data.
+    """
+    date = datetime.now(timezone.utc).isoformat()
+    migrees = versions = 0
+    while True:
+        docs = await db.aides_v2.find(
+            {'raw_data': {'$exists': True}}, {'_id': 0, 'aid_id': 1, 'raw_data': 1}
+        ).to_list(length=batch_size)
+        if not docs:
+            break
+        archives, maj = [], []
+        for doc in docs:
+            operation = separer_raw_data(doc, date)
+            if operation is not None:
+                archives.append(operation)
+            maj.append(UpdateMany(
+                {'aid_id': doc['aid_id'], 'raw_data': {'$exists': True}},
+                {'$set': {'raw_hash': doc['raw_hash']}, '$unset': {'raw_data': ''}}
+            ))
+        versions += await archiver(db, archives)
+        await db.aides_v2.bulk_write(maj, ordered=False)
+        migrees += len(docs)
+        logger.info(f"   📦 {migrees} aides migrées vers {RAW_COLLECTION}")
+    return {'aides': migrees, 'versions': versions}
@@ -5,14 +5,13 @@ Usage: python run_migration.py
 
 import asyncio
 import sys
-import os
 from pathlib import Path
-from motor.motor_asyncio import AsyncIOMotorClient
 from dotenv import load_dotenv
 import logging
 
 # Importer la classe de migration
 from migrate_to_v2 import MigrationV2
+from database import DB_NAME, get_db, close_client
 
 logging.basicConfig(
     level=logging.INFO,
@@ -33,14 +32,10 @@ async def main():
     
     try:
         # Connexion MongoDB
-        mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
-        db_name = os.environ.get('DB_NAME', 'agrisubv_db')
-        
         logger.info(f"\n📡 Connexion à MongoDB...")
-        logger.info(f"   Database: {db_name}")
+        logger.info(f"   Database: {DB_NAME}")
         
-        client = AsyncIOMotorClient(mongo_url)
-        db = client[db_name]
+        db = get_db()
         
         # Vérifier la connexion
         await db.command('ping')
@@ -122,7 +117,7 @@ async def main():
             return_code = 1
         
         # Fermeture connexion
-        client.close()
+        close_client()
         logger.info("\n👋 Connexion MongoDB fermée")
         
         return return_code
@@ -1,13 +1,15 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import asyncio
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 import uuid
+import time
 from datetime import datetime, timezone
 
 # ============ CONFIGURATION LOGGER (DÉPLACÉ EN PREMIER) ============
@@ -18,29 +20,44 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Imports pour matching V2
-from matching_engine import MatchingEngine
+from matching_engine import MatchingEngine, horodatage_matching
 from models_v2 import (
     ProfilAgriculteur,
-    ResultatMatching, 
-    AideAgricoleV2,
-    StatutJuridique,
-    TypeProduction,
-    TypeProjet
+    ProfilAgriculteurLegacy,
 )
 
-# Import exploration, export et analyse Aides-Territoires
-from explore_aides_endpoint import explore_aides_territoires_handler
-from export_aides_endpoint import export_aides_handler
-from analyze_criteria_endpoint import analyze_criteria_handler
-from questionnaire_endpoint import get_questionnaire_config
+# Les handlers admin (exploration, export, analyse) et les modules de synchronisation
+# sont importés à la première utilisation : ils tirent httpx, aiohttp et requests,
+# inutiles au démarrage (scale-from-zero)
+from questionnaire_endpoint import questionnaire_cache, questionnaire_response, QuestionnaireConfigError
+from profile_compiler import get_profil_compiler
+from live_preview import apercu_options, index_catalogue
+from catalog_snapshot import load_catalog, publish_catalog_snapshot, get_snapshot_store
+from catalog_stats import (
+    HISTORY_COLLECTION, historique, lire_stats, lire_stats_legacy, recalculer_stats, recalculer_stats_legacy,
+    recalculer_stats_legacy_sans_erreur, vue_stats,
+)
+from warmup import warmup_state, run_warmup, WARMUP_ENABLED
+from expiry_scheduler import ExpiryScheduler, EXPIRY_SCHEDULER_ENABLED
+from http_cache import get_http_cache
+from raw_archive import RAW_COLLECTION, migrer_raw_data, raw_data_aide, versions_aide
+from metrics import registry, start_timer
+from json_responses import FastJSONResponse, respond
+from compression import CompressionMiddleware
+from what_if import WhatIfRequest, analyser_scenarios
+from matching_session import SessionMatching, resultat_enrichi, sessions as matching_sessions, statistiques_matching
+from percolator import OUTBOX_COLLECTION, PROFILS_COLLECTION, sauvegarder_profil, supprimer_profil
+from database import get_client, get_db, get_matching_db, get_pool_stats, pool_stats, close_client
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ.get('DB_NAME', 'agrisubv_db')]
+# MongoDB connection (pool, timeouts et read preference configurés dans database.py)
+client = get_client()
+db = get_db()
+# Lectures du matching par requête : secondaires autorisés (MONGO_MATCHING_READ_PREFERENCE).
+# Le snapshot du catalogue (load_catalog) est toujours construit depuis le primaire (db).
+matching_db = get_matching_db()
 
 # Create the main app
 app = FastAPI(title="AgriSubv API", version="1.0.0")
@@ -93,134 +110,17 @@ class AssistantRequest(BaseModel):
 
 # ============ ADAPTATEUR POUR ANCIEN FORMAT ============
 
-class ProfilAgriculteurLegacy(BaseModel):
-    """Ancien format de profil (pour compatibilité frontend)"""
-    profil_id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    region: str
-    departement: Optional[str] = None
-    statut_juridique: str
-    superficie_ha: float
-    productions: List[str] = Field(default_factory=list)
-    labels: List[str] = Field(default_factory=list)
-    age_exploitant: Optional[int] = None
-    jeune_agriculteur: bool = False
-    projets: List[str] = Field(default_factory=list)
-    created_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
-
-
 def convert_legacy_to_v2(legacy: ProfilAgriculteurLegacy) -> ProfilAgriculteur:
     """
     Convertit l'ancien format (frontend) en format V2 (backend)
     
-    Transformations principales :
+    Transformations principales (tables compilées, voir profile_compiler) :
     - superficie_ha → sau_totale
-    - statut_juridique (string) → StatutJuridique (Enum)
+    - statut_juridique (string) → StatutJuridique (Enum), Autre si inconnu
     - productions (List[str]) → productions (List[TypeProduction])
     - projets (List[str]) → projets_en_cours (List[TypeProjet])
     """
-    
-    # Mapping direct String → Enum (pas de string intermédiaire)
-    statut_mapping = {
-        "Exploitation individuelle": StatutJuridique.INDIVIDUEL,
-        "EARL": StatutJuridique.EARL,
-        "GAEC": StatutJuridique.GAEC,
-        "SCEA": StatutJuridique.SCEA,
-        "SA": StatutJuridique.SA,
-        "CUMA": StatutJuridique.CUMA,
-        "Coopérative": StatutJuridique.COOPERATIVE,
-        "GIE": StatutJuridique.GIE,
-        "Autre": StatutJuridique.AUTRE
-    }
-    
-    # Mapping productions String → Enum DIRECT
-    production_mapping = {
-        "Céréales": TypeProduction.CEREALES,
-        "Maraîchage": TypeProduction.MARAICHAGE,
-        "Viticulture": TypeProduction.VITICULTURE,
-        "Arboriculture": TypeProduction.ARBORICULTURE,
-        "Élevage bovin": TypeProduction.ELEVAGE_BOVIN,
-        "Élevage ovin": TypeProduction.ELEVAGE_OVIN,
-        "Élevage caprin": TypeProduction.ELEVAGE_CAPRIN,
-        "Élevage porcin": TypeProduction.ELEVAGE_PORCIN,
-        "Élevage avicole": TypeProduction.ELEVAGE_AVICOLE,
-        "Élevage laitier": TypeProduction.ELEVAGE_LAITIER,
-        "Grandes cultures": TypeProduction.GRANDES_CULTURES,
-        "Horticulture": TypeProduction.HORTICULTURE,
-        "Apiculture": TypeProduction.APICULTURE,
-        "Aquaculture": TypeProduction.AQUACULTURE
-    }
-    
-    # Mapping projets String → Enum DIRECT
-    projet_mapping = {
-        "Installation": TypeProjet.INSTALLATION,
-        "Conversion bio": TypeProjet.CONVERSION_BIO,
-        "Modernisation": TypeProjet.MODERNISATION,
-        "Diversification": TypeProjet.DIVERSIFICATION,
-        "Irrigation": TypeProjet.IRRIGATION,
-        "Bâtiment": TypeProjet.BATIMENT,
-        "Matériel": TypeProjet.MATERIEL,
-        "Énergie": TypeProjet.ENERGIE,
-        "Environnement": TypeProjet.ENVIRONNEMENT,
-        "Formation": TypeProjet.FORMATION,
-        "Commercialisation": TypeProjet.COMMERCIALISATION,
-        "Numérique": TypeProjet.NUMERIQUE,
-        "Bien-être animal": TypeProjet.BIEN_ETRE_ANIMAL
-    }
-    
-    # Convertir statut
-    statut = statut_mapping.get(legacy.statut_juridique, StatutJuridique.AUTRE)
-    if legacy.statut_juridique not in statut_mapping:
-        logger.warning(f"⚠️  Statut inconnu '{legacy.statut_juridique}', utilisation de AUTRE")
-    
-    # Convertir productions (list comprehension filtrée)
-    productions_v2 = [
-        production_mapping[prod] 
-        for prod in legacy.productions 
-        if prod in production_mapping
-    ]
-    
-    # Logger les productions ignorées
-    ignored_prods = [p for p in legacy.productions if p not in production_mapping]
-    if ignored_prods:
-        logger.warning(f"⚠️  Productions ignorées: {ignored_prods}")
-    
-    # Convertir projets (list comprehension filtrée)
-    projets_v2 = [
-        projet_mapping[proj] 
-        for proj in legacy.projets 
-        if proj in projet_mapping
-    ]
-    
-    # Logger les projets ignorés
-    ignored_projs = [p for p in legacy.projets if p not in projet_mapping]
-    if ignored_projs:
-        logger.warning(f"⚠️  Projets ignorés: {ignored_projs}")
-    
-    # Déterminer si bio
-    is_bio = any(
-        label.lower() in ["agriculture biologique", "bio", "ab"] 
-        for label in legacy.labels
-    )
-    
-    logger.info(f"✅ Conversion réussie: {len(productions_v2)} productions, {len(projets_v2)} projets")
-    
-    # Créer le profil V2 avec tous les champs requis
-    return ProfilAgriculteur(
-        profil_id=legacy.profil_id,
-        region=legacy.region,
-        departement=legacy.departement or "00",
-        statut_juridique=statut,
-        sau_totale=legacy.superficie_ha,
-        sau_bio=legacy.superficie_ha if is_bio else 0.0,
-        productions=productions_v2,
-        production_principale=productions_v2[0] if productions_v2 else None,
-        age=legacy.age_exploitant,
-        jeune_agriculteur=legacy.jeune_agriculteur,
-        labels=legacy.labels,
-        label_bio=is_bio,
-        projets_en_cours=projets_v2,
-        created_at=legacy.created_at
-    )
+    return get_profil_compiler().compile(dict(legacy))
 
 # ============ LOGIQUE ELIGIBILITE (ancienne API) ============ 
 
@@ -334,6 +234,14 @@ async def generate_ia_summary(aide: AideAgricole, profil: Dict[str, Any], eligib
     else:
         return f"❌ Non éligible pour le moment. Vérifiez les critères manquants."
 
+def parse_profil(profil_data: Dict[str, Any]) -> ProfilAgriculteur:
+    """Profil V2 depuis un payload V2, legacy (frontend, détecté par "superficie_ha") ou des réponses au questionnaire"""
+    if "superficie_ha" in profil_data:
+        logger.info("🔄 Détection format LEGACY (frontend), conversion en V2...")
+    else:
+        logger.info("✅ Format V2 détecté directement")
+    return get_profil_compiler().compile(profil_data)
+
 # ============ ENDPOINTS ============ 
 
 @api_router.get("/")
@@ -342,9 +250,23 @@ async def root():
 
 @api_router.get("/health")
 async def health():
-    return {"status": "ok", "version": "1.0.0", "timestamp": datetime.now(timezone.utc).isoformat()}
+    """Readiness : 503 tant que le warm-up n'est pas terminé"""
+    payload = {
+        "status": "ok" if warmup_state.ready else "warming",
+        "version": "1.0.0",
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "warmup": warmup_state.as_dict()
+    }
+    if not warmup_state.ready:
+        return JSONResponse(status_code=503, content=payload)
+    return payload
+
+@api_router.get("/health/live")
+async def health_live():
+    """Liveness : le process répond, indépendamment du warm-up"""
+    return {"status": "ok", "timestamp": datetime.now(timezone.utc).isoformat()}
 
-@api_router.get("/aides", response_model=List[AideAgricole])
+@api_router.get("/aides", response_model=List[AideAgricole], response_class=FastJSONResponse)
 async def get_aides(
     region: Optional[str] = None,
     departement: Optional[str] = None,
@@ -400,11 +322,11 @@ async def get_aides(
     aides_cursor = db.aides.find(query).skip(skip).limit(limit)
     aides = await aides_cursor.to_list(length=limit)
     
-    return [AideAgricole(**aide) for aide in aides]
+    return respond([AideAgricole(**aide) for aide in aides])
 
-@api_router.post("/eligibilite", response_model=EligibiliteResponse)
+@api_router.post("/eligibilite", response_model=EligibiliteResponse, response_class=FastJSONResponse)
 async def check_eligibilite(profil: Dict[str, Any]):
-    aides_cursor = db.aides.find({"expiree": False})
+    aides_cursor = matching_db.aides.find({"expiree": False})
     aides = await aides_cursor.to_list(length=500)
     
     resultats = []
@@ -426,44 +348,44 @@ async def check_eligibilite(profil: Dict[str, Any]):
     resultats.sort(key=lambda x: (not x.eligible, -x.score_pertinence))
     eligibles = [r for r in resultats if r.eligible]
     
-    return EligibiliteResponse(
-        profil=profil,
-        aides_eligibles=resultats,
-        total_aides=len(resultats),
-        total_eligibles=len(eligibles)
-    )
+    # Résultats déjà validés : encodés directement, sans revalidation par response_model
+    return respond({
+        "profil": profil,
+        "aides_eligibles": resultats,
+        "total_aides": len(resultats),
+        "total_eligibles": len(eligibles)
+    })
 
 # ============ MATCHING V2 INTELLIGENT ============
 
-@api_router.post("/matching")
-async def calculate_matching_v2(profil_data: Dict[str, Any]):
+@api_router.post("/matching", response_class=FastJSONResponse)
+async def calculate_matching_v2(profil_data: Dict[str, Any], timing: bool = False):
     """
     Matching intelligent V2 - Accepte ancien et nouveau format
     
     Détection automatique du format :
     - Si "superficie_ha" présent → ancien format (conversion automatique)
     - Si "sau_totale" présent → nouveau format V2 (direct)
+    
+    Les phases sont chronométrées sur une fraction des requêtes (METRICS_SAMPLE_RATE)
+    ou à la demande avec ?timing=true ; elles sont alors renvoyées en Server-Timing.
     """
+    timer = start_timer(force=timing)
     try:
         # Détecter le format
-        if "superficie_ha" in profil_data:
-            logger.info("🔄 Détection format LEGACY (frontend), conversion en V2...")
-            legacy_profil = ProfilAgriculteurLegacy(**profil_data)
-            profil = convert_legacy_to_v2(legacy_profil)
-            logger.info(f"✅ Conversion réussie")
-        else:
-            logger.info("✅ Format V2 détecté directement")
-            profil = ProfilAgriculteur(**profil_data)
+        with timer.phase("profil"):
+            profil = parse_profil(profil_data)
         
         logger.info(f"🎯 Matching V2 pour: {profil.region}, {profil.statut_juridique.value}")
         
-        # Récupérer toutes les aides V2 actives
-        aides_cursor = db.aides_v2.find({"statut": "active"})
-        aides = await aides_cursor.to_list(length=5000)
+        # Catalogue des aides V2 actives (snapshot mappé en mémoire, partagé entre workers)
+        with timer.phase("catalogue"):
+            catalog = await load_catalog(db)
+            aides = catalog.load_aides()
         
         if not aides:
             logger.warning("⚠️  Aucune aide V2 trouvée dans la base")
-            return {
+            return _matching_response(timer, {
                 "profil_id": profil.profil_id,
                 "total_aides": 0,
                 "aides_eligibles": 0,
@@ -472,78 +394,58 @@ async def calculate_matching_v2(profil_data: Dict[str, Any]):
                 "montant_total_estime_min": 0,
                 "montant_total_estime_max": 0,
                 "resultats": []
-            }
+            })
         
-        logger.info(f"   📊 {len(aides)} aides V2 trouvées")
+        logger.info(f"   📊 {len(aides)} aides V2 (catalogue v{catalog.version})")
         
-        # Créer le matching engine
+        # Créer le matching engine (un seul horodatage pour tous les résultats)
         engine = MatchingEngine()
+        date_matching = horodatage_matching()
         
         # Calculer le matching pour chaque aide
-                # Calculer le matching pour chaque aide
         resultats = []
-        for aide_data in aides:
+        perf_counter = time.perf_counter
+        for aide in aides:
             try:
-                aide = AideAgricoleV2(**aide_data)
-                resultat = engine.calculate_match(aide, profil)
+                t0 = perf_counter()
+                resultat = engine.calculer(
+                    aide, profil, timings=timer.engine_steps, date_matching=date_matching
+                )
+                t1 = perf_counter()
                 
                 # ✅ ENRICHIR le résultat avec les infos complètes de l'aide
-                resultat_dict = resultat.model_dump()
-                resultat_dict['aide'] = {
-                    'aid_id': aide.aid_id,
-                    'titre': aide.titre,
-                    'description': aide.description,
-                    'url': aide.source_url or aide.lien_officiel,
-                    'type_aide': aide.tags[:3] if aide.tags else [],
-                    'organisme': aide.organisme,
-                    'source': aide.source
-                }
-                
-                resultats.append(resultat_dict)
+                resultats.append(resultat_enrichi(resultat, aide))
+                timer.add("calculate_match", t1 - t0)
+                timer.add("serialisation", perf_counter() - t1)
                 
             except Exception as e:
-                logger.error(f"   ❌ Erreur matching aide {aide_data.get('aid_id')}: {e}")
+                logger.error(f"   ❌ Erreur matching aide {aide.aid_id}: {e}")
                 continue
         
-        # Trier par score décroissant
-        resultats.sort(key=lambda x: (-x.eligible, -x.score))
+        # Trier par score décroissant (les résultats sont des dicts après sérialisation)
+        with timer.phase("tri"):
+            resultats.sort(key=lambda x: (-x['eligible'], -x['score']))
         
         # Statistiques globales
-        aides_eligibles = [r for r in resultats if r.eligible]
-        aides_quasi_eligibles = [r for r in resultats if not r.eligible and r.score >= 40]
-        aides_non_eligibles = [r for r in resultats if r.score < 40]
-        
-        # Calcul du montant total estimé
-        montant_total_min = sum(
-            r.montant_estime_min or 0 
-            for r in aides_eligibles 
-            if r.montant_estime_min
-        )
-        montant_total_max = sum(
-            r.montant_estime_max or 0 
-            for r in aides_eligibles 
-            if r.montant_estime_max
-        )
+        # Montant total estimé sur les aides éligibles (estimations par type de montant)
+        with timer.phase("statistiques"):
+            stats = statistiques_matching(resultats)
         
         logger.info(f"   ✅ Matching terminé:")
-        logger.info(f"      - Éligibles: {len(aides_eligibles)}")
-        logger.info(f"      - Quasi-éligibles: {len(aides_quasi_eligibles)}")
-        logger.info(f"      - Non éligibles: {len(aides_non_eligibles)}")
-        if montant_total_min > 0 or montant_total_max > 0:
-            logger.info(f"      - Montant estimé: {montant_total_min:,.0f}€ - {montant_total_max:,.0f}€")
+        logger.info(f"      - Éligibles: {stats['aides_eligibles']}")
+        logger.info(f"      - Quasi-éligibles: {stats['aides_quasi_eligibles']}")
+        logger.info(f"      - Non éligibles: {stats['aides_non_eligibles']}")
+        if stats['montant_total_estime_min'] > 0 or stats['montant_total_estime_max'] > 0:
+            logger.info(f"      - Montant estimé: {stats['montant_total_estime_min']:,.0f}€ - {stats['montant_total_estime_max']:,.0f}€")
         
-        return {
+        return _matching_response(timer, {
             "profil_id": profil.profil_id,
-            "total_aides": len(resultats),
-            "aides_eligibles": len(aides_eligibles),
-            "aides_quasi_eligibles": len(aides_quasi_eligibles),
-            "aides_non_eligibles": len(aides_non_eligibles),
-            "montant_total_estime_min": round(montant_total_min, 2),
-            "montant_total_estime_max": round(montant_total_max, 2),
+            **stats,
             "resultats": resultats
-        }
+        })
         
     except Exception as e:
+        timer.finish(status="error")
         logger.error(f"❌ Erreur lors du matching V2: {e}")
         import traceback
         logger.error(traceback.format_exc())
@@ -553,6 +455,119 @@ async def calculate_matching_v2(profil_data: Dict[str, Any]):
         )
 
 
+def _matching_response(timer, content: Dict[str, Any]) -> FastJSONResponse:
+    """Encode la réponse du matching (orjson, phase chronométrée) et ajoute Server-Timing"""
+    with timer.phase("encodage_json"):
+        response = FastJSONResponse(content=content)
+    total = timer.finish()
+    if timer.sampled:
+        response.headers["Server-Timing"] = timer.server_timing(total)
+    return response
+
+
+@api_router.post("/matching/what-if", response_class=FastJSONResponse)
+async def matching_what_if(request: WhatIfRequest):
+    """
+    Analyse what-if : effet de modifications du profil sur les aides éligibles
+
+    Chaque scénario liste des changements ({"champ": "labels", "operation": "ajouter",
+    "valeur": "AB"}, {"champ": "sau_totale", "operation": "augmenter", "valeur": 20}...).
+    Retourne par scénario les aides gagnées / perdues et la variation du montant estimé.
+    """
+    try:
+        profil = parse_profil(request.profil)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Profil invalide: {e}")
+
+    catalog = await load_catalog(db)
+    aides = catalog.load_aides()
+    try:
+        resultat = analyser_scenarios(aides, profil, request.scenarios)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    logger.info(f"🔮 What-if: {len(request.scenarios)} scénario(s) sur {len(aides)} aides")
+    return FastJSONResponse(content=resultat)
+
+
+@api_router.post("/matching/sessions", response_class=FastJSONResponse)
+async def create_matching_session(profil_data: Dict[str, Any]):
+    """
+    Crée une session de matching pour le profil (format V2 ou legacy)
+
+    Réponse au format de /matching ; les modifications suivantes du profil
+    passent par PATCH /matching/sessions/{profil_id} (re-scoring incrémental).
+    """
+    try:
+        profil = parse_profil(profil_data)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Profil invalide: {e}")
+
+    catalog = await load_catalog(db)
+    session = SessionMatching(profil, catalog.load_aides(), catalog.version)
+    matching_sessions.put(session)
+    logger.info(f"🆕 Session de matching {profil.profil_id} ({len(session.aides)} aides)")
+    return FastJSONResponse(content=session.reponse())
+
+
+@api_router.patch("/matching/sessions/{profil_id}", response_class=FastJSONResponse)
+async def update_matching_session(profil_id: str, modifications: Dict[str, Any]):
+    """
+    Modifie des champs du profil V2 d'une session ({"labels": [...], "sau_totale": 80})
+
+    Seuls les groupes de critères qui lisent les champs modifiés sont réévalués.
+    404 si la session a expiré ou vit sur un autre worker : la recréer.
+    """
+    session = matching_sessions.get(profil_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session de matching inconnue ou expirée")
+
+    catalog = await load_catalog(db)
+    if catalog.version != session.version_catalogue:
+        session.recharger(catalog.load_aides(), catalog.version)
+        groupes = [nom for nom, _ in MatchingEngine.GROUPES]
+    else:
+        groupes = None
+    try:
+        groupes_modifies = session.appliquer(modifications)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    return FastJSONResponse(content={
+        **session.reponse(),
+        "groupes_recalcules": groupes if groupes is not None else groupes_modifies,
+    })
+
+
+@api_router.delete("/matching/sessions/{profil_id}")
+async def delete_matching_session(profil_id: str):
+    return {"supprimee": matching_sessions.delete(profil_id)}
+
+
+class ProfilSauvegardeRequest(BaseModel):
+    profil: Dict[str, Any]  # format V2, legacy ou réponses au questionnaire
+    contact: Optional[str] = None
+
+
+@api_router.post("/profils/sauvegardes")
+async def save_profil(request: ProfilSauvegardeRequest):
+    """
+    Enregistre un profil à surveiller : les aides nouvelles ou modifiées auxquelles
+    il devient éligible sont notifiées (notifications_outbox) après chaque synchronisation
+    """
+    try:
+        profil = parse_profil(request.profil)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Profil invalide: {e}")
+    await sauvegarder_profil(db, profil, request.contact)
+    return {"profil_id": profil.profil_id}
+
+
+@api_router.delete("/profils/sauvegardes/{profil_id}")
+async def delete_profil_sauvegarde(profil_id: str):
+    return {"supprime": await supprimer_profil(db, profil_id)}
+
+
 @api_router.get("/matching/test")
 async def test_matching_endpoint():
     """Endpoint de test pour vérifier que le matching engine fonctionne"""
@@ -567,6 +582,7 @@ async def test_matching_endpoint():
             "matching_engine": "loaded",
             "aides_v2_count": count_v2,
             "aides_v2_active": count_active,
+            "catalog_version": get_snapshot_store().current_version(),
             "message": "✅ Endpoint de matching V2 opérationnel"
         }
     except ImportError as e:
@@ -586,6 +602,11 @@ async def test_matching_endpoint():
 
 # ============ ADMIN ENDPOINTS ============
 
+@api_router.get("/metrics")
+async def get_metrics():
+    """Métriques de latence au format Prometheus"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 @api_router.post("/admin/run-migration")
 async def run_migration_via_http():
     """Endpoint admin pour exécuter la migration V2"""
@@ -602,13 +623,18 @@ async def run_migration_via_http():
         if result['success']:
             logger.info("✅ Migration terminée avec succès")
             
+            # Statistiques recalculées (la migration écrit sans incréments), puis nouveau catalogue
+            await recalculer_stats(db)
+            catalog = await publish_catalog_snapshot(db)
+            
             return {
                 "status": "success",
                 "message": "Migration V2 terminée avec succès",
                 "migration_results": {
                     "total_migrated": int(result.get('total_migrated', 0)),
                     "errors": int(result.get('errors', 0))
-                }
+                },
+                "catalog_version": catalog.version
             }
         else:
             logger.error("❌ La migration a échoué")
@@ -653,25 +679,121 @@ async def get_migration_status():
             "message": "Erreur vérification statut"
         }
 
+@api_router.post("/admin/archive-raw-data")
+async def archive_raw_data():
+    """Déplace les raw_data encore embarqués dans aides_v2 vers l'archive compressée"""
+    try:
+        result = await migrer_raw_data(db)
+        logger.info(f"🗄️  Archive raw_data: {result['aides']} aides, {result['versions']} nouvelles versions")
+        return {"status": "success", **result}
+    except Exception as e:
+        logger.error(f"❌ Erreur archive raw_data: {e}")
+        return {
+            "status": "error",
+            "message": "Erreur lors de l'archivage des raw_data"
+        }
+
+@api_router.get("/admin/aides/{aid_id}/raw")
+async def get_aide_raw_data(aid_id: str, raw_hash: Optional[str] = None):
+    """Payload brut archivé d'une aide (dernière version, ou celle de raw_hash) et son historique"""
+    raw = await raw_data_aide(db, aid_id, raw_hash)
+    if raw is None:
+        raise HTTPException(status_code=404, detail="Aucun payload brut archivé pour cette aide")
+    return {"aid_id": aid_id, "raw_data": raw, "versions": await versions_aide(db, aid_id)}
+
+@api_router.get("/admin/db-pool-stats")
+async def get_db_pool_stats(reset_peaks: bool = False):
+    """Statistiques du pool MongoDB (connexions empruntées, file d'attente, temps d'attente)"""
+    stats = get_pool_stats()
+    if reset_peaks:
+        pool_stats.reset_peaks()
+    return stats
+
+@api_router.get("/admin/http-cache-stats")
+async def get_http_cache_stats():
+    """Réponses Aides-Territoires servies par le cache HTTP (fraîches, revalidées 304, téléchargées)"""
+    cache = get_http_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, "ttl_s": cache.ttl_s, **cache.stats}
+
+@api_router.get("/admin/catalog-stats")
+async def catalog_stats():
+    """Statistiques matérialisées du catalogue (statuts, sources, régions, productions, critères, montants)"""
+    return vue_stats(await lire_stats(db))
+
+@api_router.get("/admin/catalog-stats/history")
+async def catalog_stats_history(limit: int = 100):
+    """Statistiques de chaque version publiée du catalogue, de la plus ancienne à la plus récente"""
+    return {"history": await historique(db, limit=max(1, min(limit, 1000)))}
+
+@api_router.post("/admin/catalog-stats/rebuild")
+async def catalog_stats_rebuild():
+    """Recalcule les statistiques d'aides_v2 et de la collection legacy (après une écriture hors synchronisation)"""
+    legacy = await recalculer_stats_legacy(db)
+    return {
+        **vue_stats(await recalculer_stats(db)),
+        "legacy": {"total": legacy["total"], "actives": legacy["actives"]},
+    }
+
 @api_router.get("/admin/explore-aides-territoires")
 async def explore_aides_territoires():
     """Explore l'API Aides-Territoires pour identifier les aides agricoles"""
+    from explore_aides_endpoint import explore_aides_territoires_handler
     return await explore_aides_territoires_handler()
 
 @api_router.get("/admin/export-aides-agricoles")
 async def export_aides_agricoles():
     """Exporte toutes les 507 aides agricoles en JSON pour enrichissement manuel"""
+    from export_aides_endpoint import export_aides_handler
     return await export_aides_handler()
 
+@api_router.get("/admin/export-aides")
+async def export_aides(request: Request, format: str = "ndjson"):
+    """Exporte le catalogue local (aides actives) en NDJSON, CSV ou Parquet, régénéré à chaque version"""
+    from catalog_export import FORMATS, parquet_disponible, reponse_export
+    if format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"Format inconnu: {format} ({', '.join(FORMATS)})")
+    if format == "parquet" and not parquet_disponible():
+        raise HTTPException(status_code=501, detail="Export Parquet indisponible (pyarrow non installé)")
+    return reponse_export(request, db, format, get_snapshot_store().current_version())
+
 @api_router.get("/admin/analyze-criteria")
 async def analyze_criteria():
-    """Analyse les 507 aides pour extraire tous les critères d'éligibilité"""
-    return await analyze_criteria_handler()
+    """Analyse les aides du catalogue local pour extraire tous les critères d'éligibilité"""
+    from analyze_criteria_endpoint import analyze_criteria_handler
+    return await analyze_criteria_handler(db)
 
 @api_router.api_route("/questionnaire/config", methods=["GET", "HEAD"])
-async def get_questionnaire():
-    """Retourne la configuration du questionnaire dynamique"""
-    return await get_questionnaire_config()
+async def get_questionnaire(request: Request):
+    """Retourne la configuration du questionnaire dynamique (ETag, 304, Cache-Control)"""
+    return questionnaire_response(request)
+
+
+class QuestionnairePreviewRequest(BaseModel):
+    reponses: Dict[str, Any] = Field(default_factory=dict)  # clés = ids des questions
+    question_id: Optional[str] = None  # par défaut la prochaine question sans réponse
+
+
+@api_router.post("/questionnaire/preview", response_class=FastJSONResponse)
+async def questionnaire_preview(request: QuestionnairePreviewRequest):
+    """
+    Aperçu en direct : nombre d'aides restantes pour chaque option d'une question
+
+    Compte des aides qu'aucun critère bloquant n'exclut compte tenu des réponses
+    déjà données (index en bitmaps, sans exécuter le moteur de matching).
+    """
+    catalog = await load_catalog(db)
+    index = index_catalogue(catalog.version, catalog.load_aides())
+    try:
+        questions = questionnaire_cache.current().questions
+    except QuestionnaireConfigError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    try:
+        apercu = apercu_options(index, questions, request.reponses, request.question_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return FastJSONResponse(content={**apercu, "version_catalogue": catalog.version})
     
 @api_router.post("/aides")
 async def create_or_update_aide(aide: AideAgricole):
@@ -680,10 +802,13 @@ async def create_or_update_aide(aide: AideAgricole):
     
     if existing:
         await db.aides.update_one({"aid_id": aide.aid_id}, {"$set": aide_dict})
-        return {"message": "Aide mise à jour", "aid_id": aide.aid_id}
+        message = "Aide mise à jour"
     else:
         await db.aides.insert_one(aide_dict)
-        return {"message": "Aide créée", "aid_id": aide.aid_id}
+        message = "Aide créée"
+    # Compteurs matérialisés de /api/stats (total, actives)
+    await recalculer_stats_legacy_sans_erreur(db)
+    return {"message": message, "aid_id": aide.aid_id}
 
 @api_router.post("/assistant")
 async def assistant_ia(request: AssistantRequest):
@@ -691,43 +816,48 @@ async def assistant_ia(request: AssistantRequest):
 
 @api_router.get("/stats")
 async def get_stats():
-    total_aides = await db.aides.count_documents({})
-    aides_actives = await db.aides.count_documents({"expiree": False})
+    """
+    Compteurs lus dans les statistiques matérialisées (pas de count_documents)
+
+    total_aides / aides_actives : collection legacy aides (non expirées), comme avant ;
+    *_v2 : catalogue aides_v2
+    """
+    legacy = await lire_stats_legacy(db)
+    stats = await lire_stats(db)
     
     return {
-        "total_aides": total_aides,
-        "aides_actives": aides_actives
+        "total_aides": legacy.get("total", 0),
+        "aides_actives": legacy.get("actives", 0),
+        "total_aides_v2": stats.get("total", 0),
+        "aides_actives_v2": (stats.get("par_statut") or {}).get("active", 0)
     }
 
 # ============ SYNC ENDPOINTS ============
 
-from sync_aides_territoires import sync_aides_to_db
-
 @api_router.post("/sync/aides-territoires")
 async def sync_aides_territoires(limit: Optional[int] = None):
     try:
+        from sync_aides_territoires import sync_aides_to_db
         result = await sync_aides_to_db(db, limit=limit)
         return result
     except Exception as e:
         logger.error(f"Erreur sync: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-from sync_datagouv_pac import sync_pac_to_db
-
 @api_router.post("/sync/datagouv-pac")
 async def sync_datagouv_pac(limit: Optional[int] = None):
     try:
+        from sync_datagouv_pac import sync_pac_to_db
         result = await sync_pac_to_db(db, limit=limit)
         return result
     except Exception as e:
         logger.error(f"Erreur sync PAC: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-from sync_aides_territoires_v2 import sync_aides_territoires_v2, debug_first_aide
-
 @api_router.api_route("/sync/aides-territoires-v2", methods=["GET", "POST"])
 async def sync_aides_territoires_v2_endpoint(max_pages: Optional[int] = None):
     try:
+        from sync_aides_territoires_v2 import sync_aides_territoires_v2
         result = await sync_aides_territoires_v2(db, max_pages=max_pages)
         return result
     except Exception as e:
@@ -740,6 +870,7 @@ async def debug_first_aide_endpoint():
     Endpoint de debug pour analyser la première aide
     """
     try:
+        from sync_aides_territoires_v2 import debug_first_aide
         result = await debug_first_aide(db)
         return result
     except Exception as e:
@@ -759,21 +890,74 @@ app.add_middleware(
     expose_headers=["*"],
 )
 
-@app.on_event("startup")
+# Compression gzip/brotli des réponses au-delà de COMPRESSION_MIN_SIZE
+app.add_middleware(CompressionMiddleware)
+
 async def create_indexes():
     """Crée les index MongoDB"""
     try:
         logger.info("🔧 Création index MongoDB...")
         
         # Index V2
-        await db.aides_v2.create_index([("titre", "text"), ("description", "text")])
+        # Recherche plein texte sur le texte extrait à l'import (plus sur le HTML)
+        if "titre_text_description_text" in await db.aides_v2.index_information():
+            await db.aides_v2.drop_index("titre_text_description_text")
+        await db.aides_v2.create_index(
+            [("titre", "text"), ("description_texte", "text"), ("conditions_eligibilite_texte", "text")],
+            name="recherche_texte", default_language="french"
+        )
         await db.aides_v2.create_index("source")
         await db.aides_v2.create_index("statut")
+        await db.aides_v2.create_index("aid_id")
+        # Archive des payloads bruts (une version par contenu)
+        await db[RAW_COLLECTION].create_index([("aid_id", 1), ("raw_hash", 1)], unique=True)
+        await db[RAW_COLLECTION].create_index([("aid_id", 1), ("archive_le", -1)])
+        
+        # Échéancier d'expiration (aides actives par date limite)
+        await db.aides_v2.create_index([("statut", 1), ("date_limite_depot", 1)])
+        
+        # Percolation : profils sauvegardés et notifications (une par couple profil / aide)
+        await db[PROFILS_COLLECTION].create_index("profil_id", unique=True)
+        await db[OUTBOX_COLLECTION].create_index([("profil_id", 1), ("aid_id", 1)], unique=True)
+        await db[OUTBOX_COLLECTION].create_index("statut")
+        
+        # Historique des statistiques du catalogue (une entrée par version publiée)
+        await db[HISTORY_COLLECTION].create_index("version")
         
         logger.info("✅ Index créés")
     except Exception as e:
         logger.error(f"❌ Erreur index: {e}")
 
+@app.on_event("startup")
+async def schedule_index_creation():
+    """Crée les index en tâche de fond : le port est ouvert sans attendre MongoDB"""
+    app.state.index_task = asyncio.create_task(create_indexes())
+
+@app.on_event("startup")
+async def load_questionnaire():
+    """Charge et valide la configuration du questionnaire, compile le traducteur de profils"""
+    try:
+        questionnaire_cache.current()
+    except QuestionnaireConfigError as e:
+        logger.error(f"❌ Questionnaire non disponible: {e}")
+    get_profil_compiler()
+
+@app.on_event("startup")
+async def start_warmup():
+    """Lance le warm-up en tâche de fond (le serveur répond déjà à /api/health)"""
+    if WARMUP_ENABLED:
+        app.state.warmup_task = asyncio.create_task(run_warmup(matching_db, calculate_matching_v2, catalog_db=db))
+
+@app.on_event("startup")
+async def start_expiry_scheduler():
+    """Expire les aides à leur date limite entre deux synchronisations"""
+    if EXPIRY_SCHEDULER_ENABLED:
+        app.state.expiry_task = asyncio.create_task(ExpiryScheduler(db).run())
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
+    for name in ("warmup_task", "expiry_task"):
+        task = getattr(app.state, name, None)
+        if task is not None and not task.done():
+            task.cancel()
+    close_client()
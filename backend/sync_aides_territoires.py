@@ -1,73 +1,160 @@
 """
 Script de synchronisation avec l'API Aides-Territoires
 Récupère les aides agricoles et les normalise pour MongoDB
+
+Client HTTP asynchrone (aiohttp, connexions réutilisées) : la première page
+donne le nombre total d'aides, les suivantes sont récupérées en parallèle
+(concurrence bornée). Les aides sont écrites par bulk_write d'upserts, sans
+bloquer la boucle d'événements de l'API pendant la synchronisation.
 """
 
-import requests
+import aiohttp
 import asyncio
+import math
+import os
 from datetime import datetime, timezone
 from typing import List, Dict, Any, Optional
-import re
 import logging
 
-logging.basicConfig(level=logging.INFO)
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from fixture_transport import client_session
+from catalog_stats import recalculer_stats_legacy_sans_erreur
+from criteria_patterns import NUMERO_DEPARTEMENT, bornes, montants_et_taux
+from html_text import html_vers_texte
+from http_cache import HttpCache, get_http_cache, transport_aiohttp
+
 logger = logging.getLogger(__name__)
 
 # Configuration API Aides-Territoires
 AIDES_TERRITOIRES_API_URL = "https://aides-territoires.beta.gouv.fr/api/aids/"
 AIDES_TERRITOIRES_BASE_URL = "https://aides-territoires.beta.gouv.fr"
 
+# Pages récupérées en parallèle, délai par requête, taille des bulk_write
+SYNC_CONCURRENCY = int(os.environ.get('AT_SYNC_CONCURRENCY', '4'))
+SYNC_TIMEOUT_S = float(os.environ.get('AT_SYNC_TIMEOUT_S', '30'))
+SYNC_BULK_SIZE = int(os.environ.get('AT_SYNC_BULK_SIZE', '500'))
+
 class AidesTerritoiresSyncer:
-    """Classe pour synchroniser les aides depuis Aides-Territoires"""
+    """
+    Classe pour synchroniser les aides depuis Aides-Territoires
+
+    S'utilise comme contexte asynchrone (session HTTP partagée) :
+        async with AidesTerritoiresSyncer() as syncer:
+            aides = await syncer.fetch_aides_agricoles()
+    """
     
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'application/json',
-            'Accept-Language': 'fr-FR,fr;q=0.9,en-US;q=0.8,en;q=0.7'
-        })
+    HEADERS = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+        'Accept': 'application/json',
+        'Accept-Language': 'fr-FR,fr;q=0.9,en-US;q=0.8,en;q=0.7'
+    }
     
-    def fetch_aides_agricoles(self, page_size: int = 50) -> List[Dict[str, Any]]:
-        """Récupère toutes les aides agricoles depuis l'API"""
-        
-        all_aides = []
-        page = 1
-        
+    def __init__(self, concurrency: int = SYNC_CONCURRENCY, timeout_s: float = SYNC_TIMEOUT_S,
+                 cache: Optional[HttpCache] = None):
+        self.concurrency = max(1, concurrency)
+        self.timeout_s = timeout_s
+        # Cache HTTP partagé (pages revalidées par ETag / Last-Modified), None = requêtes directes
+        self.cache = cache
+        self.session = None
+    
+    async def __aenter__(self):
+        self.session = client_session(
+            headers=self.HEADERS,
+            connector=aiohttp.TCPConnector(limit=self.concurrency),
+            timeout=aiohttp.ClientTimeout(total=self.timeout_s)
+        )
+        return self
+    
+    async def __aexit__(self, *exc):
+        await self.session.close()
+        self.session = None
+    
+    async def _fetch_page(self, page: int, page_size: int) -> Dict[str, Any]:
         params = {
-    'categories': 'agriculture',  # Chercher par catégorie au lieu de audience
-    'is_charged': 'false',
-    'page_size': page_size,
-    'page': page
-}
+            'categories': 'agriculture',  # Chercher par catégorie au lieu de audience
+            'is_charged': 'false',
+            'page_size': page_size,
+            'page': page
+        }
+        if self.cache is not None:
+            response = await self.cache.get(transport_aiohttp(self.session), AIDES_TERRITOIRES_API_URL, params)
+            if response.status != 200:
+                raise aiohttp.ClientError(f"HTTP {response.status} page {page}")
+            return response.json()
+        async with self.session.get(AIDES_TERRITOIRES_API_URL, params=params) as response:
+            response.raise_for_status()
+            return await response.json()
+    
+    async def fetch_aides_agricoles(self, page_size: int = 50,
+                                    limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Récupère toutes les aides agricoles depuis l'API (au plus `limit`)
         
+        Une page en erreur est journalisée et ignorée, les autres sont conservées.
+        """
         logger.info("🔄 Début de la récupération des aides agricoles...")
         
-        while True:
+        try:
+            first = await self._fetch_page(1, page_size)
+        except Exception as e:
+            logger.error(f"❌ Erreur lors de la récupération page 1: {e}")
+            return []
+        
+        all_aides = list(first.get('results', []))
+        logger.info(f"✅ Page 1 : {len(all_aides)} aides récupérées")
+        
+        count = first.get('count')
+        if first.get('next') and all_aides:
+            if count is None:
+                all_aides.extend(await self._fetch_sequential(page_size, limit, len(all_aides)))
+            else:
+                total = count if limit is None else min(count, limit)
+                last_page = math.ceil(total / page_size)
+                all_aides.extend(await self._fetch_concurrent(range(2, last_page + 1), page_size))
+        
+        if limit is not None:
+            all_aides = all_aides[:limit]
+        logger.info(f"✅ Total aides récupérées : {len(all_aides)}")
+        return all_aides
+    
+    async def _fetch_concurrent(self, pages: range, page_size: int) -> List[Dict[str, Any]]:
+        """Pages récupérées en parallèle (au plus `concurrency`), résultats dans l'ordre des pages"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        
+        async def fetch(page: int) -> List[Dict[str, Any]]:
+            async with semaphore:
+                try:
+                    results = (await self._fetch_page(page, page_size)).get('results', [])
+                except Exception as e:
+                    logger.error(f"❌ Erreur lors de la récupération page {page}: {e}")
+                    return []
+            logger.info(f"✅ Page {page} : {len(results)} aides récupérées")
+            return results
+        
+        pages_results = await asyncio.gather(*(fetch(page) for page in pages))
+        return [aide for results in pages_results for aide in results]
+    
+    async def _fetch_sequential(self, page_size: int, limit: Optional[int], deja: int) -> List[Dict[str, Any]]:
+        """Pagination par `next` quand l'API ne renvoie pas le nombre total"""
+        aides = []
+        page = 2
+        while limit is None or deja + len(aides) < limit:
             try:
-                response = self.session.get(AIDES_TERRITOIRES_API_URL, params=params)
-                response.raise_for_status()
-                data = response.json()
-                
-                results = data.get('results', [])
-                if not results:
-                    break
-                
-                all_aides.extend(results)
-                logger.info(f"✅ Page {page} : {len(results)} aides récupérées (Total: {len(all_aides)})")
-                
-                if not data.get('next'):
-                    break
-                
-                page += 1
-                params['page'] = page
-                
+                data = await self._fetch_page(page, page_size)
             except Exception as e:
                 logger.error(f"❌ Erreur lors de la récupération page {page}: {e}")
                 break
-        
-        logger.info(f"✅ Total aides récupérées : {len(all_aides)}")
-        return all_aides
+            results = data.get('results', [])
+            if not results:
+                break
+            aides.extend(results)
+            logger.info(f"✅ Page {page} : {len(results)} aides récupérées (Total: {deja + len(aides)})")
+            if not data.get('next'):
+                break
+            page += 1
+        return aides
     
     def normalize_aide(self, aide_data: Dict[str, Any]) -> Dict[str, Any]:
         """Normalise une aide Aides-Territoires vers le format AgriSubv"""
@@ -118,7 +205,7 @@ class AidesTerritoiresSyncer:
             "date_limite": date_limite,
             "criteres_durs_expr": criteres_durs_expr,
             "criteres_mous_tags": criteres_mous_tags,
-            "conditions_clefs": criteres_eligibilite[:500] if criteres_eligibilite else '',
+            "conditions_clefs": html_vers_texte(criteres_eligibilite)[:500],
             "lien_officiel": lien_officiel,
             "confiance": 0.8,
             "expiree": expiree,
@@ -160,7 +247,7 @@ class AidesTerritoiresSyncer:
         if 'region' in scale:
             regions.append(perimeter_name)
         elif 'department' in scale:
-            match = re.search(r'\b(\d{2,3})\b', perimeter_name)
+            match = NUMERO_DEPARTEMENT.search(perimeter_name)
             if match:
                 departements.append(match.group(1))
         elif 'france' in perimeter_name.lower() or 'national' in scale:
@@ -187,31 +274,12 @@ class AidesTerritoiresSyncer:
     def _extract_montants(self, aide_data: Dict[str, Any]) -> tuple:
         montant_str = aide_data.get('subvention_rate', '') or aide_data.get('aid_amount', '')
         
-        montant_min = None
-        montant_max = None
-        taux_min = None
-        taux_max = None
-        
         if not montant_str:
             return None, None, None, None
         
-        montants_euros = re.findall(r'(\d+[\s\u202f]?\d*)\s*€', montant_str)
-        if montants_euros:
-            montants = [int(m.replace(' ', '').replace('\u202f', '')) for m in montants_euros]
-            if len(montants) == 1:
-                montant_max = montants[0]
-            elif len(montants) >= 2:
-                montant_min = min(montants)
-                montant_max = max(montants)
-        
-        taux = re.findall(r'(\d+)\s*%', montant_str)
-        if taux:
-            taux_values = [int(t) for t in taux]
-            if len(taux_values) == 1:
-                taux_max = taux_values[0]
-            elif len(taux_values) >= 2:
-                taux_min = min(taux_values)
-                taux_max = max(taux_values)
+        montants, taux = montants_et_taux(montant_str)
+        montant_min, montant_max = bornes(montants)
+        taux_min, taux_max = bornes(taux)
         
         return montant_min, montant_max, taux_min, taux_max
     
@@ -244,74 +312,78 @@ class AidesTerritoiresSyncer:
             return False
 
 
+async def upsert_aides(collection, aides: List[Dict[str, Any]],
+                       bulk_size: int = SYNC_BULK_SIZE) -> Dict[str, int]:
+    """
+    Upsert des aides par aid_id en bulk_write non ordonnés
+    
+    Returns:
+        inserted (nouvelles aides), updated (aides existantes), errors
+    """
+    inserted = updated = errors = 0
+    for i in range(0, len(aides), bulk_size):
+        batch = aides[i:i + bulk_size]
+        operations = [UpdateOne({"aid_id": aide['aid_id']}, {"$set": aide}, upsert=True) for aide in batch]
+        try:
+            result = await collection.bulk_write(operations, ordered=False)
+            inserted += result.upserted_count
+            updated += result.matched_count
+        except BulkWriteError as e:
+            details = e.details
+            inserted += details.get('nUpserted', 0)
+            updated += details.get('nMatched', 0)
+            for error in details.get('writeErrors', []):
+                logger.error(f"❌ Erreur insertion aide {batch[error['index']]['aid_id']}: {error.get('errmsg')}")
+            errors += len(details.get('writeErrors', []))
+        except Exception as e:
+            logger.error(f"❌ Erreur bulk_write ({len(batch)} aides): {e}")
+            errors += len(batch)
+    return {"inserted": inserted, "updated": updated, "errors": errors}
+
+
 async def sync_aides_to_db(db, limit: Optional[int] = None) -> Dict[str, Any]:
     """Synchronise les aides depuis Aides-Territoires vers MongoDB"""
     
-    syncer = AidesTerritoiresSyncer()
-    
     logger.info("🔄 Récupération des aides depuis Aides-Territoires...")
-    aides_brutes = syncer.fetch_aides_agricoles()
-    
-    if limit:
-        aides_brutes = aides_brutes[:limit]
+    async with AidesTerritoiresSyncer(cache=get_http_cache()) as syncer:
+        aides_brutes = await syncer.fetch_aides_agricoles(limit=limit)
     
     logger.info(f"🔄 Normalisation de {len(aides_brutes)} aides...")
     aides_normalized = []
-    for aide_brute in aides_brutes:
+    for i, aide_brute in enumerate(aides_brutes, 1):
         try:
             aide_norm = syncer.normalize_aide(aide_brute)
             aides_normalized.append(aide_norm)
         except Exception as e:
             logger.error(f"❌ Erreur normalisation aide {aide_brute.get('id')}: {e}")
+        if i % 100 == 0:
+            await asyncio.sleep(0)  # rend la main aux requêtes de l'API entre deux lots
     
     logger.info(f"💾 Insertion de {len(aides_normalized)} aides dans MongoDB...")
-    
-    inserted_count = 0
-    updated_count = 0
-    errors_count = 0
-    
-    for aide in aides_normalized:
-        try:
-            existing = await db.aides.find_one({"aid_id": aide['aid_id']})
-            
-            if existing:
-                await db.aides.update_one(
-                    {"aid_id": aide['aid_id']},
-                    {"$set": aide}
-                )
-                updated_count += 1
-            else:
-                await db.aides.insert_one(aide)
-                inserted_count += 1
-        except Exception as e:
-            logger.error(f"❌ Erreur insertion aide {aide['aid_id']}: {e}")
-            errors_count += 1
+    stats = await upsert_aides(db.aides, aides_normalized)
+    await recalculer_stats_legacy_sans_erreur(db)
     
     logger.info(f"✅ Synchronisation terminée !")
-    logger.info(f"   - Nouvelles aides : {inserted_count}")
-    logger.info(f"   - Aides mises à jour : {updated_count}")
-    logger.info(f"   - Erreurs : {errors_count}")
+    logger.info(f"   - Nouvelles aides : {stats['inserted']}")
+    logger.info(f"   - Aides mises à jour : {stats['updated']}")
+    logger.info(f"   - Erreurs : {stats['errors']}")
     
     return {
         "success": True,
         "total_fetched": len(aides_brutes),
         "total_normalized": len(aides_normalized),
-        "inserted": inserted_count,
-        "updated": updated_count,
-        "errors": errors_count
+        "inserted": stats['inserted'],
+        "updated": stats['updated'],
+        "errors": stats['errors']
     }
 
 
 if __name__ == "__main__":
-    from motor.motor_asyncio import AsyncIOMotorClient
-    import os
-    from dotenv import load_dotenv
+    logging.basicConfig(level=logging.INFO)
     
-    load_dotenv()
+    from database import get_db
     
-    mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
-    client = AsyncIOMotorClient(mongo_url)
-    db = client[os.environ.get('DB_NAME', 'agrisubv_db')]
+    db = get_db()
     
     result = asyncio.run(sync_aides_to_db(db, limit=100))
     print(f"\n📊 Résultat : {result}")
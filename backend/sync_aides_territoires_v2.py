@@ -4,12 +4,11 @@ Récupération paginée avec rate limiting et normalisation vers modèle V2
 """
 
 import asyncio
-import aiohttp
 import time
+from collections import Counter
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timezone
 import logging
-import re
 import os
 from dotenv import load_dotenv
 
@@ -17,8 +16,18 @@ from models_v2 import (
     AideAgricoleV2, CriteresEligibilite, MontantAide,
     TypeProduction, TypeProjet, StatutJuridique, TypeMontant
 )
+from catalog_snapshot import publish_catalog_snapshot
+from catalog_stats import PROJECTION_STATS, appliquer_delta_sans_erreur, delta
+from expiry_scheduler import est_expiree
+from raw_archive import archiver, separer_raw_data
+from fixture_transport import client_session
+from html_text import extraire_html, html_vers_texte, textes_aide
+from criteria_patterns import (
+    NUMERO_DEPARTEMENT, PAR_HECTARE, PAR_TETE, bornes, montants_et_taux, signaux_texte
+)
+from http_cache import get_cached, get_token_cache, transport_aiohttp
+from percolator import a_percoler, empreinte_criteres, percoler_aides
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Load environment variables
@@ -98,10 +107,16 @@ class AidesTerritoiresSync:
         self.db = db
         self.session = None
         self.last_request_time = 0
+        # Aides nouvelles ou dont les critères ont changé (percolées après l'import)
+        self.aides_a_percoler: List[AideAgricoleV2] = []
+        # Nouvelles versions de payloads bruts archivées dans aides_raw
+        self.versions_raw = 0
+        # Textes bruts extraits à la normalisation, stockés à l'import (aid_id -> champs *_texte)
+        self.textes: Dict[str, Dict[str, str]] = {}
     
     async def get_bearer_token(self) -> Optional[str]:
         """
-        Obtient un Bearer Token en utilisant le X-AUTH-TOKEN
+        Bearer Token en cache (partagé avec les endpoints admin), sinon obtenu via le X-AUTH-TOKEN
         
         Returns:
             Bearer Token (valable 24h) ou None en cas d'erreur
@@ -109,7 +124,10 @@ class AidesTerritoiresSync:
         if not API_TOKEN:
             logger.error("❌ AIDES_TERRITOIRES_API_TOKEN non configuré")
             return None
-        
+        return await get_token_cache().token(API_TOKEN, self._demander_bearer_token)
+    
+    async def _demander_bearer_token(self) -> Optional[str]:
+        """Authentification auprès de /api/connexion/"""
         headers = {
             'User-Agent': 'AgriSubv/2.0 (https://agrisubv.onrender.com)',
             'X-AUTH-TOKEN': API_TOKEN,
@@ -117,7 +135,7 @@ class AidesTerritoiresSync:
         
         try:
             logger.info("🔐 Authentification auprès d'Aides-Territoires...")
-            async with aiohttp.ClientSession() as session:
+            async with client_session() as session:
                 async with session.post(CONNEXION_URL, headers=headers) as response:
                     if response.status == 200:
                         data = await response.json()
@@ -166,6 +184,7 @@ class AidesTerritoiresSync:
         
         all_aides = []
         page = 1
+        tentatives_auth = 0
         
         headers = {
             'User-Agent': 'AgriSubv/2.0 (https://agrisubv.onrender.com)',
@@ -173,16 +192,19 @@ class AidesTerritoiresSync:
             'Authorization': f'Bearer {bearer_token}',
         }
         
-        async with aiohttp.ClientSession(headers=headers) as session:
+        async with client_session(headers=headers) as session:
             self.session = session
+            transport = transport_aiohttp(session)
+            
+            async def requete(url, params, entetes):
+                # Rate limiting (seulement pour les requêtes réellement envoyées)
+                await self._rate_limit()
+                return await transport(url, params, entetes)
             
             while True:
                 if max_pages and page > max_pages:
                     break
                 
-                # Rate limiting
-                await self._rate_limit()
-                
                 params = {
                     'categories': 'agriculture',
                     'is_charged': 'false',
@@ -192,36 +214,39 @@ class AidesTerritoiresSync:
                 
                 try:
                     logger.info(f"🔄 Récupération page {page}...")
-                    async with session.get(AIDES_TERRITOIRES_API_URL, params=params) as response:
-                        if response.status == 401:
-                            logger.error(f"❌ Token expiré ou invalide (401)")
-                            # Réessayer avec un nouveau token
-                            bearer_token = await self.get_bearer_token()
-                            if not bearer_token:
-                                break
-                            headers['Authorization'] = f'Bearer {bearer_token}'
-                            continue
-                        
-                        if response.status != 200:
-                            logger.error(f"❌ Erreur HTTP {response.status} page {page}")
-                            error_text = await response.text()
-                            logger.error(f"   Détails: {error_text[:200]}")
-                            break
-                        
-                        data = await response.json()
-                        results = data.get('results', [])
-                        
-                        if not results:
-                            logger.info(f"✅ Fin de pagination (page {page})")
+                    # Cache HTTP partagé : page fraîche servie localement, sinon requête conditionnelle
+                    response = await get_cached(requete, AIDES_TERRITOIRES_API_URL, params,
+                                                {'Authorization': headers['Authorization']})
+                    if response.status == 401:
+                        logger.error(f"❌ Token expiré ou invalide (401)")
+                        # Réessayer avec un nouveau token
+                        get_token_cache().invalider(API_TOKEN)
+                        bearer_token = await self.get_bearer_token()
+                        if not bearer_token or tentatives_auth >= 1:
                             break
-                        
-                        all_aides.extend(results)
-                        logger.info(f"   ✅ {len(results)} aides récupérées (Total: {len(all_aides)})")
-                        
-                        if not data.get('next'):
-                            break
-                        
-                        page += 1
+                        tentatives_auth += 1
+                        headers['Authorization'] = f'Bearer {bearer_token}'
+                        continue
+                    
+                    if response.status != 200:
+                        logger.error(f"❌ Erreur HTTP {response.status} page {page}")
+                        logger.error(f"   Détails: {response.body[:200].decode(errors='replace')}")
+                        break
+                    
+                    data = response.json()
+                    results = data.get('results', [])
+                    
+                    if not results:
+                        logger.info(f"✅ Fin de pagination (page {page})")
+                        break
+                    
+                    all_aides.extend(results)
+                    logger.info(f"   ✅ {len(results)} aides récupérées (Total: {len(all_aides)}, {response.source})")
+                    
+                    if not data.get('next'):
+                        break
+                    
+                    page += 1
                         
                 except asyncio.TimeoutError:
                     logger.error(f"❌ Timeout page {page}")
@@ -233,12 +258,14 @@ class AidesTerritoiresSync:
         logger.info(f"✅ Total récupéré: {len(all_aides)} aides")
         return all_aides
     
-    def detect_productions(self, aide_data: Dict[str, Any]) -> List[TypeProduction]:
+    def detect_productions(self, aide_data: Dict[str, Any],
+                           description_texte: Optional[str] = None) -> List[TypeProduction]:
         """
         Détecte les types de production depuis les mots-clés
         
         Args:
             aide_data: Données brutes de l'aide
+            description_texte: Description déjà extraite du HTML (sinon extraite ici)
             
         Returns:
             Liste des types de production détectés
@@ -249,8 +276,10 @@ class AidesTerritoiresSync:
         name = aide_data.get('name')
         titre = str(name).lower() if name is not None else ''
         
-        desc = aide_data.get('description')
-        description = str(desc).lower() if desc is not None else ''
+        # Texte seul : les balises et attributs HTML ne doivent pas matcher les mots-clés
+        if description_texte is None:
+            description_texte = html_vers_texte(aide_data.get('description'))
+        description = description_texte.lower()
         
         # Gestion robuste des categories (liste de strings)
         categories_raw = aide_data.get('categories', [])
@@ -326,7 +355,7 @@ class AidesTerritoiresSync:
             regions.append(perimeter_name)
         elif 'department' in scale:
             # Extraire le numéro de département
-            match = re.search(r'\b(\d{2,3})\b', perimeter_name)
+            match = NUMERO_DEPARTEMENT.search(perimeter_name)
             if match:
                 departements.append(match.group(1))
         elif 'france' in perimeter_name.lower() or 'national' in scale:
@@ -348,55 +377,42 @@ class AidesTerritoiresSync:
         montant_str = str(montant_raw) if montant_raw else ''
         
         type_montant = TypeMontant.FORFAITAIRE
-        montant_min = None
-        montant_max = None
         taux_min = None
         taux_max = None
         
         if not montant_str:
             return type_montant, None, None, None, None
         
-        # Recherche de montants en euros
-        montants_euros = re.findall(r'(\d+[\s\u202f]?\d*)\s*€', montant_str)
-        if montants_euros:
-            montants = [int(m.replace(' ', '').replace('\u202f', '')) for m in montants_euros]
-            if len(montants) == 1:
-                montant_max = montants[0]
-            elif len(montants) >= 2:
-                montant_min = min(montants)
-                montant_max = max(montants)
-        
-        # Recherche de taux en pourcentage
-        taux = re.findall(r'(\d+)\s*%', montant_str)
+        # Montants en euros et taux en pourcentage (motifs précompilés)
+        montants, taux = montants_et_taux(montant_str)
+        montant_min, montant_max = bornes(montants)
         if taux:
             type_montant = TypeMontant.POURCENTAGE
-            taux_values = [int(t) for t in taux]
-            if len(taux_values) == 1:
-                taux_max = taux_values[0]
-            elif len(taux_values) >= 2:
-                taux_min = min(taux_values)
-                taux_max = max(taux_values)
+            taux_min, taux_max = bornes(taux)
         
         # Détection du type selon le texte
-        if '/ha' in montant_str.lower() or 'hectare' in montant_str.lower():
+        if PAR_HECTARE.search(montant_str):
             type_montant = TypeMontant.SURFACE
-        elif '/tête' in montant_str.lower() or 'animal' in montant_str.lower():
+        elif PAR_TETE.search(montant_str):
             type_montant = TypeMontant.TETE
         
         return type_montant, montant_min, montant_max, taux_min, taux_max
     
-    def extract_eligibility_criteria(self, aide_data: Dict[str, Any]) -> Dict[str, Any]:
+    def extract_eligibility_criteria(self, aide_data: Dict[str, Any],
+                                     eligibility_texte: Optional[str] = None) -> Dict[str, Any]:
         """
         Extrait les critères d'éligibilité depuis la description
         
         Args:
             aide_data: Données brutes de l'aide
+            eligibility_texte: Conditions d'éligibilité déjà extraites du HTML (sinon extraites ici)
             
         Returns:
             Dictionnaire avec les critères extraits
         """
-        eligibility = aide_data.get('eligibility')
-        eligibility_text = str(eligibility).lower() if eligibility is not None else ''
+        if eligibility_texte is None:
+            eligibility_texte = html_vers_texte(aide_data.get('eligibility'))
+        eligibility_text = eligibility_texte.lower()
         
         criteria = {
             'jeune_agriculteur': None,
@@ -440,9 +456,10 @@ class AidesTerritoiresSync:
         if not isinstance(titre, str):
             titre = str(titre)
             
-        description = aide_data.get('description') or ''
-        if not isinstance(description, str):
-            description = str(description)
+        # HTML nettoyé (affichage) et texte brut (détections, recherche, export), en une passe
+        description = extraire_html(aide_data.get('description'))
+        eligibilite = extraire_html(aide_data.get('eligibility'))
+        contact = extraire_html(aide_data.get('contact'))
 
         # Organisme (préférer financers_full si disponible, sinon financers)
         financers_full = aide_data.get('financers_full', [])
@@ -505,23 +522,16 @@ class AidesTerritoiresSync:
         
         date_limite = aide_data.get('submission_deadline')
         
-        # Statut
-        statut = 'active'
-        if date_limite:
-            try:
-                deadline = datetime.fromisoformat(date_limite.replace('Z', '+00:00'))
-                if deadline < datetime.now(timezone.utc):
-                    statut = 'expiree'
-            except:
-                pass
+        # Statut (même règle que le planificateur d'expiration)
+        statut = 'expiree' if est_expiree(date_limite) else 'active'
         
         # Détections intelligentes
-        productions = self.detect_productions(aide_data)
+        productions = self.detect_productions(aide_data, description.texte)
         projets = self.detect_projets(aide_data)
         regions, departements = self.extract_perimeter(aide_data)
         
         # Critères extraits
-        extra_criteria = self.extract_eligibility_criteria(aide_data)
+        extra_criteria = self.extract_eligibility_criteria(aide_data, eligibilite.texte)
         
         # Construction des critères
         criteres = CriteresEligibilite(
@@ -559,7 +569,7 @@ class AidesTerritoiresSync:
             aid_id=aid_id,
             id_externe=id_externe,
             titre=titre,
-            description=description,
+            description=description.html,
             organisme=organisme,
             programme=programme,
             source='aides_territoires',
@@ -570,13 +580,19 @@ class AidesTerritoiresSync:
             statut=statut,
             criteres=criteres,
             montant=montant,
-            conditions_eligibilite=aide_data.get('eligibility', ''),
+            conditions_eligibilite=eligibilite.html,
             demarche=aide_data.get('application_url', ''),
+            contact=contact.html or None,
             lien_officiel=url,
             confiance=0.8,
             tags=tags,
             raw_data=aide_data
         )
+        self.textes[aid_id] = {
+            'description_texte': description.texte,
+            'conditions_eligibilite_texte': eligibilite.texte,
+            'contact_texte': contact.texte,
+        }
         
         return aide_v2
     
@@ -594,14 +610,50 @@ class AidesTerritoiresSync:
         updated = 0
         errors = 0
         
+        # Empreintes des critères et champs comptés dans les statistiques déjà stockés (une requête par batch)
+        empreintes, anciens = {}, {}
+        async for doc in self.db.aides_v2.find(
+            {'aid_id': {'$in': [aide.aid_id for aide in aides_v2]}},
+            {**PROJECTION_STATS, 'empreinte_criteres': 1}
+        ):
+            empreintes[doc['aid_id']] = doc.get('empreinte_criteres')
+            anciens[doc['aid_id']] = doc
+        
+        # raw_data archivé compressé dans aides_raw avant l'écriture des documents chauds
+        date = datetime.now(timezone.utc).isoformat()
+        documents, archives = [], []
         for aide in aides_v2:
+            aide_dict = aide.model_dump()
+            aide_dict['empreinte_criteres'] = empreinte_criteres(aide)
+            # Textes extraits du HTML à la normalisation (recalculés si l'aide vient d'ailleurs)
+            aide_dict.update(self.textes.pop(aide.aid_id, None) or textes_aide(aide_dict))
+            # Signaux de critères (analyse du catalogue sans reparcourir les textes)
+            aide_dict['signaux_criteres'] = signaux_texte(
+                f"{aide_dict['conditions_eligibilite_texte']}\n{aide_dict['description_texte']}"
+            )
+            archive = separer_raw_data(aide_dict, date)
+            if archive is not None:
+                archives.append(archive)
+            documents.append((aide, aide_dict))
+        try:
+            self.versions_raw += await archiver(self.db, archives)
+            archive_ok = True
+        except Exception as e:
+            # raw_data reste embarqué, déplacé plus tard par migrer_raw_data
+            logger.error(f"❌ Erreur archivage raw_data: {e}")
+            archive_ok = False
+        
+        ecart_stats = Counter()
+        for aide, aide_dict in documents:
             try:
-                aide_dict = aide.model_dump()
-                
-                # Upsert (insert ou update)
+                if archive_ok:
+                    # Upsert (insert ou update), raw_data retiré des documents déjà stockés
+                    update = {'$set': aide_dict, '$unset': {'raw_data': ''}}
+                else:
+                    update = {'$set': {**aide_dict, 'raw_data': aide.raw_data}}
                 result = await self.db.aides_v2.update_one(
                     {'aid_id': aide.aid_id},
-                    {'$set': aide_dict},
+                    update,
                     upsert=True
                 )
                 
@@ -609,11 +661,20 @@ class AidesTerritoiresSync:
                     inserted += 1
                 elif result.modified_count > 0:
                     updated += 1
+                ecart_stats.update(delta(aide_dict, anciens.get(aide.aid_id)))
+                # Une aide déjà expirée (date limite passée) ne notifie personne
+                if aide_dict['statut'] == 'active' and a_percoler(
+                    aide.aid_id, aide_dict['empreinte_criteres'], empreintes
+                ):
+                    self.aides_a_percoler.append(aide)
                     
             except Exception as e:
                 logger.error(f"❌ Erreur import {aide.aid_id}: {e}")
                 errors += 1
         
+        # Statistiques matérialisées du catalogue : un $inc par batch
+        await appliquer_delta_sans_erreur(self.db, ecart_stats)
+        
         return {'inserted': inserted, 'updated': updated, 'errors': errors}
     
     async def sync(self, max_pages: Optional[int] = None) -> Dict[str, Any]:
@@ -685,7 +746,25 @@ class AidesTerritoiresSync:
             
             logger.info(f"      ✅ Insérées: {stats['inserted']}, Mises à jour: {stats['updated']}, Erreurs: {stats['errors']}")
         
-        # 4. Statistiques finales
+        # 4. Percolation des aides nouvelles ou modifiées contre les profils sauvegardés
+        logger.info(f"\n🔔 Phase 4: Percolation de {len(self.aides_a_percoler)} aides nouvelles ou modifiées...")
+        percolation = None
+        if self.aides_a_percoler:
+            try:
+                percolation = await percoler_aides(self.db, self.aides_a_percoler)
+            except Exception as e:
+                logger.error(f"❌ Erreur percolation: {e}")
+        
+        # 5. Publication du snapshot catalogue (partagé par les workers de l'API)
+        logger.info(f"\n📦 Phase 5: Publication du snapshot catalogue...")
+        catalog_version = None
+        try:
+            snapshot = await publish_catalog_snapshot(self.db)
+            catalog_version = snapshot.version
+        except Exception as e:
+            logger.error(f"❌ Erreur publication snapshot: {e}")
+        
+        # 6. Statistiques finales
         elapsed = time.time() - start_time
         
         logger.info(f"\n" + "=" * 60)
@@ -696,7 +775,9 @@ class AidesTerritoiresSync:
         logger.info(f"✅ Aides normalisées: {len(aides_v2)}")
         logger.info(f"➕ Nouvelles aides: {total_inserted}")
         logger.info(f"🔄 Mises à jour: {total_updated}")
+        logger.info(f"🗄️  Versions brutes archivées: {self.versions_raw}")
         logger.info(f"❌ Erreurs: {erreurs_normalisation + total_errors}")
+        logger.info(f"📦 Version catalogue: {catalog_version}")
         logger.info(f"=" * 60)
         
         return {
@@ -706,6 +787,9 @@ class AidesTerritoiresSync:
             'inserted': total_inserted,
             'updated': total_updated,
             'errors': erreurs_normalisation + total_errors,
+            'catalog_version': catalog_version,
+            'percolation': percolation,
+            'versions_raw': self.versions_raw,
             'duration_seconds': elapsed
         }
 
@@ -786,21 +870,15 @@ async def debug_first_aide(db) -> Dict[str, Any]:
 
 
 if __name__ == "__main__":
-    import os
-    from dotenv import load_dotenv
-    from motor.motor_asyncio import AsyncIOMotorClient
-    from pathlib import Path
+    logging.basicConfig(level=logging.INFO)
     
-    ROOT_DIR = Path(__file__).parent
-    load_dotenv(ROOT_DIR / '.env')
+    from database import get_db, close_client
     
-    mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
-    client = AsyncIOMotorClient(mongo_url)
-    db = client[os.environ.get('DB_NAME', 'agrisubv_db')]
+    db = get_db()
     
     # Synchronisation (limité à 5 pages pour test)
     result = asyncio.run(sync_aides_territoires_v2(db, max_pages=5))
     
     print(f"\n📊 Résultat final: {result}")
     
-    client.close()
+    close_client()
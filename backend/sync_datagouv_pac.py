@@ -11,7 +11,9 @@ from datetime import datetime, timezone
 from typing import List, Dict, Any, Optional
 import logging
 
-logging.basicConfig(level=logging.INFO)
+from catalog_stats import recalculer_stats_legacy_sans_erreur
+from fixture_transport import monter_requests
+
 logger = logging.getLogger(__name__)
 
 # URL du dataset PAC sur Data.gouv.fr
@@ -32,7 +34,7 @@ class DataGouvPACSyncer:
     """Classe pour synchroniser les aides PAC depuis Data.gouv.fr"""
     
     def __init__(self):
-        self.session = requests.Session()
+        self.session = monter_requests(requests.Session())
         self.session.headers.update({
             'User-Agent': 'AgriSubv/1.0 (https://agrisubv.onrender.com)',
         })
@@ -320,6 +322,7 @@ async def sync_pac_to_db(db, limit: Optional[int] = None) -> Dict[str, Any]:
         except Exception as e:
             logger.error(f"❌ Erreur insertion aide {aide['aid_id']}: {e}")
             errors_count += 1
+    await recalculer_stats_legacy_sans_erreur(db)
     
     logger.info(f"✅ Synchronisation PAC terminée !")
     logger.info(f"   - Nouvelles aides PAC : {inserted_count}")
@@ -338,15 +341,11 @@ async def sync_pac_to_db(db, limit: Optional[int] = None) -> Dict[str, Any]:
 
 
 if __name__ == "__main__":
-    from motor.motor_asyncio import AsyncIOMotorClient
-    import os
-    from dotenv import load_dotenv
+    logging.basicConfig(level=logging.INFO)
     
-    load_dotenv()
+    from database import get_db
     
-    mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
-    client = AsyncIOMotorClient(mongo_url)
-    db = client[os.environ.get('DB_NAME', 'agrisubv_db')]
+    db = get_db()
     
     result = asyncio.run(sync_pac_to_db(db))
     print(f"\n📊 Résultat : {result}")
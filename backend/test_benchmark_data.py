@@ -0,0 +1,26 @@
+"""
+Tests for benchmark_data.py
+Synthetic catalogues and profiles are deterministic and valid
+"""
+
+from benchmark_data import generate_aides, generate_profil_payloads, generate_profils
+from server import ProfilAgriculteurLegacy, convert_legacy_to_v2
+
+
+def test_generators_are_deterministic():
+    """The same seed yields the same catalogue and profiles"""
+    first = [a.model_dump(exclude={'derniere_maj'}) for a in generate_aides(50, seed=1)]
+    second = [a.model_dump(exclude={'derniere_maj'}) for a in generate_aides(50, seed=1)]
+    assert first == second
+    assert generate_profil_payloads(20, seed=3) == generate_profil_payloads(20, seed=3)
+
+
+def test_profiles_follow_questionnaire_answer_space():
+    """V2 and legacy payloads validate and keep questionnaire answers"""
+    profils = generate_profils(30)
+    assert all(p.productions for p in profils)
+    assert len({p.region for p in profils}) > 1
+
+    for payload in generate_profil_payloads(30, legacy=True):
+        profil = convert_legacy_to_v2(ProfilAgriculteurLegacy(**payload))
+        assert profil.sau_totale == payload['superficie_ha']
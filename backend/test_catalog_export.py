@@ -0,0 +1,118 @@
+"""
+Tests for catalog_export.py
+Exports are built from the local catalog, streamed, and only regenerated when the catalog version changes
+"""
+
+import asyncio
+import csv
+import io
+from types import SimpleNamespace
+
+import orjson
+
+import catalog_export
+from catalog_export import CatalogExportStore, ligne_export, reponse_export
+from html_text import textes_aide
+
+
+def aide(aid_id, statut="active", **extra):
+    return {
+        "aid_id": aid_id, "titre": f"Aide {aid_id}", "organisme": "Région", "statut": statut,
+        "description": "<p>Premier</p><p>Second</p>", "raw_data": {"contact": "<b>x</b>"},
+        "criteres": {"regions": ["Bretagne", "Normandie"]}, "montant": {"montant_max": 5000.0},
+        "tags": ["bio"], **extra,
+    }
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, cle, sens):
+        self.docs = sorted(self.docs, key=lambda d: d[cle], reverse=sens < 0)
+        return self
+
+    def batch_size(self, n):
+        return self
+
+    async def __aiter__(self):
+        for doc in self.docs:
+            yield dict(doc)
+
+
+class FakeAides:
+    def __init__(self, docs):
+        self.docs = docs
+        self.finds = 0
+
+    def find(self, filtre, projection=None):
+        self.finds += 1
+        docs = [{k: v for k, v in d.items() if k not in projection}
+                for d in self.docs if d["statut"] == filtre["statut"]]
+        return FakeCursor(docs)
+
+
+async def collect(stream):
+    return b"".join([bloc async for bloc in stream])
+
+
+def test_rows_use_text_stored_at_ingest():
+    """Stored *_texte fields win; older documents are converted on the fly"""
+    textes = textes_aide(aide("A"))
+    assert textes["description_texte"] == "Premier\nSecond" and textes["contact_texte"] == "x"
+    assert ligne_export({**aide("A"), "description_texte": "stocké"})["description"] == "stocké"
+    assert ligne_export(aide("A"))["description"] == "Premier\nSecond"
+
+
+def test_export_is_cached_until_the_version_changes(tmp_path):
+    """Second request replays the content-addressed file; a new version regenerates it"""
+    aides = FakeAides([aide("B"), aide("A"), aide("C", statut="expiree")])
+    db = SimpleNamespace(aides_v2=aides)
+    store = CatalogExportStore(tmp_path)
+
+    ndjson = asyncio.run(collect(store.generer(db, "ndjson", 1)))
+    lignes = [orjson.loads(l) for l in ndjson.splitlines()]
+    assert [l["aid_id"] for l in lignes] == ["A", "B"] and lignes[0]["regions"] == ["Bretagne", "Normandie"]
+
+    entree = store.existant("ndjson", 1)
+    assert entree is not None and b"".join(store.lire(entree)) == ndjson and aides.finds == 1
+    assert store.existant("ndjson", 2) is None
+
+    aides.docs.append(aide("D"))
+    asyncio.run(collect(store.generer(db, "ndjson", 2)))
+    assert store.existant("ndjson", 2)["sha256"] != entree["sha256"]
+    assert not store.path(entree).exists()
+
+
+def test_csv_export_and_http_revalidation(tmp_path):
+    """CSV has a header and joined lists; a cached export answers 304 to its ETag"""
+    db = SimpleNamespace(aides_v2=FakeAides([aide("A")]))
+    store = CatalogExportStore(tmp_path)
+    request = SimpleNamespace(headers={})
+
+    response = reponse_export(request, db, "csv", 3, store)
+    assert "ETag" not in response.headers
+    corps = asyncio.run(collect(response.body_iterator))
+    ligne = next(csv.DictReader(io.StringIO(corps.decode())))
+    assert ligne["regions"] == "Bretagne | Normandie" and ligne["montant_max"] == "5000.0"
+
+    response = reponse_export(request, db, "csv", 3, store)
+    etag = response.headers["ETag"]
+    assert response.headers["Content-Length"] == str(len(corps))
+    revalidation = reponse_export(SimpleNamespace(headers={"if-none-match": etag}), db, "csv", 3, store)
+    assert revalidation.status_code == 304 and db.aides_v2.finds == 1
+
+
+def test_interrupted_export_is_not_cached(tmp_path, monkeypatch):
+    """A client disconnect leaves no index entry nor temp file"""
+    db = SimpleNamespace(aides_v2=FakeAides([aide(str(i)) for i in range(5)]))
+    store = CatalogExportStore(tmp_path)
+
+    async def interrompre():
+        stream = store.generer(db, "ndjson", 1)
+        await stream.__anext__()
+        await stream.aclose()
+
+    monkeypatch.setattr(catalog_export, "EXPORT_BATCH_SIZE", 2)
+    asyncio.run(interrompre())
+    assert store.existant("ndjson", 1) is None and list(tmp_path.iterdir()) == []
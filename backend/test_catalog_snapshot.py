@@ -0,0 +1,111 @@
+"""
+Tests for catalog_snapshot.py
+Round-trip of the binary catalog and atomic version switching
+"""
+
+import asyncio
+
+import catalog_snapshot
+from catalog_snapshot import CatalogSnapshotStore, load_catalog
+from models_v2 import (
+    AideAgricoleV2, CriteresEligibilite, MontantAide,
+    TypeProduction, TypeProjet, StatutJuridique, TypeMontant
+)
+
+
+def make_aide(i: int, **criteres) -> AideAgricoleV2:
+    return AideAgricoleV2(
+        aid_id=f"AT-{i}",
+        titre=f"Aide {i} — éleveurs",
+        organisme="Région Bretagne",
+        description="<p>Description</p>",
+        criteres=CriteresEligibilite(**criteres),
+        montant=MontantAide(
+            type_montant=TypeMontant.SURFACE,
+            montant_par_unite=120.5,
+            plafond=15000
+        ),
+        tags=["Agriculture", "Subvention"],
+        raw_data={"id": i}
+    )
+
+
+def test_roundtrip_preserves_aides(tmp_path):
+    """Decoded aides must equal the source models (raw_data excluded)"""
+    aides = [
+        make_aide(
+            1,
+            regions=["Bretagne", "National"],
+            departements=["35"],
+            age_max=40,
+            superficie_min=2.5,
+            jeune_agriculteur=True,
+            types_production=[TypeProduction.MARAICHAGE, TypeProduction.CEREALES],
+            types_projets=[TypeProjet.INSTALLATION],
+            statuts_juridiques=[StatutJuridique.EARL, StatutJuridique.GAEC],
+            labels_requis=["Agriculture Biologique"]
+        ),
+        make_aide(2),
+    ]
+
+    store = CatalogSnapshotStore(tmp_path)
+    snapshot = store.publish(aides)
+
+    assert snapshot.version == 1
+    assert len(snapshot) == 2
+    decoded = snapshot.load_aides()
+    for original, copy in zip(aides, decoded):
+        assert copy.model_dump() == original.model_dump(exclude={'raw_data'}) | {'raw_data': None}
+
+    # Order of enum lists is preserved (used in explanations)
+    assert decoded[0].criteres.types_production == [TypeProduction.MARAICHAGE, TypeProduction.CEREALES]
+    assert decoded[1].criteres.jeune_agriculteur is None
+    assert decoded[0].criteres.age_max == 40 and isinstance(decoded[0].criteres.age_max, int)
+
+
+def test_publish_switches_version_for_other_readers(tmp_path):
+    """A second store (another worker) picks up the new version on next access"""
+    writer = CatalogSnapshotStore(tmp_path)
+    reader = CatalogSnapshotStore(tmp_path)
+
+    assert reader.current() is None
+
+    writer.publish([make_aide(1)])
+    first = reader.current()
+    assert first.version == 1
+    assert reader.current() is first
+
+    writer.publish([make_aide(1), make_aide(2)])
+    second = reader.current()
+    assert second.version == 2
+    assert len(second) == 2
+
+
+def test_old_versions_are_cleaned_up(tmp_path):
+    """Only the most recent snapshot files are kept on disk"""
+    store = CatalogSnapshotStore(tmp_path)
+    for _ in range(5):
+        store.publish([make_aide(1)])
+
+    files = sorted(p.name for p in tmp_path.glob("catalog-v*.bin"))
+    assert files == ["catalog-v00000003.bin", "catalog-v00000004.bin", "catalog-v00000005.bin"]
+    assert store.current().version == 5
+
+
+def test_cold_start_publishes_once(tmp_path, monkeypatch):
+    """Concurrent requests without a snapshot build a single version"""
+    store = CatalogSnapshotStore(tmp_path)
+    appels = []
+
+    async def publish(db, store):
+        appels.append(db)
+        await asyncio.sleep(0.01)
+        return await asyncio.to_thread(store.publish, [make_aide(1)])
+
+    monkeypatch.setattr(catalog_snapshot, "publish_catalog_snapshot", publish)
+
+    async def scenario():
+        return await asyncio.gather(*[load_catalog("primary", store) for _ in range(5)])
+
+    versions = {snapshot.version for snapshot in asyncio.run(scenario())}
+    assert versions == {1} and appels == ["primary"]
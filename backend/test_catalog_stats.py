@@ -0,0 +1,183 @@
+"""
+Tests for catalog_stats.py
+Incremental updates of the materialized catalog statistics match a full recount
+"""
+
+import asyncio
+import copy
+
+from catalog_stats import (
+    HISTORY_COLLECTION, STATS_COLLECTION, appliquer_delta, delta, enregistrer_historique, historique,
+    lire_stats, lire_stats_legacy, recalculer_stats, recalculer_stats_legacy_sans_erreur, vue_stats,
+)
+from expiry_scheduler import basculer_expirees
+
+
+def aide(aid_id, regions=("Bretagne",), montant_max=8000.0, **extra):
+    return {
+        "aid_id": aid_id, "source": "aides_territoires", "statut": "active", "tags": ["Agriculture"],
+        "criteres": {"regions": list(regions), "types_production": ["Élevage ovin"]},
+        "montant": {"montant_max": montant_max, "taux_max": 40},
+        "signaux_criteres": {"bio": ["bio"], "plafond": ["8 000"]}, **extra,
+    }
+
+
+class Cursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, cle, sens):
+        self.docs = sorted(self.docs, key=lambda d: d[cle], reverse=sens < 0)
+        return self
+
+    async def to_list(self, length=None):
+        return self.docs[:length]
+
+    async def __aiter__(self):
+        for doc in self.docs:
+            yield dict(doc)
+
+
+class Collection:
+    def __init__(self, docs=()):
+        self.docs = [dict(d) for d in docs]
+
+    def find(self, filtre=None, projection=None):
+        return Cursor([dict(d) for d in self.docs])
+
+    async def find_one(self, filtre):
+        return next((dict(d) for d in self.docs if d["_id"] == filtre["_id"]), None)
+
+    async def replace_one(self, filtre, doc, upsert=False):
+        self.docs = [d for d in self.docs if d["_id"] != filtre["_id"]] + [copy.deepcopy(doc)]
+
+    async def update_one(self, filtre, update):
+        doc = next((d for d in self.docs if d["_id"] == filtre["_id"]), None)
+        if doc is not None:
+            for chemin, valeur in update["$inc"].items():
+                cible = doc
+                *sections, cle = chemin.split(".")
+                for section in sections:
+                    cible = cible.setdefault(section, {})
+                cible[cle] = cible.get(cle, 0) + valeur
+            doc.update(update["$set"])
+        return type("R", (), {"matched_count": int(doc is not None)})()
+
+    async def insert_one(self, doc):
+        self.docs.append(copy.deepcopy(doc))
+
+    async def find_one_and_update(self, filtre, update, projection=None):
+        for doc in self.docs:
+            if doc["aid_id"] == filtre["aid_id"] and doc["statut"] == filtre["statut"]:
+                ancien = dict(doc)
+                doc.update(update["$set"])
+                return ancien
+        return None
+
+
+class LegacyAides:
+    """Legacy `aides` collection that counts its count_documents calls"""
+
+    def __init__(self, docs):
+        self.docs, self.comptages = docs, 0
+
+    async def count_documents(self, filtre):
+        self.comptages += 1
+        return sum(all(doc.get(k) == v for k, v in filtre.items()) for doc in self.docs)
+
+    async def find_one(self, filtre):
+        return next((doc for doc in self.docs if doc.get("aid_id") == filtre["aid_id"]), None)
+
+    async def insert_one(self, doc):
+        self.docs.append(dict(doc))
+
+
+class FakeDb:
+    def __init__(self, aides, legacy=()):
+        self.aides_v2 = Collection(aides)
+        self.aides = LegacyAides(list(legacy))
+        self.collections = {STATS_COLLECTION: Collection(), HISTORY_COLLECTION: Collection()}
+
+    def __getitem__(self, nom):
+        return self.collections[nom]
+
+
+def sans_dates(stats):
+    return {k: v for k, v in stats.items() if k not in ("maj_le", "recalcule_le")}
+
+
+def test_incremental_updates_match_full_recount():
+    """Upserts and expiries applied as deltas give the same document as a recount"""
+    db = FakeDb([aide("AT-1"), aide("AT-2", regions=("Normandie",), montant_max=150000.0)])
+
+    async def scenario():
+        await lire_stats(db)  # premier usage : recalcul
+        ancien, nouveau = db.aides_v2.docs[0], aide("AT-1", regions=("Bretagne", "Normandie"), signaux_criteres={})
+        db.aides_v2.docs[0] = nouveau
+        ajoutee = aide("AT-3", source="manual", montant_max=None)
+        db.aides_v2.docs.append(ajoutee)
+        ecart = delta(nouveau, ancien)
+        ecart.update(delta(ajoutee, None))
+        await appliquer_delta(db, ecart)
+        assert await basculer_expirees(db, ["AT-2", "AT-2"]) == 1
+        return await lire_stats(db), await recalculer_stats(db)
+
+    incremental, recompte = asyncio.run(scenario())
+    incremental = {k: ({c: n for c, n in v.items() if n} if isinstance(v, dict) else v) for k, v in incremental.items()}
+    assert sans_dates(incremental) == sans_dates(recompte)
+    assert recompte["par_statut"] == {"active": 2, "expiree": 1}
+    assert recompte["par_region"] == {"Bretagne": 2, "Normandie": 1}
+    assert recompte["criteres"] == {"bio_mentioned": 1, "with_plafond": 1, "agriculture_category": 2}
+
+
+def test_served_view_and_history():
+    """Zero counters are hidden, percentages are over active aides, history is oldest first"""
+    db = FakeDb([aide("AT-1"), aide("AT-2", montant_max=None, statut="expiree")])
+
+    async def scenario():
+        await enregistrer_historique(db, 1)
+        db.aides_v2.docs.append(aide("AT-3", regions=("Occitanie",)))
+        await appliquer_delta(db, delta(db.aides_v2.docs[-1], None))
+        await enregistrer_historique(db, 2)
+        return vue_stats(await lire_stats(db)), await historique(db, limit=10)
+
+    vue, entrees = asyncio.run(scenario())
+    assert vue["total"] == 3 and vue["actives"] == 2 and vue["montant_max_moyen"] == 8000
+    assert vue["criteres_pourcentage"]["bio_mentioned"] == 100.0
+    assert vue["montants"] == {"5k_20k": 2} and vue["taux"] == {"21_40": 2}
+    assert [(e["version"], e["actives"]) for e in entrees] == [(1, 1), (2, 2)]
+    assert not +delta(aide("AT-1"), aide("AT-1")) and not -delta(aide("AT-1"), aide("AT-1"))
+
+
+def test_legacy_counts_are_materialized_separately():
+    """/api/stats keeps counting the legacy collection, recomputed after writes rather than on read"""
+    db = FakeDb([aide("AT-1")], legacy=[{"expiree": False}, {"expiree": True}])
+
+    async def scenario():
+        premiere = await lire_stats_legacy(db)  # premier usage : recalcul
+        db.aides.docs.append({"expiree": False})
+        avant_sync = await lire_stats_legacy(db)
+        await recalculer_stats_legacy_sans_erreur(db)  # fin de synchronisation legacy
+        return premiere, avant_sync, await lire_stats_legacy(db), await lire_stats(db)
+
+    premiere, avant_sync, apres_sync, v2 = asyncio.run(scenario())
+    assert (premiere["total"], premiere["actives"]) == (2, 1) == (avant_sync["total"], avant_sync["actives"])
+    assert (apres_sync["total"], apres_sync["actives"]) == (3, 2) and db.aides.comptages == 4
+    assert v2["total"] == 1
+
+
+def test_legacy_counts_follow_single_aide_writes(monkeypatch):
+    """POST /api/aides refreshes the legacy counters served by /api/stats"""
+    import server
+
+    db = FakeDb([], legacy=[{"aid_id": "L-1", "expiree": False}])
+    monkeypatch.setattr(server, "db", db)
+
+    async def scenario():
+        avant = await lire_stats_legacy(db)
+        aide_legacy = server.AideAgricole(aid_id="L-2", titre="Aide", organisme="DRAAF", programme="PCAE", source_url="")
+        await server.create_or_update_aide(aide_legacy)
+        return avant, await lire_stats_legacy(db)
+
+    avant, apres = asyncio.run(scenario())
+    assert (avant["total"], apres["total"], apres["actives"]) == (1, 2, 2)
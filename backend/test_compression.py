@@ -0,0 +1,82 @@
+"""
+Tests for compression.py and json_responses.py
+Negotiated compression of full and streamed responses, orjson encoding
+"""
+
+import gzip
+import json
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from compression import CompressionMiddleware, choose_encoding
+from json_responses import FastJSONResponse
+from models_v2 import DetailCritere
+
+
+def make_app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=500)
+
+    @app.get("/big")
+    async def big():
+        return FastJSONResponse({"resultats": [{"titre": "Aide régionale", "score": 87.5}] * 200})
+
+    @app.get("/small")
+    async def small():
+        return FastJSONResponse({"status": "ok"})
+
+    @app.get("/stream")
+    async def stream():
+        async def lines():
+            for i in range(100):
+                yield (json.dumps({"i": i, "titre": "Élevage"}) + "\n").encode()
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    return app
+
+
+def test_accept_encoding_negotiation():
+    """q-values are honoured and brotli is only chosen when available"""
+    assert choose_encoding("gzip, deflate", ["br", "gzip"]) == "gzip"
+    assert choose_encoding("gzip;q=0.5, br", ["br", "gzip"]) == "br"
+    assert choose_encoding("br;q=0, gzip;q=0.1", ["br", "gzip"]) == "gzip"
+    assert choose_encoding("identity", ["br", "gzip"]) is None
+    assert choose_encoding("br", ["gzip"]) is None
+
+
+def test_large_response_is_gzipped_and_small_one_is_not():
+    """Only payloads above the threshold are compressed"""
+    client = TestClient(make_app())
+
+    response = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert response.json()["resultats"][0]["titre"] == "Aide régionale"
+    assert int(response.headers["content-length"]) < len(response.content)
+
+    response = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.json() == {"status": "ok"}
+
+
+def test_streamed_response_is_compressed_incrementally():
+    """Streamed bodies are compressed chunk by chunk without Content-Length"""
+    client = TestClient(make_app())
+
+    with client.stream("GET", "/stream", headers={"Accept-Encoding": "gzip"}) as response:
+        raw = b"".join(response.iter_raw())
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    lines = gzip.decompress(raw).decode().splitlines()
+    assert len(lines) == 100 and json.loads(lines[-1]) == {"i": 99, "titre": "Élevage"}
+
+
+def test_fast_json_response_encodes_models():
+    """Pydantic models nested in the content are serialized without revalidation"""
+    detail = DetailCritere(nom="Région", valide=True, points=17.5)
+    body = FastJSONResponse({"details": [detail], "n": 1}).body
+
+    assert json.loads(body) == {"details": [detail.model_dump()], "n": 1}
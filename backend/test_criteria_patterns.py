@@ -0,0 +1,35 @@
+"""
+Tests for criteria_patterns.py
+Precompiled patterns shared by both syncs and criteria signals computed at import
+"""
+
+from criteria_patterns import bornes, criteres_mentionnes, montants_et_taux, productions_mentionnees, signaux_texte
+from models_v2 import TypeMontant
+from sync_aides_territoires import AidesTerritoiresSyncer
+from sync_aides_territoires_v2 import AidesTerritoiresSync
+
+
+def test_amounts_are_shared_by_both_syncs():
+    montant = {"subvention_rate": "De 1 500 € à 20 000 € par hectare, 30 % à 40 %"}
+    assert montants_et_taux(montant["subvention_rate"]) == ([1500, 20000], [30, 40])
+    assert bornes([]) == (None, None) and bornes([7]) == (None, 7)
+    assert AidesTerritoiresSync(db=None).extract_montants(montant) == (TypeMontant.SURFACE, 1500, 20000, 30, 40)
+    assert AidesTerritoiresSyncer()._extract_montants(montant) == (1500, 20000, 30, 40)
+
+
+def test_signals_extracted_with_values():
+    """Presence and captured values come from the same scan; word boundaries avoid 'ab' in 'établissement'"""
+    signaux = signaux_texte(
+        "Jeunes Agriculteurs de moins de 40 ans, SAU minimum 10 ha. Agriculture biologique.\n"
+        "Taux de 40 %, plafond de 15 000 €, 300 €/ha. Élevage ovin. Établissement tabac."
+    )
+    assert signaux["sau"] == ["10"] and signaux["taux"] == ["40"] and signaux["plafond"] == ["15 000"]
+    assert signaux["montant_ha"] == ["300"] and signaux["prod_elevage_ovin"] == ["ovin"]
+    assert signaux["bio"] == ["agriculture biologique"]
+    assert {"age_ja", "sau", "bio"} <= set(signaux) and "diplome" not in signaux
+
+
+def test_signals_map_to_frequency_keys():
+    signaux = {"age_ja": ["ja"], "taux": ["40"], "prod_apiculture": ["miel"]}
+    assert criteres_mentionnes(signaux, ["Agriculture", "Eau"]) == ["age_mentioned", "with_taux", "agriculture_category"]
+    assert productions_mentionnees(signaux) == ["apiculture"] and criteres_mentionnes({}) == []
@@ -0,0 +1,74 @@
+"""
+Tests for database.py
+Pool options come from the environment and pool counters follow CMAP events
+"""
+
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from pymongo.read_preferences import Primary, SecondaryPreferred
+
+import database
+from database import PoolStatsListener, get_client_options
+
+
+ADDRESS = ("mongo-1", 27017)
+
+
+def event(duration: float = 0.0):
+    return SimpleNamespace(address=ADDRESS, connection_id=1, duration=duration)
+
+
+def test_client_options_only_include_configured_values():
+    """Unset variables keep the driver defaults, set ones are converted"""
+    env = {"MONGO_MAX_POOL_SIZE": "50", "MONGO_WAIT_QUEUE_TIMEOUT_MS": "2000", "MONGO_COMPRESSORS": "zlib"}
+    with patch.dict("os.environ", env, clear=True):
+        options = get_client_options()
+
+    assert options["maxPoolSize"] == 50
+    assert options["waitQueueTimeoutMS"] == 2000
+    assert options["compressors"] == "zlib"
+    assert "minPoolSize" not in options
+    assert "socketTimeoutMS" not in options
+
+
+def test_matching_read_preference():
+    """Matching reads default to secondaries, unknown modes fall back to primary"""
+    with patch.object(database, "MATCHING_READ_PREFERENCE", "secondaryPreferred"), \
+            patch.object(database, "MATCHING_MAX_STALENESS_S", "120"):
+        pref = database.get_matching_read_preference()
+    assert isinstance(pref, SecondaryPreferred)
+    assert pref.max_staleness == 120
+
+    with patch.object(database, "MATCHING_READ_PREFERENCE", "bogus"):
+        assert isinstance(database.get_matching_read_preference(), Primary)
+
+
+def test_pool_listener_tracks_checkouts_and_wait_queue():
+    """Checked-out connections, waiters and their peaks are counted per server"""
+    listener = PoolStatsListener()
+    listener.connection_created(event())
+    listener.connection_created(event())
+    listener.connection_check_out_started(event())
+    listener.connection_check_out_started(event())
+    listener.connection_checked_out(event(0.004))
+    listener.connection_checked_out(event(0.002))
+    listener.connection_check_out_started(event())
+    listener.connection_check_out_failed(event())
+    listener.connection_checked_in(event())
+
+    stats = listener.snapshot()["mongo-1:27017"]
+    assert stats["connections_open"] == 2
+    assert stats["checked_out"] == 1
+    assert stats["max_checked_out"] == 2
+    assert stats["wait_queue"] == 0
+    assert stats["max_wait_queue"] == 2
+    assert stats["checkouts"] == 2
+    assert stats["checkout_failures"] == 1
+    assert stats["checkout_wait_avg_ms"] == 3.0
+    assert stats["checkout_wait_max_ms"] == 4.0
+
+    listener.reset_peaks()
+    stats = listener.snapshot()["mongo-1:27017"]
+    assert stats["max_checked_out"] == 1
+    assert stats["checkout_wait_max_ms"] == 0.0
@@ -0,0 +1,82 @@
+"""
+Tests for expiry_scheduler.py
+Deadline parsing, heap ordering and the scheduled active → expiree transition
+"""
+
+import asyncio
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import catalog_snapshot
+from catalog_snapshot import CatalogSnapshotStore, publish_catalog_snapshot
+from expiry_scheduler import EcheancierExpiration, ExpiryScheduler, date_expiration, est_expiree
+
+NOW = datetime(2026, 5, 10, 12, 0, tzinfo=timezone.utc)
+
+
+def test_deadline_parsing():
+    """Date-only deadlines last the whole day; naive datetimes are UTC"""
+    assert date_expiration("2026-05-10") == datetime(2026, 5, 11, tzinfo=timezone.utc)
+    assert date_expiration("2026-05-10T08:00:00") == datetime(2026, 5, 10, 8, tzinfo=timezone.utc)
+    assert date_expiration("2026-05-10T08:00:00Z") == datetime(2026, 5, 10, 8, tzinfo=timezone.utc)
+    assert date_expiration("Permanente") is None and date_expiration(None) is None
+    assert not est_expiree("2026-05-10", NOW) and est_expiree("2026-05-09", NOW)
+
+
+def test_heap_pops_due_aides_in_deadline_order():
+    echeancier = EcheancierExpiration([("c", "2026-07-01"), ("a", "2026-05-01"), ("x", None), ("b", "2026-06-01")])
+    assert len(echeancier) == 3
+    assert echeancier.echues(datetime(2026, 6, 15, tzinfo=timezone.utc)) == ["a", "b"]
+    assert echeancier.prochaine() == datetime(2026, 7, 2, tzinfo=timezone.utc)
+
+
+class FakeAides:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def _match(self, doc, filtre):
+        if "statut" in filtre and doc["statut"] != filtre["statut"]:
+            return False
+        return "aid_id" not in filtre or doc["aid_id"] in filtre["aid_id"]["$in"]
+
+    def find(self, filtre, projection=None):
+        docs = [dict(doc) for doc in self.docs if self._match(doc, filtre)]
+        return SimpleNamespace(to_list=lambda length=None: asyncio.sleep(0, result=docs))
+
+    async def find_one_and_update(self, filtre, update, projection=None):
+        for doc in self.docs:
+            if doc["aid_id"] == filtre["aid_id"] and self._match(doc, {"statut": filtre["statut"]}):
+                ancien = dict(doc)
+                doc.update(update["$set"])
+                return ancien
+        return None
+
+
+def make_doc(i, date_limite):
+    return {"aid_id": f"AT-{i}", "titre": f"Aide {i}", "organisme": "Région",
+            "statut": "active", "date_limite_depot": date_limite}
+
+
+def test_scheduler_expires_due_aides_and_publishes(tmp_path, monkeypatch):
+    """Due aides are flipped when their deadline passes and each flip publishes a catalog version"""
+    store = CatalogSnapshotStore(tmp_path)
+    monkeypatch.setattr(catalog_snapshot, "_store", store)
+    db = SimpleNamespace(aides_v2=FakeAides([
+        make_doc(1, "2030-05-09"), make_doc(2, "2030-05-10T13:00:00Z"), make_doc(3, None),
+    ]))
+    scheduler = ExpiryScheduler(db, max_sleep_s=7200)
+    now = datetime(2030, 5, 10, 12, 0, tzinfo=timezone.utc)
+
+    async def scenario():
+        await publish_catalog_snapshot(db, store)
+        premier = await scheduler.tour(now)
+        statuts = [d["statut"] for d in db.aides_v2.docs]
+        second = await scheduler.tour(datetime(2030, 5, 10, 13, 0, tzinfo=timezone.utc))
+        return premier, statuts, second
+
+    premier, statuts, second = asyncio.run(scenario())
+
+    assert premier == 3600 and statuts == ["expiree", "active", "active"]
+    assert second == 7200 and scheduler.expirees == 2
+    assert store.current().version == 3
+    assert [a.aid_id for a in store.current().load_aides()] == ["AT-3"]
@@ -0,0 +1,82 @@
+"""
+Tests for fixture_transport.py
+Responses recorded once are replayed offline by every client, with deterministic fault injection
+"""
+
+import asyncio
+
+import pytest
+import requests
+
+import fixture_transport
+from fixture_transport import FixtureManquante, FixtureStore, Rejeu, monter_requests
+from sync_aides_territoires import AidesTerritoiresSyncer
+from fake_aides_territoires import TOTAL, api_app, fetch
+
+
+def use_mode(monkeypatch, mode, directory, **rejeu):
+    monkeypatch.setattr(fixture_transport, "FIXTURES_MODE", mode)
+    monkeypatch.setattr(fixture_transport, "FIXTURES_DIR", directory)
+    monkeypatch.setattr(fixture_transport, "_rejeu", Rejeu(FixtureStore(directory), **rejeu))
+
+
+def test_recorded_sync_replays_without_network(tmp_path, monkeypatch):
+    """The aiohttp sync recorded against a server returns the same aides once the server is gone"""
+    use_mode(monkeypatch, "record", tmp_path)
+    app, _ = api_app()
+    enregistrees = fetch(app, monkeypatch)
+    assert len(enregistrees) == TOTAL and len(list(tmp_path.glob("*.gz"))) == TOTAL // 10
+
+    use_mode(monkeypatch, "replay", tmp_path)
+
+    async def rejouer():
+        async with AidesTerritoiresSyncer(concurrency=3) as syncer:
+            return await syncer.fetch_aides_agricoles(page_size=10)
+
+    assert asyncio.run(rejouer()) == enregistrees
+    assert fixture_transport._rejeu.stats == {"rejouees": TOTAL // 10, "erreurs_injectees": 0}
+
+
+def test_fixture_is_shared_by_httpx_and_requests(tmp_path, monkeypatch):
+    """A fixture keyed by URL + params is found whatever client builds the query string"""
+    store = FixtureStore(tmp_path)
+    store.ecrire("GET", "https://at/api/aids/", {"page": 2, "page_size": 50}, 200,
+                 {"Content-Type": "application/json", "Set-Cookie": "x"}, b'{"count": 3}')
+    use_mode(monkeypatch, "replay", tmp_path)
+
+    async def via_httpx():
+        async with fixture_transport.client_httpx() as client:
+            return (await client.get("https://at/api/aids/", params={"page_size": 50, "page": 2})).json()
+
+    assert asyncio.run(via_httpx()) == {"count": 3}
+    session = monter_requests(requests.Session())
+    response = session.get("https://at/api/aids/?page=2&page_size=50")
+    assert response.json() == {"count": 3} and "set-cookie" not in response.headers
+    with pytest.raises(FixtureManquante):
+        session.get("https://at/api/aids/?page=3&page_size=50")
+
+
+def test_fault_injection_is_deterministic(tmp_path):
+    """Same seed, same latencies and injected errors"""
+    store = FixtureStore(tmp_path)
+    store.ecrire("GET", "https://at/api/aids/", None, 200, {}, b"{}")
+
+    def tirages(seed):
+        rejeu = Rejeu(store, latency_ms=20, jitter_ms=10, error_rate=0.3, error_status=503, seed=seed)
+        reponses = [rejeu.repondre_sync("GET", "https://at/api/aids/")[0] for _ in range(50)]
+        return reponses, rejeu.stats
+
+    reponses, stats = tirages(7)
+    assert (reponses, stats) == tirages(7) and reponses != tirages(8)[0]
+    assert set(reponses) == {200, 503} and stats["erreurs_injectees"] == reponses.count(503)
+    rejeu = Rejeu(store, latency_ms=20, jitter_ms=10, seed=1)
+    assert all(0.01 <= rejeu._tirage()[0] <= 0.03 for _ in range(100))
+
+
+def test_off_mode_returns_plain_clients(monkeypatch):
+    monkeypatch.setattr(fixture_transport, "FIXTURES_MODE", "off")
+    session = monter_requests(requests.Session())
+    assert not any(isinstance(a, fixture_transport.AdaptateurRequestsFixtures) for a in session.adapters.values())
+    client = fixture_transport.client_httpx()
+    assert not isinstance(client._transport, fixture_transport.TransportHttpxFixtures)
+    asyncio.run(client.aclose())
@@ -0,0 +1,53 @@
+"""
+Tests for html_text.py
+One streaming pass yields display-safe HTML and the plain text read by detection, search and export
+"""
+
+from html_text import ExtracteurHtml, extraire_html, html_vers_texte
+from sync_aides_territoires_v2 import AidesTerritoiresSync
+
+
+def test_sanitized_html_keeps_formatting_only():
+    """Scripts, handlers and unsafe links are removed; formatting and safe links stay"""
+    resultat = extraire_html(
+        '<div class="x" onclick="go()"><p>Aide <b>bio</b></p><script>alert(1)</script>'
+        '<a href="javascript:alert(1)">a</a> <a href="https://ex.fr/?a=1&amp;b=2" target="_blank">b</a>'
+        '<img src=x onerror=alert(1)><ul><li>un<li>deux</ul>'
+    )
+    assert resultat.html == (
+        '<p>Aide <b>bio</b></p><a>a</a> <a href="https://ex.fr/?a=1&amp;b=2" rel="noopener noreferrer nofollow">b</a>'
+        '<ul><li>un<li>deux</li></li></ul>'
+    )
+    assert "alert" not in resultat.texte and "onclick" not in resultat.html
+
+
+def test_plain_text_one_block_per_line():
+    """Inline tags do not split words; blocks, entities and nbsp are normalized"""
+    texte = html_vers_texte("<p>Jeunes&nbsp;agri<em>culteurs</em> &amp; CUMA</p><p>  moins de\n 40 ans<br>SAU &lt; 50 ha</p>")
+    assert texte == "Jeunes agriculteurs & CUMA\nmoins de 40 ans\nSAU < 50 ha"
+    assert html_vers_texte(None) == "" and html_vers_texte("  déjà du texte ") == "déjà du texte"
+
+
+def test_streaming_feed_matches_single_pass():
+    html = "<p>Élevage <strong>ovin</strong></p><ul><li>brebis</li></ul>" * 20
+    extracteur = ExtracteurHtml()
+    for i in range(0, len(html), 7):
+        extracteur.feed(html[i:i + 7])
+    assert extracteur.resultat() == extraire_html(html)
+
+
+def test_keyword_detection_ignores_markup():
+    """Tag names and attributes no longer trigger keywords; stored fields are cleaned"""
+    syncer = AidesTerritoiresSync(db=None)
+    aide_data = {
+        "id": 1, "name": "Modernisation", "categories": [],
+        "description": '<p class="vin">Matériel</p>', "eligibility": "<p>Exploitations en <b>bio</b></p>",
+        "contact": '<a href="mailto:ddt@ex.fr" style="x">DDT</a>',
+    }
+    aide = syncer.normalize_aide(aide_data)
+    assert syncer.detect_productions(aide_data) == []
+    assert aide.criteres.labels_requis == ["Agriculture Biologique"]
+    assert aide.contact == '<a href="mailto:ddt@ex.fr" rel="noopener noreferrer nofollow">DDT</a>'
+    assert syncer.textes["AT-1"] == {
+        "description_texte": "Matériel", "conditions_eligibilite_texte": "Exploitations en bio", "contact_texte": "DDT",
+    }
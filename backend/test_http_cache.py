@@ -0,0 +1,110 @@
+"""
+Tests for http_cache.py
+Fresh entries skip the network, stale ones revalidate with ETag, bearer tokens are reused
+"""
+
+import asyncio
+
+import httpx
+
+from http_cache import BearerTokenCache, ClientAidesTerritoires, HttpCache
+
+
+class FakeUpstream:
+    """Upstream serving one JSON page with an ETag, answering 304 to a matching If-None-Match"""
+
+    def __init__(self):
+        self.requests = []
+        self.body = b'{"count": 1, "results": [{"id": 1}]}'
+        self.etag = '"v1"'
+
+    async def __call__(self, url, params, headers):
+        self.requests.append(dict(headers))
+        if headers.get("If-None-Match") == self.etag:
+            return 304, {}, b""
+        return 200, {"ETag": self.etag}, self.body
+
+
+def test_fresh_entries_skip_the_network_and_stale_ones_revalidate(tmp_path):
+    upstream = FakeUpstream()
+    cache = HttpCache(tmp_path, ttl_s=60)
+    params = {"page": 1, "page_size": 50}
+
+    async def scenario():
+        premiere = await cache.get(upstream, "https://at/api/aids/", params)
+        seconde = await cache.get(upstream, "https://at/api/aids/", {"page_size": 50, "page": 1})
+        cache.ttl_s = 0
+        troisieme = await cache.get(upstream, "https://at/api/aids/", params)
+        upstream.body, upstream.etag = b'{"count": 2, "results": []}', '"v2"'
+        quatrieme = await cache.get(upstream, "https://at/api/aids/", params)
+        return premiere, seconde, troisieme, quatrieme
+
+    premiere, seconde, troisieme, quatrieme = asyncio.run(scenario())
+
+    assert [r.source for r in (premiere, seconde, troisieme, quatrieme)] == ["reseau", "cache", "revalidee", "reseau"]
+    assert troisieme.json() == premiere.json() and quatrieme.json()["count"] == 2
+    assert len(upstream.requests) == 3 and upstream.requests[1]["If-None-Match"] == '"v1"'
+    assert cache.stats == {"cache": 1, "revalidee": 1, "reseau": 2}
+
+
+def test_bearer_token_is_fetched_once_and_persisted(tmp_path):
+    """Concurrent callers share one authentication; the token survives a restart until its validity ends"""
+    appels = []
+
+    async def obtenir():
+        appels.append(1)
+        await asyncio.sleep(0.01)
+        return f"token-{len(appels)}"
+
+    tokens = BearerTokenCache(tmp_path / "tokens.json")
+
+    async def scenario():
+        return await asyncio.gather(*(tokens.token("api", obtenir) for _ in range(5)))
+
+    assert asyncio.run(scenario()) == ["token-1"] * 5
+    relu = BearerTokenCache(tmp_path / "tokens.json")
+    assert relu.valide("api") == "token-1" and relu.valide("autre") is None
+    assert BearerTokenCache(tmp_path / "tokens.json", validity_s=60).valide("api") is None
+    relu.invalider("api")
+    assert BearerTokenCache(tmp_path / "tokens.json").valide("api") is None
+
+
+def test_bearer_token_is_shared_between_workers(tmp_path):
+    """A worker started before the token was obtained re-reads the file instead of authenticating"""
+    appels = []
+
+    async def obtenir():
+        appels.append(1)
+        return f"token-{len(appels)}"
+
+    premier, second = BearerTokenCache(tmp_path / "tokens.json"), BearerTokenCache(tmp_path / "tokens.json")
+
+    async def scenario():
+        return await premier.token("api", obtenir), await second.token("api", obtenir)
+
+    assert asyncio.run(scenario()) == ("token-1", "token-1") and len(appels) == 1
+    assert (tmp_path / "tokens.json").stat().st_mode & 0o777 == 0o600
+
+
+def test_admin_client_reauthenticates_once_on_401(tmp_path):
+    """A rejected cached token is replaced and the page request retried"""
+    connexions = []
+
+    def handler(request):
+        if request.url.path.endswith("/connexion/"):
+            connexions.append(1)
+            return httpx.Response(200, json={"token": f"jeton-{len(connexions)}"})
+        if request.headers["Authorization"] != "Bearer jeton-2":
+            return httpx.Response(401)
+        return httpx.Response(200, json={"count": 0, "results": []})
+
+    tokens = BearerTokenCache()
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            at = ClientAidesTerritoires(client, "api", HttpCache(tmp_path), tokens)
+            assert await at.authentifier()
+            return await at.get_json("https://at/api/aids/", {"page": 1})
+
+    assert asyncio.run(scenario()) == (200, {"count": 0, "results": []})
+    assert len(connexions) == 2 and tokens.valide("api") == "jeton-2"
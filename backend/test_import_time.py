@@ -0,0 +1,51 @@
+"""
+Import-time budget for server.py
+Measured with `python -X importtime` in a fresh interpreter
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent
+
+# Budget (ms) for `import server`, FastAPI itself accounts for most of it
+IMPORT_TIME_BUDGET_MS = float(os.environ.get('IMPORT_TIME_BUDGET_MS', '1500'))
+
+# Modules only needed by the admin, sync and export subsystems
+LAZY_MODULES = {
+    "bs4", "httpx", "aiohttp", "requests",
+    "explore_aides_endpoint", "export_aides_endpoint", "analyze_criteria_endpoint",
+    "sync_aides_territoires", "sync_aides_territoires_v2", "sync_datagouv_pac",
+}
+
+
+def import_times(module: str) -> dict:
+    """Cumulative import time (µs) per top-level module name"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+        env={**os.environ, "WARMUP_ENABLED": "false"},
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_server_import_does_not_load_admin_subsystems():
+    """Admin, sync and export dependencies are loaded on first use only"""
+    times = import_times("server")
+    loaded = LAZY_MODULES & set(times)
+    assert not loaded, f"Imported at startup: {sorted(loaded)}"
+
+
+def test_server_import_within_budget():
+    """`import server` stays under the cold-start budget"""
+    times = import_times("server")
+    server_ms = times["server"] / 1000
+    assert server_ms < IMPORT_TIME_BUDGET_MS, f"import server: {server_ms:.0f} ms > {IMPORT_TIME_BUDGET_MS:.0f} ms"
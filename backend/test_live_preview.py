@@ -0,0 +1,57 @@
+"""
+Tests for live_preview.py
+Bitmap counts must agree with the blocking criteria of the matching engine
+"""
+
+import random
+
+from benchmark_data import answers_to_profil_v2, generate_aides, generate_answers, load_answer_space
+from live_preview import IndexBloquants, apercu_options, champs_depuis_reponses, prochaine_question
+from matching_engine import MatchingEngine
+from models_v2 import ProfilAgriculteur
+from questionnaire_endpoint import iter_questions, load_questionnaire_config
+
+QUESTIONS = iter_questions(load_questionnaire_config())
+
+
+def not_blocked(aides, profil):
+    engine = MatchingEngine()
+    return {a.aid_id for a in aides if not engine.calculate_match(a, profil).criteres_bloquants_ko}
+
+
+def test_index_matches_engine_blocking_criteria():
+    """For complete answers, the bitmap filter selects exactly the aides with no blocking failure"""
+    aides = generate_aides(500, seed=31)
+    index = IndexBloquants(aides)
+    rng, space = random.Random(32), load_answer_space()
+
+    for _ in range(20):
+        answers = generate_answers(rng, space)
+        profil = ProfilAgriculteur(**answers_to_profil_v2(answers))
+        masque = index.filtre(champs_depuis_reponses(QUESTIONS, answers))
+
+        assert {a.aid_id for i, a in enumerate(aides) if masque >> i & 1} == not_blocked(aides, profil)
+
+
+def test_option_counts_for_next_question():
+    """Each option count equals the count obtained by answering it"""
+    aides = generate_aides(500, seed=31)
+    index = IndexBloquants(aides)
+    reponses = {"region": "Bretagne", "departement": "35", "statut_juridique": "GAEC", "sau_totale": 60}
+
+    apercu = apercu_options(index, QUESTIONS, reponses)
+
+    assert apercu["question_id"] == "productions"
+    for option in apercu["options"]:
+        avec_option = dict(reponses, productions=[option["value"]])
+        attendu = index.filtre(champs_depuis_reponses(QUESTIONS, avec_option)).bit_count()
+        assert option["aides_possibles"] == attendu <= apercu["aides_possibles"]
+
+
+def test_next_question_follows_visibility_rules():
+    """Conditional questions are skipped until their trigger is answered accordingly"""
+    reponses = {"region": "Bretagne", "departement": "35", "statut_juridique": "GAEC",
+                "sau_totale": 60, "productions": ["Céréales"], "age": 55}
+
+    assert prochaine_question(QUESTIONS, reponses)["id"] == "label_bio"
+    assert prochaine_question(QUESTIONS, dict(reponses, age=30))["id"] == "jeune_agriculteur"
@@ -0,0 +1,34 @@
+"""
+Tests for the MatchingEngine result construction
+Raw results are plain data that validate unchanged into ResultatMatching
+"""
+
+from benchmark_data import generate_aides, generate_profils
+from matching_engine import MatchingEngine, serialiser_resultat
+from models_v2 import ResultatMatching
+
+
+def test_raw_results_match_validated_models():
+    """Validation changes nothing in a raw result and both serialize identically"""
+    engine = MatchingEngine()
+    profil = generate_profils(1, seed=3)[0]
+
+    for aide in generate_aides(200, seed=4):
+        brut = engine.calculer(aide, profil, date_matching="T")
+        resultat = engine.calculate_match(aide, profil, date_matching="T")
+
+        assert isinstance(resultat, ResultatMatching)
+        assert resultat.model_dump() == brut
+        assert serialiser_resultat(brut) == serialiser_resultat(resultat) == brut
+        assert isinstance(brut["score"], float) and round(brut["score"], 2) == brut["score"]
+
+
+def test_one_timestamp_per_matching_run():
+    """find_best_matches stamps every result with the same date_matching"""
+    engine = MatchingEngine()
+    profil = generate_profils(1, seed=3)[0]
+
+    resultats = engine.find_best_matches(generate_aides(50, seed=4), profil, top_n=50)
+
+    assert len({r.date_matching for r in resultats}) == 1
+    assert engine.calculate_match(generate_aides(1)[0], profil, date_matching="T").date_matching == "T"
@@ -0,0 +1,74 @@
+"""
+Tests for matching_equivalence.py
+The harness replays the recorded reference results and pinpoints divergent candidates
+"""
+
+from benchmark_data import generate_aides, generate_profils
+from matching_engine import MatchingEngine
+from matching_equivalence import (
+    GOLDEN_AIDES, GOLDEN_PROFILS, diff_results, golden_corpus, load_golden, run_equivalence, run_golden, write_golden,
+)
+
+
+class IgnoreAgeEngine(MatchingEngine):
+    """Candidate that wrongly drops the age criteria"""
+
+    def _evaluer_age(self, aide, profil):
+        return self.POIDS_AGE, [], False
+
+
+def test_golden_reference_replays_recorded_results(tmp_path):
+    """Recorded results are compared field by field, edge-case profiles included"""
+    path = tmp_path / "golden.json.gz"
+    aides, profils = golden_corpus(aides=40, profils=3)
+    assert write_golden(path, MatchingEngine().calculate_match, aides, profils) == 40 * 6
+
+    assert run_golden(MatchingEngine().calculate_match, path, strict=True).ok
+    report = run_golden(IgnoreAgeEngine().calculate_match, path, max_divergences=10)
+    assert not report.ok and report.comparisons <= 40 * 6
+    assert {"score", "eligible", "criteres_bloquants_ko"} & set(report.divergences[0].differences)
+
+
+def test_committed_golden_covers_the_corpus():
+    """The committed reference holds every aide × profile pair, with distinct profile ids"""
+    aides, profils, reference = load_golden()
+    assert len(aides) == GOLDEN_AIDES and len(profils) == 2 * GOLDEN_PROFILS
+    assert len({p.profil_id for p in profils}) == len(profils)
+    assert set(reference(aides[-1], profils[-1])) >= {"score", "eligible", "montant_estime_max"}
+
+
+def test_engine_matches_committed_golden():
+    """The engine reproduces the recorded reference, explanations included"""
+    report = run_golden(MatchingEngine().calculate_match, strict=True)
+
+    assert report.ok, report.summary()
+    assert report.comparisons == GOLDEN_AIDES * 2 * GOLDEN_PROFILS
+
+
+def test_divergence_is_reported_with_minimal_reproducer():
+    """A dropped criterion is caught and the reproducer keeps only what matters"""
+    aides = generate_aides(300, seed=5)
+    profils = generate_profils(10, seed=6)
+
+    report = run_equivalence(IgnoreAgeEngine().calculate_match, aides, profils)
+
+    assert not report.ok
+    divergence = report.divergences[0]
+    assert set(divergence.differences) & {"score", "eligible", "criteres_bloquants_ko"}
+    reproducer = divergence.reproducer()
+    # Reduction keeps the age bound and drops unrelated criteria and montant details
+    assert set(reproducer["aide"]["criteres"]) <= {"age_min", "age_max", "jeune_agriculteur"}
+    assert "montant" not in reproducer["aide"]
+
+
+def test_unrounded_score_is_flagged():
+    """Scores must match ResultatMatching.score_valide rounding"""
+    aide = generate_aides(1, seed=1)[0]
+    profil = generate_profils(1, seed=2)[0]
+    reference = MatchingEngine().calculate_match(aide, profil).model_dump()
+    candidate = dict(reference, score=reference["score"] + 1e-9)
+
+    differences = diff_results(reference, candidate)
+
+    assert "score" in differences
+    assert "score_arrondi" in differences
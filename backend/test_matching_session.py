@@ -0,0 +1,93 @@
+"""
+Tests for matching_session.py
+Incremental re-scoring must give the same results as a full matching
+"""
+
+from unittest.mock import patch
+
+import pytest
+
+from benchmark_data import generate_aides, generate_profils
+from matching_engine import MatchingEngine, serialiser_resultat
+from matching_session import SessionMatching, SessionStore
+
+IGNORED = ("date_matching", "aide")
+
+
+def full_results(aides, profil):
+    engine = MatchingEngine()
+    return {
+        aide.aid_id: serialiser_resultat(engine.calculate_match(aide, profil))
+        for aide in aides
+    }
+
+
+def session_results(session):
+    return {
+        r["aide_id"]: {k: v for k, v in r.items() if k not in IGNORED}
+        for r in session.resultats
+    }
+
+
+def strip(results):
+    return {aid: {k: v for k, v in r.items() if k not in IGNORED} for aid, r in results.items()}
+
+
+def test_patches_match_full_matching():
+    """After each patch the session results equal a full matching of the new profile"""
+    aides = generate_aides(300, seed=21)
+    session = SessionMatching(generate_profils(1, seed=22)[0], aides)
+
+    for modifications, groupes in (
+        ({"labels": ["Agriculture Biologique", "HVE"]}, ["labels"]),
+        ({"projets_en_cours": ["Installation"]}, ["projet"]),
+        ({"sau_totale": 140.0, "budget_projet": 80000}, ["surface"]),
+        ({"age": 31, "jeune_agriculteur": True}, ["age"]),
+        ({"region": "Bretagne", "departement": "29"}, ["localisation"]),
+        ({"nb_ovins": 250}, []),
+    ):
+        assert session.appliquer(modifications) == groupes
+        assert session_results(session) == strip(full_results(aides, session.profil))
+
+    reponse = session.reponse()
+    assert reponse["total_aides"] == 300
+    assert reponse["aides_eligibles"] == sum(r["eligible"] for r in session.resultats)
+
+
+def test_only_changed_groups_are_evaluated():
+    """A labels patch runs _evaluer_labels only and leaves other evaluators untouched"""
+    aides = generate_aides(50, seed=21)
+    session = SessionMatching(generate_profils(1, seed=22)[0], aides)
+
+    with patch.object(MatchingEngine, "_evaluer_localisation") as localisation, \
+            patch.object(MatchingEngine, "_evaluer_labels", wraps=session.engine._evaluer_labels) as labels:
+        session.appliquer({"labels": ["Label Rouge"]})
+
+    assert localisation.call_count == 0
+    assert labels.call_count == 50
+    assert session.appliquer({"labels": ["Label Rouge"]}) == []
+
+
+def test_invalid_patch_leaves_session_unchanged():
+    """Unknown fields and invalid values are rejected before any change"""
+    profil = generate_profils(1, seed=22)[0]
+    session = SessionMatching(profil, generate_aides(20, seed=21))
+
+    for modifications in ({"inconnu": 1}, {"profil_id": "autre"}, {"sau_totale": -1}):
+        with pytest.raises(ValueError):
+            session.appliquer(modifications)
+    assert session.profil is profil
+
+
+def test_store_expires_and_bounds_sessions():
+    """Idle sessions expire and the oldest ones are evicted beyond the limit"""
+    aides = generate_aides(5, seed=21)
+    store = SessionStore(ttl=60, max_sessions=2)
+    sessions = [SessionMatching(profil, aides) for profil in generate_profils(3, seed=22)]
+    for session in sessions:
+        store.put(session)
+
+    assert len(store) == 2 and store.get(sessions[0].profil_id) is None
+    sessions[1].dernier_acces -= 120
+    assert store.get(sessions[1].profil_id) is None
+    assert store.get(sessions[2].profil_id) is sessions[2]
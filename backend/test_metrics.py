@@ -0,0 +1,75 @@
+"""
+Tests for metrics.py
+Histogram exposition, sampling and MatchingEngine step timings
+"""
+
+from matching_engine import MatchingEngine
+from metrics import Histogram, MetricsRegistry, PhaseTimer
+from models_v2 import (
+    AideAgricoleV2, CriteresEligibilite, MontantAide, ProfilAgriculteur,
+    StatutJuridique, TypeMontant
+)
+
+
+def test_histogram_buckets_are_cumulative():
+    """Observations land in the first bucket whose bound is >= value"""
+    histogram = Histogram(buckets=(0.01, 0.1))
+    for value in (0.005, 0.01, 0.05, 2.0):
+        histogram.observe(value)
+
+    assert histogram.cumulative() == [2, 3, 4]
+    assert histogram.count == 4
+    assert round(histogram.sum, 3) == 2.065
+
+
+def test_registry_renders_prometheus_text():
+    """Counters and histograms use the Prometheus text exposition format"""
+    registry = MetricsRegistry()
+    registry.describe("x_seconds", "Test")
+    registry.observe("x_seconds", 0.002, phase="tri")
+    registry.inc("x_total", status="ok")
+
+    text = registry.render()
+    assert "# TYPE x_total counter" in text
+    assert 'x_total{status="ok"} 1' in text
+    assert "# HELP x_seconds Test" in text
+    assert 'x_seconds_bucket{phase="tri",le="0.0025"} 1' in text
+    assert 'x_seconds_bucket{phase="tri",le="+Inf"} 1' in text
+    assert 'x_seconds_count{phase="tri"} 1' in text
+
+
+def test_unsampled_timer_records_nothing():
+    """Outside the sample only the total duration is kept"""
+    timer = PhaseTimer(sampled=False)
+    with timer.phase("profil"):
+        pass
+    timer.add("model_dump", 0.5)
+
+    assert timer.phases == {}
+    assert timer.engine_steps is None
+    assert timer.server_timing() == ""
+
+
+def test_engine_reports_step_timings():
+    """Every _evaluer_* step is accumulated in the timings dict"""
+    aide = AideAgricoleV2(
+        aid_id="AT-1", titre="Aide", organisme="Région", description="",
+        criteres=CriteresEligibilite(regions=["Bretagne"]),
+        montant=MontantAide(type_montant=TypeMontant.FORFAITAIRE, montant_min=1000, montant_max=5000),
+    )
+    profil = ProfilAgriculteur(
+        region="Bretagne", departement="35", statut_juridique=StatutJuridique.EARL, sau_totale=50
+    )
+    engine = MatchingEngine()
+    timings = {}
+
+    untimed = engine.calculate_match(aide, profil)
+    timed = engine.calculate_match(aide, profil, timings=timings)
+    engine.calculate_match(aide, profil, timings=timings)
+
+    assert timed.score == untimed.score
+    assert set(timings) == {
+        "localisation", "production", "projet", "statut", "age", "surface",
+        "labels", "montant", "recommandations", "resultat",
+    }
+    assert all(seconds >= 0 for seconds in timings.values())
@@ -0,0 +1,90 @@
+"""
+Tests for montant_estimators.py
+Per-TypeMontant estimators, plafond/plancher clamping and batch totals
+"""
+
+import weakref
+from unittest.mock import patch
+
+import montant_estimators
+from montant_estimators import compiler, enregistrer_estimateur, estimer_montant, estimer_total
+from models_v2 import (
+    AideAgricoleV2, CriteresEligibilite, MontantAide, ProfilAgriculteur,
+    StatutJuridique, TypeMontant, TypeProduction
+)
+
+
+def make_aide(productions=(), **montant) -> AideAgricoleV2:
+    return AideAgricoleV2(
+        titre="Aide", organisme="Région",
+        criteres=CriteresEligibilite(types_production=list(productions)),
+        montant=MontantAide(**montant),
+    )
+
+
+def make_profil(**fields) -> ProfilAgriculteur:
+    return ProfilAgriculteur(
+        region="Bretagne", departement="35", statut_juridique=StatutJuridique.GAEC,
+        sau_totale=fields.pop("sau_totale", 80), **fields
+    )
+
+
+def test_pourcentage_uses_budget_and_plafond():
+    """taux × budget_projet, clamped to the plafond; range kept without a budget"""
+    aide = make_aide(type_montant=TypeMontant.POURCENTAGE, taux_min=20, taux_max=40,
+                     plafond=30000, montant_min=1000, montant_max=50000)
+
+    assert estimer_montant(aide, make_profil(budget_projet=100000)) == (20000, 30000)
+    assert estimer_montant(aide, make_profil()) == (1000, 30000)
+
+
+def test_tete_counts_heads_of_the_aide_species():
+    """Only the species matching the aide's productions are counted"""
+    aide = make_aide([TypeProduction.ELEVAGE_OVIN], type_montant=TypeMontant.TETE,
+                     montant_par_unite=25, plancher=500)
+    profil = make_profil(nb_bovins=40, nb_ovins=10)
+
+    assert estimer_montant(aide, profil) == (500, 500)
+    assert estimer_montant(aide, make_profil(nb_ovins=300)) == (7500, 7500)
+
+    generic = make_aide(type_montant=TypeMontant.TETE, montant_par_unite=10)
+    assert estimer_montant(generic, make_profil(nb_bovins=40, nb_ovins=10, nb_volailles=5000)) == (500, 500)
+
+
+def test_surface_and_forfait():
+    """Surface keeps the previous per-hectare behaviour, forfaits use montant_fixe"""
+    surface = make_aide(type_montant=TypeMontant.SURFACE, montant_par_unite=120, plafond=5000)
+    assert estimer_montant(surface, make_profil(sau_totale=10)) == (1200, 1200)
+    assert estimer_montant(surface, make_profil(sau_totale=100)) == (5000, 5000)
+
+    forfait = make_aide(type_montant=TypeMontant.FORFAITAIRE, montant_fixe=8000)
+    assert estimer_montant(forfait, make_profil()) == (8000, 8000)
+
+
+def test_batch_total_and_pluggable_estimators():
+    """Totals over a set of aides; a registered estimator replaces the default"""
+    aides = [
+        make_aide(type_montant=TypeMontant.FORFAITAIRE, montant_fixe=1000),
+        make_aide(type_montant=TypeMontant.UNITE, montant_min=200, montant_max=600),
+        make_aide(type_montant=TypeMontant.UNITE),
+    ]
+    assert estimer_total(aides, make_profil()) == (1200, 1600)
+
+    with patch.dict(montant_estimators.ESTIMATEURS):
+        enregistrer_estimateur(TypeMontant.UNITE, lambda aide: lambda contexte: (1.0, 2.0))
+        assert estimer_total(aides, make_profil()) == (1002, 1004)
+
+
+def test_compiled_estimator_lives_on_the_aide():
+    """No module-level cache: the estimator is freed with the aide and follows montant replacements"""
+    aide = make_aide(type_montant=TypeMontant.FORFAITAIRE, montant_fixe=1000)
+    assert compiler(aide) is compiler(aide)
+    assert not hasattr(montant_estimators, "_cache")
+
+    copie = aide.model_copy(update={"montant": aide.montant.model_copy(update={"montant_fixe": 3000})})
+    assert estimer_montant(copie, make_profil()) == (3000, 3000)
+    assert estimer_montant(aide, make_profil()) == (1000, 1000)
+
+    reference = weakref.ref(aide)
+    del aide
+    assert reference() is None
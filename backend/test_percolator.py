@@ -0,0 +1,104 @@
+"""
+Tests for percolator.py
+Candidate profiles must never miss a profile the matching engine finds eligible
+"""
+
+import asyncio
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from benchmark_data import generate_aides, generate_profils
+from matching_engine import MatchingEngine
+from percolator import OUTBOX_COLLECTION, PROFILS_COLLECTION, Percolator, a_percoler, percoler_aides
+
+# Avant les dates limites générées par benchmark_data (2027)
+NOW = datetime(2026, 5, 10, tzinfo=timezone.utc)
+
+
+def test_percolation_matches_brute_force():
+    """Eligible profiles equal those found by running the engine on every profile"""
+    aides, profils = generate_aides(40, seed=41), generate_profils(400, seed=42)
+    percolator = Percolator()
+    for profil in profils:
+        percolator.ajouter(profil)
+    engine = MatchingEngine()
+
+    for aide in aides:
+        candidats, eligibles = percolator.percoler(aide)
+        attendus = {p.profil_id for p in profils if engine.calculate_match(aide, p).eligible}
+        assert {p.profil_id for p, _ in eligibles} == attendus
+        assert len(attendus) <= candidats <= len(profils)
+
+
+def test_removed_profiles_free_their_slot():
+    """A removed profile is no longer a candidate and its slot is reused"""
+    aide = generate_aides(1, seed=43)[0]
+    aide.criteres.regions, aide.criteres.departements = [], []
+    aide.criteres.statuts_juridiques, aide.criteres.types_production = [], []
+    profils = generate_profils(3, seed=44)
+    percolator = Percolator()
+    for profil in profils:
+        percolator.ajouter(profil)
+
+    assert percolator.retirer(profils[1].profil_id)
+    assert percolator.candidats(aide) == 0b101
+    percolator.ajouter(profils[1])
+    assert percolator.candidats(aide) == 0b111 and len(percolator.profils) == 3
+
+
+def test_only_new_or_changed_aides_are_percolated():
+    """Aides stored before fingerprints existed are a baseline, not news"""
+    empreintes = {"AT-1": "abc", "AT-2": None}
+    assert a_percoler("AT-0", "abc", empreintes)
+    assert not a_percoler("AT-1", "abc", empreintes)
+    assert a_percoler("AT-1", "def", empreintes)
+    assert not a_percoler("AT-2", "abc", empreintes)
+
+
+class FakeOutbox:
+    def __init__(self):
+        self.keys = set()
+
+    async def bulk_write(self, operations, ordered=True):
+        avant = len(self.keys)
+        self.keys.update((op._filter["profil_id"], op._filter["aid_id"]) for op in operations)
+        return SimpleNamespace(upserted_count=len(self.keys) - avant)
+
+
+class FakeProfils:
+    def __init__(self, profils):
+        self.docs = [p.model_dump(mode="json") | {"contact": "a@b.fr"} for p in profils]
+
+    def find(self, *args):
+        async def iterer():
+            for doc in self.docs:
+                yield doc
+        return iterer()
+
+
+def test_outbox_notifications_are_idempotent():
+    """Percolating the same aide twice does not notify twice"""
+    aides, profils = generate_aides(5, seed=45), generate_profils(100, seed=46)
+    db = {PROFILS_COLLECTION: FakeProfils(profils), OUTBOX_COLLECTION: FakeOutbox()}
+
+    premiere = asyncio.run(percoler_aides(db, aides, maintenant=NOW))
+    seconde = asyncio.run(percoler_aides(db, aides, maintenant=NOW))
+
+    assert premiere["profils"] == 100 and premiere["eligibles"] > 0
+    assert premiere["notifications"] == premiere["eligibles"] == len(db[OUTBOX_COLLECTION].keys)
+    assert seconde["notifications"] == 0 and seconde["eligibles"] == premiere["eligibles"]
+
+
+def test_expired_aides_notify_nobody():
+    """An aide flagged expiree or past its deadline is skipped, even if new or changed"""
+    aides, profils = generate_aides(5, seed=45), generate_profils(100, seed=46)
+    expirees = [aides[0].model_copy(update={"statut": "expiree"})] + [
+        aide.model_copy(update={"date_limite_depot": "2026-05-09"}) for aide in aides[1:]
+    ]
+    db = {PROFILS_COLLECTION: FakeProfils(profils), OUTBOX_COLLECTION: FakeOutbox()}
+
+    stats = asyncio.run(percoler_aides(db, expirees, maintenant=NOW))
+
+    assert stats["aides"] == 0 and stats["expirees"] == 5
+    assert stats["notifications"] == 0 and not db[OUTBOX_COLLECTION].keys
+    assert asyncio.run(percoler_aides(db, aides, maintenant=NOW))["notifications"] > 0
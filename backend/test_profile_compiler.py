@@ -0,0 +1,81 @@
+"""
+Tests for profile_compiler.py
+The compiled translator must agree with the historical conversions for legacy,
+V2 and raw questionnaire answers
+"""
+
+import random
+
+import pytest
+from pydantic import ValidationError
+
+from benchmark_data import answers_to_profil_v2, generate_answers, generate_profil_payloads, load_answer_space
+from models_v2 import ProfilAgriculteur, StatutJuridique, TypeProduction, TypeProjet
+from profile_compiler import ProfilCompiler
+from questionnaire_endpoint import load_questionnaire_config
+
+COMPILER = ProfilCompiler(load_questionnaire_config())
+
+
+def comparable(profil):
+    return profil.model_dump(exclude={"profil_id", "created_at", "updated_at"})
+
+
+def test_shipped_config_compiles_without_warnings():
+    """Every select option of the enum-backed questions maps to an enum value"""
+    assert COMPILER.avertissements == []
+    assert COMPILER.cles["types_projets"][0] == "projets_en_cours"
+    assert COMPILER.cles["diplome"][0] == "niveau_formation"
+
+
+def test_v2_payloads_match_direct_validation():
+    """A V2 payload compiles to the same profile as ProfilAgriculteur(**payload)"""
+    for payload in generate_profil_payloads(200, seed=11):
+        assert comparable(COMPILER.compile(payload)) == comparable(ProfilAgriculteur(**payload))
+
+
+def test_raw_answers_match_benchmark_mapping():
+    """Raw questionnaire answers compile like answers_to_profil_v2"""
+    rng, space = random.Random(12), load_answer_space()
+    for _ in range(200):
+        answers = generate_answers(rng, space)
+        expected = ProfilAgriculteur(**answers_to_profil_v2(answers))
+        assert comparable(COMPILER.compile(answers)) == comparable(expected)
+
+
+def test_legacy_rules():
+    """Legacy payloads keep the historical fallbacks and bio detection"""
+    profil = COMPILER.compile({
+        "region": "Bretagne", "statut_juridique": "Inconnu", "superficie_ha": 40,
+        "productions": ["Maraîchage", "Inconnue"], "labels": ["AB"],
+        "age_exploitant": 30, "projets": ["Irrigation", "x"], "sau_bio": 3, "age": 99,
+    })
+
+    assert profil.statut_juridique == StatutJuridique.AUTRE
+    assert profil.departement == "00"
+    assert profil.age == 30
+    assert profil.productions == [TypeProduction.MARAICHAGE]
+    assert profil.production_principale == TypeProduction.MARAICHAGE
+    assert profil.projets_en_cours == [TypeProjet.IRRIGATION]
+    assert profil.label_bio and profil.sau_bio == 40
+
+
+def test_invalid_v2_statut_is_rejected():
+    """Outside the legacy format an unknown statut is still a validation error"""
+    payload = generate_profil_payloads(1, seed=13)[0]
+    with pytest.raises(ValueError):
+        COMPILER.compile(dict(payload, statut_juridique="Inconnu"))
+
+
+def test_invalid_legacy_payload_fails_legacy_validation():
+    """Bad legacy input is reported on the legacy fields, not defaulted or blamed on derived V2 fields"""
+    base = {"region": "Bretagne", "statut_juridique": "EARL", "superficie_ha": 40}
+    for payload, champ in (
+        (dict(base, superficie_ha="beaucoup"), "superficie_ha"),
+        ({k: v for k, v in base.items() if k != "statut_juridique"}, "statut_juridique"),
+        (dict(base, age_exploitant="trente"), "age_exploitant"),
+    ):
+        with pytest.raises(ValidationError) as erreur:
+            COMPILER.compile(payload)
+        assert erreur.value.title == "ProfilAgriculteurLegacy"
+        assert [e["loc"] for e in erreur.value.errors()] == [(champ,)]
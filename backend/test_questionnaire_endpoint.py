@@ -0,0 +1,97 @@
+"""
+Tests for questionnaire_endpoint.py
+Schema validation, mtime-based reload and ETag revalidation of the config
+"""
+
+import json
+import os
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from questionnaire_endpoint import (
+    CONFIG_PATH, QuestionnaireCache, QuestionnaireConfigError,
+    load_questionnaire_config, questionnaire_response, validate_questionnaire_config
+)
+
+CONFIG = {
+    "version": "1.0",
+    "sections": [{
+        "id": "identite", "titre": "Identité", "ordre": 1,
+        "questions": [
+            {"id": "region", "type": "select", "ordre": 1, "options": [{"value": "Bretagne", "label": "Bretagne"}]},
+            {"id": "age", "type": "number", "ordre": 2},
+        ],
+    }],
+}
+
+
+def write_config(path, config, mtime=None):
+    path.write_text(json.dumps(config), encoding="utf-8")
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+def test_shipped_config_is_valid():
+    """questionnaire_config.json passes the schema"""
+    validate_questionnaire_config(load_questionnaire_config(CONFIG_PATH))
+
+
+def test_schema_rejects_broken_configs():
+    """Unknown types, missing options, duplicate ids and dangling visible_if are rejected"""
+    broken = [
+        {"id": "q", "type": "slider"},
+        {"id": "q", "type": "radio"},
+        {"id": "age", "type": "number"},
+        {"id": "q", "type": "number", "visible_if": {"question_id": "inconnue", "operator": "<", "value": 1}},
+    ]
+    for question in broken:
+        config = json.loads(json.dumps(CONFIG))
+        config["sections"][0]["questions"].append(question)
+        with pytest.raises(QuestionnaireConfigError):
+            validate_questionnaire_config(config)
+
+
+def test_reload_on_change_and_keep_previous_when_invalid(tmp_path):
+    """A modified file is reloaded; an invalid modification keeps the last good version"""
+    path = tmp_path / "questionnaire.json"
+    write_config(path, CONFIG, mtime=1_000_000)
+    cache = QuestionnaireCache(path)
+    first = cache.current()
+    assert cache.current() is first
+
+    updated = dict(CONFIG, version="1.1")
+    write_config(path, updated, mtime=1_000_100)
+    second = cache.current()
+    assert second.config["version"] == "1.1" and second.etag != first.etag
+
+    path.write_text("{ pas du json", encoding="utf-8")
+    os.utime(path, (1_000_200, 1_000_200))
+    assert cache.current() is second
+    assert cache.error
+
+
+def test_etag_revalidation_returns_304(tmp_path, monkeypatch):
+    """Matching If-None-Match gets an empty 304 for any representation"""
+    path = tmp_path / "questionnaire.json"
+    write_config(path, CONFIG)
+    monkeypatch.setattr("questionnaire_endpoint.questionnaire_cache", QuestionnaireCache(path))
+    monkeypatch.setattr("questionnaire_endpoint.COMPRESSION_MIN_SIZE", 10)
+
+    app = FastAPI()
+
+    @app.get("/config")
+    async def config(request: Request):
+        return questionnaire_response(request)
+
+    client = TestClient(app)
+    response = client.get("/config", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200 and response.json()["stats"]["total_questions"] == 2
+    assert response.headers["etag"].endswith('-gzip"')
+    assert "max-age" in response.headers["cache-control"]
+
+    revalidation = client.get("/config", headers={"Accept-Encoding": "identity",
+                                                   "If-None-Match": response.headers["etag"]})
+    assert revalidation.status_code == 304 and revalidation.content == b""
+    assert client.get("/config", headers={"If-None-Match": '"autre"'}).status_code == 200
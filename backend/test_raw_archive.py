@@ -0,0 +1,93 @@
+"""
+Tests for raw_archive.py
+raw_data leaves the hot aides_v2 documents and round-trips through the compressed archive
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+from raw_archive import (
+    compresser, decompresser, empreinte_raw, lire_document, migrer_raw_data, raw_data_aide,
+    separer_raw_data,
+)
+
+RAW = {"id": 12, "name": "Aide", "description": "<p>Texte</p>" * 50, "financers": ["Région"]}
+
+
+def test_compression_round_trip_and_stable_hash():
+    """Codec round trip; the hash ignores key order"""
+    data = "<p>Texte répété</p>".encode() * 100
+    assert decompresser(compresser(data, "zlib"), "zlib") == data
+    assert empreinte_raw({"a": 1, "b": [1, 2]}) == empreinte_raw({"b": [1, 2], "a": 1})
+    assert empreinte_raw({"a": 1}) != empreinte_raw({"a": 2})
+
+
+def test_separation_keeps_only_the_hash():
+    """The hot document loses raw_data; the archive version decodes back to it"""
+    doc = {"aid_id": "AT-1", "titre": "Aide", "raw_data": dict(RAW)}
+    operation = separer_raw_data(doc, "2026-05-10T00:00:00+00:00")
+
+    assert "raw_data" not in doc and doc["raw_hash"] == empreinte_raw(RAW)
+    archive = operation._doc["$setOnInsert"]
+    assert archive["taille_compressee"] < archive["taille"]
+    assert lire_document(archive) == RAW
+    assert separer_raw_data({"aid_id": "AT-2", "raw_data": None}, "") is None
+
+
+class FakeCollection:
+    def __init__(self, docs=()):
+        self.docs = list(docs)
+
+    def _match(self, doc, filtre):
+        for cle, valeur in filtre.items():
+            if isinstance(valeur, dict) and "$exists" in valeur:
+                if (cle in doc) != valeur["$exists"]:
+                    return False
+            elif doc.get(cle) != valeur:
+                return False
+        return True
+
+    def find(self, filtre, projection=None):
+        docs = [dict(doc) for doc in self.docs if self._match(doc, filtre)]
+        return SimpleNamespace(to_list=lambda length=None: asyncio.sleep(0, result=docs[:length]))
+
+    async def find_one(self, filtre, sort=None):
+        docs = sorted((d for d in self.docs if self._match(d, filtre)), key=lambda d: d["archive_le"], reverse=True)
+        return docs[0] if docs else None
+
+    async def bulk_write(self, operations, ordered=True):
+        inseres = 0
+        for op in operations:
+            cibles = [doc for doc in self.docs if self._match(doc, op._filter)]
+            update = op._doc
+            if not cibles and getattr(op, "_upsert", False):
+                self.docs.append(dict(update.get("$setOnInsert", {})))
+                inseres += 1
+                continue
+            for doc in cibles:
+                doc.update(update.get("$set", {}))
+                for cle in update.get("$unset", {}):
+                    doc.pop(cle, None)
+        return SimpleNamespace(upserted_count=inseres)
+
+
+class FakeDb(SimpleNamespace):
+    def __getitem__(self, nom):
+        return getattr(self, nom)
+
+
+def test_migration_moves_embedded_raw_data():
+    """Embedded raw_data is archived once per content and removed from aides_v2"""
+    db = FakeDb(aides_v2=FakeCollection([
+        {"aid_id": "AT-1", "raw_data": dict(RAW)},
+        {"aid_id": "AT-2", "raw_data": dict(RAW)},
+        {"aid_id": "AT-3", "raw_data": None},
+        {"aid_id": "AT-4", "raw_hash": "deja"},
+    ]), aides_raw=FakeCollection())
+    resultat = asyncio.run(migrer_raw_data(db, batch_size=2))
+
+    assert resultat == {"aides": 3, "versions": 2}
+    assert all("raw_data" not in doc for doc in db.aides_v2.docs)
+    assert db.aides_v2.docs[0]["raw_hash"] == empreinte_raw(RAW) and db.aides_v2.docs[2]["raw_hash"] is None
+    assert asyncio.run(raw_data_aide(db, "AT-2")) == RAW
+    assert asyncio.run(migrer_raw_data(db)) == {"aides": 0, "versions": 0}
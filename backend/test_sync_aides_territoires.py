@@ -0,0 +1,64 @@
+"""
+Tests for sync_aides_territoires.py
+Concurrent page fetching against a local aiohttp server and bulk upserts
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+from pymongo.errors import BulkWriteError
+
+from fake_aides_territoires import TOTAL, api_app, fetch
+from sync_aides_territoires import upsert_aides
+
+
+def test_concurrent_fetch_keeps_page_order(monkeypatch):
+    """All pages are fetched once and results come back in page order"""
+    app, requested = api_app()
+    aides = fetch(app, monkeypatch)
+
+    assert [a["id"] for a in aides] == list(range(TOTAL))
+    assert sorted(requested) == list(range(1, 13))
+
+
+def test_limit_stops_pagination_and_failed_page_is_skipped(monkeypatch):
+    """limit bounds the pages requested; a failing page is logged and skipped"""
+    app, requested = api_app(fail_page=2)
+    aides = fetch(app, monkeypatch, limit=35)
+
+    assert sorted(requested) == [1, 2, 3, 4]
+    assert [a["id"] for a in aides] == list(range(10)) + list(range(20, 40))[:25]
+
+
+def test_sequential_fallback_without_count(monkeypatch):
+    """Without a total count, pagination follows `next`"""
+    app, requested = api_app(with_count=False)
+    aides = fetch(app, monkeypatch)
+
+    assert len(aides) == TOTAL and requested == list(range(1, 13))
+
+
+class FakeCollection:
+    def __init__(self, existing, failing=()):
+        self.existing, self.failing, self.calls = set(existing), set(failing), []
+
+    async def bulk_write(self, operations, ordered=True):
+        self.calls.append((len(operations), ordered))
+        ids = [op._filter["aid_id"] for op in operations]
+        errors = [{"index": i, "errmsg": "boom"} for i, aid in enumerate(ids) if aid in self.failing]
+        ok = [aid for aid in ids if aid not in self.failing]
+        matched = sum(aid in self.existing for aid in ok)
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nUpserted": len(ok) - matched, "nMatched": matched})
+        return SimpleNamespace(upserted_count=len(ok) - matched, matched_count=matched)
+
+
+def test_upsert_aides_in_unordered_batches():
+    """Inserted / updated / errors are counted from the bulk results"""
+    aides = [{"aid_id": f"AT-{i}"} for i in range(25)]
+    collection = FakeCollection(existing={"AT-1", "AT-2"}, failing={"AT-20"})
+
+    stats = asyncio.run(upsert_aides(collection, aides, bulk_size=10))
+
+    assert collection.calls == [(10, False), (10, False), (5, False)]
+    assert stats == {"inserted": 22, "updated": 2, "errors": 1}
@@ -0,0 +1,62 @@
+"""
+Tests for warmup.py
+Readiness is only reported once every warm-up step has succeeded
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, Mock, patch
+
+from warmup import WarmupState, run_warmup, SAMPLE_PROFIL_LEGACY, SAMPLE_PROFIL_V2
+
+
+def make_catalog(version: int = 3):
+    catalog = Mock()
+    catalog.version = version
+    catalog.load_aides.return_value = []
+    return catalog
+
+
+def test_warmup_marks_ready_after_all_steps():
+    """Pool priming, catalog load and both matching formats are exercised"""
+    db = Mock()
+    db.command = AsyncMock(return_value={"ok": 1})
+    handler = AsyncMock(return_value={})
+    state = WarmupState()
+    state.ready = False
+
+    with patch("warmup.load_catalog", AsyncMock(return_value=make_catalog())):
+        asyncio.run(run_warmup(db, handler, state=state, pool_connections=4))
+
+    assert state.ready is True
+    assert state.catalog_version == 3
+    assert db.command.await_count == 4
+    assert [c.args[0] for c in handler.await_args_list] == [SAMPLE_PROFIL_LEGACY, SAMPLE_PROFIL_V2]
+    assert set(state.steps) == {"mongo_pool", "catalog", "matching_legacy", "matching_v2"}
+
+
+def test_warmup_retries_until_mongo_is_reachable():
+    """A failing attempt keeps the instance not-ready and is retried"""
+    db = Mock()
+    db.command = AsyncMock(side_effect=[ConnectionError("down"), {"ok": 1}])
+    handler = AsyncMock(return_value={})
+    state = WarmupState()
+    state.ready = False
+
+    with patch("warmup.load_catalog", AsyncMock(return_value=make_catalog())):
+        asyncio.run(run_warmup(db, handler, state=state, pool_connections=1, retry_seconds=0))
+
+    assert state.ready is True
+    assert state.attempts == 2
+    assert state.error is None
+
+
+def test_warmup_loads_catalog_from_primary():
+    """Pings go through the matching pool, a first snapshot is built from the primary"""
+    db, primary = Mock(), Mock()
+    db.command = AsyncMock(return_value={"ok": 1})
+    state = WarmupState()
+
+    with patch("warmup.load_catalog", AsyncMock(return_value=make_catalog())) as load:
+        asyncio.run(run_warmup(db, AsyncMock(return_value={}), state=state, pool_connections=1, catalog_db=primary))
+
+    load.assert_awaited_once_with(primary)
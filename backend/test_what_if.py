@@ -0,0 +1,79 @@
+"""
+Tests for what_if.py
+Partial re-evaluation of scenarios must agree with a full matching of the modified profile
+"""
+
+import pytest
+
+from benchmark_data import generate_aides, generate_profils
+from matching_engine import MatchingEngine
+from montant_estimators import estimer_total
+from what_if import ChangementProfil, ScenarioWhatIf, analyser_scenarios, appliquer_changements
+
+SCENARIOS = [
+    ScenarioWhatIf(nom="Bio", changements=[
+        ChangementProfil(champ="labels", operation="ajouter", valeur="Agriculture Biologique"),
+    ]),
+    ScenarioWhatIf(nom="+40 ha", changements=[
+        ChangementProfil(champ="sau_totale", operation="augmenter", valeur=40),
+    ]),
+    ScenarioWhatIf(nom="Projet et JA", changements=[
+        ChangementProfil(champ="projets_en_cours", operation="ajouter", valeur="Installation"),
+        ChangementProfil(champ="jeune_agriculteur", valeur=True),
+        ChangementProfil(champ="age", valeur=28),
+    ]),
+    ScenarioWhatIf(nom="Déménagement", changements=[
+        ChangementProfil(champ="region", valeur="Occitanie"),
+        ChangementProfil(champ="departement", valeur="31"),
+    ]),
+    ScenarioWhatIf(nom="Aucun changement"),
+]
+
+
+def test_scenarios_match_full_matching_of_modified_profile():
+    """Gained/lost aides and totals equal those of a full re-run on the modified profile"""
+    engine = MatchingEngine()
+    aides = generate_aides(400, seed=11)
+
+    for profil in generate_profils(4, seed=12):
+        resultat = analyser_scenarios(aides, profil, SCENARIOS)
+        base = {a.aid_id for a in aides if engine.calculate_match(a, profil).eligible}
+        assert resultat["base"]["aides_eligibles"] == len(base)
+
+        for scenario, sortie in zip(SCENARIOS, resultat["scenarios"]):
+            variante = appliquer_changements(profil, scenario.changements)
+            eligibles = [a for a in aides if engine.calculate_match(a, variante).eligible]
+            ids = {a.aid_id for a in eligibles}
+
+            assert {r["aid_id"] for r in sortie["aides_gagnees"]} == ids - base
+            assert {r["aid_id"] for r in sortie["aides_perdues"]} == base - ids
+            total_min, total_max = estimer_total(eligibles, variante)
+            assert sortie["montant_total_estime_min"] == round(total_min, 2)
+            assert sortie["montant_total_estime_max"] == round(total_max, 2)
+
+
+def test_only_touched_groups_are_recomputed():
+    """A label change re-evaluates the labels group only, and no aide without changes"""
+    profil = generate_profils(1, seed=12)[0]
+    resultat = analyser_scenarios(generate_aides(100, seed=11), profil, SCENARIOS)
+    bio, surface, projet, _, inchange = resultat["scenarios"]
+
+    assert bio["groupes_recalcules"] == ["labels"]
+    assert surface["groupes_recalcules"] == ["surface"]
+    assert projet["groupes_recalcules"] == ["projet", "age"]
+    assert inchange["groupes_recalcules"] == [] and inchange["aides_reevaluees"] == 0
+    assert inchange["delta_montant_min"] == inchange["delta_montant_max"] == 0
+
+
+def test_invalid_changes_are_rejected():
+    """Unknown fields, protected fields and mismatched operations raise ValueError"""
+    profil = generate_profils(1, seed=12)[0]
+    for changement in (
+        ChangementProfil(champ="inconnu", valeur=1),
+        ChangementProfil(champ="profil_id", valeur="x"),
+        ChangementProfil(champ="sau_totale", operation="ajouter", valeur=3),
+        ChangementProfil(champ="labels", operation="augmenter", valeur=3),
+        ChangementProfil(champ="sau_totale", valeur=-5),
+    ):
+        with pytest.raises(ValueError):
+            appliquer_changements(profil, [changement])
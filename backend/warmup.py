@@ -0,0 +1,137 @@
+"""
+Warm-up du serveur au démarrage
+Amorce le pool MongoDB, précharge le catalogue et exécute le matching une fois
+avant de déclarer l'instance prête (/api/health)
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from catalog_snapshot import load_catalog
+
+logger = logging.getLogger(__name__)
+
+WARMUP_ENABLED = os.environ.get('WARMUP_ENABLED', 'true').lower() not in ('0', 'false', 'no')
+# Par défaut, autant de connexions que le minimum du pool (MONGO_MIN_POOL_SIZE)
+WARMUP_POOL_CONNECTIONS = int(
+    os.environ.get('WARMUP_POOL_CONNECTIONS') or os.environ.get('MONGO_MIN_POOL_SIZE') or '10'
+)
+WARMUP_RETRY_SECONDS = float(os.environ.get('WARMUP_RETRY_SECONDS', '5'))
+
+# Profils d'exemple pour exercer les deux formats acceptés par /api/matching
+SAMPLE_PROFIL_LEGACY = {
+    "region": "Bretagne",
+    "departement": "35",
+    "statut_juridique": "EARL",
+    "superficie_ha": 50.0,
+    "productions": ["Céréales", "Élevage bovin"],
+    "labels": ["HVE"],
+    "age_exploitant": 35,
+    "jeune_agriculteur": True,
+    "projets": ["Modernisation"],
+}
+
+SAMPLE_PROFIL_V2 = {
+    "region": "Occitanie",
+    "departement": "31",
+    "statut_juridique": "GAEC",
+    "sau_totale": 120.0,
+    "productions": ["Viticulture"],
+    "labels": ["Agriculture Biologique"],
+    "label_bio": True,
+    "projets_en_cours": ["Conversion bio"],
+}
+
+
+class WarmupState:
+    """État du warm-up, exposé par /api/health"""
+
+    def __init__(self):
+        self.ready = not WARMUP_ENABLED
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+        self.attempts = 0
+        self.steps: Dict[str, float] = {}
+        self.catalog_version: Optional[int] = None
+        self.error: Optional[str] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "attempts": self.attempts,
+            "steps_ms": {name: round(seconds * 1000, 1) for name, seconds in self.steps.items()},
+            "catalog_version": self.catalog_version,
+            "error": self.error,
+        }
+
+
+warmup_state = WarmupState()
+
+
+async def _timed(state: WarmupState, name: str, step: Awaitable) -> Any:
+    start = time.perf_counter()
+    result = await step
+    state.steps[name] = time.perf_counter() - start
+    return result
+
+
+async def run_warmup(
+    db,
+    matching_handler: Callable[[Dict[str, Any]], Awaitable[Any]],
+    state: WarmupState = warmup_state,
+    pool_connections: int = WARMUP_POOL_CONNECTIONS,
+    retry_seconds: float = WARMUP_RETRY_SECONDS,
+    catalog_db=None,
+) -> WarmupState:
+    """
+    Exécute le warm-up jusqu'à succès
+
+    Args:
+        db: Instance MongoDB
+        matching_handler: Handler /api/matching, appelé avec les profils d'exemple
+        state: État à mettre à jour
+        pool_connections: Nombre de connexions à ouvrir en parallèle
+        retry_seconds: Délai entre deux tentatives en cas d'échec
+        catalog_db: Base principale (primaire) d'où publier un premier snapshot (db par défaut)
+
+    Returns:
+        L'état final (ready=True)
+    """
+    state.started_at = datetime.now(timezone.utc).isoformat()
+
+    while True:
+        state.attempts += 1
+        try:
+            logger.info(f"🔥 Warm-up (tentative {state.attempts})...")
+
+            # 1. Connexions MongoDB (pings concurrents = connexions ouvertes dans le pool)
+            await _timed(state, "mongo_pool", asyncio.gather(
+                *[db.command('ping') for _ in range(max(1, pool_connections))]
+            ))
+
+            # 2. Catalogue (snapshot mappé + décodage des aides)
+            catalog = await _timed(state, "catalog", load_catalog(catalog_db or db))
+            catalog.load_aides()
+            state.catalog_version = catalog.version
+
+            # 3. Chemin complet du matching (validation des profils, conversion legacy,
+            #    MatchingEngine, sérialisation) sur les deux formats
+            await _timed(state, "matching_legacy", matching_handler(dict(SAMPLE_PROFIL_LEGACY)))
+            await _timed(state, "matching_v2", matching_handler(dict(SAMPLE_PROFIL_V2)))
+
+            state.error = None
+            state.ready = True
+            state.finished_at = datetime.now(timezone.utc).isoformat()
+            logger.info(f"✅ Warm-up terminé: {state.as_dict()['steps_ms']}")
+            return state
+
+        except Exception as e:
+            state.error = f"{type(e).__name__}: {e}"
+            logger.error(f"❌ Warm-up échoué ({state.error}), nouvelle tentative dans {retry_seconds}s")
+            await asyncio.sleep(retry_seconds)
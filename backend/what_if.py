@@ -0,0 +1,194 @@
+"""
+Analyse what-if du matching : effet de modifications du profil sur les aides
+Le profil de base est évalué une fois par groupe de critères ; chaque scénario
+(ajout d'un label, SAU modifiée, nouveau projet...) ne réévalue que les groupes
+dont un champ a changé (MatchingEngine.CHAMPS_GROUPES), et seulement pour les
+aides qu'un critère bloquant d'un groupe inchangé n'exclut pas déjà.
+"""
+
+import logging
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+from pydantic import BaseModel, Field
+
+from matching_engine import MatchingEngine
+from models_v2 import AideAgricoleV2, ProfilAgriculteur
+from montant_estimators import ContexteProfil, compiler as compiler_estimateur, sommer_estimations
+
+logger = logging.getLogger(__name__)
+
+WHAT_IF_MAX_SCENARIOS = int(os.environ.get('WHAT_IF_MAX_SCENARIOS', '20'))
+
+# Champs d'identification et d'horodatage : non modifiables par un scénario
+CHAMPS_NON_MODIFIABLES = frozenset({"profil_id", "created_at", "updated_at"})
+
+OPERATIONS = ("definir", "ajouter", "retirer", "augmenter")
+
+
+class ChangementProfil(BaseModel):
+    """Modification d'un champ du profil V2"""
+    champ: str
+    operation: str = "definir"  # definir, ajouter / retirer (listes), augmenter (nombres)
+    valeur: Any = None
+
+
+class ScenarioWhatIf(BaseModel):
+    nom: Optional[str] = None
+    changements: List[ChangementProfil] = Field(default_factory=list)
+
+
+class WhatIfRequest(BaseModel):
+    profil: Dict[str, Any]  # format V2 ou legacy (comme /matching)
+    scenarios: List[ScenarioWhatIf]
+
+
+def appliquer_changements(profil: ProfilAgriculteur, changements: Sequence[ChangementProfil]) -> ProfilAgriculteur:
+    """
+    Profil modifié par les changements (revalidé : valeurs converties en enums)
+
+    Raises:
+        ValueError: champ inconnu ou non modifiable, opération invalide pour le champ
+    """
+    data = profil.model_dump()
+    for changement in changements:
+        champ, operation, valeur = changement.champ, changement.operation, changement.valeur
+        if champ not in ProfilAgriculteur.model_fields or champ in CHAMPS_NON_MODIFIABLES:
+            raise ValueError(f"Champ de profil non modifiable: {champ}")
+        actuel = data[champ]
+
+        if operation == "definir":
+            data[champ] = valeur
+        elif operation in ("ajouter", "retirer"):
+            if not isinstance(actuel, list):
+                raise ValueError(f"'{operation}' ne s'applique qu'aux listes ({champ})")
+            valeurs = valeur if isinstance(valeur, list) else [valeur]
+            if operation == "ajouter":
+                data[champ] = actuel + [v for v in valeurs if v not in actuel]
+            else:
+                data[champ] = [v for v in actuel if v not in valeurs]
+        elif operation == "augmenter":
+            if isinstance(actuel, (bool, list, str)) or not isinstance(valeur, (int, float)):
+                raise ValueError(f"'augmenter' attend un champ et une valeur numériques ({champ})")
+            data[champ] = (actuel or 0) + valeur
+        else:
+            raise ValueError(f"Opération inconnue: {operation} (attendu: {', '.join(OPERATIONS)})")
+
+    return ProfilAgriculteur.model_validate(data)
+
+
+def champs_modifies(base: ProfilAgriculteur, variante: ProfilAgriculteur) -> List[str]:
+    """Champs du profil dont la valeur diffère entre les deux profils"""
+    return [
+        champ for champ in ProfilAgriculteur.model_fields
+        if champ not in CHAMPS_NON_MODIFIABLES and getattr(base, champ) != getattr(variante, champ)
+    ]
+
+
+def _resume_aide(aide: AideAgricoleV2, score: float, estimation=None) -> Dict[str, Any]:
+    resume = {"aid_id": aide.aid_id, "titre": aide.titre, "score": round(score, 2)}
+    if estimation is not None:
+        resume["montant_estime_min"], resume["montant_estime_max"] = estimation
+    return resume
+
+
+class AnalyseWhatIf:
+    """
+    Évaluations du profil de base réutilisées par tous les scénarios
+
+    Pour chaque aide : évaluation par groupe, score, éligibilité et groupes
+    bloquants du profil de base.
+    """
+
+    def __init__(self, aides: Sequence[AideAgricoleV2], profil: ProfilAgriculteur,
+                 engine: Optional[MatchingEngine] = None):
+        self.engine = engine or MatchingEngine()
+        self.aides = list(aides)
+        self.profil = profil
+        self.evaluations = [self.engine.evaluer_groupes(aide, profil) for aide in self.aides]
+        self.scores = [self.engine.score_evaluations(evaluation) for evaluation in self.evaluations]
+        self.bloquants = [
+            frozenset(nom for nom, (_, _, bloquant) in evaluation.items() if bloquant)
+            for evaluation in self.evaluations
+        ]
+        contexte = ContexteProfil(profil)
+        self.estimations = {
+            i: compiler_estimateur(self.aides[i])(contexte)
+            for i, (_, eligible) in enumerate(self.scores) if eligible
+        }
+        self.montant_total = sommer_estimations(self.estimations.values())
+
+    def resume_base(self) -> Dict[str, Any]:
+        return {
+            "profil_id": self.profil.profil_id,
+            "total_aides": len(self.aides),
+            "aides_eligibles": len(self.estimations),
+            "montant_total_estime_min": round(self.montant_total[0], 2),
+            "montant_total_estime_max": round(self.montant_total[1], 2),
+        }
+
+    def evaluer_scenario(self, scenario: ScenarioWhatIf) -> Dict[str, Any]:
+        """Aides gagnées / perdues et variation du montant total estimé pour un scénario"""
+        engine = self.engine
+        variante = appliquer_changements(self.profil, scenario.changements)
+        champs = champs_modifies(self.profil, variante)
+        groupes = engine.groupes_concernes(champs)
+        a_recalculer = frozenset(groupes)
+        contexte = ContexteProfil(variante)
+
+        gagnees, perdues, estimations = [], [], []
+        reevaluees = 0
+        for i, aide in enumerate(self.aides):
+            score, eligible = self.scores[i]
+            if a_recalculer:
+                if self.bloquants[i] - a_recalculer:
+                    # Un critère bloquant d'un groupe inchangé exclut toujours l'aide
+                    score, eligible = 0.0, False
+                else:
+                    evaluation = dict(self.evaluations[i])
+                    evaluation.update(engine.evaluer_groupes(aide, variante, groupes=a_recalculer))
+                    score, eligible = engine.score_evaluations(evaluation)
+                    reevaluees += 1
+
+            etait_eligible = i in self.estimations
+            if eligible:
+                estimation = compiler_estimateur(aide)(contexte)
+                estimations.append(estimation)
+                if not etait_eligible:
+                    gagnees.append(_resume_aide(aide, score, estimation))
+            elif etait_eligible:
+                perdues.append(_resume_aide(aide, self.scores[i][0], self.estimations[i]))
+
+        total_min, total_max = sommer_estimations(estimations)
+        gagnees.sort(key=lambda r: -r["score"])
+        perdues.sort(key=lambda r: -r["score"])
+        return {
+            "nom": scenario.nom,
+            "changements": [changement.model_dump() for changement in scenario.changements],
+            "champs_modifies": champs,
+            "groupes_recalcules": groupes,
+            "aides_reevaluees": reevaluees,
+            "aides_eligibles": len(estimations),
+            "aides_gagnees": gagnees,
+            "aides_perdues": perdues,
+            "montant_total_estime_min": round(total_min, 2),
+            "montant_total_estime_max": round(total_max, 2),
+            "delta_montant_min": round(total_min - self.montant_total[0], 2),
+            "delta_montant_max": round(total_max - self.montant_total[1], 2),
+        }
+
+
+def analyser_scenarios(aides: Sequence[AideAgricoleV2], profil: ProfilAgriculteur,
+                       scenarios: Sequence[ScenarioWhatIf]) -> Dict[str, Any]:
+    """Évalue tous les scénarios en une passe sur le catalogue du profil de base"""
+    if len(scenarios) > WHAT_IF_MAX_SCENARIOS:
+        raise ValueError(f"Trop de scénarios ({len(scenarios)}, maximum {WHAT_IF_MAX_SCENARIOS})")
+    # Validation de tous les changements avant l'évaluation du catalogue
+    for scenario in scenarios:
+        appliquer_changements(profil, scenario.changements)
+
+    analyse = AnalyseWhatIf(aides, profil)
+    return {
+        "base": analyse.resume_base(),
+        "scenarios": [analyse.evaluer_scenario(scenario) for scenario in scenarios],
+    }